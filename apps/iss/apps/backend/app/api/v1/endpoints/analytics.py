@@ -3,19 +3,18 @@ Endpoint API per Analytics Dashboard e KPI
 Sistema completo di analytics per bandi e utenti ISS
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_, desc, extract
+from sqlalchemy import select, func
 from fastapi_cache.decorator import cache
 from pydantic import BaseModel
 
 from app.database.database import get_db
-from app.models.bando import Bando, BandoStatus
-from app.models.aps_user import APSUser, BandoApplication
-from app.crud.bando import bando_crud
-from app.crud.aps_user import aps_user_crud
+from app.models.aps_user import BandoApplication
+from app.crud.analytics import analytics_crud
+from app.crud.rollup import rollup_crud
 
 router = APIRouter()
 
@@ -98,35 +97,17 @@ async def get_kpi_dashboard(db: AsyncSession = Depends(get_db)):
     - Success rate candidature
     """
     try:
-        # Conta bandi per stato
-        total_result = await db.execute(select(func.count(Bando.id)))
-        total_bandi = total_result.scalar() or 0
-        
-        active_result = await db.execute(
-            select(func.count(Bando.id)).where(Bando.status == 'attivo')
-        )
-        active_bandi = active_result.scalar() or 0
-        
-        expired_result = await db.execute(
-            select(func.count(Bando.id)).where(Bando.status == 'scaduto')
-        )
-        expired_bandi = expired_result.scalar() or 0
+        # Conteggi per stato e nuovi bandi dal rollup giornaliero (costo indipendente dal numero di bandi)
+        kpis = await rollup_crud.bandi_kpis(db)
+        total_bandi = kpis['total']
+        active_bandi = kpis['active']
+        expired_bandi = kpis['expired']
         
         # Crescita settimanale
-        week_ago = datetime.now() - timedelta(days=7)
-        weekly_result = await db.execute(
-            select(func.count(Bando.id)).where(Bando.data_trovato >= week_ago)
-        )
-        weekly_new = weekly_result.scalar() or 0
-        weekly_growth = (weekly_new / total_bandi * 100) if total_bandi > 0 else 0
+        weekly_growth = (kpis['new_week'] / total_bandi * 100) if total_bandi > 0 else 0
         
         # Crescita mensile
-        month_ago = datetime.now() - timedelta(days=30)
-        monthly_result = await db.execute(
-            select(func.count(Bando.id)).where(Bando.data_trovato >= month_ago)
-        )
-        monthly_new = monthly_result.scalar() or 0
-        monthly_growth = (monthly_new / total_bandi * 100) if total_bandi > 0 else 0
+        monthly_growth = (kpis['new_month'] / total_bandi * 100) if total_bandi > 0 else 0
         
         # Success rate candidature
         total_apps_result = await db.execute(select(func.count(BandoApplication.id)))
@@ -183,32 +164,19 @@ async def get_trends(
     try:
         cutoff_date = datetime.now() - timedelta(days=days)
         
-        # Query bandi nel periodo
-        result = await db.execute(
-            select(Bando).where(Bando.data_trovato >= cutoff_date).order_by(Bando.data_trovato)
-        )
-        bandi = list(result.scalars().all())
-        
-        # Aggrega per giorno
-        daily_counts: Dict[str, int] = {}
-        for bando in bandi:
-            if bando.data_trovato:
-                date_key = bando.data_trovato.strftime('%Y-%m-%d')
-                daily_counts[date_key] = daily_counts.get(date_key, 0) + 1
+        # Conteggi giornalieri dal rollup; settimane e mesi derivati da quelli
+        daily_counts = await rollup_crud.daily_new_bandi(db, cutoff_date.date())
         
         daily_data = [
-            TimeSeriesData(date=date, value=count)
-            for date, count in sorted(daily_counts.items())
+            TimeSeriesData(date=day.strftime('%Y-%m-%d'), value=count)
+            for day, count in daily_counts
         ]
         
-        # Aggrega per settimana
+        # Aggrega per settimana (lunedì della settimana)
         weekly_counts: Dict[str, int] = {}
-        for bando in bandi:
-            if bando.data_trovato:
-                # Ottieni lunedì della settimana
-                week_start = bando.data_trovato - timedelta(days=bando.data_trovato.weekday())
-                week_key = week_start.strftime('%Y-%m-%d')
-                weekly_counts[week_key] = weekly_counts.get(week_key, 0) + 1
+        for day, count in daily_counts:
+            week_key = (day - timedelta(days=day.weekday())).strftime('%Y-%m-%d')
+            weekly_counts[week_key] = weekly_counts.get(week_key, 0) + count
         
         weekly_data = [
             TimeSeriesData(date=date, value=count, label=f"Settimana {date}")
@@ -217,10 +185,9 @@ async def get_trends(
         
         # Aggrega per mese
         monthly_counts: Dict[str, int] = {}
-        for bando in bandi:
-            if bando.data_trovato:
-                month_key = bando.data_trovato.strftime('%Y-%m')
-                monthly_counts[month_key] = monthly_counts.get(month_key, 0) + 1
+        for day, count in daily_counts:
+            month_key = day.strftime('%Y-%m')
+            monthly_counts[month_key] = monthly_counts.get(month_key, 0) + count
         
         monthly_data = [
             TimeSeriesData(date=f"{date}-01", value=count, label=date)
@@ -250,43 +217,23 @@ async def get_source_distribution(db: AsyncSession = Depends(get_db)):
     - Bandi attivi vs scaduti
     """
     try:
-        # Query tutti i bandi
-        result = await db.execute(select(Bando))
-        all_bandi = list(result.scalars().all())
-        total = len(all_bandi)
+        # Una riga per fonte, già ordinate per count decrescente
+        source_stats = await analytics_crud.source_distribution(db)
+        total = sum(stats['count'] for stats in source_stats)
         
         if total == 0:
             return []
         
-        # Aggrega per fonte
-        source_stats: Dict[str, Dict[str, int]] = {}
-        for bando in all_bandi:
-            fonte = bando.fonte.value if hasattr(bando.fonte, 'value') else str(bando.fonte)
-            
-            if fonte not in source_stats:
-                source_stats[fonte] = {'total': 0, 'active': 0, 'expired': 0}
-            
-            source_stats[fonte]['total'] += 1
-            
-            if bando.status.value == 'attivo' if hasattr(bando.status, 'value') else bando.status == 'attivo':
-                source_stats[fonte]['active'] += 1
-            else:
-                source_stats[fonte]['expired'] += 1
-        
-        # Crea lista risultati
-        distributions = []
-        for fonte, stats in source_stats.items():
-            distributions.append(SourceDistribution(
-                source=fonte,
-                count=stats['total'],
-                percentage=round(stats['total'] / total * 100, 2),
+        return [
+            SourceDistribution(
+                source=stats['source'],
+                count=stats['count'],
+                percentage=round(stats['count'] / total * 100, 2),
                 active=stats['active'],
                 expired=stats['expired']
-            ))
-        
-        # Ordina per count decrescente
-        distributions.sort(key=lambda x: x.count, reverse=True)
-        return distributions
+            )
+            for stats in source_stats
+        ]
         
     except Exception as e:
         return []
@@ -299,33 +246,18 @@ async def get_category_distribution(db: AsyncSession = Depends(get_db)):
     📂 Distribuzione bandi per categoria
     """
     try:
-        result = await db.execute(select(Bando))
-        all_bandi = list(result.scalars().all())
-        total = len(all_bandi)
-        
-        if total == 0:
-            return []
+        # Top 10 categorie con il totale dei bandi per la percentuale
+        category_counts = await analytics_crud.category_distribution(db, limit=10)
         
-        # Aggrega per categoria
-        category_counts: Dict[str, int] = {}
-        for bando in all_bandi:
-            categoria = bando.categoria or 'Non specificata'
-            category_counts[categoria] = category_counts.get(categoria, 0) + 1
-        
-        # Crea lista risultati
-        categories = [
+        return [
             CategoryData(
                 category=cat,
                 value=count,
                 percentage=round(count / total * 100, 2)
             )
-            for cat, count in category_counts.items()
+            for cat, count, total in category_counts
         ]
         
-        # Ordina per valore decrescente
-        categories.sort(key=lambda x: x.value, reverse=True)
-        return categories[:10]  # Top 10
-        
     except Exception as e:
         return []
 
@@ -339,45 +271,18 @@ async def get_geographic_distribution(db: AsyncSession = Depends(get_db)):
     Heatmap per regioni e province
     """
     try:
-        result = await db.execute(select(Bando))
-        all_bandi = list(result.scalars().all())
+        # Regione estratta dall'ente e conteggi calcolati nel database
+        region_counts = await analytics_crud.geographic_distribution(db)
         
-        # Aggrega per regione (estrai da ente)
-        region_counts: Dict[str, int] = {}
-        
-        for bando in all_bandi:
-            # Cerca keyword regionali nell'ente
-            ente_lower = bando.ente.lower()
-            
-            if 'campania' in ente_lower or 'regione campania' in ente_lower:
-                region_counts['Campania'] = region_counts.get('Campania', 0) + 1
-            elif 'salerno' in ente_lower:
-                region_counts['Salerno'] = region_counts.get('Salerno', 0) + 1
-            elif 'napoli' in ente_lower:
-                region_counts['Napoli'] = region_counts.get('Napoli', 0) + 1
-            elif 'avellino' in ente_lower:
-                region_counts['Avellino'] = region_counts.get('Avellino', 0) + 1
-            elif 'caserta' in ente_lower:
-                region_counts['Caserta'] = region_counts.get('Caserta', 0) + 1
-            elif 'benevento' in ente_lower:
-                region_counts['Benevento'] = region_counts.get('Benevento', 0) + 1
-            else:
-                region_counts['Altro'] = region_counts.get('Altro', 0) + 1
-        
-        # Crea lista risultati
-        geographic = [
+        return [
             GeographicData(
                 region=region,
                 count=count,
                 total_amount=None
             )
-            for region, count in region_counts.items()
+            for region, count in region_counts
         ]
         
-        # Ordina per count decrescente
-        geographic.sort(key=lambda x: x.count, reverse=True)
-        return geographic
-        
     except Exception as e:
         return []
 
@@ -396,74 +301,29 @@ async def get_user_analytics(db: AsyncSession = Depends(get_db)):
     - Settori più popolari
     """
     try:
-        # Conta utenti
-        total_result = await db.execute(select(func.count(APSUser.id)))
-        total_users = total_result.scalar() or 0
-        
-        active_result = await db.execute(
-            select(func.count(APSUser.id)).where(APSUser.is_active == True)
-        )
-        active_users = active_result.scalar() or 0
-        
-        # Nuovi utenti settimana
-        week_ago = datetime.now() - timedelta(days=7)
-        week_result = await db.execute(
-            select(func.count(APSUser.id)).where(APSUser.created_at >= week_ago)
-        )
-        new_users_week = week_result.scalar() or 0
-        
-        # Nuovi utenti mese
-        month_ago = datetime.now() - timedelta(days=30)
-        month_result = await db.execute(
-            select(func.count(APSUser.id)).where(APSUser.created_at >= month_ago)
-        )
-        new_users_month = month_result.scalar() or 0
-        
-        # Distribuzione per tipo
-        users_result = await db.execute(select(APSUser))
-        all_users = list(users_result.scalars().all())
-        
-        type_counts: Dict[str, int] = {}
-        region_counts: Dict[str, int] = {}
-        sector_counts: Dict[str, int] = {}
-        
-        for user in all_users:
-            # Tipo organizzazione
-            org_type = user.organization_type.value if hasattr(user.organization_type, 'value') else str(user.organization_type)
-            type_counts[org_type] = type_counts.get(org_type, 0) + 1
-            
-            # Regione
-            region = user.region or 'Non specificata'
-            region_counts[region] = region_counts.get(region, 0) + 1
-            
-            # Settori
-            if user.sectors:
-                for sector in user.sectors:
-                    sector_counts[sector] = sector_counts.get(sector, 0) + 1
+        stats = await analytics_crud.user_analytics(db)
+        total_users = stats['total_users']
         
-        # Converti in liste
         users_by_type = [
             CategoryData(category=t, value=c, percentage=round(c/total_users*100, 2) if total_users > 0 else 0)
-            for t, c in type_counts.items()
+            for t, c in stats['users_by_type']
         ]
-        users_by_type.sort(key=lambda x: x.value, reverse=True)
         
         users_by_region = [
             GeographicData(region=r, count=c)
-            for r, c in region_counts.items()
+            for r, c in stats['users_by_region']
         ]
-        users_by_region.sort(key=lambda x: x.count, reverse=True)
         
         top_sectors = [
-            CategoryData(category=s, value=c, percentage=round(c/len(all_users)*100, 2) if all_users else 0)
-            for s, c in sorted(sector_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+            CategoryData(category=s, value=c, percentage=round(c/total_users*100, 2) if total_users > 0 else 0)
+            for s, c in stats['top_sectors']
         ]
         
         return UserAnalytics(
             total_users=total_users,
-            active_users=active_users,
-            new_users_week=new_users_week,
-            new_users_month=new_users_month,
+            active_users=stats['active_users'],
+            new_users_week=stats['new_users_week'],
+            new_users_month=stats['new_users_month'],
             users_by_type=users_by_type,
             users_by_region=users_by_region,
             top_sectors=top_sectors
@@ -486,41 +346,23 @@ async def get_user_analytics(db: AsyncSession = Depends(get_db)):
 @cache(expire=600)
 async def get_top_keywords(
     limit: int = Query(20, ge=5, le=50),
+    days: Optional[int] = Query(None, ge=1, le=365, description="Solo bandi trovati negli ultimi N giorni"),
     db: AsyncSession = Depends(get_db)
 ):
     """
     🔤 Top keywords emergenti dai bandi
     
-    Analisi NLP delle parole più frequenti nei titoli e descrizioni
+    Termini più frequenti nei titoli e descrizioni dei bandi non archiviati,
+    letti dai conteggi giornalieri mantenuti in fase di ingest
     """
     try:
-        result = await db.execute(select(Bando))
-        all_bandi = list(result.scalars().all())
-        
-        # Conta parole (semplice word frequency)
-        word_counts: Dict[str, int] = {}
-        
-        # Stop words italiane comuni
-        stop_words = {'il', 'lo', 'la', 'i', 'gli', 'le', 'un', 'uno', 'una', 'di', 'a', 'da', 'in', 'con', 'su', 'per', 'tra', 'fra', 'e', 'o', 'ma', 'se', 'che', 'del', 'della', 'dei', 'delle', 'al', 'alla', 'ai', 'alle', 'dal', 'dalla', 'dai', 'dalle'}
-        
-        for bando in all_bandi:
-            text = f"{bando.title} {bando.descrizione or ''}".lower()
-            words = text.split()
-            
-            for word in words:
-                # Pulisci parola
-                word = ''.join(c for c in word if c.isalnum())
-                
-                # Filtra stop words e parole corte
-                if len(word) > 3 and word not in stop_words:
-                    word_counts[word] = word_counts.get(word, 0) + 1
-        
-        # Top keywords
-        top_keywords = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)[:limit]
+        since = (datetime.now() - timedelta(days=days)).date() if days else None
+        top_keywords = await rollup_crud.top_keywords(db, limit=limit, since=since)
+        bandi_count = await rollup_crud.counted_bandi(db, since=since)
         
         return {
             "keywords": [
-                {"word": word, "count": count, "relevance": round(count / len(all_bandi), 2)}
+                {"word": word, "count": count, "relevance": round(count / max(bandi_count, 1), 2)}
                 for word, count in top_keywords
             ]
         }
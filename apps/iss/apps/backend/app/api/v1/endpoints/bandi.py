@@ -1,5 +1,6 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi_cache.decorator import cache
 
@@ -11,10 +12,16 @@ from app.schemas.bando import (
     BandoStatusEnum, BandoSourceEnum
 )
 from app.models.admin import AdminUser
+from app.services.bando_lifecycle import bando_lifecycle_service
 from app.services.bando_monitor import bando_monitor_service
+from app.services.event_broker import BANDO_CREATED, BANDO_STATUS, bando_event, event_broker, filter_terms
 
 router = APIRouter()
 
+# Limiti del filtro dello stream SSE (ogni evento è confrontato con tutti i termini)
+MAX_STREAM_TERMS = 20
+MAX_STREAM_TERM_LENGTH = 100
+
 
 @router.get("/", response_model=BandoList)
 @cache(expire=300)
@@ -109,6 +116,32 @@ async def get_recent_bandi(
     return await bando_crud.get_recent_bandi(db, limit=limit)
 
 
+@router.get("/stream")
+async def stream_bandi_events(
+    request: Request,
+    terms: List[str] = Query(
+        [], description="Settori o parole chiave dell'organizzazione (nessun termine = tutti gli eventi)"
+    )
+):
+    """Flusso SSE di nuovi bandi e cambi di stato (endpoint pubblico).
+
+    Il filtro arriva dal client: l'endpoint non legge profili, quindi non espone
+    i dati delle organizzazioni registrate.
+    """
+    terms = filter_terms(terms)
+    if len(terms) > MAX_STREAM_TERMS or any(len(term) > MAX_STREAM_TERM_LENGTH for term in terms):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Al massimo {MAX_STREAM_TERMS} termini di {MAX_STREAM_TERM_LENGTH} caratteri"
+        )
+
+    return StreamingResponse(
+        event_broker.stream(terms, is_disconnected=request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/{bando_id}", response_model=BandoRead)
 async def get_bando(
     bando_id: int,
@@ -133,7 +166,10 @@ async def create_bando(
     current_admin: AdminUser = Depends(get_current_admin)
 ):
     """Crea un nuovo bando manualmente (endpoint admin)."""
-    return await bando_crud.create_bando(db, bando=bando_data)
+    bando = await bando_crud.create_bando(db, bando=bando_data)
+    # Client SSE e indice suggerimenti di ogni worker
+    await event_broker.publish([bando_event(BANDO_CREATED, bando)])
+    return bando
 
 
 @router.put("/{bando_id}", response_model=BandoRead)
@@ -150,6 +186,8 @@ async def update_bando(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Bando non trovato"
         )
+    if 'status' in bando_data.model_dump(exclude_unset=True):
+        await event_broker.publish([bando_event(BANDO_STATUS, bando)])
     return bando
 
 
@@ -195,9 +233,14 @@ async def cleanup_old_bandi(
     db: AsyncSession = Depends(get_db),
     current_admin: AdminUser = Depends(get_current_admin)
 ):
-    """Pulisce/archivia i bandi vecchi (endpoint admin)."""
-    count = await bando_crud.cleanup_old_bandi(db, days_old=days_old)
-    return {"message": f"Archiviati {count} bandi", "archived_count": count}
+    """Scade i bandi con termine passato e archivia quelli vecchi (endpoint admin)."""
+    result = await bando_lifecycle_service.run(db, archive_after_days=days_old)
+    count = len(result['archived'])
+    return {
+        "message": f"Archiviati {count} bandi",
+        "archived_count": count,
+        "expired_count": len(result['expired'])
+    }
 
 
 @router.post("/trigger-monitoring")
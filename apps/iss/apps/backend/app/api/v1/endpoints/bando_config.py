@@ -11,7 +11,7 @@ from app.schemas.bando_config import (
 )
 from app.models.admin import AdminUser
 from app.crud.bando_config import bando_config_crud
-from app.services.bando_monitor import bando_monitor_service
+from app.services.bando_monitor import BandoMonitorService
 
 router = APIRouter()
 
@@ -39,6 +39,34 @@ async def get_monitor_status(
     return await bando_config_crud.get_monitor_status(db)
 
 
+@router.get("/scheduler/jobs")
+async def get_scheduler_jobs(
+    limit: int = Query(50, ge=1, le=500),
+    job_id: Optional[str] = Query(None),
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """Job dello scheduler con esiti, durate e storico recente (admin)."""
+    from app.services.job_telemetry import job_telemetry
+    from app.services.leader_election import leader_elector
+    from app.services.scheduler import scheduler_service
+
+    return {
+        'is_leader': leader_elector.is_leader,
+        'is_running': scheduler_service.is_running,
+        'jobs': [
+            {
+                'id': job.id,
+                'name': job.name,
+                'next_run_time': job.next_run_time.isoformat() if job.next_run_time else None,
+            }
+            for job in scheduler_service.get_jobs()
+        ],
+        'running': job_telemetry.running,
+        'summary': job_telemetry.summary(),
+        'history': job_telemetry.recent(limit=limit, job_id=job_id),
+    }
+
+
 @router.get("/{config_id}", response_model=BandoConfigRead)
 async def get_bando_config(
     config_id: int,
@@ -277,8 +305,10 @@ async def test_bando_config(
 async def _run_monitoring_task(db: AsyncSession, config):
     """Task in background per eseguire il monitoraggio"""
     try:
-        async with bando_monitor_service as monitor:
-            result = await monitor.run_monitoring(db, config)
+        # Istanza dedicata: può girare in parallelo alle esecuzioni dello scheduler
+        async with BandoMonitorService() as monitor:
+            # Esecuzione manuale: interroga tutte le fonti, anche quelle non ancora dovute
+            result = await monitor.run_monitoring(db, config, force=True)
             
             # Salva log del risultato
             log_data = {
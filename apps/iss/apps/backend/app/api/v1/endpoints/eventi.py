@@ -492,7 +492,7 @@ def get_qr_code_evento(
     # Salva token temporaneo (potresti usare Redis per questo)
     # Per ora lo includiamo nel QR code
     
-    qr_data = f"{settings.API_V1_STR}/eventi/{evento_id}/check-in-qr?token={token}&user_id={user_id}"
+    qr_data = f"{settings.api_v1_prefix}/eventi/{evento_id}/check-in-qr?token={token}&user_id={user_id}"
     
     qr_code_image = generate_qr_code(qr_data)
     
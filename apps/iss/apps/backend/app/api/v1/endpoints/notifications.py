@@ -10,8 +10,10 @@ from pydantic import BaseModel, EmailStr
 from app.database.database import get_db
 from app.services.email_notifications import email_notification_service
 from app.services.alert_system import alert_system
+from app.services.ingest_pipeline import ingest_pipeline
 from app.crud.aps_user import aps_user_crud
 from app.crud.bando import bando_crud
+from app.crud.email_outbox import email_outbox_crud
 
 router = APIRouter()
 
@@ -47,6 +49,8 @@ class NotificationStats(BaseModel):
     active_users: int
     emails_sent_today: int
     emails_sent_week: int
+    emails_pending: int = 0
+    emails_failed: int = 0
     newsletter_subscribers: int
     alert_subscribers: int
 
@@ -179,38 +183,40 @@ async def get_notification_stats(db: AsyncSession = Depends(get_db)):
     📊 Statistiche sistema notifiche
     """
     try:
-        # Conta utenti
-        all_users, total_users = await aps_user_crud.search_users(db, skip=0, limit=10000)
-        active_users, _ = await aps_user_crud.search_users(db, skip=0, limit=10000, is_active=True)
+        # Utenti e sottoscrittori newsletter e alert
+        audience = await aps_user_crud.get_notification_audience(db)
         
-        # Conta sottoscrittori newsletter e alert
-        newsletter_subscribers = 0
-        alert_subscribers = 0
-        
-        for user in active_users:
-            preferences = user.notification_preferences or {}
-            if preferences.get('weekly_newsletter', True):
-                newsletter_subscribers += 1
-            if preferences.get('new_bandi_alerts', True):
-                alert_subscribers += 1
+        # Consegne dalla coda email
+        delivery = await email_outbox_crud.get_delivery_stats(db)
         
         return NotificationStats(
-            total_users=total_users,
-            active_users=len(active_users),
-            emails_sent_today=0,  # TODO: Implementare tracking
-            emails_sent_week=0,   # TODO: Implementare tracking
-            newsletter_subscribers=newsletter_subscribers,
-            alert_subscribers=alert_subscribers
+            total_users=audience['total_users'],
+            active_users=audience['active_users'],
+            emails_sent_today=delivery['sent_today'],
+            emails_sent_week=delivery['sent_week'],
+            emails_pending=delivery['pending'],
+            emails_failed=delivery['failed'],
+            newsletter_subscribers=audience['weekly_newsletter'],
+            alert_subscribers=audience['new_bandi_alerts']
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Errore calcolo statistiche: {e}")
 
 
+@router.get("/pipeline")
+async def get_pipeline_metrics():
+    """
+    🚰 Metriche della pipeline ingest → embedding → alert (code e latenze per stage)
+    """
+    return {"running": ingest_pipeline.is_running, "stages": ingest_pipeline.metrics()}
+
+
 @router.post("/trigger-alerts")
 async def trigger_manual_alerts(
     background_tasks: BackgroundTasks,
     alert_type: str = "all",  # all, new_bandi, deadlines, newsletter
+    dry_run: bool = False,  # compone i messaggi senza accodarli
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -221,13 +227,13 @@ async def trigger_manual_alerts(
             results = {}
             
             if alert_type in ["all", "new_bandi"]:
-                results["new_bandi"] = await alert_system.check_new_bandi_alerts(db)
+                results["new_bandi"] = await alert_system.check_new_bandi_alerts(db, dry_run=dry_run)
             
             if alert_type in ["all", "deadlines"]:
-                results["deadlines"] = await alert_system.check_deadline_reminders(db)
+                results["deadlines"] = await alert_system.check_deadline_reminders(db, dry_run=dry_run)
             
             if alert_type in ["all", "newsletter"]:
-                results["newsletter"] = await alert_system.send_weekly_newsletters(db)
+                results["newsletter"] = await alert_system.send_weekly_newsletters(db, dry_run=dry_run)
             
             print(f"Manual alerts triggered: {results}")
             
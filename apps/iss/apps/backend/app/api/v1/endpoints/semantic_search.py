@@ -3,14 +3,16 @@ Endpoint per ricerca semantica e matching intelligente
 """
 
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from fastapi_cache.decorator import cache
+from slowapi.util import get_remote_address
 
 from app.database.database import get_db
 from app.schemas.bando import BandoRead
 from app.services.semantic_search import semantic_search_service
+from app.services.suggestion_index import suggestion_index
 from app.crud.bando import bando_crud
 
 router = APIRouter()
@@ -51,6 +53,7 @@ class SuggestionsRequest(BaseModel):
 @router.post("/search", response_model=List[SemanticSearchResult])
 async def semantic_search(
     request: SemanticSearchRequest,
+    http_request: Request,
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -66,6 +69,9 @@ async def semantic_search(
             limit=request.limit,
             threshold=request.threshold
         )
+        if results:
+            # Solo le ricerche con risultati possono diventare suggerimenti
+            suggestion_index.record_query(request.query, get_remote_address(http_request))
         
         # Formatta risultati con spiegazione del match
         formatted_results = []
@@ -129,16 +135,17 @@ async def match_profile_to_bandi(
 
 
 @router.get("/suggestions", response_model=List[str])
-@cache(expire=300)  # Cache 5 minuti
 async def get_intelligent_suggestions(
     search_history: str = Query("", description="Storico ricerche (comma-separated)"),
     context: Optional[str] = Query(None, description="Contesto corrente"),
+    prefix: Optional[str] = Query(None, max_length=100, description="Testo digitato nella barra di ricerca"),
     limit: int = Query(5, ge=1, le=20)
 ):
     """
     💡 Suggerimenti intelligenti per ricerche
     
-    Genera suggerimenti basati su storico ricerche e context AI.
+    Completa il testo digitato e lo storico ricerche usando l'indice in memoria
+    di titoli, enti, categorie e query più cercate (nessun accesso al database).
     """
     try:
         # Parsing storico
@@ -146,7 +153,8 @@ async def get_intelligent_suggestions(
         
         suggestions = semantic_search_service.get_intelligent_suggestions(
             search_history=history,
-            limit=limit
+            limit=limit,
+            prefix=prefix
         )
         
         return suggestions
@@ -237,7 +245,9 @@ async def get_semantic_search_stats():
         "total_embeddings": len(semantic_search_service.bando_embeddings),
         "last_update": semantic_search_service.last_update,
         "model_name": semantic_search_service.model_name,
-        "cache_valid": semantic_search_service._is_cache_valid()
+        "cache_valid": semantic_search_service._is_cache_valid(),
+        "suggestion_phrases": len(suggestion_index),
+        "suggestion_index_built": suggestion_index.last_build
     }
 
 
@@ -5,7 +5,7 @@ Endpoint per statistiche generali della piattaforma ISS
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi_cache.decorator import cache
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from app.database.database import get_db
 from app.crud.bando import bando_crud
@@ -22,17 +22,10 @@ async def get_iss_stats(db: AsyncSession = Depends(get_db)):
     Dashboard completa con metriche chiave del sistema
     """
     try:
-        # Statistiche bandi
+        # Statistiche bandi: conteggi, fonti, categorie e nuovi bandi aggregati nel database
         bando_stats = await bando_crud.get_stats(db)
-        
-        # Statistiche temporali
-        now = datetime.now()
-        week_ago = now - timedelta(days=7)
-        month_ago = now - timedelta(days=30)
-        
-        bandi_totali, _ = await bando_crud.get_bandi(db, skip=0, limit=1000)
-        bandi_week = [b for b in bandi_totali if b.data_trovato and b.data_trovato >= week_ago]
-        bandi_month = [b for b in bandi_totali if b.data_trovato and b.data_trovato >= month_ago]
+        totali = bando_stats["totali"]
+        macro_categorie = bando_stats["macro_categorie"]
         
         # Statistiche AI (se disponibili)
         ai_stats = {}
@@ -54,15 +47,15 @@ async def get_iss_stats(db: AsyncSession = Depends(get_db)):
         
         return {
             # Metriche principali
-            "totali": len(bandi_totali),
-            "attivi": len([b for b in bandi_totali if b.stato == 'aperto']),
-            "scaduti": len([b for b in bandi_totali if b.stato == 'scaduto']),
+            "totali": totali,
+            "attivi": bando_stats["attivi"],
+            "scaduti": bando_stats["scaduti"],
             
             # Trend temporali
-            "nuovi_settimana": len(bandi_week),
-            "nuovi_mese": len(bandi_month),
-            "crescita_settimanale": len(bandi_week),
-            "crescita_mensile": len(bandi_month),
+            "nuovi_settimana": bando_stats["nuovi_settimana"],
+            "nuovi_mese": bando_stats["nuovi_mese"],
+            "crescita_settimanale": bando_stats["nuovi_settimana"],
+            "crescita_mensile": bando_stats["nuovi_mese"],
             
             # Distribuzione per fonte
             "fonti": bando_stats.get("bandi_per_fonte", {}),
@@ -70,18 +63,15 @@ async def get_iss_stats(db: AsyncSession = Depends(get_db)):
             
             # Distribuzione per categoria
             "categorie": {
-                "sociale": len([b for b in bandi_totali if b.categoria and "social" in b.categoria.lower()]),
-                "formazione": len([b for b in bandi_totali if b.categoria and "formazione" in b.categoria.lower()]),
-                "cultura": len([b for b in bandi_totali if b.categoria and "cultur" in b.categoria.lower()]),
-                "ambiente": len([b for b in bandi_totali if b.categoria and "ambient" in b.categoria.lower()]),
-                "altri": len([b for b in bandi_totali if not b.categoria or "social" not in b.categoria.lower()])
+                **macro_categorie,
+                "altri": totali - macro_categorie["sociale"]
             },
             
             # Range importi
             "importi": {
-                "max": max([b.importo for b in bandi_totali if b.importo], default=0),
-                "min": min([b.importo for b in bandi_totali if b.importo and b.importo > 0], default=0),
-                "media": sum([b.importo for b in bandi_totali if b.importo]) / len([b for b in bandi_totali if b.importo]) if any(b.importo for b in bandi_totali) else 0
+                "max": bando_stats["importo_massimo"],
+                "min": bando_stats["importo_minimo"],
+                "media": bando_stats["importo_medio"]
             },
             
             # Statistiche AI
@@ -89,7 +79,7 @@ async def get_iss_stats(db: AsyncSession = Depends(get_db)):
             
             # Sistema
             "sistema": {
-                "ultima_sincronizzazione": max([b.data_trovato for b in bandi_totali if b.data_trovato], default=datetime.now()).isoformat(),
+                "ultima_sincronizzazione": (bando_stats["ultimo_trovato"] or datetime.now()).isoformat(),
                 "uptime": True,
                 "monitoring_attivo": True,
                 "versione": "2.0.0-ai"
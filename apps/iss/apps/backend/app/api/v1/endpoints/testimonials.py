@@ -422,7 +422,7 @@ def create_richiesta_testimonial(
             context={
                 "nome_destinatario": richiesta.nome_destinatario,
                 "messaggio": richiesta.messaggio_richiesta,
-                "link_risposta": f"{settings.FRONTEND_URL}/testimonials/rispondi/{token}"
+                "link_risposta": f"{settings.frontend_url}/testimonials/rispondi/{token}"
             }
         )
     except Exception as e:
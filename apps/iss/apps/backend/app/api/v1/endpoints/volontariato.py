@@ -352,7 +352,7 @@ def candidati_volontariato(
                     "responsabile_name": opportunita.responsabile.nome,
                     "opportunita_titolo": opportunita.titolo,
                     "candidato_nome": f"{current_user.nome} {current_user.cognome}",
-                    "candidatura_url": f"{settings.FRONTEND_URL}/volontariato/candidature/{candidatura.id}"
+                    "candidatura_url": f"{settings.frontend_url}/volontariato/candidature/{candidatura.id}"
                 }
             )
     except Exception as e:
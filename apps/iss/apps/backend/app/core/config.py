@@ -30,6 +30,8 @@ class Settings(BaseSettings):
     api_v1_prefix: str = "/api/v1"
     project_name: str = "ISS WBS API"
     environment: str = Field(default="development", alias="ENVIRONMENT")
+    # Base dei link inseriti nelle email (login, dashboard, reset password)
+    frontend_url: str = Field(default="http://localhost:3000", alias="FRONTEND_URL")
     
     # CORS
     allowed_origins_str: str = Field(
@@ -68,6 +70,35 @@ class Settings(BaseSettings):
     mail_server: str = Field(default="smtp.gmail.com", alias="MAIL_SERVER")
     mail_starttls: bool = Field(default=True, alias="MAIL_STARTTLS")
     mail_ssl_tls: bool = Field(default=False, alias="MAIL_SSL_TLS")
+    # SMTP connection pool
+    mail_pool_size: int = Field(default=3, alias="MAIL_POOL_SIZE")
+    mail_max_messages_per_connection: int = Field(default=100, alias="MAIL_MAX_MESSAGES_PER_CONNECTION")
+    mail_idle_timeout_seconds: float = Field(default=30.0, alias="MAIL_IDLE_TIMEOUT_SECONDS")
+    mail_timeout_seconds: float = Field(default=30.0, alias="MAIL_TIMEOUT_SECONDS")
+    # Provider sending limit (token bucket)
+    mail_rate_limit_per_second: float = Field(default=10.0, alias="MAIL_RATE_LIMIT_PER_SECOND")
+    mail_rate_limit_burst: int = Field(default=20, alias="MAIL_RATE_LIMIT_BURST")
+    
+    # Email outbox worker
+    outbox_batch_size: int = Field(default=50, alias="OUTBOX_BATCH_SIZE")
+    outbox_concurrency: int = Field(default=3, alias="OUTBOX_CONCURRENCY")
+    outbox_poll_interval_seconds: float = Field(default=5.0, alias="OUTBOX_POLL_INTERVAL_SECONDS")
+    outbox_max_attempts: int = Field(default=5, alias="OUTBOX_MAX_ATTEMPTS")
+    outbox_retry_base_seconds: float = Field(default=60.0, alias="OUTBOX_RETRY_BASE_SECONDS")
+    outbox_retry_max_seconds: float = Field(default=3600.0, alias="OUTBOX_RETRY_MAX_SECONDS")
+    outbox_lease_seconds: int = Field(default=300, alias="OUTBOX_LEASE_SECONDS")
+    notification_user_page_size: int = Field(default=500, alias="NOTIFICATION_USER_PAGE_SIZE")
+    notification_fanout_concurrency: int = Field(default=4, alias="NOTIFICATION_FANOUT_CONCURRENCY")
+    
+    # Notifiche Telegram (Bot API)
+    telegram_api_base: str = Field(default="https://api.telegram.org", alias="TELEGRAM_API_BASE")
+    telegram_chat_rate_per_second: float = Field(default=1.0, alias="TELEGRAM_CHAT_RATE_PER_SECOND")
+    telegram_max_messages_per_run: int = Field(default=5, alias="TELEGRAM_MAX_MESSAGES_PER_RUN")
+    telegram_max_bandi_per_run: int = Field(default=200, alias="TELEGRAM_MAX_BANDI_PER_RUN")
+    telegram_max_retries: int = Field(default=3, alias="TELEGRAM_MAX_RETRIES")
+    telegram_timeout_seconds: float = Field(default=10.0, alias="TELEGRAM_TIMEOUT_SECONDS")
+    # Un bando reclamato e non confermato entro il lease torna disponibile (invio interrotto)
+    telegram_claim_lease_seconds: int = Field(default=900, alias="TELEGRAM_CLAIM_LEASE_SECONDS")
     
     # Stripe/Payment
     stripe_public_key: str = Field(default="", alias="STRIPE_PUBLIC_KEY")
@@ -79,7 +110,46 @@ class Settings(BaseSettings):
     
     # Caching
     redis_url: str = Field(default="redis://redis:6379/0", alias="REDIS_URL")
-    
+
+    # Ciclo di vita bandi (job giornaliero)
+    bando_archive_after_days: int = Field(default=365, alias="BANDO_ARCHIVE_AFTER_DAYS")
+
+    # Pipeline ingest -> embedding -> alert
+    ingest_pipeline_batch_size: int = Field(default=100, alias="INGEST_PIPELINE_BATCH_SIZE")
+
+    # Esecuzione parallela delle configurazioni di monitoraggio
+    monitor_config_concurrency: int = Field(default=3, alias="MONITOR_CONFIG_CONCURRENCY")
+    monitor_config_timeout_seconds: float = Field(default=1800.0, alias="MONITOR_CONFIG_TIMEOUT_SECONDS")
+
+    # Frequenza adattiva per fonte: intervallo dimezzato a ogni novità, allungato se la fonte è ferma
+    source_poll_min_hours: float = Field(default=1.0, alias="SOURCE_POLL_MIN_HOURS")
+    source_poll_max_hours: float = Field(default=168.0, alias="SOURCE_POLL_MAX_HOURS")
+    source_poll_increase_hours: float = Field(default=6.0, alias="SOURCE_POLL_INCREASE_HOURS")
+    source_poll_decrease_factor: float = Field(default=0.5, alias="SOURCE_POLL_DECREASE_FACTOR")
+
+    # Telemetria dei job dello scheduler: esecuzioni recenti conservate in memoria
+    scheduler_history_size: int = Field(default=200, alias="SCHEDULER_HISTORY_SIZE")
+
+    # Elezione del leader per lo scheduler (postgres, redis o local)
+    leader_election_backend: str = Field(default="postgres", alias="LEADER_ELECTION_BACKEND")
+    leader_lock_key: str = Field(default="iss:scheduler:leader", alias="LEADER_LOCK_KEY")
+    leader_lease_seconds: float = Field(default=15.0, alias="LEADER_LEASE_SECONDS")
+    leader_renew_interval_seconds: float = Field(default=5.0, alias="LEADER_RENEW_INTERVAL_SECONDS")
+
+    # Eventi in tempo reale sui bandi (SSE)
+    event_stream_channel: str = Field(default="iss:bandi:events", alias="EVENT_STREAM_CHANNEL")
+    event_stream_heartbeat_seconds: float = Field(default=15.0, alias="EVENT_STREAM_HEARTBEAT_SECONDS")
+    event_stream_queue_size: int = Field(default=100, alias="EVENT_STREAM_QUEUE_SIZE")
+
+    # Indice suggerimenti: ricostruzione periodica in ogni worker, attesa dopo un'archiviazione
+    suggestion_rebuild_interval_seconds: float = Field(default=3600.0, alias="SUGGESTION_REBUILD_INTERVAL_SECONDS")
+    suggestion_rebuild_delay_seconds: float = Field(default=5.0, alias="SUGGESTION_REBUILD_DELAY_SECONDS")
+
+    # Near-duplicate detection bandi
+    near_duplicate_max_distance: int = Field(default=7, alias="NEAR_DUPLICATE_MAX_DISTANCE")
+    near_duplicate_strict_distance: int = Field(default=3, alias="NEAR_DUPLICATE_STRICT_DISTANCE")
+    near_duplicate_min_similarity: float = Field(default=0.92, alias="NEAR_DUPLICATE_MIN_SIMILARITY")
+
     @property
     def is_production(self) -> bool:
         return self.environment.lower() == "production"
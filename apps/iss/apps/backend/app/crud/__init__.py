@@ -1,3 +1,3 @@
-from . import project, event, news, volunteer, admin, bando, bando_config, user
+from . import project, event, news, volunteer, admin, bando, bando_config, user, analytics
 
-__all__ = ["project", "event", "news", "volunteer", "admin", "bando", "bando_config", "user"]
+__all__ = ["project", "event", "news", "volunteer", "admin", "bando", "bando_config", "user", "analytics"]
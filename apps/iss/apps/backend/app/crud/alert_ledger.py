@@ -0,0 +1,213 @@
+"""
+CRUD operations per il registro degli alert, il registro Telegram e i checkpoint dei job
+"""
+
+from typing import Dict, Iterable, List, Optional, Set
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, exists, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.alert_ledger import AlertChannel, AlertLedger, JobCheckpoint, TelegramLedger, TelegramLedgerStatus
+from app.models.aps_user import APSUser
+from app.models.bando import Bando, BandoStatus
+
+
+class AlertLedgerCRUD:
+
+    async def get_pending_pairs(
+        self,
+        db: AsyncSession,
+        user_ids: Iterable[int],
+        bando_ids: Iterable[int],
+        channel: str = AlertChannel.EMAIL
+    ) -> Dict[int, Set[int]]:
+        """Coppie (utente, bando) non ancora notificate, con un solo anti-join sul registro"""
+        user_ids, bando_ids = list(user_ids), list(bando_ids)
+        if not user_ids or not bando_ids:
+            return {}
+
+        result = await db.execute(
+            select(APSUser.id, Bando.id)
+            .join(Bando, Bando.id.in_(bando_ids))
+            .outerjoin(
+                AlertLedger,
+                and_(
+                    AlertLedger.aps_user_id == APSUser.id,
+                    AlertLedger.bando_id == Bando.id,
+                    AlertLedger.channel == channel
+                )
+            )
+            .where(APSUser.id.in_(user_ids), AlertLedger.id.is_(None))
+        )
+
+        pending: Dict[int, Set[int]] = {}
+        for user_id, bando_id in result.all():
+            pending.setdefault(user_id, set()).add(bando_id)
+        return pending
+
+    async def record(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        bando_ids: Iterable[int],
+        channel: str = AlertChannel.EMAIL
+    ) -> List[int]:
+        """Registra gli alert inviati; restituisce solo i bandi non già presenti (senza commit)"""
+        now = datetime.now()
+        rows = [
+            {'aps_user_id': user_id, 'bando_id': bando_id, 'channel': channel, 'sent_at': now}
+            for bando_id in bando_ids
+        ]
+        if not rows:
+            return []
+
+        result = await db.execute(
+            insert(AlertLedger)
+            .values(rows)
+            .on_conflict_do_nothing(constraint="uq_alert_ledger_user_bando_channel")
+            .returning(AlertLedger.bando_id)
+        )
+        return list(result.scalars().all())
+
+
+class TelegramLedgerCRUD:
+
+    async def find_pending(
+        self,
+        db: AsyncSession,
+        chat_id: str,
+        keywords: Optional[Iterable[str]] = None,
+        limit: int = 200
+    ) -> List[Bando]:
+        """
+        Bandi attivi non ancora inviati (né reclamati) per la chat, dal più vecchio,
+        filtrati sulle parole chiave della configurazione
+        """
+        query = (
+            select(Bando)
+            .where(
+                Bando.status == BandoStatus.ATTIVO,
+                ~exists().where(TelegramLedger.chat_id == chat_id, TelegramLedger.bando_id == Bando.id)
+            )
+            .order_by(Bando.data_trovato, Bando.id)
+            .limit(limit)
+        )
+
+        patterns = [f"%{keyword.strip()}%" for keyword in keywords or [] if keyword and keyword.strip()]
+        if patterns:
+            query = query.where(or_(*(
+                column.ilike(pattern)
+                for pattern in patterns
+                for column in (Bando.title, Bando.descrizione, Bando.keyword_match)
+            )))
+
+        result = await db.execute(query)
+        return list(result.scalars().all())
+
+    async def claim_pending(
+        self,
+        db: AsyncSession,
+        chat_id: str,
+        keywords: Optional[Iterable[str]] = None,
+        limit: int = 200,
+        config_id: Optional[int] = None
+    ) -> List[Bando]:
+        """
+        Reclama i bandi da inviare alla chat con righe 'pending' nel registro e fa commit:
+        un giro concorrente sulla stessa chat li salta senza lock tenuti durante l'invio.
+        Un reclamo non confermato entro il lease (es. processo terminato) torna reclamabile
+        """
+        stale_before = func.now() - timedelta(seconds=settings.telegram_claim_lease_seconds)
+        result = await db.execute(
+            update(TelegramLedger)
+            .where(
+                TelegramLedger.chat_id == chat_id,
+                TelegramLedger.status == TelegramLedgerStatus.PENDING,
+                TelegramLedger.claimed_at < stale_before
+            )
+            .values(claimed_at=func.now(), config_id=config_id)
+            .returning(TelegramLedger.bando_id)
+            .execution_options(synchronize_session=False)
+        )
+        claimed_ids = list(result.scalars().all())
+
+        candidates = await self.find_pending(db, chat_id, keywords=keywords, limit=limit)
+        if candidates:
+            # Su conflitto (altro giro concorrente) il bando resta a chi l'ha reclamato per primo
+            result = await db.execute(
+                insert(TelegramLedger)
+                .values([
+                    {'chat_id': chat_id, 'bando_id': bando.id, 'config_id': config_id,
+                     'status': TelegramLedgerStatus.PENDING, 'claimed_at': func.now()}
+                    for bando in candidates
+                ])
+                .on_conflict_do_nothing(index_elements=[TelegramLedger.chat_id, TelegramLedger.bando_id])
+                .returning(TelegramLedger.bando_id)
+            )
+            claimed_ids.extend(result.scalars().all())
+
+        bandi = []
+        if claimed_ids:
+            result = await db.execute(
+                select(Bando).where(Bando.id.in_(claimed_ids)).order_by(Bando.data_trovato, Bando.id)
+            )
+            bandi = list(result.scalars().all())
+        await db.commit()
+        return bandi
+
+    async def mark_sent(self, db: AsyncSession, chat_id: str, bando_ids: Iterable[int]):
+        """Conferma i bandi reclamati e inviati alla chat (senza commit)"""
+        bando_ids = list(bando_ids)
+        if not bando_ids:
+            return
+        await db.execute(
+            update(TelegramLedger)
+            .where(TelegramLedger.chat_id == chat_id, TelegramLedger.bando_id.in_(bando_ids))
+            .values(status=TelegramLedgerStatus.SENT, sent_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+
+    async def release(self, db: AsyncSession, chat_id: str, bando_ids: Iterable[int]):
+        """Libera i reclami non inviati: il prossimo giro li riprova (senza commit)"""
+        bando_ids = list(bando_ids)
+        if not bando_ids:
+            return
+        await db.execute(
+            delete(TelegramLedger)
+            .where(
+                TelegramLedger.chat_id == chat_id,
+                TelegramLedger.bando_id.in_(bando_ids),
+                TelegramLedger.status == TelegramLedgerStatus.PENDING
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+class JobCheckpointCRUD:
+
+    async def get_mark(self, db: AsyncSession, name: str) -> Optional[datetime]:
+        """Ultimo istante elaborato dal job, None se il job non ha mai girato"""
+        result = await db.execute(select(JobCheckpoint.last_mark).where(JobCheckpoint.name == name))
+        return result.scalar_one_or_none()
+
+    async def set_mark(self, db: AsyncSession, name: str, mark: datetime):
+        """Avanza il checkpoint temporale (mai all'indietro, senza commit)"""
+        statement = insert(JobCheckpoint).values(name=name, last_mark=mark, updated_at=datetime.now())
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[JobCheckpoint.name],
+                set_={
+                    'last_mark': func.greatest(JobCheckpoint.last_mark, statement.excluded.last_mark),
+                    'updated_at': statement.excluded.updated_at,
+                }
+            )
+        )
+
+
+# Istanza singleton
+alert_ledger_crud = AlertLedgerCRUD()
+telegram_ledger_crud = TelegramLedgerCRUD()
+job_checkpoint_crud = JobCheckpointCRUD()
@@ -0,0 +1,118 @@
+"""
+Aggregazioni SQL per gli endpoint di analytics
+"""
+
+from typing import Any, Dict, List, Tuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func, literal, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.bando import Bando, BandoStatus
+from app.models.aps_user import APSUser
+
+
+# Regione dedotta dall'ente: la prima corrispondenza vince, come nella classificazione originale
+GEOGRAPHIC_PATTERNS = [
+    ('Campania', '%campania%'),
+    ('Salerno', '%salerno%'),
+    ('Napoli', '%napoli%'),
+    ('Avellino', '%avellino%'),
+    ('Caserta', '%caserta%'),
+    ('Benevento', '%benevento%'),
+]
+
+
+def _key(value) -> str:
+    return value.value if hasattr(value, 'value') else str(value)
+
+
+class AnalyticsCRUD:
+    """Aggregazioni per la dashboard calcolate dal database: restituiscono solo le righe aggregate"""
+
+    async def source_distribution(self, db: AsyncSession) -> List[Dict[str, Any]]:
+        """Bandi per fonte, con attivi e non attivi"""
+        total = func.count(Bando.id)
+        query = (
+            select(Bando.fonte, total, total.filter(Bando.status == BandoStatus.ATTIVO))
+            .group_by(Bando.fonte)
+            .order_by(total.desc())
+        )
+        rows = (await db.execute(query)).all()
+        return [
+            {'source': _key(fonte), 'count': count, 'active': active, 'expired': count - active}
+            for fonte, count, active in rows
+        ]
+
+    async def category_distribution(self, db: AsyncSession, limit: int = 10) -> List[Tuple[str, int, int]]:
+        """Prime categorie per numero di bandi: (categoria, conteggio, totale bandi)"""
+        categoria = func.coalesce(Bando.categoria, 'Non specificata')
+        count = func.count(Bando.id)
+        query = (
+            select(categoria, count, func.sum(count).over())
+            .group_by(categoria)
+            .order_by(count.desc())
+            .limit(limit)
+        )
+        return [(name, value, int(total)) for name, value, total in (await db.execute(query)).all()]
+
+    async def geographic_distribution(self, db: AsyncSession) -> List[Tuple[str, int]]:
+        """Bandi per area geografica dell'ente"""
+        ente = func.lower(Bando.ente)
+        region = case(*[(ente.like(pattern), literal(name)) for name, pattern in GEOGRAPHIC_PATTERNS], else_=literal('Altro'))
+        count = func.count(Bando.id)
+        query = select(region, count).group_by(region).order_by(count.desc())
+        return [tuple(row) for row in (await db.execute(query)).all()]
+
+    async def user_analytics(self, db: AsyncSession) -> Dict[str, Any]:
+        """Conteggi utenti, distribuzioni per tipo e regione e settori più frequenti"""
+        now = datetime.now()
+        count = func.count(APSUser.id)
+        totals = (await db.execute(select(
+            count,
+            count.filter(APSUser.is_active == True),
+            count.filter(APSUser.created_at >= now - timedelta(days=7)),
+            count.filter(APSUser.created_at >= now - timedelta(days=30)),
+        ))).one()
+
+        by_type = (await db.execute(
+            select(APSUser.organization_type, count)
+            .group_by(APSUser.organization_type)
+            .order_by(count.desc())
+        )).all()
+
+        region = func.coalesce(APSUser.region, 'Non specificata')
+        by_region = (await db.execute(
+            select(region, count).group_by(region).order_by(count.desc())
+        )).all()
+
+        # Settori JSON espansi nel database; valori non lista trattati come lista vuota
+        sectors_array = case(
+            (func.json_typeof(APSUser.sectors) == 'array', APSUser.sectors),
+            else_=func.json_build_array()
+        )
+        sector = func.json_array_elements_text(sectors_array).table_valued('value').lateral()
+        sector_count = func.count()
+        top_sectors = (await db.execute(
+            select(sector.c.value, sector_count)
+            .select_from(APSUser)
+            .join(sector, true())
+            .where(APSUser.sectors.is_not(None))
+            .group_by(sector.c.value)
+            .order_by(sector_count.desc())
+            .limit(10)
+        )).all()
+
+        return {
+            'total_users': totals[0],
+            'active_users': totals[1],
+            'new_users_week': totals[2],
+            'new_users_month': totals[3],
+            'users_by_type': [(_key(org_type), value) for org_type, value in by_type],
+            'users_by_region': [tuple(row) for row in by_region],
+            'top_sectors': [tuple(row) for row in top_sectors],
+        }
+
+
+# Istanza singleton
+analytics_crud = AnalyticsCRUD()
@@ -2,15 +2,25 @@
 CRUD operations per utenti APS e sistema utenti
 """
 
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any, Sequence, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, desc, func, text
+from sqlalchemy import Date, cast, select, and_, or_, desc, func, text
 from sqlalchemy.orm import selectinload
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 
-from app.models.aps_user import APSUser, BandoApplication, BandoWatchlist, AIRecommendation, OrganizationType
+from app.models.aps_user import (
+    APSUser, BandoApplication, BandoWatchlist, AIRecommendation, OrganizationType,
+    NOTIFICATION_PREFERENCE_COLUMNS
+)
 from app.models.bando import Bando
 from app.crud.base import CRUDBase
+from app.crud.rollup import rollup_crud
+from app.core.config import settings
+
+
+def notification_enabled(preference: str):
+    """Condizione SQL sulla colonna indicizzata della preferenza di notifica"""
+    return getattr(APSUser, NOTIFICATION_PREFERENCE_COLUMNS[preference]).is_(True)
 
 
 class CRUDAPSUser(CRUDBase[APSUser, Dict[str, Any], Dict[str, Any]]):
@@ -34,6 +44,8 @@ class CRUDAPSUser(CRUDBase[APSUser, Dict[str, Any], Dict[str, Any]]):
         """Crea nuovo utente APS"""
         db_user = APSUser(**user_data)
         db.add(db_user)
+        await db.flush()
+        await rollup_crud.refresh_user_days(db, [db_user.created_at.date()])
         await db.commit()
         await db.refresh(db_user)
         return db_user
@@ -94,6 +106,53 @@ class CRUDAPSUser(CRUDBase[APSUser, Dict[str, Any], Dict[str, Any]]):
         
         return list(users), total
 
+    async def get_notification_audience(self, db: AsyncSession) -> Dict[str, int]:
+        """Utenti totali, attivi e iscritti per preferenza (una query, indici parziali)"""
+        def active_count(*conditions):
+            return select(func.count(APSUser.id)).where(APSUser.is_active.is_(True), *conditions).scalar_subquery()
+
+        result = await db.execute(
+            select(
+                select(func.count(APSUser.id)).scalar_subquery(),
+                active_count(),
+                *[active_count(notification_enabled(preference)) for preference in NOTIFICATION_PREFERENCE_COLUMNS]
+            )
+        )
+        total, active, *subscribers = result.one()
+        audience = {'total_users': total, 'active_users': active}
+        audience.update(zip(NOTIFICATION_PREFERENCE_COLUMNS, subscribers))
+        return audience
+
+    async def stream_active_users(
+        self,
+        db: AsyncSession,
+        preference: Optional[str] = None,
+        page_size: Optional[int] = None
+    ) -> AsyncIterator[List[APSUser]]:
+        """Utenti attivi a pagine (keyset su id), filtrati per preferenza di notifica"""
+        page_size = page_size or settings.notification_user_page_size
+        conditions = [APSUser.is_active.is_(True)]
+        if preference:
+            conditions.append(notification_enabled(preference))
+
+        last_id = 0
+        while True:
+            result = await db.execute(
+                select(APSUser)
+                .where(APSUser.id > last_id, *conditions)
+                .order_by(APSUser.id)
+                .limit(page_size)
+            )
+            users = list(result.scalars().all())
+            if not users:
+                return
+
+            # Id letto prima di cedere la pagina: il chiamante può fare commit o rollback
+            last_id = users[-1].id
+            yield users
+            if len(users) < page_size:
+                return
+
     async def get_user_dashboard_data(self, db: AsyncSession, user_id: int) -> Dict[str, Any]:
         """Dati dashboard completa per utente"""
         
@@ -288,6 +347,91 @@ class CRUDBandoWatchlist(CRUDBase[BandoWatchlist, Dict[str, Any], Dict[str, Any]
         
         return False
 
+    async def get_upcoming_deadlines(
+        self,
+        db: AsyncSession,
+        user_ids: Sequence[int],
+        days: int = 30,
+        per_user: int = 5
+    ) -> Dict[int, List[Dict[str, Any]]]:
+        """Prossime scadenze in watchlist per più utenti, le prime N per utente, in una query"""
+        if not user_ids:
+            return {}
+
+        now = datetime.now()
+        ranked = (
+            select(
+                BandoWatchlist.aps_user_id.label('user_id'),
+                Bando.id.label('bando_id'),
+                func.row_number().over(
+                    partition_by=BandoWatchlist.aps_user_id, order_by=Bando.scadenza
+                ).label('position')
+            )
+            .join(Bando, Bando.id == BandoWatchlist.bando_id)
+            .where(
+                BandoWatchlist.aps_user_id.in_(list(user_ids)),
+                Bando.status == 'attivo',
+                Bando.scadenza > now,
+                Bando.scadenza < now + timedelta(days=days + 1)
+            )
+            .subquery()
+        )
+        result = await db.execute(
+            select(ranked.c.user_id, Bando)
+            .join(Bando, Bando.id == ranked.c.bando_id)
+            .where(ranked.c.position <= per_user)
+            .order_by(ranked.c.user_id, ranked.c.position)
+        )
+
+        deadlines: Dict[int, List[Dict[str, Any]]] = {}
+        for user_id, bando in result.all():
+            deadlines.setdefault(user_id, []).append({
+                'bando': bando,
+                'days_left': (bando.scadenza - now).days
+            })
+        return deadlines
+
+    async def stream_deadline_reminders(
+        self,
+        db: AsyncSession,
+        days_ahead: Sequence[int],
+        batch_size: int = 500
+    ) -> AsyncIterator[Tuple[APSUser, List[Tuple[Bando, int]]]]:
+        """Scadenze in watchlist per tutte le finestre in una sola query, raggruppate per utente"""
+        today = date.today()
+        deadline_dates = [today + timedelta(days=days) for days in days_ahead]
+        if not deadline_dates:
+            return
+
+        query = (
+            select(APSUser, Bando)
+            .join(BandoWatchlist, BandoWatchlist.aps_user_id == APSUser.id)
+            .join(Bando, Bando.id == BandoWatchlist.bando_id)
+            .where(
+                APSUser.is_active.is_(True),
+                notification_enabled('deadline_reminders'),
+                Bando.status == 'attivo',
+                # Intervallo complessivo, poi solo i giorni delle finestre
+                Bando.scadenza >= datetime.combine(min(deadline_dates), time.min),
+                Bando.scadenza < datetime.combine(max(deadline_dates) + timedelta(days=1), time.min),
+                cast(Bando.scadenza, Date).in_(deadline_dates)
+            )
+            .order_by(APSUser.id, Bando.scadenza)
+            .execution_options(yield_per=batch_size)
+        )
+
+        current_user, reminders = None, []
+        result = await db.stream(query)
+        async for user, bando in result:
+            if current_user is not None and user.id != current_user.id:
+                yield current_user, reminders
+                reminders = []
+            current_user = user
+            reminders.append((bando, (bando.scadenza.date() - today).days))
+
+        if current_user is not None:
+            yield current_user, reminders
+
 
 # Instances
 aps_user_crud = CRUDAPSUser(APSUser)
@@ -1,12 +1,31 @@
 from typing import List, Optional, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_, desc
+from sqlalchemy import JSON, select, func, and_, or_, desc, update
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import selectinload
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 import hashlib
 
 from app.models.bando import Bando, BandoStatus, BandoSource
 from app.schemas.bando import BandoCreate, BandoUpdate, BandoSearch
+from app.crud.rollup import rollup_crud
+from app.utils.importo import parse_importo
+from app.utils.simhash import simhash, to_signed64
+
+
+# Colonne restituite dagli UPDATE di ciclo di vita, per invalidare cache, indici ed eventi
+LIFECYCLE_COLUMNS = (Bando.id, Bando.title, Bando.status, Bando.categoria, Bando.keyword_match)
+
+# Importo di riferimento di un bando per somme e medie: il massimo erogabile, o il minimo se aperto in alto
+IMPORTO_DISPONIBILE = func.coalesce(Bando.importo_max, Bando.importo_min)
+
+# Macro categorie della dashboard: nome -> sottostringa cercata (case-insensitive) nella categoria
+STATS_MACRO_CATEGORIE = {
+    'sociale': 'social',
+    'formazione': 'formazione',
+    'cultura': 'cultur',
+    'ambiente': 'ambient',
+}
 
 
 class BandoCRUD:
@@ -26,11 +45,19 @@ class BandoCRUD:
         if existing:
             return existing
             
+        importo_min, importo_max = parse_importo(bando.importo)
         db_bando = Bando(
             **bando.model_dump(),
-            hash_identifier=hash_identifier
+            hash_identifier=hash_identifier,
+            simhash=to_signed64(simhash(bando.title)),
+            importo_min=importo_min,
+            importo_max=importo_max
         )
         db.add(db_bando)
+        await db.flush()
+        await rollup_crud.refresh_bandi(db, [db_bando.id])
+        if db_bando.status != BandoStatus.ARCHIVIATO:
+            await rollup_crud.update_keywords(db, [db_bando.id])
         await db.commit()
         await db.refresh(db_bando)
         return db_bando
@@ -40,6 +67,14 @@ class BandoCRUD:
         result = await db.execute(select(Bando).where(Bando.id == bando_id))
         return result.scalar_one_or_none()
     
+    async def get_bandi_by_ids(self, db: AsyncSession, bando_ids) -> Dict[int, Bando]:
+        """Recupera più bandi per ID con una sola query"""
+        bando_ids = list(bando_ids)
+        if not bando_ids:
+            return {}
+        result = await db.execute(select(Bando).where(Bando.id.in_(bando_ids)))
+        return {bando.id: bando for bando in result.scalars().all()}
+    
     async def get_bando_by_hash(self, db: AsyncSession, hash_identifier: str) -> Optional[Bando]:
         """Recupera un bando per hash"""
         result = await db.execute(
@@ -89,6 +124,19 @@ class BandoCRUD:
                 keyword_term = f"%{search.keyword}%"
                 conditions.append(Bando.keyword_match.ilike(keyword_term))
             
+            # Intervalli di importo che si sovrappongono a quello richiesto (estremo NULL = aperto)
+            if search.importo_min is not None:
+                conditions.append(or_(
+                    Bando.importo_max >= search.importo_min,
+                    and_(Bando.importo_max.is_(None), Bando.importo_min.isnot(None))
+                ))
+            
+            if search.importo_max is not None:
+                conditions.append(or_(
+                    Bando.importo_min <= search.importo_max,
+                    and_(Bando.importo_min.is_(None), Bando.importo_max.isnot(None))
+                ))
+            
             if conditions:
                 query = query.where(and_(*conditions))
                 count_query = count_query.where(and_(*conditions))
@@ -120,9 +168,27 @@ class BandoCRUD:
             return None
             
         update_data = bando_update.model_dump(exclude_unset=True)
+        if update_data.get('status') is not None:
+            # Enum dello schema -> enum del modello, per i confronti sullo stato
+            update_data['status'] = BandoStatus(getattr(update_data['status'], 'value', update_data['status']))
+        
+        # Termini contati solo per i bandi non archiviati: si tolgono i vecchi e si aggiungono i nuovi
+        text_changed = bool({'title', 'descrizione'} & update_data.keys())
+        was_counted = db_bando.status != BandoStatus.ARCHIVIATO
+        if was_counted and (text_changed or update_data.get('status') == BandoStatus.ARCHIVIATO):
+            await rollup_crud.update_keywords(db, [bando_id], sign=-1)
+        
         for field, value in update_data.items():
             setattr(db_bando, field, value)
+        if 'importo' in update_data:
+            db_bando.importo_min, db_bando.importo_max = parse_importo(db_bando.importo)
         
+        # Stato, fonte e categoria sono dimensioni del rollup giornaliero
+        await db.flush()
+        await rollup_crud.refresh_bandi(db, [bando_id])
+        is_counted = db_bando.status != BandoStatus.ARCHIVIATO
+        if is_counted and (text_changed or not was_counted):
+            await rollup_crud.update_keywords(db, [bando_id])
         await db.commit()
         await db.refresh(db_bando)
         return db_bando
@@ -133,7 +199,12 @@ class BandoCRUD:
         if not db_bando:
             return False
             
+        days = await rollup_crud.bandi_days(db, [bando_id])
+        if db_bando.status != BandoStatus.ARCHIVIATO:
+            await rollup_crud.update_keywords(db, [bando_id], sign=-1)
         await db.delete(db_bando)
+        await db.flush()
+        await rollup_crud.refresh_bandi_days(db, days)
         await db.commit()
         return True
     
@@ -158,99 +229,122 @@ class BandoCRUD:
         await db.refresh(db_bando)
         return db_bando
     
-    async def get_stats(self, db: AsyncSession) -> Dict[str, Any]:
-        """Ottieni statistiche sui bandi"""
-        
-        # Conteggi totali
-        total_query = select(func.count(Bando.id))
-        total_result = await db.execute(total_query)
-        totali = total_result.scalar() or 0
+    async def mark_many_as_notified(
+        self,
+        db: AsyncSession,
+        bando_ids,
+        email: bool = False,
+        telegram: bool = False
+    ) -> int:
+        """Marca più bandi come notificati con un solo UPDATE"""
+        values = {}
+        if email:
+            values['notificato_email'] = True
+        if telegram:
+            values['notificato_telegram'] = True
+        bando_ids = list(bando_ids)
+        if not bando_ids or not values:
+            return 0
         
-        # Bandi attivi
-        active_query = select(func.count(Bando.id)).where(Bando.status == BandoStatus.ATTIVO)
-        active_result = await db.execute(active_query)
-        attivi = active_result.scalar() or 0
+        result = await db.execute(
+            update(Bando)
+            .where(Bando.id.in_(bando_ids))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount
+    
+    async def get_stats(self, db: AsyncSession) -> Dict[str, Any]:
+        """Ottieni statistiche sui bandi (una query di aggregati condizionali + serie mensile dal rollup)"""
+        now = datetime.now()
         
-        # Bandi scaduti  
-        expired_query = select(func.count(Bando.id)).where(Bando.status == BandoStatus.SCADUTO)
-        expired_result = await db.execute(expired_query)
-        scaduti = expired_result.scalar() or 0
+        def count_where(condition):
+            return func.count(Bando.id).filter(condition)
         
-        # Bandi in scadenza (prossimi 30 giorni)
-        future_30_days = datetime.now() + timedelta(days=30)
-        expiring_query = select(func.count(Bando.id)).where(
-            and_(
-                Bando.status == BandoStatus.ATTIVO,
-                Bando.scadenza <= future_30_days,
-                Bando.scadenza >= datetime.now()
-            )
+        # Bandi per categoria come oggetto JSON, nella stessa query dei conteggi
+        per_categoria = (
+            select(Bando.categoria, func.count(Bando.id).label('n'))
+            .where(Bando.categoria.isnot(None))
+            .group_by(Bando.categoria)
+            .subquery()
         )
-        expiring_result = await db.execute(expiring_query)
-        in_scadenza = expiring_result.scalar() or 0
-        
-        # Bandi per fonte
-        source_query = select(Bando.fonte, func.count(Bando.id)).group_by(Bando.fonte)
-        source_result = await db.execute(source_query)
-        fonti = {fonte.value if hasattr(fonte, 'value') else str(fonte): count 
-                for fonte, count in source_result.fetchall()}
+        categorie_json = select(
+            func.json_object_agg(per_categoria.c.categoria, per_categoria.c.n, type_=JSON)
+        ).scalar_subquery()
         
-        # Bandi per categoria
-        category_query = select(Bando.categoria, func.count(Bando.id)).where(
-            Bando.categoria.isnot(None)
-        ).group_by(Bando.categoria)
-        category_result = await db.execute(category_query)
-        categorie = {categoria: count for categoria, count in category_result.fetchall()}
+        columns = [
+            func.count(Bando.id).label('totali'),
+            count_where(Bando.status == BandoStatus.ATTIVO).label('attivi'),
+            count_where(Bando.status == BandoStatus.SCADUTO).label('scaduti'),
+            # In scadenza nei prossimi 30 giorni
+            count_where(and_(
+                Bando.status == BandoStatus.ATTIVO,
+                Bando.scadenza >= now,
+                Bando.scadenza <= now + timedelta(days=30)
+            )).label('in_scadenza'),
+            count_where(Bando.data_trovato >= now - timedelta(days=7)).label('nuovi_settimana'),
+            count_where(Bando.data_trovato >= now - timedelta(days=30)).label('nuovi_mese'),
+            func.max(Bando.data_trovato).label('ultimo_trovato'),
+            func.sum(IMPORTO_DISPONIBILE).label('importo_totale'),
+            func.avg(IMPORTO_DISPONIBILE).label('importo_medio'),
+            func.max(Bando.importo_max).label('importo_massimo'),
+            func.min(Bando.importo_min).filter(Bando.importo_min > 0).label('importo_minimo'),
+            categorie_json.label('categorie'),
+        ]
+        # Una colonna per fonte: l'insieme delle fonti è chiuso (enum)
+        columns += [count_where(Bando.fonte == source).label(f'fonte_{source.value}') for source in BandoSource]
+        columns += [
+            count_where(Bando.categoria.ilike(f'%{pattern}%')).label(f'macro_{name}')
+            for name, pattern in STATS_MACRO_CATEGORIE.items()
+        ]
+        row = (await db.execute(select(*columns))).mappings().one()
         
-        # Ultimi 7 giorni
-        week_ago = datetime.now() - timedelta(days=7)
-        recent_query = select(func.count(Bando.id)).where(Bando.data_trovato >= week_ago)
-        recent_result = await db.execute(recent_query)
-        nuovi_settimana = recent_result.scalar() or 0
+        totali = row['totali'] or 0
+        nuovi_settimana = row['nuovi_settimana'] or 0
+        fonti = {
+            source.value: row[f'fonte_{source.value}']
+            for source in BandoSource if row[f'fonte_{source.value}']
+        }
+        categorie = dict(row['categorie'] or {})
+        macro_categorie = {name: row[f'macro_{name}'] or 0 for name in STATS_MACRO_CATEGORIE}
         
-        # Calcolo importi (mock data per ora)
-        importo_totale = 15000000.0  # €15M mock
-        importo_medio = importo_totale / max(totali, 1)
+        # Importi dalle colonne numeriche calcolate in fase di ingest
+        importo_totale = float(row['importo_totale'] or 0)
+        importo_medio = float(row['importo_medio'] or 0)
         
-        # Trend mensile (ultimi 6 mesi)
-        trend_mensile = []
-        for i in range(6):
-            month_start = datetime.now().replace(day=1) - timedelta(days=30*i)
-            month_end = month_start + timedelta(days=30)
-            
-            month_query = select(func.count(Bando.id)).where(
-                and_(
-                    Bando.data_trovato >= month_start,
-                    Bando.data_trovato < month_end
-                )
-            )
-            month_result = await db.execute(month_query)
-            count = month_result.scalar() or 0
-            
-            trend_mensile.append({
-                "mese": month_start.strftime("%Y-%m"),
+        # Trend mensile (ultimi 6 mesi di calendario, mesi vuoti inclusi) dal rollup giornaliero
+        trend_mensile = [
+            {
+                "mese": month.strftime("%Y-%m"),
                 "count": count,
                 "importo": count * (importo_medio if count > 0 else 0)
-            })
-        
-        trend_mensile.reverse()  # Ordine cronologico
+            }
+            for month, count in await rollup_crud.monthly_new_bandi(db, months=6)
+        ]
         
         return {
             # Formato nuovo per il frontend
             "totali": totali,
-            "attivi": attivi,
-            "scaduti": scaduti,
-            "in_scadenza": in_scadenza,
+            "attivi": row['attivi'] or 0,
+            "scaduti": row['scaduti'] or 0,
+            "in_scadenza": row['in_scadenza'] or 0,
             "importo_totale": importo_totale,
             "importo_medio": importo_medio,
+            "importo_massimo": float(row['importo_massimo'] or 0),
+            "importo_minimo": float(row['importo_minimo'] or 0),
             "nuovi_settimana": nuovi_settimana,
+            "nuovi_mese": row['nuovi_mese'] or 0,
+            "ultimo_trovato": row['ultimo_trovato'],
             "fonti": fonti,
             "categorie": categorie,
+            "macro_categorie": macro_categorie,
             "trend_mensile": trend_mensile,
             
             # Campi legacy per compatibilità
             "total_bandi": totali,
-            "bandi_attivi": attivi,
-            "bandi_scaduti": scaduti,
+            "bandi_attivi": row['attivi'] or 0,
+            "bandi_scaduti": row['scaduti'] or 0,
             "bandi_per_fonte": fonti,
             "ultimi_trovati": nuovi_settimana,
             "media_giornaliera": round(nuovi_settimana / 7.0, 2)
@@ -262,29 +356,29 @@ class BandoCRUD:
         result = await db.execute(query)
         return list(result.scalars().all())
     
-    async def cleanup_old_bandi(self, db: AsyncSession, days_old: int = 365) -> int:
-        """Pulisce i bandi vecchi (archivia)"""
+    async def expire_past_deadline(self, db: AsyncSession, today: Optional[date] = None) -> List[Row]:
+        """Porta a SCADUTO i bandi attivi con scadenza passata (un solo UPDATE, senza commit)"""
+        start_of_today = datetime.combine(today or date.today(), time.min)
+        result = await db.execute(
+            update(Bando)
+            .where(Bando.status == BandoStatus.ATTIVO, Bando.scadenza < start_of_today)
+            .values(status=BandoStatus.SCADUTO)
+            .returning(*LIFECYCLE_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
+        return list(result.all())
+    
+    async def archive_old_bandi(self, db: AsyncSession, days_old: int = 365) -> List[Row]:
+        """Archivia i bandi trovati da più di N giorni (un solo UPDATE, senza commit)"""
         cutoff_date = datetime.now() - timedelta(days=days_old)
-        
-        # Aggiorna status invece di eliminare
-        update_query = (
-            select(Bando)
-            .where(and_(
-                Bando.data_trovato < cutoff_date,
-                Bando.status != BandoStatus.ARCHIVIATO
-            ))
+        result = await db.execute(
+            update(Bando)
+            .where(Bando.data_trovato < cutoff_date, Bando.status != BandoStatus.ARCHIVIATO)
+            .values(status=BandoStatus.ARCHIVIATO)
+            .returning(*LIFECYCLE_COLUMNS)
+            .execution_options(synchronize_session=False)
         )
-        
-        result = await db.execute(update_query)
-        old_bandi = result.scalars().all()
-        
-        count = 0
-        for bando in old_bandi:
-            bando.status = BandoStatus.ARCHIVIATO
-            count += 1
-        
-        await db.commit()
-        return count
+        return list(result.all())
 
 
 # Istanza singleton
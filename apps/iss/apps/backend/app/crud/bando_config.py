@@ -3,7 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, desc, and_
 from datetime import datetime, timedelta
 
-from app.models.bando_config import BandoConfig, BandoLog
+from app.models.bando_config import BandoConfig, BandoLog, BandoSourceState
 from app.models.bando import Bando, BandoStatus
 from app.schemas.bando_config import BandoConfigCreate, BandoConfigUpdate
 
@@ -151,6 +151,11 @@ class BandoConfigCRUD:
         result = await db.execute(query)
         return list(result.scalars().all())
     
+    async def get_source_states(self, db: AsyncSession, config_id: int) -> Dict[str, BandoSourceState]:
+        """Stato di polling delle fonti di una configurazione, per nome fonte"""
+        result = await db.execute(select(BandoSourceState).where(BandoSourceState.config_id == config_id))
+        return {state.source: state for state in result.scalars()}
+    
     # --- LOG OPERATIONS ---
     
     async def create_log(self, db: AsyncSession, log_data: Dict[str, Any]) -> BandoLog:
@@ -161,6 +166,13 @@ class BandoConfigCRUD:
         await db.refresh(db_log)
         return db_log
     
+    async def update_log(self, db: AsyncSession, db_log: BandoLog, log_data: Dict[str, Any]) -> BandoLog:
+        """Aggiorna un log di esecuzione esistente"""
+        for field, value in log_data.items():
+            setattr(db_log, field, value)
+        await db.commit()
+        return db_log
+    
     async def get_config_logs(
         self, 
         db: AsyncSession, 
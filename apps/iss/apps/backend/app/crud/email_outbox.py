@@ -0,0 +1,147 @@
+"""
+CRUD operations per la coda email in uscita
+"""
+
+import random
+from typing import Any, Dict, List, Optional
+from datetime import timedelta
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.email_outbox import EmailOutbox, OutboxStatus
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Backoff esponenziale con jitter dopo il tentativo N"""
+    seconds = min(
+        settings.outbox_retry_base_seconds * (2 ** max(attempts - 1, 0)),
+        settings.outbox_retry_max_seconds
+    )
+    return timedelta(seconds=seconds * random.uniform(0.8, 1.2))
+
+
+class EmailOutboxCRUD:
+
+    async def enqueue(
+        self,
+        db: AsyncSession,
+        *,
+        idempotency_key: str,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        category: str,
+        text_content: Optional[str] = None,
+        aps_user_id: Optional[int] = None,
+    ) -> bool:
+        """Accoda un messaggio; False se la chiave di idempotenza è già presente
+
+        Non fa commit: il chiamante salva il messaggio nella stessa transazione
+        delle scritture collegate (es. registro degli alert inviati)
+        """
+        result = await db.execute(
+            insert(EmailOutbox)
+            .values(
+                idempotency_key=idempotency_key,
+                category=category,
+                aps_user_id=aps_user_id,
+                to_email=to_email,
+                subject=subject,
+                html_content=html_content,
+                text_content=text_content,
+                status=OutboxStatus.PENDING,
+                attempts=0,
+                max_attempts=settings.outbox_max_attempts,
+            )
+            .on_conflict_do_nothing(index_elements=[EmailOutbox.idempotency_key])
+            .returning(EmailOutbox.id)
+        )
+        return result.scalar_one_or_none() is not None
+
+    async def exists(self, db: AsyncSession, idempotency_key: str) -> bool:
+        """True se un messaggio con questa chiave di idempotenza è già in coda (o inviato)"""
+        result = await db.execute(
+            select(EmailOutbox.id).where(EmailOutbox.idempotency_key == idempotency_key)
+        )
+        return result.first() is not None
+
+    async def claim_batch(self, db: AsyncSession, limit: int) -> List[Any]:
+        """Prende in carico i messaggi pronti (anche quelli di worker bloccati)"""
+        # Orario del database: nessuna dipendenza dal fuso del processo
+        now = func.now()
+        stale_before = now - timedelta(seconds=settings.outbox_lease_seconds)
+
+        ready = (
+            select(EmailOutbox.id)
+            .where(
+                or_(
+                    and_(EmailOutbox.status == OutboxStatus.PENDING, EmailOutbox.next_attempt_at <= now),
+                    and_(EmailOutbox.status == OutboxStatus.SENDING, EmailOutbox.locked_at < stale_before),
+                )
+            )
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+
+        result = await db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(ready.scalar_subquery()))
+            .values(status=OutboxStatus.SENDING, locked_at=now, attempts=EmailOutbox.attempts + 1)
+            .returning(
+                EmailOutbox.id, EmailOutbox.to_email, EmailOutbox.subject,
+                EmailOutbox.html_content, EmailOutbox.text_content,
+                EmailOutbox.attempts, EmailOutbox.max_attempts
+            )
+            .execution_options(synchronize_session=False)
+        )
+        messages = result.all()
+        await db.commit()
+        return messages
+
+    async def mark_sent(self, db: AsyncSession, message_id: int):
+        """Segna un messaggio come consegnato"""
+        await db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id == message_id)
+            .values(status=OutboxStatus.SENT, sent_at=func.now(), locked_at=None, last_error=None)
+        )
+
+    async def mark_failed(self, db: AsyncSession, message_id: int, attempts: int, max_attempts: int, error: str):
+        """Riprogramma un messaggio con backoff o lo segna come fallito definitivamente"""
+        values = {'locked_at': None, 'last_error': error[:2000]}
+        if attempts >= max_attempts:
+            values['status'] = OutboxStatus.FAILED
+        else:
+            values['status'] = OutboxStatus.PENDING
+            values['next_attempt_at'] = func.now() + retry_delay(attempts)
+
+        await db.execute(update(EmailOutbox).where(EmailOutbox.id == message_id).values(**values))
+
+    async def get_delivery_stats(self, db: AsyncSession) -> Dict[str, int]:
+        """Conteggi di consegna (oggi, ultimi 7 giorni, in coda, falliti)"""
+        today = func.date_trunc('day', func.now())
+        week_ago = func.now() - timedelta(days=7)
+
+        result = await db.execute(
+            select(
+                func.count().filter(and_(EmailOutbox.status == OutboxStatus.SENT, EmailOutbox.sent_at >= today)),
+                func.count().filter(and_(EmailOutbox.status == OutboxStatus.SENT, EmailOutbox.sent_at >= week_ago)),
+                func.count().filter(EmailOutbox.status.in_([OutboxStatus.PENDING, OutboxStatus.SENDING])),
+                func.count().filter(EmailOutbox.status == OutboxStatus.FAILED),
+            )
+        )
+        sent_today, sent_week, pending, failed = result.one()
+        return {
+            'sent_today': sent_today,
+            'sent_week': sent_week,
+            'pending': pending,
+            'failed': failed,
+        }
+
+
+# Istanza singleton
+email_outbox_crud = EmailOutboxCRUD()
@@ -0,0 +1,291 @@
+"""
+CRUD operations per le tabelle di rollup giornaliere
+Ogni aggiornamento ricalcola per intero i giorni toccati (DELETE + INSERT ... SELECT):
+idempotente e corretto anche dopo cambi di stato o cancellazioni. Le parole chiave,
+tokenizzate in Python, sono invece incrementate e decrementate per bando.
+Nessun commit: l'aggiornamento fa parte della transazione del chiamante.
+Su PostgreSQL i giorni ricalcolati sono serializzati con advisory lock di transazione:
+due scrittori sullo stesso giorno non possono inserire la stessa chiave primaria
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import DateTime, String, and_, cast, delete, func, insert, literal, literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.aps_user import APSUser
+from app.models.bando import Bando, BandoStatus
+from app.models.rollup import BandoDailyRollup, KeywordDailyRollup, UserDailyRollup
+from app.utils.simhash import tokenize
+
+KEYWORD_MIN_LENGTH = 4
+KEYWORD_BATCH_SIZE = 1000
+
+# Namespace degli advisory lock per giorno (primo argomento di pg_advisory_xact_lock)
+BANDI_ROLLUP_LOCK = 4701
+USERS_ROLLUP_LOCK = 4702
+
+
+def _as_date(value) -> date:
+    # SQLite restituisce date() come stringa ISO
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def keyword_terms(title: Optional[str], descrizione: Optional[str]) -> Counter:
+    """Occorrenze dei termini di un bando: senza stop words, numeri e parole corte"""
+    return Counter(
+        token[:100] for token in tokenize(f"{title or ''} {descrizione or ''}")
+        if len(token) >= KEYWORD_MIN_LENGTH and not token.isdigit()
+    )
+
+
+def _day_range(days: Set[date]) -> Tuple[datetime, datetime]:
+    """Intervallo di timestamp che copre i giorni, per usare gli indici sulle date"""
+    return datetime.combine(min(days), time.min), datetime.combine(max(days) + timedelta(days=1), time.min)
+
+
+def _is_postgres(db: AsyncSession) -> bool:
+    return db.get_bind().dialect.name == 'postgresql'
+
+
+class RollupCRUD:
+
+    async def _lock_days(self, db: AsyncSession, namespace: int, days: Set[date]) -> None:
+        """Advisory lock di transazione per ogni giorno, in ordine per evitare deadlock"""
+        if not _is_postgres(db):
+            return  # SQLite serializza già gli scrittori
+        for day in sorted(days):
+            await db.execute(select(func.pg_advisory_xact_lock(namespace, day.toordinal())))
+
+    async def _lock_tables(self, db: AsyncSession, *tables) -> None:
+        """Blocca gli scrittori incrementali durante una ricostruzione completa"""
+        if not _is_postgres(db):
+            return
+        for table in tables:
+            await db.execute(text(f"LOCK TABLE {table.__tablename__} IN SHARE ROW EXCLUSIVE MODE"))
+
+    async def bandi_days(self, db: AsyncSession, bando_ids: Iterable[int]) -> Set[date]:
+        """Giorni di ritrovamento dei bandi indicati"""
+        bando_ids = list(bando_ids)
+        if not bando_ids:
+            return set()
+        result = await db.execute(
+            select(func.date(Bando.data_trovato)).where(Bando.id.in_(bando_ids)).distinct()
+        )
+        return {_as_date(day) for day in result.scalars() if day is not None}
+
+    async def refresh_bandi_days(self, db: AsyncSession, days: Iterable[date]) -> int:
+        """Ricalcola il rollup dei bandi per i giorni indicati"""
+        days = set(days)
+        if not days:
+            return 0
+        day = func.date(Bando.data_trovato)
+        start, end = _day_range(days)
+        await self._lock_days(db, BANDI_ROLLUP_LOCK, days)
+        await db.execute(delete(BandoDailyRollup).where(BandoDailyRollup.day.in_(days)))
+        result = await db.execute(
+            insert(BandoDailyRollup).from_select(
+                ['day', 'fonte', 'categoria', 'status', 'count'],
+                self._bandi_aggregate(day).where(
+                    Bando.data_trovato >= start, Bando.data_trovato < end, day.in_(days)
+                )
+            )
+        )
+        return result.rowcount
+
+    async def refresh_bandi(self, db: AsyncSession, bando_ids: Iterable[int]) -> Set[date]:
+        """Ricalcola i giorni dei bandi inseriti o modificati"""
+        days = await self.bandi_days(db, bando_ids)
+        await self.refresh_bandi_days(db, days)
+        return days
+
+    async def refresh_user_days(self, db: AsyncSession, days: Iterable[date]) -> None:
+        """Ricalcola le registrazioni per i giorni indicati"""
+        days = set(days)
+        if not days:
+            return
+        day = func.date(APSUser.created_at)
+        start, end = _day_range(days)
+        await self._lock_days(db, USERS_ROLLUP_LOCK, days)
+        await db.execute(delete(UserDailyRollup).where(UserDailyRollup.day.in_(days)))
+        await db.execute(
+            insert(UserDailyRollup).from_select(
+                ['day', 'signups'],
+                select(day, func.count(APSUser.id))
+                .where(APSUser.created_at >= start, APSUser.created_at < end, day.in_(days))
+                .group_by(day)
+            )
+        )
+
+    async def rebuild(self, db: AsyncSession) -> Dict[str, int]:
+        """Ricostruisce da zero entrambi i rollup"""
+        await self._lock_tables(db, BandoDailyRollup, UserDailyRollup)
+        await db.execute(delete(BandoDailyRollup))
+        await db.execute(
+            insert(BandoDailyRollup).from_select(
+                ['day', 'fonte', 'categoria', 'status', 'count'],
+                self._bandi_aggregate(func.date(Bando.data_trovato)).where(Bando.data_trovato.is_not(None))
+            )
+        )
+        day = func.date(APSUser.created_at)
+        await db.execute(delete(UserDailyRollup))
+        await db.execute(
+            insert(UserDailyRollup).from_select(
+                ['day', 'signups'],
+                select(day, func.count(APSUser.id)).where(APSUser.created_at.is_not(None)).group_by(day)
+            )
+        )
+        bandi_rows = await db.scalar(select(func.count()).select_from(BandoDailyRollup))
+        user_rows = await db.scalar(select(func.count()).select_from(UserDailyRollup))
+        return {'bandi_rows': bandi_rows or 0, 'user_rows': user_rows or 0}
+
+    async def update_keywords(self, db: AsyncSession, bando_ids: Iterable[int], sign: int = 1) -> int:
+        """Somma (sign=1) o sottrae (sign=-1) i termini dei bandi indicati"""
+        bando_ids = list(bando_ids)
+        if not bando_ids:
+            return 0
+        result = await db.execute(
+            select(func.date(Bando.data_trovato), Bando.title, Bando.descrizione).where(Bando.id.in_(bando_ids))
+        )
+        counts: Counter = Counter()
+        for day, title, descrizione in result.all():
+            if day is None:
+                continue
+            for term, count in keyword_terms(title, descrizione).items():
+                counts[(_as_date(day), term)] += sign * count
+        if not counts:
+            return 0
+
+        values = [{'day': day, 'term': term, 'count': count} for (day, term), count in counts.items()]
+        for start in range(0, len(values), KEYWORD_BATCH_SIZE):
+            statement = pg_insert(KeywordDailyRollup).values(values[start:start + KEYWORD_BATCH_SIZE])
+            await db.execute(statement.on_conflict_do_update(
+                index_elements=[KeywordDailyRollup.day, KeywordDailyRollup.term],
+                set_={'count': KeywordDailyRollup.count + statement.excluded.count}
+            ))
+        if sign < 0:
+            days = {day for day, _ in counts}
+            await db.execute(
+                delete(KeywordDailyRollup).where(KeywordDailyRollup.day.in_(days), KeywordDailyRollup.count <= 0)
+            )
+        return len(counts)
+
+    async def rebuild_keywords(self, db: AsyncSession) -> int:
+        """Ricostruisce da zero i conteggi dei termini (bandi letti a blocchi)"""
+        # Lock prima della lettura: un bando inserito durante la scansione non va perso
+        await self._lock_tables(db, KeywordDailyRollup)
+        counts: Counter = Counter()
+        last_id = 0
+        while True:
+            result = await db.execute(
+                select(Bando.id, func.date(Bando.data_trovato), Bando.title, Bando.descrizione)
+                .where(Bando.id > last_id, Bando.status != BandoStatus.ARCHIVIATO)
+                .order_by(Bando.id)
+                .limit(KEYWORD_BATCH_SIZE)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            for _, day, title, descrizione in rows:
+                if day is None:
+                    continue
+                for term, count in keyword_terms(title, descrizione).items():
+                    counts[(_as_date(day), term)] += count
+            last_id = rows[-1][0]
+
+        await db.execute(delete(KeywordDailyRollup))
+        values = [{'day': day, 'term': term, 'count': count} for (day, term), count in counts.items()]
+        for start in range(0, len(values), KEYWORD_BATCH_SIZE):
+            await db.execute(insert(KeywordDailyRollup), values[start:start + KEYWORD_BATCH_SIZE])
+        return len(values)
+
+    @staticmethod
+    def _bandi_aggregate(day):
+        fonte = cast(Bando.fonte, String)
+        categoria = func.coalesce(Bando.categoria, literal(''))
+        status = cast(Bando.status, String)
+        return select(day, fonte, categoria, status, func.count(Bando.id)).group_by(day, fonte, categoria, status)
+
+    # --- LETTURE ---
+
+    async def daily_new_bandi(self, db: AsyncSession, since: date) -> List[Tuple[date, int]]:
+        """Nuovi bandi per giorno a partire da una data"""
+        total = func.sum(BandoDailyRollup.count)
+        result = await db.execute(
+            select(BandoDailyRollup.day, total)
+            .where(BandoDailyRollup.day >= since)
+            .group_by(BandoDailyRollup.day)
+            .order_by(BandoDailyRollup.day)
+        )
+        return [(_as_date(day), int(count)) for day, count in result.all()]
+
+    async def monthly_new_bandi(self, db: AsyncSession, months: int = 6,
+                                today: Optional[date] = None) -> List[Tuple[date, int]]:
+        """Nuovi bandi negli ultimi mesi di calendario, mesi vuoti inclusi (generate_series)"""
+        last = (today or date.today()).replace(day=1)
+        first = last
+        for _ in range(months - 1):
+            first = (first - timedelta(days=1)).replace(day=1)
+        month = literal_column("interval '1 month'")
+        series = func.generate_series(
+            cast(first, DateTime), cast(last, DateTime), month
+        ).table_valued('mese').render_derived(name='mesi')
+        result = await db.execute(
+            select(series.c.mese, func.coalesce(func.sum(BandoDailyRollup.count), 0))
+            .select_from(series.outerjoin(BandoDailyRollup, and_(
+                BandoDailyRollup.day >= series.c.mese, BandoDailyRollup.day < series.c.mese + month
+            )))
+            .group_by(series.c.mese)
+            .order_by(series.c.mese)
+        )
+        return [(bucket.date(), int(count)) for bucket, count in result.all()]
+
+    async def bandi_kpis(self, db: AsyncSession, today: Optional[date] = None) -> Dict[str, int]:
+        """Totali per stato e nuovi bandi negli ultimi 7 e 30 giorni"""
+        today = today or date.today()
+        count = func.coalesce(func.sum(BandoDailyRollup.count), 0)
+
+        def count_where(condition):
+            return func.coalesce(func.sum(BandoDailyRollup.count).filter(condition), 0)
+
+        row = (await db.execute(select(
+            count,
+            count_where(BandoDailyRollup.status == BandoStatus.ATTIVO.value),
+            count_where(BandoDailyRollup.status == BandoStatus.SCADUTO.value),
+            count_where(BandoDailyRollup.day >= today - timedelta(days=7)),
+            count_where(BandoDailyRollup.day >= today - timedelta(days=30)),
+        ))).one()
+        return dict(zip(('total', 'active', 'expired', 'new_week', 'new_month'), (int(value) for value in row)))
+
+    async def top_keywords(self, db: AsyncSession, limit: int = 20,
+                           since: Optional[date] = None) -> List[Tuple[str, int]]:
+        """Termini più frequenti, eventualmente solo nei bandi trovati da una data"""
+        total = func.sum(KeywordDailyRollup.count)
+        query = select(KeywordDailyRollup.term, total).group_by(KeywordDailyRollup.term)
+        if since is not None:
+            query = query.where(KeywordDailyRollup.day >= since)
+        result = await db.execute(query.order_by(total.desc(), KeywordDailyRollup.term).limit(limit))
+        return [(term, int(count)) for term, count in result.all()]
+
+    async def counted_bandi(self, db: AsyncSession, since: Optional[date] = None) -> int:
+        """Bandi non archiviati, eventualmente solo quelli trovati da una data"""
+        query = select(func.coalesce(func.sum(BandoDailyRollup.count), 0)).where(
+            BandoDailyRollup.status != BandoStatus.ARCHIVIATO.value
+        )
+        if since is not None:
+            query = query.where(BandoDailyRollup.day >= since)
+        return int(await db.scalar(query) or 0)
+
+    async def new_users(self, db: AsyncSession, since: date) -> int:
+        """Registrazioni a partire da una data"""
+        result = await db.scalar(
+            select(func.coalesce(func.sum(UserDailyRollup.signups), 0)).where(UserDailyRollup.day >= since)
+        )
+        return int(result or 0)
+
+
+# Istanza singleton
+rollup_crud = RollupCRUD()
@@ -56,13 +56,52 @@ async def startup_events():
     except Exception as e:
         logger.warning(f"Redis cache not available: {e}")
 
-    # Bando monitoring scheduler
+    # Real-time bando events (Redis pub/sub across workers, in-process fallback)
     try:
+        from .services.event_broker import event_broker
+        await event_broker.start()
+    except Exception as e:
+        logger.warning(f"Bando event broker failed to start: {e}")
+
+    # Ingest -> embed -> alert pipeline fed by run_monitoring (idle until bandi are inserted)
+    try:
+        from .services.ingest_pipeline import ingest_pipeline
+        await ingest_pipeline.start()
+    except Exception as e:
+        logger.warning(f"Ingest pipeline failed to start: {e}")
+
+    # Bando monitoring scheduler and email outbox worker: only the elected leader worker runs them,
+    # so the outbox SMTP rate limit (a per-process token bucket) holds for the whole deployment
+    outbox_enabled = bool(settings.mail_username and settings.mail_password)
+    if not outbox_enabled:
+        logger.warning("Email outbox worker not started: SMTP credentials not configured")
+    try:
+        from .services.leader_election import leader_elector
+        from .services.outbox_worker import outbox_worker
         from .services.scheduler import scheduler_service
-        await scheduler_service.start()
-        logger.info("Bando monitoring scheduler started")
+
+        async def start_leader_jobs():
+            await scheduler_service.start()
+            if outbox_enabled:
+                await outbox_worker.start()
+
+        async def stop_leader_jobs():
+            await outbox_worker.stop()
+            await scheduler_service.stop()
+
+        await leader_elector.start(on_elected=start_leader_jobs, on_demoted=stop_leader_jobs)
+    except Exception as e:
+        logger.warning(f"Bando scheduler leader election failed to start: {e}")
+
+    # Search box autocomplete index (in-memory, one per worker): fed by bando events,
+    # rebuilt after archiving and periodically, since only the leader ingests bandi
+    try:
+        from .services.event_broker import event_broker
+        from .services.suggestion_index import suggestion_index
+        event_broker.add_listener(suggestion_index.apply_event)
+        await suggestion_index.start()
     except Exception as e:
-        logger.warning(f"Bando scheduler failed to start: {e}")
+        logger.warning(f"Suggestion index failed to start: {e}")
 
     # AI Semantic Search initialization (ASYNC MODE)
     async def initialize_ai_async():
@@ -81,14 +120,44 @@ async def startup_events():
 
 @app.on_event("shutdown")
 async def shutdown_events():
-    # Stop bando monitoring scheduler
+    # Step down as leader (stops the scheduler and the outbox worker) so another worker can take over
     try:
-        from .services.scheduler import scheduler_service
-        await scheduler_service.stop()
+        from .services.leader_election import leader_elector
+        await leader_elector.stop()
         logger.info("Bando monitoring scheduler stopped")
     except Exception as e:
         logger.warning(f"Bando scheduler shutdown error: {e}")
 
+    # Stop the suggestion index refresh
+    try:
+        from .services.suggestion_index import suggestion_index
+        await suggestion_index.stop()
+    except Exception as e:
+        logger.warning(f"Suggestion index shutdown error: {e}")
+
+    # Stop the ingest pipeline (the hourly alert job picks up anything still queued)
+    try:
+        from .services.ingest_pipeline import ingest_pipeline
+        await ingest_pipeline.stop()
+    except Exception as e:
+        logger.warning(f"Ingest pipeline shutdown error: {e}")
+
+    # Close the bando event broker
+    try:
+        from .services.event_broker import event_broker
+        await event_broker.stop()
+    except Exception as e:
+        logger.warning(f"Bando event broker shutdown error: {e}")
+
+    # Drain the outbox worker if still running, then close pooled SMTP connections
+    try:
+        from .services.outbox_worker import outbox_worker
+        from .services.mail_transport import mail_transport
+        await outbox_worker.stop()
+        await mail_transport.close()
+    except Exception as e:
+        logger.warning(f"Mail transport shutdown error: {e}")
+
 # Security headers middleware
 @app.middleware("http")
 async def security_headers_middleware(request: Request, call_next):
@@ -1,24 +1,39 @@
 from .admin import AdminUser
-from .bando import Bando, BandoStatus
-from .bando_config import BandoConfig, SourceType, ScheduleFrequency
+from .alert_ledger import AlertLedger, AlertChannel, JobCheckpoint, TelegramLedger, TelegramLedgerStatus
+from .bando import Bando, BandoStatus, BandoDuplicate
+from .bando_config import BandoConfig, BandoSourceState, SourceType, ScheduleFrequency
 from .donations import Donation
+from .email_outbox import EmailOutbox, OutboxStatus
 from .event import Event
 from .newspost import NewsPost
 from .project import Project
+from .rollup import BandoDailyRollup, KeywordDailyRollup, UserDailyRollup
 from .user import User, UserRole, UserStatus, AccessibilityNeeds, UserSession, UserPreferences
 from .volunteer import VolunteerApplication
 
 __all__ = [
     "AdminUser",
+    "AlertLedger",
+    "AlertChannel",
+    "JobCheckpoint",
+    "TelegramLedger",
+    "TelegramLedgerStatus",
     "Bando",
     "BandoStatus", 
+    "BandoDuplicate",
     "BandoConfig",
+    "BandoSourceState",
     "SourceType",
     "ScheduleFrequency",
     "Donation",
+    "EmailOutbox",
+    "OutboxStatus",
     "Event",
     "NewsPost",
     "Project", 
+    "BandoDailyRollup",
+    "KeywordDailyRollup",
+    "UserDailyRollup",
     "User",
     "UserRole",
     "UserStatus",
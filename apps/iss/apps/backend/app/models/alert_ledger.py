@@ -0,0 +1,78 @@
+"""
+Registro degli alert inviati e checkpoint dei job periodici
+Il registro impedisce di notificare due volte la stessa coppia (utente, bando)
+sullo stesso canale, quello Telegram la stessa coppia (chat, bando) e fa
+da prenotazione durante l'invio;
+il checkpoint conserva l'ultimo istante elaborato
+"""
+
+import enum
+
+from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, UniqueConstraint
+from datetime import datetime
+
+from app.database.database import Base
+
+
+class AlertChannel:
+    """Canali di notifica registrati nel ledger"""
+    EMAIL = "email"
+
+
+class TelegramLedgerStatus(enum.Enum):
+    """Stati di un bando nel registro Telegram"""
+    PENDING = "pending"  # Reclamato da un giro di invio, non ancora confermato
+    SENT = "sent"
+
+
+class AlertLedger(Base):
+    """Alert già inviato a un utente per un bando"""
+    __tablename__ = "alert_ledger"
+
+    id = Column(Integer, primary_key=True, index=True)
+    aps_user_id = Column(Integer, ForeignKey("aps_users.id", ondelete="CASCADE"), nullable=False)
+    bando_id = Column(Integer, ForeignKey("bandi.id", ondelete="CASCADE"), nullable=False, index=True)
+    channel = Column(String(20), nullable=False, default=AlertChannel.EMAIL)
+    sent_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        UniqueConstraint("aps_user_id", "bando_id", "channel", name="uq_alert_ledger_user_bando_channel"),
+    )
+
+    def __repr__(self):
+        return f"<AlertLedger(user={self.aps_user_id}, bando={self.bando_id}, channel='{self.channel}')>"
+
+
+class TelegramLedger(Base):
+    """Bando già inviato a una chat Telegram"""
+    __tablename__ = "telegram_ledger"
+
+    id = Column(Integer, primary_key=True, index=True)
+    chat_id = Column(String(50), nullable=False)
+    bando_id = Column(Integer, ForeignKey("bandi.id", ondelete="CASCADE"), nullable=False, index=True)
+    config_id = Column(Integer, ForeignKey("bando_configs.id", ondelete="SET NULL"), nullable=True)
+    status = Column(
+        Enum(TelegramLedgerStatus, values_callable=lambda x: [e.value for e in x], native_enum=False, length=20),
+        nullable=False, default=TelegramLedgerStatus.SENT
+    )
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("chat_id", "bando_id", name="uq_telegram_ledger_chat_bando"),
+    )
+
+    def __repr__(self):
+        return f"<TelegramLedger(chat='{self.chat_id}', bando={self.bando_id}, status='{self.status.value}')>"
+
+
+class JobCheckpoint(Base):
+    """High-water mark persistente di un job periodico"""
+    __tablename__ = "job_checkpoints"
+
+    name = Column(String(100), primary_key=True)
+    last_mark = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f"<JobCheckpoint(name='{self.name}', last_mark={self.last_mark})>"
@@ -2,8 +2,8 @@
 Modelli per utenti APS e organizzazioni del terzo settore
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Boolean, ForeignKey, Float, Enum as SQLEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Boolean, ForeignKey, Float, Index, Enum as SQLEnum, and_, true
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.ext.mutable import MutableList
 from datetime import datetime
 import enum
@@ -23,6 +23,15 @@ class OrganizationType(str, enum.Enum):
     ALTRO = "altro"
 
 
+# Preferenze JSON -> colonne booleane indicizzate usate per selezionare i destinatari
+NOTIFICATION_PREFERENCE_COLUMNS = {
+    'email_enabled': 'notify_email_enabled',
+    'new_bandi_alerts': 'notify_new_bandi_alerts',
+    'deadline_reminders': 'notify_deadline_reminders',
+    'weekly_newsletter': 'notify_weekly_newsletter',
+}
+
+
 class APSUser(Base):
     """Utente registrato - Organizzazione del terzo settore"""
     __tablename__ = "aps_users"
@@ -63,6 +72,12 @@ class APSUser(Base):
     geographical_scope = Column(String(100), nullable=True, default="Campania")  # Ambito geografico
     notification_preferences = Column(JSON, nullable=True)  # Preferenze notifiche
     
+    # Preferenze notifiche tipizzate (allineate a notification_preferences)
+    notify_email_enabled = Column(Boolean, nullable=False, default=True, server_default=true())
+    notify_new_bandi_alerts = Column(Boolean, nullable=False, default=True, server_default=true())
+    notify_deadline_reminders = Column(Boolean, nullable=False, default=True, server_default=true())
+    notify_weekly_newsletter = Column(Boolean, nullable=False, default=True, server_default=true())
+    
     # Sistema
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -75,6 +90,24 @@ class APSUser(Base):
     watchlists = relationship("BandoWatchlist", back_populates="aps_user")
     ai_recommendations = relationship("AIRecommendation", back_populates="aps_user")
 
+    @validates('notification_preferences')
+    def _sync_notification_columns(self, key, preferences):
+        """Aggiorna le colonne tipizzate quando cambiano le preferenze JSON"""
+        for preference, column in NOTIFICATION_PREFERENCE_COLUMNS.items():
+            setattr(self, column, bool((preferences or {}).get(preference, True)))
+        return preferences
+
+
+# Indici parziali: utenti attivi, e per ogni preferenza utenti attivi che la hanno abilitata
+Index("ix_aps_users_active", APSUser.id, postgresql_where=APSUser.is_active.is_(True))
+for _column in NOTIFICATION_PREFERENCE_COLUMNS.values():
+    Index(
+        f"ix_aps_users_active_{_column}",
+        APSUser.id,
+        postgresql_where=and_(APSUser.is_active.is_(True), getattr(APSUser, _column).is_(True))
+    )
+del _column
+
 
 class BandoApplication(Base):
     """Candidatura a un bando"""
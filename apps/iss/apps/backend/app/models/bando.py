@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Date, Boolean, DateTime, Enum
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Text, Date, Boolean, DateTime, Enum, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -37,7 +37,8 @@ class Bando(Base):
     
     # Metadati per il monitoraggio
     hash_identifier = Column(String(32), unique=True, nullable=False, index=True)  # MD5 hash per deduplicazione
-    data_trovato = Column(DateTime(timezone=True), server_default=func.now())
+    simhash = Column(BigInteger, nullable=True)  # Fingerprint SimHash del titolo per near-duplicate
+    data_trovato = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     data_aggiornamento = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Flags di processo
@@ -47,12 +48,40 @@ class Bando(Base):
     
     # Dati aggiuntivi strutturati
     importo = Column(String(100), nullable=True)
+    importo_min = Column(Float, nullable=True, index=True)  # Estremi in euro ricavati da importo
+    importo_max = Column(Float, nullable=True, index=True)
     categoria = Column(String(100), nullable=True)
     
     # Relazioni con sistema utenti
     applications = relationship("BandoApplication", back_populates="bando")
     watchlists = relationship("BandoWatchlist", back_populates="bando") 
     ai_recommendations = relationship("AIRecommendation", back_populates="bando")
+    duplicates = relationship("BandoDuplicate", back_populates="canonical")
     
     def __repr__(self):
         return f"<Bando(id={self.id}, title='{self.title}', ente='{self.ente}', fonte='{self.fonte}')>"
+
+
+class BandoDuplicate(Base):
+    """Pubblicazione near-duplicate di un bando già presente, collegata al bando canonico"""
+    __tablename__ = "bando_duplicates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    canonical_id = Column(Integer, ForeignKey("bandi.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    # Dati della pubblicazione duplicata
+    title = Column(String(500), nullable=False)
+    ente = Column(String(200), nullable=False)
+    link = Column(Text, nullable=False)
+    fonte = Column(Enum(BandoSource, values_callable=lambda x: [e.value for e in x]), nullable=False)
+    hash_identifier = Column(String(32), unique=True, nullable=False, index=True)
+
+    # Esito del rilevamento
+    hamming_distance = Column(Integer, nullable=False)
+    similarity = Column(Float, nullable=True)  # Similarità embedding (se disponibile)
+    data_trovato = Column(DateTime(timezone=True), server_default=func.now())
+
+    canonical = relationship("Bando", back_populates="duplicates")
+
+    def __repr__(self):
+        return f"<BandoDuplicate(id={self.id}, canonical_id={self.canonical_id}, fonte='{self.fonte}')>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, JSON, Enum
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, JSON, Enum, Float, UniqueConstraint
 from sqlalchemy.sql import func
 from app.database.database import Base
 import enum
@@ -79,13 +79,18 @@ class BandoLog(Base):
     started_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
     
+    # Tempi dello scheduler
+    scheduled_for = Column(DateTime(timezone=True), nullable=True)  # next_run della configurazione
+    dispatch_lag_seconds = Column(Float, nullable=True)  # Ritardo tra next_run e avvio effettivo
+    duration_seconds = Column(Float, nullable=True)
+    
     # Risultati
     bandi_found = Column(Integer, default=0)
     bandi_new = Column(Integer, default=0)
     errors_count = Column(Integer, default=0)
     
     # Status
-    status = Column(String(20), default="running")  # running, completed, failed
+    status = Column(String(20), default="running")  # running, completed, failed, timeout, cancelled
     error_message = Column(Text, nullable=True)
     
     # Dettagli delle fonti
@@ -93,3 +98,31 @@ class BandoLog(Base):
     
     def __repr__(self):
         return f"<BandoLog(id={self.id}, config_id={self.config_id}, status='{self.status}')>"
+
+
+class BandoSourceState(Base):
+    """Frequenza di polling appresa per ogni fonte di una configurazione"""
+    __tablename__ = "bando_source_states"
+
+    id = Column(Integer, primary_key=True, index=True)
+    config_id = Column(Integer, nullable=False)  # FK to BandoConfig
+    source = Column(String(100), nullable=False)
+
+    # Intervallo corrente e prossimo fetch previsto
+    poll_interval_hours = Column(Float, nullable=False)
+    next_fetch_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Storico dei fetch
+    last_fetched_at = Column(DateTime(timezone=True), nullable=True)
+    last_changed_at = Column(DateTime(timezone=True), nullable=True)
+    content_hash = Column(String(64), nullable=True)  # Hash degli elementi dell'ultimo fetch riuscito
+    change_rate = Column(Float, nullable=False, default=0.0)  # Media mobile dei fetch con novità (0-1)
+    fetches = Column(Integer, nullable=False, default=0)
+    changes = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("config_id", "source", name="uq_bando_source_states_config_source"),
+    )
+
+    def __repr__(self):
+        return f"<BandoSourceState(config_id={self.config_id}, source='{self.source}', every={self.poll_interval_hours}h)>"
@@ -0,0 +1,55 @@
+"""
+Coda persistente delle email in uscita (outbox)
+I job di notifica inseriscono i messaggi, il worker li consegna con retry
+"""
+
+import enum
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, Index
+from sqlalchemy.sql import func
+
+from app.database.database import Base
+
+
+class OutboxStatus(enum.Enum):
+    """Stati di un messaggio in coda"""
+    PENDING = "pending"  # In attesa di invio (o di nuovo tentativo)
+    SENDING = "sending"  # Preso in carico da un worker
+    SENT = "sent"
+    FAILED = "failed"  # Tentativi esauriti
+
+
+class EmailOutbox(Base):
+    """Messaggio email accodato per l'invio"""
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    idempotency_key = Column(String(255), unique=True, nullable=False, index=True)
+    category = Column(String(50), nullable=False, index=True)  # new_bandi, deadline, newsletter, ...
+    aps_user_id = Column(Integer, nullable=True, index=True)
+
+    to_email = Column(String(255), nullable=False)
+    subject = Column(String(500), nullable=False)
+    html_content = Column(Text, nullable=False)
+    text_content = Column(Text, nullable=True)
+
+    # VARCHAR come nella tabella esistente, con i valori minuscoli dell'enum
+    status = Column(
+        Enum(OutboxStatus, values_callable=lambda x: [e.value for e in x], native_enum=False, length=20),
+        nullable=False, default=OutboxStatus.PENDING
+    )
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    def __repr__(self):
+        return f"<EmailOutbox(id={self.id}, key='{self.idempotency_key}', status='{self.status.value}')>"
@@ -0,0 +1,47 @@
+"""
+Tabelle di rollup giornaliere per analytics e statistiche
+Conteggi per giorno aggiornati a ogni ingest e cambio di stato e ricostruiti
+ogni notte: trend, KPI, serie mensili e parole chiave le leggono al posto delle
+tabelle grezze
+"""
+
+from sqlalchemy import Column, Date, Integer, String
+
+from app.database.database import Base
+
+
+class BandoDailyRollup(Base):
+    """Bandi trovati per giorno, fonte, categoria e stato corrente"""
+    __tablename__ = "bandi_daily_rollup"
+
+    day = Column(Date, primary_key=True)
+    fonte = Column(String(50), primary_key=True)
+    categoria = Column(String(100), primary_key=True)  # '' se il bando non ha categoria
+    status = Column(String(20), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<BandoDailyRollup(day={self.day}, fonte='{self.fonte}', status='{self.status}', count={self.count})>"
+
+
+class UserDailyRollup(Base):
+    """Registrazioni di utenti APS per giorno"""
+    __tablename__ = "aps_users_daily_rollup"
+
+    day = Column(Date, primary_key=True)
+    signups = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<UserDailyRollup(day={self.day}, signups={self.signups})>"
+
+
+class KeywordDailyRollup(Base):
+    """Occorrenze dei termini in titolo e descrizione dei bandi non archiviati, per giorno di ritrovamento"""
+    __tablename__ = "bandi_keyword_daily_rollup"
+
+    day = Column(Date, primary_key=True)
+    term = Column(String(100), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<KeywordDailyRollup(day={self.day}, term='{self.term}', count={self.count})>"
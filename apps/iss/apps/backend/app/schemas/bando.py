@@ -59,6 +59,8 @@ class BandoRead(BandoBase):
     notificato_email: bool
     notificato_telegram: bool
     keyword_match: Optional[str] = None
+    importo_min: Optional[float] = None
+    importo_max: Optional[float] = None
 
     class Config:
         from_attributes = True
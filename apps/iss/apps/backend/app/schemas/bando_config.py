@@ -115,6 +115,9 @@ class BandoLogRead(BandoLogBase):
     id: int
     started_at: datetime
     completed_at: Optional[datetime] = None
+    scheduled_for: Optional[datetime] = None
+    dispatch_lag_seconds: Optional[float] = None
+    duration_seconds: Optional[float] = None
     sources_processed: Optional[Dict[str, dict]] = None
 
     class Config:
@@ -4,86 +4,95 @@ Monitora bandi e invia notifiche automatiche basate su watchlist e profili utent
 """
 
 import logging
-from typing import List, Dict, Optional, Any
-from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Any, Set
+from datetime import date, datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import func, select, or_
 
-from app.database.database import get_db
+from app.database.database import async_session_maker
 from app.models.bando import Bando
-from app.models.aps_user import APSUser, BandoWatchlist
+from app.models.aps_user import APSUser
+from app.crud.alert_ledger import alert_ledger_crud, job_checkpoint_crud
 from app.crud.aps_user import aps_user_crud, bando_watchlist_crud
-from app.crud.bando import bando_crud
-from app.services.email_notifications import email_notification_service
+from app.crud.bando import IMPORTO_DISPONIBILE, bando_crud
+from app.crud.email_outbox import email_outbox_crud
+from app.services.email_notifications import (
+    email_notification_service, notification_key, bandi_digest, iso_week
+)
+from app.services.fan_out import FanOutExecutor, fan_out_executor
+from app.services.outbox_worker import outbox_worker
 from app.services.semantic_search import semantic_search_service
 
 logger = logging.getLogger(__name__)
 
+# Checkpoint dell'ultimo istante valutato per gli alert
+NEW_BANDI_CHECKPOINT = "new_bandi_alerts"
+
+# data_trovato è l'inizio della transazione di inserimento: un bando può diventare
+# visibile dopo un checkpoint successivo. Ogni giro rilegge questa finestra e il
+# registro degli alert scarta le coppie già inviate
+NEW_BANDI_OVERLAP = timedelta(hours=1)
+
+# Con errori il checkpoint resta indietro per ritentare, ma al massimo di questa finestra:
+# un utente che fallisce sempre non allarga all'infinito i bandi riletti a ogni giro
+NEW_BANDI_RETRY_WINDOW = timedelta(hours=24)
+
+# Similarità minima tra profilo e bando per l'alert, e bandi al massimo per email
+ALERT_MIN_SCORE = 0.3
+MAX_BANDI_PER_ALERT = 5
+
+# Giorni prima della scadenza in cui inviare il reminder
+REMINDER_WINDOWS = (7, 3, 1)
+
 
 class BandoAlertSystem:
     """Sistema di alert automatici per bandi e notifiche utenti"""
     
-    def __init__(self):
+    def __init__(self, fan_out: Optional[FanOutExecutor] = None, session_maker=None):
         self.last_check = datetime.now()
         self.active = True
+        self.fan_out = fan_out or fan_out_executor
+        self.session_maker = session_maker or async_session_maker
     
-    async def check_new_bandi_alerts(self, db: AsyncSession) -> Dict[str, int]:
-        """Controlla nuovi bandi e invia alert agli utenti interessati"""
+    async def check_new_bandi_alerts(self, db: AsyncSession, dry_run: bool = False) -> Dict[str, int]:
+        """Controlla nuovi bandi e invia alert agli utenti interessati (dry_run: nessuna scrittura)"""
         logger.info("🔍 Controllo nuovi bandi per alert...")
         
-        results = {"users_notified": 0, "emails_sent": 0, "errors": 0}
+        results = {"users_notified": 0, "emails_queued": 0, "pairs_already_sent": 0, "errors": 0}
         
         try:
-            # Trova bandi nuovi (ultimi 24 ore)
-            cutoff_time = datetime.now() - timedelta(hours=24)
+            # Solo i bandi trovati dopo l'ultimo giro (meno la finestra); al primo avvio ultime 24 ore
+            started_at = await db.scalar(select(func.now()))
+            mark = await job_checkpoint_crud.get_mark(db, NEW_BANDI_CHECKPOINT)
+            since = mark - NEW_BANDI_OVERLAP if mark else started_at - timedelta(hours=24)
             
             result = await db.execute(
-                select(Bando).where(
-                    and_(
-                        Bando.data_trovato >= cutoff_time,
-                        Bando.status == 'attivo'
-                    )
-                )
+                select(Bando)
+                .where(Bando.status == 'attivo', Bando.data_trovato >= since)
+                .order_by(Bando.data_trovato, Bando.id)
             )
             new_bandi = list(result.scalars().all())
             
-            if not new_bandi:
+            if new_bandi:
+                logger.info(f"🆕 Trovati {len(new_bandi)} nuovi bandi")
+                await self._alert_users(db, new_bandi, results, dry_run)
+            else:
                 logger.info("📭 Nessun nuovo bando trovato")
+            
+            if dry_run:
+                logger.info(f"🧪 Alert nuovi bandi (dry-run): {results}")
                 return results
             
-            logger.info(f"🆕 Trovati {len(new_bandi)} nuovi bandi")
+            # Con errori il checkpoint avanza solo fino al limite della finestra di retry:
+            # i giri successivi rivalutano le coppie fallite, il registro scarta quelle inviate
+            if results["errors"]:
+                await job_checkpoint_crud.set_mark(db, NEW_BANDI_CHECKPOINT, started_at - NEW_BANDI_RETRY_WINDOW)
+                await db.commit()
+                logger.warning(f"⚠️ Alert nuovi bandi con errori, coppie fallite ritentate al prossimo giro: {results}")
+                return results
             
-            # Recupera tutti gli utenti attivi con preferenze email
-            users, _ = await aps_user_crud.search_users(db, skip=0, limit=1000, is_active=True)
-            
-            for user in users:
-                try:
-                    # Controlla preferenze notifiche
-                    preferences = user.notification_preferences or {}
-                    if not preferences.get('new_bandi_alerts', True):
-                        continue
-                    
-                    # Trova bandi rilevanti per l'utente usando AI
-                    relevant_bandi = await self._find_relevant_bandi_for_user(db, user, new_bandi)
-                    
-                    if relevant_bandi:
-                        # Invia notifica email
-                        success = await email_notification_service.send_new_bandi_alert(
-                            user, relevant_bandi
-                        )
-                        
-                        if success:
-                            results["emails_sent"] += 1
-                            logger.info(f"📧 Alert inviato a {user.organization_name}: {len(relevant_bandi)} bandi")
-                        else:
-                            results["errors"] += 1
-                        
-                        results["users_notified"] += 1
-                
-                except Exception as e:
-                    logger.error(f"Errore alert per utente {user.id}: {e}")
-                    results["errors"] += 1
+            await job_checkpoint_crud.set_mark(db, NEW_BANDI_CHECKPOINT, started_at)
+            await db.commit()
             
             logger.info(f"✅ Alert nuovi bandi completato: {results}")
             return results
@@ -93,72 +102,105 @@ class BandoAlertSystem:
             results["errors"] += 1
             return results
     
-    async def check_deadline_reminders(self, db: AsyncSession) -> Dict[str, int]:
-        """Controlla scadenze imminenti e invia reminder"""
-        logger.info("⏰ Controllo scadenze imminenti...")
+    async def alert_new_bandi(self, db: AsyncSession, bando_ids: List[int]) -> Dict[str, int]:
+        """Alert solo per i bandi appena inseriti (stage della pipeline di ingest)"""
+        results = {"users_notified": 0, "emails_queued": 0, "pairs_already_sent": 0, "errors": 0}
         
-        results = {"reminders_sent": 0, "errors": 0}
+        result = await db.execute(
+            select(Bando).where(Bando.id.in_(bando_ids), Bando.status == 'attivo').order_by(Bando.id)
+        )
+        new_bandi = list(result.scalars().all())
+        if not new_bandi:
+            return results
         
-        try:
-            # Date di controllo: 7 giorni, 3 giorni, 1 giorno
-            now = datetime.now()
-            check_dates = [
-                now + timedelta(days=7),   # 7 giorni prima
-                now + timedelta(days=3),   # 3 giorni prima  
-                now + timedelta(days=1),   # 1 giorno prima
-            ]
+        # Il checkpoint resta al job orario: rilegge anche questi bandi e il registro scarta le coppie inviate
+        await self._alert_users(db, new_bandi, results, dry_run=False)
+        
+        logger.info(f"✅ Alert per {len(new_bandi)} bandi appena inseriti: {results}")
+        return results
+    
+    async def _alert_users(self, db: AsyncSession, new_bandi: List[Bando], results: Dict[str, int], dry_run: bool):
+        """Notifica agli utenti con alert attivi i bandi rilevanti non ancora inviati"""
+        bando_ids = [bando.id for bando in new_bandi]
+        pending: Dict[int, Set[int]] = {}  # Aggiornati a ogni pagina di utenti
+        matches: Dict[int, List[Bando]] = {}
+        
+        async def notify(user: APSUser):
+            pending_ids = pending.get(user.id)
+            if not pending_ids:
+                return
+            relevant_bandi = [bando for bando in matches.get(user.id, []) if bando.id in pending_ids]
+            relevant_bandi = relevant_bandi[:MAX_BANDI_PER_ALERT]
+            if not relevant_bandi:
+                return
             
-            for days_ahead, check_date in enumerate([7, 3, 1], 1):
-                deadline_date = now + timedelta(days=check_date)
+            # Sessione per utente: gli utenti sono elaborati in parallelo
+            async with self.session_maker() as user_db:
+                if not dry_run:
+                    # Registra le coppie: un altro processo potrebbe averle già inviate
+                    recorded = set(await alert_ledger_crud.record(user_db, user.id, [b.id for b in relevant_bandi]))
+                    relevant_bandi = [bando for bando in relevant_bandi if bando.id in recorded]
+                    if not relevant_bandi:
+                        return
                 
-                # Trova bandi che scadono in questa data
-                result = await db.execute(
-                    select(Bando).where(
-                        and_(
-                            Bando.scadenza >= deadline_date.replace(hour=0, minute=0, second=0),
-                            Bando.scadenza <= deadline_date.replace(hour=23, minute=59, second=59),
-                            Bando.status == 'attivo'
-                        )
-                    )
+                # Accoda notifica email: registro e coda vengono salvati nella stessa transazione
+                idempotency_key = notification_key("new_bandi", user.id, bandi_digest(relevant_bandi))
+                queued = await email_notification_service.send_new_bandi_alert(
+                    user, relevant_bandi, db=user_db, idempotency_key=idempotency_key, dry_run=dry_run
                 )
-                expiring_bandi = list(result.scalars().all())
-                
-                if not expiring_bandi:
-                    continue
-                
-                logger.info(f"⏰ {len(expiring_bandi)} bandi scadono in {check_date} giorni")
-                
-                for bando in expiring_bandi:
-                    # Trova utenti che hanno questo bando in watchlist
-                    watchlist_result = await db.execute(
-                        select(BandoWatchlist).options(
-                            selectinload(BandoWatchlist.aps_user)
-                        ).where(BandoWatchlist.bando_id == bando.id)
-                    )
-                    watchlist_items = list(watchlist_result.scalars().all())
-                    
-                    for item in watchlist_items:
-                        user = item.aps_user
-                        
-                        # Controlla preferenze
-                        preferences = user.notification_preferences or {}
-                        if not preferences.get('deadline_reminders', True):
-                            continue
-                        
-                        try:
-                            success = await email_notification_service.send_deadline_reminder(
-                                user, bando, check_date
-                            )
-                            
-                            if success:
-                                results["reminders_sent"] += 1
-                                logger.info(f"⏰ Reminder inviato a {user.organization_name} per {bando.title}")
-                            else:
-                                results["errors"] += 1
+                # Email non accodata (es. servizio disabilitato): le coppie restano da notificare
+                if dry_run or not (queued or await email_outbox_crud.exists(user_db, idempotency_key)):
+                    await user_db.rollback()
+                else:
+                    await user_db.commit()
+            
+            if queued:
+                outbox_worker.wake()
+                results["emails_queued"] += 1
+                results["users_notified"] += 1
+                logger.info(f"📧 Alert accodato per {user.organization_name}: {len(relevant_bandi)} bandi")
+        
+        # Utenti attivi con alert abilitati, a pagine
+        async for users in aps_user_crud.stream_active_users(db, preference='new_bandi_alerts'):
+            # Coppie (utente, bando) non ancora notificate
+            pending = await alert_ledger_crud.get_pending_pairs(db, [user.id for user in users], bando_ids)
+            results["pairs_already_sent"] += len(users) * len(bando_ids) - sum(len(ids) for ids in pending.values())
+            # Profili della pagina confrontati con i soli bandi nuovi, in batch
+            matches = await self._match_new_bandi(db, [user for user in users if pending.get(user.id)], new_bandi)
+            
+            outcomes = await self.fan_out.run(users, notify, label="alert nuovi bandi")
+            results["errors"] += sum(1 for outcome in outcomes if outcome.error)
+    
+    async def check_deadline_reminders(self, db: AsyncSession, dry_run: bool = False) -> Dict[str, int]:
+        """Controlla scadenze imminenti e invia un riepilogo per utente (dry_run: nessuna scrittura)"""
+        logger.info("⏰ Controllo scadenze imminenti...")
+        
+        results = {"digests_queued": 0, "reminders_queued": 0, "errors": 0}
+        today = date.today().isoformat()
+        
+        try:
+            # Lettura in streaming sulla sessione del job, accodamento su una sessione separata
+            async with self.session_maker() as queue_db:
+                async for user, reminders in bando_watchlist_crud.stream_deadline_reminders(db, REMINDER_WINDOWS):
+                    try:
+                        # Un solo riepilogo per utente e per giorno, anche con più esecuzioni del job
+                        queued = await email_notification_service.send_deadline_digest(
+                            user, reminders, db=queue_db,
+                            idempotency_key=notification_key("deadline_digest", user.id, today),
+                            dry_run=dry_run
+                        )
+                        await queue_db.commit()
                         
-                        except Exception as e:
-                            logger.error(f"Errore reminder per {user.organization_name}: {e}")
-                            results["errors"] += 1
+                        if queued:
+                            outbox_worker.wake()
+                            results["digests_queued"] += 1
+                            results["reminders_queued"] += len(reminders)
+                            logger.info(f"⏰ Riepilogo scadenze accodato per {user.organization_name}: {len(reminders)} bandi")
+                    
+                    except Exception as e:
+                        await queue_db.rollback()
+                        logger.error(f"Errore reminder per {user.organization_name}: {e}")
+                        results["errors"] += 1
             
             logger.info(f"✅ Controllo scadenze completato: {results}")
             return results
@@ -168,42 +210,41 @@ class BandoAlertSystem:
             results["errors"] += 1
             return results
     
-    async def send_weekly_newsletters(self, db: AsyncSession) -> Dict[str, int]:
-        """Invia newsletter settimanali con statistiche e bandi"""
+    async def send_weekly_newsletters(self, db: AsyncSession, dry_run: bool = False) -> Dict[str, int]:
+        """Invia newsletter settimanali con statistiche e bandi (dry_run: nessuna scrittura)"""
         logger.info("📊 Preparazione newsletter settimanali...")
         
-        results = {"newsletters_sent": 0, "errors": 0}
+        results = {"newsletters_queued": 0, "errors": 0}
         
         try:
             # Calcola statistiche settimanali
             stats = await self._calculate_weekly_stats(db)
+            week = iso_week()
+            await self._warm_up_recommendations(db)
             
-            # Recupera utenti che vogliono la newsletter
-            users, _ = await aps_user_crud.search_users(db, skip=0, limit=1000, is_active=True)
+            personalized: Dict[int, Dict[str, Any]] = {}  # Aggiornato a ogni pagina di utenti
             
-            for user in users:
-                try:
-                    # Controlla preferenze
-                    preferences = user.notification_preferences or {}
-                    if not preferences.get('weekly_newsletter', True):
-                        continue
-                    
-                    # Personalizza statistiche per l'utente
-                    user_stats = await self._personalize_stats_for_user(db, user, stats)
-                    
-                    success = await email_notification_service.send_weekly_newsletter(
-                        user, user_stats
+            async def send(user: APSUser):
+                # Sessione per utente: gli utenti sono elaborati in parallelo
+                async with self.session_maker() as user_db:
+                    queued = await email_notification_service.send_weekly_newsletter(
+                        user, personalized[user.id], db=user_db,
+                        idempotency_key=notification_key("newsletter", user.id, week),
+                        dry_run=dry_run
                     )
-                    
-                    if success:
-                        results["newsletters_sent"] += 1
-                        logger.info(f"📊 Newsletter inviata a {user.organization_name}")
-                    else:
-                        results["errors"] += 1
+                    await user_db.commit()
                 
-                except Exception as e:
-                    logger.error(f"Errore newsletter per {user.organization_name}: {e}")
-                    results["errors"] += 1
+                if queued:
+                    outbox_worker.wake()
+                    results["newsletters_queued"] += 1
+                    logger.info(f"📊 Newsletter accodata per {user.organization_name}")
+            
+            # Utenti attivi iscritti alla newsletter, a pagine
+            async for users in aps_user_crud.stream_active_users(db, preference='weekly_newsletter'):
+                # Personalizzazione in blocco per la pagina, poi invii in parallelo
+                personalized = await self._personalize_stats_for_users(db, users, stats)
+                outcomes = await self.fan_out.run(users, send, label="newsletter")
+                results["errors"] += sum(1 for outcome in outcomes if outcome.error)
             
             logger.info(f"✅ Newsletter settimanali completate: {results}")
             return results
@@ -213,88 +254,80 @@ class BandoAlertSystem:
             results["errors"] += 1
             return results
     
-    async def _find_relevant_bandi_for_user(self, db: AsyncSession, user: APSUser, bandi: List[Bando]) -> List[Bando]:
-        """Trova bandi rilevanti per un utente specifico usando AI"""
-        if not bandi:
-            return []
-        
+    async def _warm_up_recommendations(self, db: AsyncSession):
+        """Prepara gli embedding una volta, prima che gli utenti vengano elaborati in parallelo"""
         try:
-            # Costruisci profilo utente per AI
-            user_profile = {
-                'organization_type': user.organization_type.value if user.organization_type else 'aps',
-                'sectors': user.sectors or [],
-                'target_groups': user.target_groups or [],
-                'keywords': user.keywords or [],
-                'geographical_scope': user.geographical_scope or 'Campania',
-                'max_budget_interest': user.max_budget_interest,
-                'description': user.description
-            }
-            
-            # Usa AI per trovare match
-            recommendations = await semantic_search_service.generate_user_recommendations(
-                user_profile, db, limit=len(bandi)
+            await semantic_search_service.generate_embeddings(db)
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding non disponibili, matching semplice per settori: {e}")
+    
+    async def _match_new_bandi(
+        self, db: AsyncSession, users: List[APSUser], new_bandi: List[Bando]
+    ) -> Dict[int, List[Bando]]:
+        """Bandi nuovi rilevanti per ogni utente, dal più affine: solo i nuovi embedding contro i profili"""
+        if not users:
+            return {}
+        try:
+            recommendations = await semantic_search_service.generate_batch_recommendations(
+                {user.id: self._alert_profile(user) for user in users}, db,
+                limit=len(new_bandi), threshold=ALERT_MIN_SCORE, bandi=new_bandi
             )
-            
-            # Filtra solo i bandi nuovi che sono stati raccomandati
-            new_bando_ids = {b.id for b in bandi}
-            relevant_bandi = []
-            
-            for rec in recommendations:
-                if rec['bando'].id in new_bando_ids and rec['recommendation_score'] > 0.3:
-                    relevant_bandi.append(rec['bando'])
-            
-            return relevant_bandi[:5]  # Max 5 bandi per email
-            
+            return {
+                user_id: [rec['bando'] for rec in recs]
+                for user_id, recs in recommendations.items()
+            }
         except Exception as e:
-            logger.error(f"Errore ricerca bandi rilevanti per {user.organization_name}: {e}")
-            # Fallback: usa matching semplice per settori
-            relevant = []
-            user_sectors = [s.lower() for s in (user.sectors or [])]
-            
-            for bando in bandi:
-                if user_sectors and bando.categoria:
-                    if any(sector in bando.categoria.lower() for sector in user_sectors):
-                        relevant.append(bando)
-                        if len(relevant) >= 3:
-                            break
-            
-            return relevant
+            logger.error(f"Errore ricerca bandi rilevanti per gli alert: {e}")
+            # Fallback: matching semplice per settori
+            return {user.id: self._match_by_sectors(user, new_bandi) for user in users}
+    
+    def _alert_profile(self, user: APSUser) -> Dict[str, Any]:
+        """Profilo usato per gli alert sui nuovi bandi"""
+        return {
+            **self._newsletter_profile(user),
+            'max_budget_interest': user.max_budget_interest,
+            'description': user.description
+        }
+    
+    def _match_by_sectors(self, user: APSUser, bandi: List[Bando]) -> List[Bando]:
+        """Bandi la cui categoria contiene uno dei settori dell'utente"""
+        user_sectors = [sector.lower() for sector in (user.sectors or [])]
+        if not user_sectors:
+            return []
+        return [
+            bando for bando in bandi
+            if bando.categoria and any(sector in bando.categoria.lower() for sector in user_sectors)
+        ]
     
     async def _calculate_weekly_stats(self, db: AsyncSession) -> Dict[str, Any]:
-        """Calcola statistiche settimanali per newsletter"""
+        """Calcola statistiche settimanali per newsletter (aggregati SQL)"""
         try:
             week_ago = datetime.now() - timedelta(days=7)
+            is_active = Bando.status == 'attivo'
             
-            # Nuovi bandi questa settimana
-            new_bandi_result = await db.execute(
-                select(Bando).where(Bando.data_trovato >= week_ago)
+            result = await db.execute(
+                select(
+                    func.count().filter(Bando.data_trovato >= week_ago),
+                    func.count().filter(is_active),
+                    func.coalesce(func.sum(IMPORTO_DISPONIBILE).filter(is_active), 0)
+                )
             )
-            new_bandi = list(new_bandi_result.scalars().all())
+            new_count, active_count, total_amount = result.one()
             
-            # Bandi attivi totali
-            active_bandi_result = await db.execute(
-                select(Bando).where(Bando.status == 'attivo')
+            # Top 3 nuovi
+            latest_result = await db.execute(
+                select(Bando)
+                .where(Bando.data_trovato >= week_ago)
+                .order_by(Bando.data_trovato.desc())
+                .limit(3)
             )
-            active_bandi = list(active_bandi_result.scalars().all())
-            
-            # Calcola importo totale (quando possibile)
-            total_amount = 0
-            for bando in active_bandi:
-                if bando.importo:
-                    try:
-                        # Estrai numeri dalla stringa importo
-                        import re
-                        numbers = re.findall(r'\d+(?:\.\d+)?', str(bando.importo))
-                        if numbers:
-                            total_amount += float(numbers[0])
-                    except:
-                        pass
             
+            total_amount = float(total_amount or 0)
             return {
-                'nuovi_bandi': len(new_bandi),
-                'totali_attivi': len(active_bandi),
+                'nuovi_bandi': new_count,
+                'totali_attivi': active_count,
                 'importo_totale': f"{total_amount:,.0f}" if total_amount > 0 else None,
-                'bandi_raccomandati': new_bandi[:3],  # Top 3 nuovi
+                'bandi_raccomandati': list(latest_result.scalars().all()),
                 'scadenze_imminenti': []  # Verrà personalizzato per utente
             }
             
@@ -310,49 +343,50 @@ class BandoAlertSystem:
     
     async def _personalize_stats_for_user(self, db: AsyncSession, user: APSUser, base_stats: Dict) -> Dict[str, Any]:
         """Personalizza le statistiche per un utente specifico"""
-        personalized = base_stats.copy()
+        personalized = await self._personalize_stats_for_users(db, [user], base_stats)
+        return personalized[user.id]
+    
+    async def _personalize_stats_for_users(
+        self, db: AsyncSession, users: List[APSUser], base_stats: Dict
+    ) -> Dict[int, Dict[str, Any]]:
+        """Personalizza le statistiche per una pagina di utenti: una query e un batch AI"""
+        user_ids = [user.id for user in users]
+        recommendations: Dict[int, List[Dict]] = {}
+        deadlines: Dict[int, List[Dict]] = {}
         
         try:
-            # Aggiungi raccomandazioni AI personalizzate
-            if user.id:
-                user_profile = {
-                    'organization_type': user.organization_type.value if user.organization_type else 'aps',
-                    'sectors': user.sectors or [],
-                    'target_groups': user.target_groups or [],
-                    'keywords': user.keywords or [],
-                    'geographical_scope': user.geographical_scope or 'Campania'
-                }
-                
-                recommendations = await semantic_search_service.generate_user_recommendations(
-                    user_profile, db, limit=3
-                )
-                
-                personalized['raccomandazioni_ai'] = len(recommendations)
-                personalized['bandi_raccomandati'] = [rec['bando'] for rec in recommendations[:3]]
-            
-            # Aggiungi scadenze dalla watchlist dell'utente
-            watchlist = await bando_watchlist_crud.get_user_watchlist(db, user.id)
-            upcoming_deadlines = []
-            
-            now = datetime.now()
-            for item in watchlist:
-                if item.bando.scadenza and item.bando.scadenza > now:
-                    days_left = (item.bando.scadenza - now).days
-                    if days_left <= 30:  # Solo prossimi 30 giorni
-                        upcoming_deadlines.append({
-                            'bando': item.bando,
-                            'days_left': days_left
-                        })
-            
-            personalized['scadenze_imminenti'] = sorted(
-                upcoming_deadlines, 
-                key=lambda x: x['days_left']
-            )[:5]
-            
+            # Raccomandazioni AI personalizzate, in batch
+            recommendations = await semantic_search_service.generate_batch_recommendations(
+                {user.id: self._newsletter_profile(user) for user in users}, db, limit=3
+            )
         except Exception as e:
-            logger.error(f"Errore personalizzazione stats per {user.organization_name}: {e}")
+            logger.error(f"Errore raccomandazioni newsletter: {e}")
         
+        try:
+            # Scadenze dalla watchlist, prossimi 30 giorni
+            deadlines = await bando_watchlist_crud.get_upcoming_deadlines(db, user_ids, days=30, per_user=5)
+        except Exception as e:
+            logger.error(f"Errore scadenze watchlist newsletter: {e}")
+        
+        personalized = {}
+        for user_id in user_ids:
+            stats = base_stats.copy()
+            if user_id in recommendations:
+                stats['raccomandazioni_ai'] = len(recommendations[user_id])
+                stats['bandi_raccomandati'] = [rec['bando'] for rec in recommendations[user_id][:3]]
+            stats['scadenze_imminenti'] = deadlines.get(user_id, [])
+            personalized[user_id] = stats
         return personalized
+    
+    def _newsletter_profile(self, user: APSUser) -> Dict[str, Any]:
+        """Profilo usato per le raccomandazioni della newsletter"""
+        return {
+            'organization_type': user.organization_type.value if user.organization_type else 'aps',
+            'sectors': user.sectors or [],
+            'target_groups': user.target_groups or [],
+            'keywords': user.keywords or [],
+            'geographical_scope': user.geographical_scope or 'Campania'
+        }
 
 
 # Singleton service instance
@@ -0,0 +1,74 @@
+"""
+Manutenzione del ciclo di vita dei bandi
+Scadenza automatica (ATTIVO -> SCADUTO) e archiviazione dei bandi vecchi con
+UPDATE set-based; gli id coinvolti servono a invalidare cache, indici in memoria
+e a notificare i client in tempo reale
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud.bando import bando_crud
+from app.crud.rollup import rollup_crud
+from app.services.event_broker import BANDO_STATUS, bando_event, event_broker
+from app.services.near_duplicates import near_duplicate_detector
+
+logger = logging.getLogger(__name__)
+
+
+class BandoLifecycleService:
+    """Job giornaliero di scadenza e archiviazione dei bandi"""
+
+    async def run(self, db: AsyncSession, archive_after_days: Optional[int] = None) -> Dict[str, List[int]]:
+        """Scade e archivia in un'unica transazione, poi invalida ciò che dipende dallo stato"""
+        days_old = archive_after_days or settings.bando_archive_after_days
+        expired = await bando_crud.expire_past_deadline(db)
+        archived = await bando_crud.archive_old_bandi(db, days_old=days_old)
+        # Lo stato è una dimensione del rollup giornaliero: stessi id, stessa transazione
+        await rollup_crud.refresh_bandi(db, [row.id for row in expired] + [row.id for row in archived])
+        # I bandi archiviati escono dai conteggi delle parole chiave
+        await rollup_crud.update_keywords(db, [row.id for row in archived], sign=-1)
+        await db.commit()
+
+        result = {
+            'expired': [row.id for row in expired],
+            'archived': [row.id for row in archived],
+        }
+        if expired or archived:
+            await self._invalidate(db, expired, archived)
+        logger.info(f"🗓️ Ciclo di vita bandi: {len(expired)} scaduti, {len(archived)} archiviati")
+        return result
+
+    async def _invalidate(self, db: AsyncSession, expired: List[Row], archived: List[Row]):
+        """Aggiorna indici e cache; ogni passo è indipendente dagli altri"""
+        archived_ids = [row.id for row in archived]
+        # Un bando scaduto non può più essere canonico
+        for bando_id in [row.id for row in expired] + archived_ids:
+            near_duplicate_detector.remove(bando_id)
+
+        try:
+            # Importa qui per evitare di caricare il modello AI nei percorsi che non lo usano
+            from app.services.semantic_search import semantic_search_service
+            await semantic_search_service.remove_bandi([row.id for row in expired] + archived_ids)
+        except Exception as e:
+            logger.warning(f"⚠️ Pulizia indice semantico fallita: {e}")
+
+        try:
+            from fastapi_cache import FastAPICache
+            await FastAPICache.clear()
+        except Exception as e:
+            logger.warning(f"⚠️ Invalidazione cache API non riuscita: {e}")
+
+        # Un evento per bando: un bando scaduto e archiviato nello stesso giro riporta lo stato finale.
+        # Gli eventi di archiviazione fanno ricostruire l'indice suggerimenti in ogni worker
+        latest = {row.id: row for row in expired}
+        latest.update({row.id: row for row in archived})
+        await event_broker.publish(bando_event(BANDO_STATUS, row) for row in latest.values())
+
+
+# Istanza singleton del servizio
+bando_lifecycle_service = BandoLifecycleService()
@@ -5,6 +5,7 @@ Adattato dal sistema bot originale per l'integrazione nel backend FastAPI
 
 import asyncio
 import logging
+from collections import Counter
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import hashlib
@@ -13,12 +14,20 @@ from urllib.parse import urljoin, urlparse
 
 import httpx
 from bs4 import BeautifulSoup
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.bando import Bando, BandoSource, BandoStatus
+from app.models.bando import Bando, BandoDuplicate, BandoSource, BandoStatus
 from app.models.bando_config import BandoConfig, BandoLog
 from app.crud.bando import bando_crud
+from app.crud.rollup import rollup_crud
 from app.core.config import settings
+from app.services.crawl_frequency import crawl_frequency_policy
+from app.services.event_broker import BANDO_CREATED, bando_event, event_broker
+from app.services.ingest_pipeline import ingest_pipeline
+from app.services.near_duplicates import NearDuplicateDetector, near_duplicate_detector
+from app.utils.importo import parse_importo
+from app.utils.simhash import simhash, to_signed64
 
 logger = logging.getLogger(__name__)
 
@@ -999,8 +1008,8 @@ class BandoMonitorService:
             
         return bandi
     
-    async def run_monitoring(self, db: AsyncSession, config: BandoConfig) -> Dict:
-        """Esegue il monitoraggio con una configurazione specifica"""
+    async def run_monitoring(self, db: AsyncSession, config: BandoConfig, force: bool = False) -> Dict:
+        """Esegue il monitoraggio con una configurazione specifica (force: anche le fonti non dovute)"""
         
         # Crea log di esecuzione
         log_data = {
@@ -1010,9 +1019,17 @@ class BandoMonitorService:
         }
         
         all_bandi = []
+        created_events: List[Dict] = []
         new_bandi = 0
+        duplicates = 0
         errors = 0
         sources_processed = {}
+        # Fonte di provenienza di ogni hash e bandi nuovi per fonte, per la frequenza adattiva
+        source_of: Dict[str, str] = {}
+        new_by_source: Counter = Counter()
+        # Bandi nuovi di questa esecuzione, aggiunti agli indici condivisi dopo il commit
+        staged = NearDuplicateDetector()
+        staged_bandi: List[Bando] = []
         
         try:
             # SITI UFFICIALI E SPECIFICI PER BANDI APS SALERNO/CAMPANIA
@@ -1029,13 +1046,34 @@ class BandoMonitorService:
                 ('contributi_regione', self.scrape_contributi_regione_campania)
             ]
             
+            now = crawl_frequency_policy.now()
+            source_states = await crawl_frequency_policy.load_states(
+                db, config, [source_name for source_name, _ in sources_to_process]
+            )
+            fetched: Dict[str, List[str]] = {}
+            
             # Processa ogni fonte
             for source_name, scrape_func in sources_to_process:
+                state = source_states[source_name]
+                if not force and not crawl_frequency_policy.is_due(state, now):
+                    sources_processed[source_name] = {
+                        'found': 0,
+                        'status': 'skipped',
+                        'next_fetch_at': state.next_fetch_at.isoformat()
+                    }
+                    continue
+                
                 try:
                     logger.info(f"Processando fonte: {source_name}")
                     bandi_fonte = await scrape_func(config.keywords, config)
                     all_bandi.extend(bandi_fonte)
                     
+                    fetched[source_name] = []
+                    for bando_data in bandi_fonte:
+                        hash_id = self.generate_hash(bando_data['title'], bando_data['ente'], bando_data['link'])
+                        fetched[source_name].append(hash_id)
+                        source_of.setdefault(hash_id, source_name)
+                    
                     sources_processed[source_name] = {
                         'found': len(bandi_fonte),
                         'processed_at': datetime.now().isoformat(),
@@ -1048,6 +1086,7 @@ class BandoMonitorService:
                         
                 except Exception as e:
                     errors += 1
+                    crawl_frequency_policy.record_failure(state, now)
                     sources_processed[source_name] = {
                         'found': 0,
                         'error': str(e),
@@ -1055,24 +1094,45 @@ class BandoMonitorService:
                     }
                     logger.error(f"Errore processando {source_name}: {e}")
             
-            # Salva i bandi nel database
+            # Salva i bandi nel database: un SAVEPOINT per bando, un errore non invalida la sessione
             for bando_data in all_bandi:
                 try:
-                    # Controllo duplicati con hash
-                    hash_id = self.generate_hash(
-                        bando_data['title'], 
-                        bando_data['ente'], 
-                        bando_data['link']
-                    )
-                    
-                    existing = await bando_crud.get_bando_by_hash(db, hash_id)
-                    if not existing:
+                    async with db.begin_nested():
+                        # Controllo duplicati con hash
+                        hash_id = self.generate_hash(
+                            bando_data['title'], 
+                            bando_data['ente'], 
+                            bando_data['link']
+                        )
+                    
+                        existing = await bando_crud.get_bando_by_hash(db, hash_id)
+                        if existing or await near_duplicate_detector.is_known_duplicate(db, hash_id):
+                            continue
+                    
+                        # Stesso bando pubblicato da un'altra fonte: collega al canonico
+                        match = await near_duplicate_detector.find_canonical(db, bando_data['title'], staged=staged)
+                        if match:
+                            db.add(BandoDuplicate(
+                                canonical_id=match['canonical_id'],
+                                title=bando_data['title'],
+                                ente=bando_data['ente'],
+                                link=bando_data['link'],
+                                fonte=bando_data['fonte'],
+                                hash_identifier=hash_id,
+                                hamming_distance=match['hamming_distance'],
+                                similarity=match['similarity']
+                            ))
+                            duplicates += 1
+                            continue
+                    
                         # Parsing data scadenza
                         scadenza_parsed = None
                         if bando_data.get('scadenza_raw'):
                             scadenza_parsed = self.parse_date(bando_data['scadenza_raw'])
-                        
+                    
                         # Crea nuovo bando
+                        fingerprint = simhash(bando_data['title'])
+                        importo_min, importo_max = parse_importo(bando_data.get('importo'))
                         new_bando = Bando(
                             title=bando_data['title'],
                             ente=bando_data['ente'],
@@ -1082,28 +1142,66 @@ class BandoMonitorService:
                             descrizione=bando_data.get('descrizione'),
                             fonte=bando_data['fonte'],
                             hash_identifier=hash_id,
+                            simhash=to_signed64(fingerprint),
                             keyword_match=bando_data.get('keyword_match'),
+                            importo=bando_data.get('importo'),
+                            importo_min=importo_min,
+                            importo_max=importo_max,
                             status=BandoStatus.ATTIVO
                         )
-                        
+                    
                         db.add(new_bando)
+                        await db.flush()
+                        staged.add(new_bando.id, fingerprint, new_bando.title)
+                        staged_bandi.append(new_bando)
+                        created_events.append(bando_event(BANDO_CREATED, new_bando))
+                        new_by_source[source_of.get(hash_id)] += 1
                         new_bandi += 1
                         
+                except IntegrityError:
+                    # Già inserito da un'esecuzione concorrente (hash univoco): savepoint annullato
+                    logger.info(f"Bando già salvato da un'altra esecuzione: {bando_data.get('title')}")
                 except Exception as e:
                     errors += 1
                     logger.error(f"Errore salvando bando: {e}")
             
+            for source_name, item_hashes in fetched.items():
+                state = source_states[source_name]
+                crawl_frequency_policy.record_fetch(state, item_hashes, new_by_source[source_name], now)
+                sources_processed[source_name]['new'] = new_by_source[source_name]
+                sources_processed[source_name]['poll_interval_hours'] = state.poll_interval_hours
+            
+            # Rollup giornaliero e parole chiave aggiornati nella stessa transazione dei nuovi bandi
+            if created_events:
+                created_ids = [event['bando']['id'] for event in created_events]
+                await rollup_crud.refresh_bandi(db, created_ids)
+                await rollup_crud.update_keywords(db, created_ids)
+            
             await db.commit()
             
-            # Aggiorna config con timestamp
+            # Indici in memoria aggiornati solo con bandi committati: nessun id fantasma dopo un rollback
+            # (l'indice suggerimenti di ogni worker si aggiorna dagli eventi BANDO_CREATED)
+            for new_bando in staged_bandi:
+                near_duplicate_detector.add(new_bando.id, staged.fingerprints[new_bando.id], new_bando.title)
+            
+            # Push ai client SSE e pipeline embedding/alert solo dopo il commit: i bandi sono già leggibili
+            if created_events:
+                await event_broker.publish(created_events)
+                ingest_pipeline.publish_inserted([event['bando']['id'] for event in created_events])
+            
+            if duplicates:
+                logger.info(f"🔗 {duplicates} bandi near-duplicate collegati al bando canonico")
+            
+            # Aggiorna config con timestamp: la prossima esecuzione è quando torna dovuta la prima fonte
             config.last_run = datetime.now()
-            config.next_run = datetime.now() + timedelta(hours=config.schedule_interval_hours)
+            config.next_run = crawl_frequency_policy.next_run(source_states.values(), now)
             await db.commit()
             
             return {
                 'status': 'completed',
                 'bandi_found': len(all_bandi),
                 'bandi_new': new_bandi,
+                'bandi_duplicates': duplicates,
                 'errors_count': errors,
                 'sources_processed': sources_processed
             }
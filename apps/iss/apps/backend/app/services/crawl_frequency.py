@@ -0,0 +1,118 @@
+"""
+Frequenza di crawling adattiva per fonte
+Ogni fonte di una configurazione ha un proprio intervallo di polling appreso dai
+fetch precedenti: una novità (bandi nuovi o elenco cambiato) lo riduce in modo
+moltiplicativo, un fetch senza novità lo allunga di un passo fisso, sempre entro
+i limiti configurati. Le fonti non ancora dovute vengono saltate
+"""
+
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud.bando_config import bando_config_crud
+from app.models.bando_config import BandoConfig, BandoSourceState
+
+logger = logging.getLogger(__name__)
+
+# Peso del fetch più recente nella media mobile del tasso di novità
+CHANGE_RATE_ALPHA = 0.3
+
+
+def content_fingerprint(item_hashes: Iterable[str]) -> str:
+    """Hash dell'elenco pubblicato da una fonte, indipendente dall'ordine"""
+    return hashlib.sha256("\n".join(sorted(set(item_hashes))).encode()).hexdigest()
+
+
+def as_utc(moment: datetime) -> datetime:
+    """Istante con timezone; quelli senza (es. riletti da SQLite) sono in UTC"""
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+class CrawlFrequencyPolicy:
+    """Decide quali fonti interrogare e aggiorna il loro intervallo dopo ogni fetch"""
+
+    def __init__(
+        self,
+        min_hours: Optional[float] = None,
+        max_hours: Optional[float] = None,
+        increase_hours: Optional[float] = None,
+        decrease_factor: Optional[float] = None
+    ):
+        self.min_hours = min_hours or settings.source_poll_min_hours
+        self.max_hours = max(self.min_hours, max_hours or settings.source_poll_max_hours)
+        self.increase_hours = increase_hours or settings.source_poll_increase_hours
+        self.decrease_factor = decrease_factor or settings.source_poll_decrease_factor
+
+    def clamp(self, hours: float) -> float:
+        return min(self.max_hours, max(self.min_hours, hours))
+
+    def next_interval(self, current: float, changed: bool) -> float:
+        """Riduzione moltiplicativa se la fonte è cambiata, aumento additivo altrimenti"""
+        if changed:
+            return self.clamp(current * self.decrease_factor)
+        return self.clamp(current + self.increase_hours)
+
+    async def load_states(self, db: AsyncSession, config: BandoConfig, sources: Iterable[str]) -> Dict[str, BandoSourceState]:
+        """Stato delle fonti, creando quello delle fonti mai interrogate (subito dovute)"""
+        states = await bando_config_crud.get_source_states(db, config.id)
+        for source in sources:
+            if source not in states:
+                states[source] = BandoSourceState(
+                    config_id=config.id,
+                    source=source,
+                    poll_interval_hours=self.clamp(config.schedule_interval_hours or 24),
+                    change_rate=0.0,
+                    fetches=0,
+                    changes=0
+                )
+                db.add(states[source])
+        return states
+
+    def now(self) -> datetime:
+        """Istante corrente con timezone, come le colonne di stato e config.next_run"""
+        return datetime.now(timezone.utc)
+
+    def is_due(self, state: BandoSourceState, now: datetime) -> bool:
+        return state.next_fetch_at is None or as_utc(state.next_fetch_at) <= now
+
+    def record_fetch(self, state: BandoSourceState, item_hashes: Iterable[str], new_items: int, now: datetime) -> bool:
+        """Registra un fetch riuscito e ricalcola l'intervallo; restituisce True se c'erano novità"""
+        item_hashes = list(item_hashes)
+        fingerprint = content_fingerprint(item_hashes)
+        # Un elenco vuoto è più spesso un errore del portale che una novità; al primo fetch
+        # l'hash fa solo da riferimento
+        hash_changed = bool(item_hashes) and state.content_hash is not None and fingerprint != state.content_hash
+        changed = new_items > 0 or hash_changed
+
+        if item_hashes:
+            state.content_hash = fingerprint
+        state.change_rate = (1 - CHANGE_RATE_ALPHA) * (state.change_rate or 0.0) + CHANGE_RATE_ALPHA * float(changed)
+        state.fetches = (state.fetches or 0) + 1
+        if changed:
+            state.changes = (state.changes or 0) + 1
+            state.last_changed_at = now
+        state.poll_interval_hours = self.next_interval(state.poll_interval_hours, changed)
+        state.last_fetched_at = now
+        state.next_fetch_at = now + timedelta(hours=state.poll_interval_hours)
+        return changed
+
+    def record_failure(self, state: BandoSourceState, now: datetime):
+        """Fetch fallito: nessuna informazione sul tasso di novità, si riprova all'intervallo corrente"""
+        state.next_fetch_at = now + timedelta(hours=state.poll_interval_hours)
+
+    def next_run(self, states: Iterable[BandoSourceState], now: datetime) -> datetime:
+        """Prossima esecuzione della configurazione: la prima fonte che torna dovuta"""
+        earliest = min(
+            (as_utc(state.next_fetch_at) for state in states if state.next_fetch_at is not None),
+            default=now + timedelta(hours=self.max_hours)
+        )
+        return max(earliest, now + timedelta(hours=self.min_hours))
+
+
+# Istanza singleton del servizio
+crawl_frequency_policy = CrawlFrequencyPolicy()
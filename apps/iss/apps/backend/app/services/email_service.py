@@ -3,8 +3,6 @@ EmailService - Servizio Email Avanzato ISS
 Gestione completa invio email, template, newsletter e notifiche
 """
 
-import smtplib
-import ssl
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
@@ -19,6 +17,7 @@ import logging
 from app.core.config import settings
 from app.models.user import User
 from app.models.newspost import NewsNewsletter
+from app.services.mail_transport import MailTransport, mail_transport
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
@@ -27,13 +26,10 @@ logger = logging.getLogger(__name__)
 class EmailService:
     """Servizio completo per gestione email ISS"""
     
-    def __init__(self):
-        self.smtp_server = settings.SMTP_HOST
-        self.smtp_port = settings.SMTP_PORT
-        self.smtp_user = settings.SMTP_USER
-        self.smtp_password = settings.SMTP_PASSWORD
-        self.from_email = settings.EMAILS_FROM_EMAIL
-        self.from_name = settings.EMAILS_FROM_NAME
+    def __init__(self, transport: Optional[MailTransport] = None):
+        self.transport = transport or mail_transport
+        self.from_email = settings.mail_from
+        self.from_name = settings.project_name
         
         # Setup template engine
         template_dir = Path(__file__).parent.parent / "templates" / "email"
@@ -42,7 +38,7 @@ class EmailService:
             autoescape=jinja2.select_autoescape(['html', 'xml'])
         )
     
-    def send_email(
+    async def send_email(
         self,
         to: str,
         subject: str,
@@ -53,7 +49,7 @@ class EmailService:
         bcc: Optional[List[str]] = None
     ) -> bool:
         """
-        Invia email singola
+        Invia email singola tramite il pool di connessioni SMTP
         """
         try:
             msg = MIMEMultipart('alternative')
@@ -86,11 +82,7 @@ class EmailService:
                 recipients.extend(bcc)
             
             # Invia email
-            context = ssl.create_default_context()
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls(context=context)
-                server.login(self.smtp_user, self.smtp_password)
-                server.sendmail(self.from_email, recipients, msg.as_string())
+            await self.transport.send_message(msg, sender=self.from_email, recipients=recipients)
             
             logger.info(f"Email inviata con successo a {to}")
             return True
@@ -99,7 +91,7 @@ class EmailService:
             logger.error(f"Errore invio email a {to}: {str(e)}")
             return False
     
-    def send_template_email(
+    async def send_template_email(
         self,
         to: str,
         template_name: str,
@@ -131,7 +123,7 @@ class EmailService:
                 except jinja2.TemplateNotFound:
                     subject = f"Notifica da {self.from_name}"
             
-            return self.send_email(
+            return await self.send_email(
                 to=to,
                 subject=subject,
                 html_content=html_content,
@@ -143,7 +135,7 @@ class EmailService:
             logger.error(f"Errore invio template email {template_name} a {to}: {str(e)}")
             return False
     
-    def send_bulk_email(
+    async def send_bulk_email(
         self,
         recipients: List[str],
         subject: str,
@@ -161,19 +153,19 @@ class EmailService:
             batch = recipients[i:i + batch_size]
             
             for email in batch:
-                if self.send_email(email, subject, html_content, text_content):
+                if await self.send_email(email, subject, html_content, text_content):
                     results["success"] += 1
                 else:
                     results["failed"] += 1
             
             # Pausa tra batch per evitare rate limiting
             if i + batch_size < len(recipients):
-                asyncio.sleep(delay_seconds)
+                await asyncio.sleep(delay_seconds)
         
         logger.info(f"Bulk email completato: {results['success']} successi, {results['failed']} fallimenti")
         return results
     
-    def send_newsletter(
+    async def send_newsletter(
         self,
         newsletter_id: int,
         db: Session,
@@ -204,7 +196,7 @@ class EmailService:
                 recipients = [r[0] for r in recipients]
             
             # Invia newsletter
-            results = self.send_bulk_email(
+            results = await self.send_bulk_email(
                 recipients=recipients,
                 subject=newsletter.titolo,
                 html_content=newsletter.template_html,
@@ -235,65 +227,65 @@ class EmailService:
                 db.commit()
             raise
     
-    def send_welcome_email(self, user: User) -> bool:
+    async def send_welcome_email(self, user: User) -> bool:
         """
         Email di benvenuto per nuovi utenti
         """
         context = {
             "user_name": user.nome,
             "user_email": user.email,
-            "login_url": f"{settings.FRONTEND_URL}/auth/login",
-            "dashboard_url": f"{settings.FRONTEND_URL}/dashboard",
-            "support_email": settings.EMAILS_FROM_EMAIL
+            "login_url": f"{settings.frontend_url}/auth/login",
+            "dashboard_url": f"{settings.frontend_url}/dashboard",
+            "support_email": settings.mail_from
         }
         
-        return self.send_template_email(
+        return await self.send_template_email(
             to=user.email,
             template_name="welcome",
             context=context,
-            subject=f"Benvenuto in {settings.PROJECT_NAME}!"
+            subject=f"Benvenuto in {settings.project_name}!"
         )
     
-    def send_password_reset_email(self, user: User, reset_token: str) -> bool:
+    async def send_password_reset_email(self, user: User, reset_token: str) -> bool:
         """
         Email per reset password
         """
-        reset_url = f"{settings.FRONTEND_URL}/auth/reset-password?token={reset_token}"
+        reset_url = f"{settings.frontend_url}/auth/reset-password?token={reset_token}"
         
         context = {
             "user_name": user.nome,
             "reset_url": reset_url,
             "expiry_hours": 24,
-            "support_email": settings.EMAILS_FROM_EMAIL
+            "support_email": settings.mail_from
         }
         
-        return self.send_template_email(
+        return await self.send_template_email(
             to=user.email,
             template_name="password_reset",
             context=context,
             subject="Reset della password"
         )
     
-    def send_email_verification(self, user: User, verification_token: str) -> bool:
+    async def send_email_verification(self, user: User, verification_token: str) -> bool:
         """
         Email per verifica indirizzo email
         """
-        verification_url = f"{settings.FRONTEND_URL}/auth/verify-email?token={verification_token}"
+        verification_url = f"{settings.frontend_url}/auth/verify-email?token={verification_token}"
         
         context = {
             "user_name": user.nome,
             "verification_url": verification_url,
-            "support_email": settings.EMAILS_FROM_EMAIL
+            "support_email": settings.mail_from
         }
         
-        return self.send_template_email(
+        return await self.send_template_email(
             to=user.email,
             template_name="email_verification",
             context=context,
             subject="Verifica il tuo indirizzo email"
         )
     
-    def send_course_enrollment_confirmation(self, user: User, course_title: str, course_date: datetime) -> bool:
+    async def send_course_enrollment_confirmation(self, user: User, course_title: str, course_date: datetime) -> bool:
         """
         Conferma iscrizione corso
         """
@@ -301,17 +293,17 @@ class EmailService:
             "user_name": user.nome,
             "course_title": course_title,
             "course_date": course_date.strftime("%d/%m/%Y alle %H:%M"),
-            "dashboard_url": f"{settings.FRONTEND_URL}/dashboard/corsi"
+            "dashboard_url": f"{settings.frontend_url}/dashboard/corsi"
         }
         
-        return self.send_template_email(
+        return await self.send_template_email(
             to=user.email,
             template_name="course_enrollment",
             context=context,
             subject=f"Iscrizione confermata: {course_title}"
         )
     
-    def send_event_reminder(self, user: User, event_title: str, event_date: datetime, hours_before: int = 24) -> bool:
+    async def send_event_reminder(self, user: User, event_title: str, event_date: datetime, hours_before: int = 24) -> bool:
         """
         Promemoria evento
         """
@@ -320,17 +312,17 @@ class EmailService:
             "event_title": event_title,
             "event_date": event_date.strftime("%d/%m/%Y alle %H:%M"),
             "hours_before": hours_before,
-            "dashboard_url": f"{settings.FRONTEND_URL}/dashboard/eventi"
+            "dashboard_url": f"{settings.frontend_url}/dashboard/eventi"
         }
         
-        return self.send_template_email(
+        return await self.send_template_email(
             to=user.email,
             template_name="event_reminder",
             context=context,
             subject=f"Promemoria: {event_title}"
         )
     
-    def send_volunteer_application_notification(
+    async def send_volunteer_application_notification(
         self, 
         manager_email: str, 
         manager_name: str,
@@ -346,17 +338,17 @@ class EmailService:
             "applicant_name": applicant_name,
             "opportunity_title": opportunity_title,
             "application_url": application_url,
-            "dashboard_url": f"{settings.FRONTEND_URL}/dashboard/volontariato"
+            "dashboard_url": f"{settings.frontend_url}/dashboard/volontariato"
         }
         
-        return self.send_template_email(
+        return await self.send_template_email(
             to=manager_email,
             template_name="volunteer_application",
             context=context,
             subject=f"Nuova candidatura: {opportunity_title}"
         )
     
-    def send_project_update_notification(
+    async def send_project_update_notification(
         self,
         team_emails: List[str],
         project_name: str,
@@ -378,13 +370,13 @@ class EmailService:
         html_template = self.jinja_env.get_template("project_update.html")
         html_content = html_template.render(**context)
         
-        return self.send_bulk_email(
+        return await self.send_bulk_email(
             recipients=team_emails,
             subject=f"Aggiornamento progetto: {project_name}",
             html_content=html_content
         )
     
-    def send_testimonial_request(
+    async def send_testimonial_request(
         self,
         user_email: str,
         user_name: str,
@@ -395,17 +387,17 @@ class EmailService:
         """
         Richiesta testimonial
         """
-        response_url = f"{settings.FRONTEND_URL}/testimonials/create?token={response_token}"
+        response_url = f"{settings.frontend_url}/testimonials/create?token={response_token}"
         
         context = {
             "user_name": user_name,
             "context_type": context_type,
             "context_name": context_name,
             "response_url": response_url,
-            "support_email": settings.EMAILS_FROM_EMAIL
+            "support_email": settings.mail_from
         }
         
-        return self.send_template_email(
+        return await self.send_template_email(
             to=user_email,
             template_name="testimonial_request",
             context=context,
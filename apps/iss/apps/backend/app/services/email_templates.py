@@ -0,0 +1,424 @@
+"""
+Registro dei template email per alert, reminder e newsletter
+I template vengono compilati una sola volta all'avvio; le card dei bandi e le
+sezioni comuni della newsletter sono cache per (bando_id, versione), così ogni
+email per utente renderizza solo le parti personalizzate
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from jinja2 import DictLoader, Environment
+
+logger = logging.getLogger(__name__)
+
+BANDO_CARD = """\
+<div class="bando">
+    <div class="bando-title">{{ bando.title }}</div>
+    <div class="bando-info">🏛️ <strong>Ente:</strong> {{ bando.ente }}</div>
+    {% if bando.importo %}
+    <div class="bando-info">💰 <strong>Importo:</strong> {{ bando.importo }}</div>
+    {% endif %}
+    {% if bando.scadenza %}
+    <div class="bando-info">📅 <strong>Scadenza:</strong> {{ bando.scadenza.strftime('%d/%m/%Y') }}</div>
+    {% endif %}
+    {% if bando.descrizione %}
+    <div class="bando-info">📝 {{ bando.descrizione[:200] }}{% if bando.descrizione|length > 200 %}...{% endif %}</div>
+    {% endif %}
+</div>
+"""
+
+NEW_BANDI_ALERT = """\
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .header { background: #1e40af; color: white; padding: 20px; text-align: center; }
+        .content { padding: 20px; }
+        .bando { border: 1px solid #e5e7eb; margin: 15px 0; padding: 15px; border-radius: 8px; }
+        .bando-title { color: #1e40af; font-weight: bold; margin-bottom: 8px; }
+        .bando-info { color: #6b7280; font-size: 14px; margin: 5px 0; }
+        .cta-button { background: #1e40af; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block; margin: 20px 0; }
+        .footer { background: #f9fafb; padding: 15px; text-align: center; color: #6b7280; font-size: 12px; }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>🏛️ ISS - Innovazione Sociale Salernitana</h1>
+        <h2>Nuovi Bandi per {{ organization_name }}</h2>
+    </div>
+
+    <div class="content">
+        <p>Ciao <strong>{{ organization_name }}</strong>,</p>
+        <p>Abbiamo trovato <strong>{{ bandi_count }} nuovi bandi</strong> che potrebbero interessarti:</p>
+
+        {% for card in cards %}{{ card }}{% endfor %}
+
+        <a href="https://innovazionesocialesalernitana.it/bandi" class="cta-button">
+            🔍 Visualizza Tutti i Bandi
+        </a>
+
+        <p>Il nostro sistema AI ha selezionato questi bandi basandosi sul tuo profilo organizzativo. 
+           Accedi alla piattaforma per vedere le raccomandazioni personalizzate!</p>
+    </div>
+
+    <div class="footer">
+        <p>Questa email è stata inviata automaticamente dal sistema ISS</p>
+        <p>ISS - Innovazione Sociale Salernitana | Primo Hub Bandi AI-Powered d'Italia</p>
+        <p><a href="https://innovazionesocialesalernitana.it">innovazionesocialesalernitana.it</a></p>
+    </div>
+</body>
+</html>
+"""
+
+DEADLINE_BANDO_DETAILS = """\
+<div class="bando-details">
+    <h3>{{ bando.title }}</h3>
+    <p><strong>🏛️ Ente:</strong> {{ bando.ente }}</p>
+    {% if bando.importo %}
+    <p><strong>💰 Importo:</strong> {{ bando.importo }}</p>
+    {% endif %}
+    <p><strong>📅 Scadenza:</strong> {{ bando.scadenza.strftime('%d/%m/%Y alle %H:%M') if bando.scadenza else 'Da definire' }}</p>
+    {% if bando.descrizione %}
+    <p><strong>📝 Descrizione:</strong> {{ bando.descrizione[:300] }}{% if bando.descrizione|length > 300 %}...{% endif %}</p>
+    {% endif %}
+</div>
+"""
+
+DEADLINE_REMINDER = """\
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .header { background: {% if days_left <= 3 %}#dc2626{% elif days_left <= 7 %}#ea580c{% else %}#1e40af{% endif %}; color: white; padding: 20px; text-align: center; }
+        .content { padding: 20px; }
+        .deadline-box { background: {% if days_left <= 3 %}#fee2e2{% elif days_left <= 7 %}#fed7aa{% else %}#dbeafe{% endif %}; border: 2px solid {% if days_left <= 3 %}#dc2626{% elif days_left <= 7 %}#ea580c{% else %}#1e40af{% endif %}; padding: 20px; border-radius: 8px; text-align: center; margin: 20px 0; }
+        .days-left { font-size: 2em; font-weight: bold; color: {% if days_left <= 3 %}#dc2626{% elif days_left <= 7 %}#ea580c{% else %}#1e40af{% endif %}; }
+        .bando-details { background: #f9fafb; padding: 15px; border-radius: 8px; margin: 15px 0; }
+        .cta-button { background: {% if days_left <= 3 %}#dc2626{% elif days_left <= 7 %}#ea580c{% else %}#1e40af{% endif %}; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block; margin: 20px 0; }
+        .footer { background: #f9fafb; padding: 15px; text-align: center; color: #6b7280; font-size: 12px; }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>⏰ Scadenza Bando Imminente</h1>
+        <h2>{{ organization_name }}</h2>
+    </div>
+
+    <div class="content">
+        <div class="deadline-box">
+            <div class="days-left">{{ days_left }}</div>
+            <div>giorni rimasti per candidarti</div>
+        </div>
+
+        {{ bando_details }}
+
+        <a href="{{ bando.link }}" class="cta-button">
+            🔗 Vai al Bando Originale
+        </a>
+
+        <p>{% if days_left <= 3 %}
+            <strong>⚠️ ATTENZIONE:</strong> Restano solo {{ days_left }} giorni! Non perdere questa opportunità.
+        {% elif days_left <= 7 %}
+            <strong>📋 PROMEMORIA:</strong> Il tempo stringe, organizza la documentazione necessaria.
+        {% else %}
+            <strong>📅 PIANIFICA:</strong> Hai ancora {{ days_left }} giorni per preparare la candidatura.
+        {% endif %}</p>
+
+        <p>Questo bando è nella tua watchlist perché compatibile con il profilo di <strong>{{ organization_name }}</strong>.</p>
+    </div>
+
+    <div class="footer">
+        <p>Reminder automatico dal sistema ISS</p>
+        <p>ISS - Innovazione Sociale Salernitana</p>
+    </div>
+</body>
+</html>
+"""
+
+DEADLINE_DIGEST = """\
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .header { background: {% if min_days <= 3 %}#dc2626{% elif min_days <= 7 %}#ea580c{% else %}#1e40af{% endif %}; color: white; padding: 20px; text-align: center; }
+        .content { padding: 20px; }
+        .reminder { border-left: 4px solid #1e40af; padding-left: 15px; margin: 25px 0; }
+        .reminder.urgent { border-left-color: #dc2626; }
+        .reminder.soon { border-left-color: #ea580c; }
+        .days-left { font-size: 1.3em; font-weight: bold; }
+        .bando-details { background: #f9fafb; padding: 15px; border-radius: 8px; margin: 15px 0; }
+        .cta-button { background: #1e40af; color: white; padding: 10px 20px; text-decoration: none; border-radius: 6px; display: inline-block; }
+        .footer { background: #f9fafb; padding: 15px; text-align: center; color: #6b7280; font-size: 12px; }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>⏰ {{ reminders|length }} {{ 'bando in scadenza' if reminders|length == 1 else 'bandi in scadenza' }}</h1>
+        <h2>{{ organization_name }}</h2>
+    </div>
+
+    <div class="content">
+        {% for reminder in reminders %}
+        <div class="reminder {% if reminder.days_left <= 3 %}urgent{% elif reminder.days_left <= 7 %}soon{% endif %}">
+            <div class="days-left">{{ reminder.days_left }} {{ 'giorno rimasto' if reminder.days_left == 1 else 'giorni rimasti' }}</div>
+            {{ reminder.details }}
+            <a href="{{ reminder.link }}" class="cta-button">🔗 Vai al Bando Originale</a>
+        </div>
+        {% endfor %}
+
+        <p>Questi bandi sono nella watchlist di <strong>{{ organization_name }}</strong>.</p>
+    </div>
+
+    <div class="footer">
+        <p>Reminder automatico dal sistema ISS</p>
+        <p>ISS - Innovazione Sociale Salernitana</p>
+    </div>
+</body>
+</html>
+"""
+
+NEWSLETTER_SHARED_STATS = """\
+<div class="stat-card">
+    <div class="stat-value">{{ stats.nuovi_bandi }}</div>
+    <div class="stat-label">Nuovi Bandi</div>
+</div>
+<div class="stat-card">
+    <div class="stat-value">{{ stats.totali_attivi }}</div>
+    <div class="stat-label">Bandi Attivi</div>
+</div>
+<div class="stat-card">
+    <div class="stat-value">€{{ stats.importo_totale | default('N/A') }}</div>
+    <div class="stat-label">Importo Disponibile</div>
+</div>
+"""
+
+NEWSLETTER_BANDO_ITEM = """\
+<div style="margin: 10px 0; padding: 10px; border-left: 4px solid #1e40af;">
+    <strong>{{ bando.title }}</strong><br>
+    <small>{{ bando.ente }} • {{ bando.importo if bando.importo else 'Importo non specificato' }}</small>
+</div>
+"""
+
+WEEKLY_NEWSLETTER = """\
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .header { background: linear-gradient(135deg, #1e40af, #3b82f6); color: white; padding: 30px; text-align: center; }
+        .content { padding: 20px; }
+        .stats-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 15px; margin: 20px 0; }
+        .stat-card { background: #f8fafc; border: 1px solid #e2e8f0; padding: 15px; border-radius: 8px; text-align: center; }
+        .stat-value { font-size: 2em; font-weight: bold; color: #1e40af; }
+        .stat-label { color: #64748b; font-size: 14px; }
+        .section { margin: 30px 0; }
+        .bando-list { background: #f9fafb; padding: 15px; border-radius: 8px; }
+        .cta-button { background: #1e40af; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block; margin: 20px 0; }
+        .footer { background: #1f2937; color: white; padding: 20px; text-align: center; }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>📊 ISS Weekly Newsletter</h1>
+        <p>La tua dose settimanale di opportunità per {{ organization_name }}</p>
+    </div>
+
+    <div class="content">
+        <div class="section">
+            <h2>📈 Statistiche della Settimana</h2>
+            <div class="stats-grid">
+                {{ shared_stats }}
+                <div class="stat-card">
+                    <div class="stat-value">{{ stats.raccomandazioni_ai | default(0) }}</div>
+                    <div class="stat-label">Raccomandazioni AI</div>
+                </div>
+            </div>
+        </div>
+
+        <div class="section">
+            <h2>🎯 I Tuoi Bandi Raccomandati</h2>
+            {% if recommended %}
+            <div class="bando-list">
+                {% for item in recommended %}{{ item }}{% endfor %}
+            </div>
+            {% else %}
+            <p>🤖 Il nostro AI sta analizzando i nuovi bandi per generare raccomandazioni personalizzate.</p>
+            {% endif %}
+        </div>
+
+        <div class="section">
+            <h2>📅 Scadenze Imminenti</h2>
+            {% if stats.scadenze_imminenti %}
+            <div class="bando-list">
+                {% for scadenza in stats.scadenze_imminenti %}
+                <div style="margin: 10px 0; padding: 10px; border-left: 4px solid #dc2626;">
+                    <strong>{{ scadenza.bando.title }}</strong><br>
+                    <small>⏰ {{ scadenza.days_left }} giorni rimasti</small>
+                </div>
+                {% endfor %}
+            </div>
+            {% else %}
+            <p>✅ Nessuna scadenza imminente nella tua watchlist.</p>
+            {% endif %}
+        </div>
+
+        <div class="section">
+            <h2>💡 Suggerimento della Settimana</h2>
+            <div style="background: #fef3c7; border: 1px solid #f59e0b; padding: 15px; border-radius: 8px;">
+                <p><strong>🚀 Ottimizza il tuo profilo:</strong> Aggiungi più parole chiave specifiche al tuo profilo per ricevere raccomandazioni AI più precise!</p>
+            </div>
+        </div>
+
+        <a href="https://innovazionesocialesalernitana.it/dashboard" class="cta-button">
+            🏠 Vai alla Dashboard
+        </a>
+    </div>
+
+    <div class="footer">
+        <h3>🏛️ ISS - Innovazione Sociale Salernitana</h3>
+        <p>Il primo Hub Bandi AI-powered per il terzo settore</p>
+        <p><a href="https://innovazionesocialesalernitana.it" style="color: #60a5fa;">innovazionesocialesalernitana.it</a></p>
+        <p style="font-size: 12px; margin-top: 10px;">
+            Per disattivare queste email, <a href="#" style="color: #60a5fa;">clicca qui</a>
+        </p>
+    </div>
+</body>
+</html>
+"""
+
+TEMPLATES = {
+    "bando_card.html": BANDO_CARD,
+    "new_bandi_alert.html": NEW_BANDI_ALERT,
+    "deadline_bando_details.html": DEADLINE_BANDO_DETAILS,
+    "deadline_reminder.html": DEADLINE_REMINDER,
+    "deadline_digest.html": DEADLINE_DIGEST,
+    "newsletter_shared_stats.html": NEWSLETTER_SHARED_STATS,
+    "newsletter_bando_item.html": NEWSLETTER_BANDO_ITEM,
+    "weekly_newsletter.html": WEEKLY_NEWSLETTER,
+}
+
+
+class FragmentCache:
+    """Cache LRU dei frammenti HTML già renderizzati"""
+
+    def __init__(self, maxsize: int = 5000):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Hashable, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[str]:
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: str):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+def bando_version(bando: Any) -> Any:
+    """Versione del bando: cambia a ogni aggiornamento della riga"""
+    return getattr(bando, 'data_aggiornamento', None) or getattr(bando, 'data_trovato', None)
+
+
+class EmailTemplateRegistry:
+    """Template compilati una volta e frammenti riutilizzati tra le email"""
+
+    def __init__(self, fragment_cache_size: int = 5000):
+        # Autoescape disattivato come nei template originali
+        self.env = Environment(loader=DictLoader(TEMPLATES), autoescape=False)
+        self.templates = {name: self.env.get_template(name) for name in TEMPLATES}
+        self.fragments = FragmentCache(fragment_cache_size)
+
+    def _fragment(self, template_name: str, bando: Any, **context) -> str:
+        """Frammento per bando, cache per (template, bando_id, versione)"""
+        bando_id = getattr(bando, 'id', None)
+        if bando_id is None:
+            return self.templates[template_name].render(bando=bando, **context)
+
+        key = (template_name, bando_id, bando_version(bando))
+        html = self.fragments.get(key)
+        if html is None:
+            html = self.templates[template_name].render(bando=bando, **context)
+            self.fragments.put(key, html)
+        return html
+
+    def render_new_bandi_alert(self, organization_name: str, bandi: List[Any]) -> str:
+        """Alert nuovi bandi: solo intestazione e saluto sono personali"""
+        return self.templates["new_bandi_alert.html"].render(
+            organization_name=organization_name,
+            bandi_count=len(bandi),
+            cards=[self._fragment("bando_card.html", bando) for bando in bandi]
+        )
+
+    def render_deadline_reminder(self, organization_name: str, bando: Any, days_left: int) -> str:
+        """Reminder scadenza con i dettagli del bando in cache"""
+        return self.templates["deadline_reminder.html"].render(
+            organization_name=organization_name,
+            days_left=days_left,
+            bando=bando,
+            bando_details=self._fragment("deadline_bando_details.html", bando)
+        )
+
+    def render_deadline_digest(self, organization_name: str, reminders: List[Tuple[Any, int]]) -> str:
+        """Riepilogo scadenze per utente: (bando, giorni rimasti), il più urgente per primo"""
+        items = [
+            {
+                'days_left': days_left,
+                'link': bando.link,
+                'details': self._fragment("deadline_bando_details.html", bando)
+            }
+            for bando, days_left in sorted(reminders, key=lambda reminder: reminder[1])
+        ]
+        return self.templates["deadline_digest.html"].render(
+            organization_name=organization_name,
+            reminders=items,
+            min_days=items[0]['days_left'] if items else 0
+        )
+
+    def render_weekly_newsletter(self, organization_name: str, stats: Dict[str, Any]) -> str:
+        """Newsletter: statistiche comuni e bandi in cache, il resto personalizzato"""
+        shared_key = (
+            "newsletter_shared_stats.html",
+            stats.get('nuovi_bandi'), stats.get('totali_attivi'), stats.get('importo_totale')
+        )
+        shared_stats = self.fragments.get(shared_key)
+        if shared_stats is None:
+            shared_stats = self.templates["newsletter_shared_stats.html"].render(stats=stats)
+            self.fragments.put(shared_key, shared_stats)
+
+        return self.templates["weekly_newsletter.html"].render(
+            organization_name=organization_name,
+            stats=stats,
+            shared_stats=shared_stats,
+            recommended=[
+                self._fragment("newsletter_bando_item.html", bando)
+                for bando in stats.get('bandi_raccomandati') or []
+            ]
+        )
+
+
+# Istanza singleton del servizio
+email_templates = EmailTemplateRegistry()
@@ -0,0 +1,225 @@
+"""
+Broker degli eventi in tempo reale sui bandi
+Gli eventi (nuovi bandi, cambi di stato) vengono pubblicati su Redis pub/sub e
+ogni worker uvicorn li inoltra ai propri client SSE; senza Redis il broker
+resta in-process e serve solo i client del processo corrente
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BANDO_CREATED = "bando.created"
+BANDO_STATUS = "bando.status"
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def bando_event(event_type: str, bando) -> Dict[str, Any]:
+    """Evento serializzabile con i campi del bando utili ai client"""
+    fields = ('id', 'title', 'ente', 'fonte', 'status', 'categoria', 'importo',
+              'scadenza', 'link', 'keyword_match', 'descrizione')
+    return {
+        'type': event_type,
+        'bando': {field: _json_value(getattr(bando, field, None)) for field in fields},
+        'published_at': datetime.now().isoformat()
+    }
+
+
+def filter_terms(terms: Iterable[Any]) -> List[str]:
+    """Termini di filtro normalizzati (minuscoli, senza vuoti né duplicati)"""
+    return sorted({str(term).strip().lower() for term in terms if str(term).strip()})
+
+
+def matches_profile(event: Dict[str, Any], terms: Iterable[str]) -> bool:
+    """Vero se il bando dell'evento cita almeno un termine (nessun termine = tutti gli eventi)"""
+    terms = list(terms)
+    if not terms:
+        return True
+    bando = event.get('bando') or {}
+    text = " ".join(
+        str(bando.get(field) or "") for field in ('title', 'categoria', 'keyword_match', 'descrizione')
+    ).lower()
+    return any(term in text for term in terms)
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Serializza un evento nel formato text/event-stream"""
+    bando_id = (event.get('bando') or {}).get('id')
+    lines = [f"event: {event.get('type', 'message')}"]
+    if bando_id is not None:
+        lines.append(f"id: {bando_id}")
+    lines.append(f"data: {json.dumps(event, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    """Coda di un client SSE con i termini del profilo da rispettare"""
+
+    def __init__(self, terms: Iterable[str] = (), max_size: int = 100):
+        self.terms = list(terms)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_size))
+        self.dropped = 0
+
+    def offer(self, event: Dict[str, Any]) -> bool:
+        """Accoda l'evento se pertinente; con la coda piena scarta il più vecchio"""
+        if not matches_profile(event, self.terms):
+            return False
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+        return True
+
+
+class EventBroker:
+    """Pub/sub degli eventi sui bandi: Redis tra i worker, code in memoria verso i client"""
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        channel: Optional[str] = None,
+        queue_size: Optional[int] = None
+    ):
+        self.redis_url = redis_url or settings.redis_url
+        self.channel = channel or settings.event_stream_channel
+        self.queue_size = queue_size or settings.event_stream_queue_size
+        self._subscriptions: Set[Subscription] = set()
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._redis = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    @property
+    def distributed(self) -> bool:
+        return self._redis is not None
+
+    async def start(self):
+        """Collega il broker a Redis; se non raggiungibile resta in-process"""
+        if self._redis is not None:
+            return
+        try:
+            client = redis.from_url(self.redis_url, encoding="utf-8", decode_responses=True)
+            await client.ping()
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(self.channel)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis non disponibile per gli eventi bandi, broker in-process: {e}")
+            return
+
+        self._redis, self._pubsub = client, pubsub
+        self._listener = asyncio.create_task(self._listen())
+        logger.info(f"📡 Broker eventi bandi collegato a Redis (canale {self.channel})")
+
+    async def stop(self):
+        """Ferma il listener Redis e chiude la connessione"""
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub:
+            await self._pubsub.unsubscribe(self.channel)
+            await self._pubsub.close()
+            self._pubsub = None
+        if self._redis:
+            await self._redis.close()
+            self._redis = None
+
+    async def _listen(self):
+        """Inoltra ai client locali gli eventi pubblicati da qualsiasi worker"""
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message.get('type') == 'message':
+                        self.dispatch(json.loads(message['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Errore listener eventi bandi: {e}")
+                await asyncio.sleep(1)
+
+    def dispatch(self, event: Dict[str, Any]) -> int:
+        """Consegna l'evento ai listener e alle sottoscrizioni di questo processo"""
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"❌ Listener eventi bandi fallito su {event.get('type')}: {e}")
+        return sum(1 for subscription in list(self._subscriptions) if subscription.offer(event))
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """Registra una callback di processo (es. indici in memoria) chiamata per ogni evento"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    async def publish(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Pubblica gli eventi; un errore di pubblicazione non interrompe il chiamante"""
+        published = 0
+        for event in events:
+            try:
+                if self._redis is not None:
+                    await self._redis.publish(self.channel, json.dumps(event, ensure_ascii=False))
+                else:
+                    self.dispatch(event)
+                published += 1
+            except Exception as e:
+                logger.error(f"❌ Pubblicazione evento {event.get('type')} fallita: {e}")
+        return published
+
+    def subscribe(self, terms: Iterable[str] = ()) -> Subscription:
+        subscription = Subscription(terms, self.queue_size)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    async def stream(
+        self,
+        terms: Iterable[str] = (),
+        heartbeat: Optional[float] = None,
+        is_disconnected=None
+    ) -> AsyncIterator[str]:
+        """Flusso SSE per un client: eventi filtrati per profilo e commenti di keep-alive"""
+        heartbeat = heartbeat or settings.event_stream_heartbeat_seconds
+        subscription = self.subscribe(terms)
+        try:
+            yield f"retry: {int(heartbeat * 1000)}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+                    yield format_sse(event)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                if is_disconnected and await is_disconnected():
+                    break
+        finally:
+            self.unsubscribe(subscription)
+            if subscription.dropped:
+                logger.warning(f"⚠️ Client SSE lento: {subscription.dropped} eventi scartati")
+
+
+# Istanza singleton del servizio
+event_broker = EventBroker()
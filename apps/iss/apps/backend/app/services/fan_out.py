@@ -0,0 +1,50 @@
+"""
+Esecuzione concorrente e limitata di operazioni per utente
+Usato dai job di notifica: ogni elemento è isolato (un errore non ferma gli
+altri) e la concorrenza è limitata per non saturare il pool del database
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Iterable, List, NamedTuple, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class FanOutOutcome(NamedTuple):
+    """Esito dell'operazione su un elemento"""
+    item: Any
+    result: Any
+    error: Optional[BaseException]
+
+
+class FanOutExecutor:
+    """Applica un handler asincrono a ogni elemento con al massimo N esecuzioni in parallelo"""
+
+    def __init__(self, concurrency: Optional[int] = None):
+        self.concurrency = max(1, concurrency or settings.notification_fanout_concurrency)
+
+    async def run(
+        self,
+        items: Iterable[Any],
+        handler: Callable[[Any], Awaitable[Any]],
+        label: str = "fan-out"
+    ) -> List[FanOutOutcome]:
+        """Esegue l'handler su tutti gli elementi; gli esiti seguono l'ordine di input"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def guarded(item: Any) -> FanOutOutcome:
+            async with semaphore:
+                try:
+                    return FanOutOutcome(item, await handler(item), None)
+                except Exception as e:
+                    logger.error(f"❌ Errore {label} su {item!r}: {e}")
+                    return FanOutOutcome(item, None, e)
+
+        return list(await asyncio.gather(*[guarded(item) for item in items]))
+
+
+# Istanza singleton del servizio
+fan_out_executor = FanOutExecutor()
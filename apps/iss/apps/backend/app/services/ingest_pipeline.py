@@ -0,0 +1,161 @@
+"""
+Pipeline a eventi ingest → embedding → alert
+run_monitoring, dopo il commit, pubblica gli id dei bandi inseriti; ogni stage ha
+la propria coda, elabora a lotti solo quegli id e li passa allo stage successivo.
+Gli stage sono idempotenti (embedding già presenti saltati, registro degli alert)
+e il job orario degli alert resta come recupero per quanto la pipeline non copre
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.crud.bando import bando_crud
+from app.database.database import async_session_maker
+
+logger = logging.getLogger(__name__)
+
+# Id del bando e istante di ingresso nella pipeline (monotonic)
+PipelineItem = Tuple[int, float]
+
+
+class PipelineStage:
+    """Stage con coda propria, elaborazione a lotti e metriche di profondità e latenza"""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[List[int]], Awaitable[None]],
+        batch_size: int = 100,
+        forward_on_error: bool = False
+    ):
+        self.name = name
+        self.handler = handler
+        self.batch_size = max(1, batch_size)
+        self.forward_on_error = forward_on_error
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.next_stage: Optional["PipelineStage"] = None
+        self.processed = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_batch_ms = 0.0
+        self.total_batch_ms = 0.0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    def put(self, items: List[PipelineItem]):
+        for item in items:
+            self.queue.put_nowait(item)
+
+    async def _next_batch(self) -> List[PipelineItem]:
+        """Attende il primo elemento, poi raccoglie quelli già in coda fino al lotto massimo"""
+        batch = [await self.queue.get()]
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def run(self):
+        while True:
+            batch = await self._next_batch()
+            bando_ids = list(dict.fromkeys(bando_id for bando_id, _ in batch))
+            start = time.monotonic()
+            try:
+                await self.handler(bando_ids)
+                succeeded = True
+                self.processed += len(bando_ids)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                succeeded = False
+                self.failed += len(bando_ids)
+                logger.error(f"❌ Stage {self.name} fallito su {len(bando_ids)} bandi: {e}")
+
+            finished = time.monotonic()
+            self.batches += 1
+            self.last_batch_ms = (finished - start) * 1000
+            self.total_batch_ms += self.last_batch_ms
+            # Latenza dall'ingest alla fine di questo stage, per il bando più vecchio del lotto
+            self.last_lag_ms = (finished - min(entered for _, entered in batch)) * 1000
+            self.max_lag_ms = max(self.max_lag_ms, self.last_lag_ms)
+
+            # Inoltro prima di task_done: drain() non deve vedere code vuote a metà passaggio
+            if self.next_stage and (succeeded or self.forward_on_error):
+                self.next_stage.put(batch)
+            for _ in batch:
+                self.queue.task_done()
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            'queue_depth': self.queue.qsize(),
+            'processed': self.processed,
+            'failed': self.failed,
+            'batches': self.batches,
+            'last_batch_ms': round(self.last_batch_ms, 2),
+            'avg_batch_ms': round(self.total_batch_ms / self.batches, 2) if self.batches else 0.0,
+            'last_lag_ms': round(self.last_lag_ms, 2),
+            'max_lag_ms': round(self.max_lag_ms, 2),
+        }
+
+
+class IngestPipeline:
+    """Catena degli stage: embedding dei nuovi bandi, poi alert agli utenti"""
+
+    def __init__(self, session_maker=None, batch_size: Optional[int] = None):
+        self.session_maker = session_maker or async_session_maker
+        batch_size = batch_size or settings.ingest_pipeline_batch_size
+        # Senza embedding gli alert usano il matching per settori: si prosegue anche se lo stage fallisce
+        self.embed = PipelineStage("embed", self._embed, batch_size, forward_on_error=True)
+        self.alert = PipelineStage("alert", self._alert, batch_size)
+        self.embed.next_stage = self.alert
+        self.stages = [self.embed, self.alert]
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(stage.run()) for stage in self.stages]
+        logger.info("🚰 Pipeline ingest → embedding → alert avviata")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def publish_inserted(self, bando_ids: List[int]) -> bool:
+        """Immette nella pipeline i bandi appena salvati; False se la pipeline non è attiva"""
+        if not self._tasks or not bando_ids:
+            return False
+        entered = time.monotonic()
+        self.embed.put([(bando_id, entered) for bando_id in bando_ids])
+        return True
+
+    async def drain(self):
+        """Attende che tutte le code siano vuote e i lotti in corso conclusi"""
+        for stage in self.stages:
+            await stage.queue.join()
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        return {stage.name: stage.metrics() for stage in self.stages}
+
+    # Import locali: modelli e servizi AI vengono caricati solo quando la pipeline lavora
+    async def _embed(self, bando_ids: List[int]):
+        from app.services.semantic_search import semantic_search_service
+        async with self.session_maker() as db:
+            bandi = await bando_crud.get_bandi_by_ids(db, bando_ids)
+        await semantic_search_service.index_bandi(list(bandi.values()))
+
+    async def _alert(self, bando_ids: List[int]):
+        from app.services.alert_system import alert_system
+        async with self.session_maker() as db:
+            await alert_system.alert_new_bandi(db, bando_ids)
+
+
+# Istanza singleton del servizio
+ingest_pipeline = IngestPipeline()
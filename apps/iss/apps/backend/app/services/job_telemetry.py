@@ -0,0 +1,135 @@
+"""
+Telemetria dei job dello scheduler
+Listener APScheduler che misurano per ogni job il ritardo di avvio, la durata e
+l'esito (successo, errore, esecuzione persa, saltata per max_instances); i dati
+finiscono negli istogrammi Prometheus esposti su /metrics e in uno storico
+recente consultabile dagli amministratori
+"""
+
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from apscheduler.events import (
+    EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED
+)
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+JOB_EVENTS = EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES
+
+# Job da pochi secondi (controllo configurazioni) fino alla newsletter settimanale
+DURATION_BUCKETS = (0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 15, 60, 300)
+
+
+class JobTelemetry:
+    """Raccoglie le metriche dei job a partire dagli eventi dello scheduler"""
+
+    def __init__(self, history_size: Optional[int] = None, registry: CollectorRegistry = REGISTRY):
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=history_size or settings.scheduler_history_size)
+        self._started: Dict[Tuple[str, datetime], datetime] = {}
+        self._totals: Dict[str, Dict[str, int]] = {}
+
+        self.duration = Histogram(
+            'iss_scheduler_job_duration_seconds', "Durata delle esecuzioni dei job dello scheduler",
+            ['job_id', 'outcome'], buckets=DURATION_BUCKETS, registry=registry
+        )
+        self.start_lag = Histogram(
+            'iss_scheduler_job_start_lag_seconds', "Ritardo tra orario previsto e avvio effettivo dei job",
+            ['job_id'], buckets=LAG_BUCKETS, registry=registry
+        )
+        self.runs = Counter(
+            'iss_scheduler_job_runs_total', "Esecuzioni dei job per esito",
+            ['job_id', 'outcome'], registry=registry
+        )
+
+    def attach(self, scheduler):
+        """Registra il listener sullo scheduler"""
+        scheduler.add_listener(self.handle_event, JOB_EVENTS)
+
+    def handle_event(self, event):
+        """Listener APScheduler: non deve mai sollevare eccezioni verso lo scheduler"""
+        try:
+            now = datetime.now(timezone.utc)
+            if event.code == EVENT_JOB_SUBMITTED:
+                for run_time in event.scheduled_run_times:
+                    self._started[(event.job_id, run_time)] = now
+                    self.start_lag.labels(event.job_id).observe(max(0.0, (now - run_time).total_seconds()))
+            elif event.code == EVENT_JOB_MAX_INSTANCES:
+                # Esecuzione precedente ancora in corso: questa viene saltata
+                for run_time in event.scheduled_run_times:
+                    self._record(event.job_id, run_time, 'skipped', now)
+            elif event.code == EVENT_JOB_MISSED:
+                self._started.pop((event.job_id, event.scheduled_run_time), None)
+                self._record(event.job_id, event.scheduled_run_time, 'missed', now)
+            elif event.code in (EVENT_JOB_EXECUTED, EVENT_JOB_ERROR):
+                outcome = 'success' if event.code == EVENT_JOB_EXECUTED else 'error'
+                started = self._started.pop((event.job_id, event.scheduled_run_time), None)
+                error = repr(event.exception) if event.exception else None
+                self._record(event.job_id, event.scheduled_run_time, outcome, now, started, error)
+        except Exception as e:
+            logger.warning(f"⚠️ Telemetria job non registrata: {e}")
+
+    def _record(
+        self,
+        job_id: str,
+        run_time: datetime,
+        outcome: str,
+        finished: datetime,
+        started: Optional[datetime] = None,
+        error: Optional[str] = None
+    ):
+        self.runs.labels(job_id, outcome).inc()
+        totals = self._totals.setdefault(job_id, {})
+        totals[outcome] = totals.get(outcome, 0) + 1
+
+        entry = {
+            'job_id': job_id,
+            'outcome': outcome,
+            'scheduled_at': run_time.isoformat() if run_time else None,
+            'started_at': started.isoformat() if started else None,
+            'finished_at': finished.isoformat(),
+            'start_lag_seconds': round((started - run_time).total_seconds(), 3) if started and run_time else None,
+            'duration_seconds': None,
+            'error': error,
+        }
+        if started:
+            duration = (finished - started).total_seconds()
+            entry['duration_seconds'] = round(duration, 3)
+            self.duration.labels(job_id, outcome).observe(duration)
+        self.history.append(entry)
+
+        if outcome != 'success':
+            logger.warning(f"⚠️ Job {job_id}: esecuzione {outcome} (prevista {entry['scheduled_at']})")
+
+    @property
+    def running(self) -> List[Dict[str, Any]]:
+        return [
+            {'job_id': job_id, 'scheduled_at': run_time.isoformat(), 'started_at': started.isoformat()}
+            for (job_id, run_time), started in self._started.items()
+        ]
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Totali per esito e ultima durata di ogni job"""
+        summary = {job_id: {'runs': dict(totals)} for job_id, totals in self._totals.items()}
+        for entry in self.history:
+            job = summary.setdefault(entry['job_id'], {'runs': {}})
+            job['last_outcome'] = entry['outcome']
+            job['last_finished_at'] = entry['finished_at']
+            if entry['duration_seconds'] is not None:
+                job['last_duration_seconds'] = entry['duration_seconds']
+        return summary
+
+    def recent(self, limit: int = 50, job_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Ultime esecuzioni, dalla più recente"""
+        entries = [entry for entry in reversed(self.history) if job_id is None or entry['job_id'] == job_id]
+        return entries[:limit]
+
+
+# Istanza singleton del servizio
+job_telemetry = JobTelemetry()
@@ -0,0 +1,253 @@
+"""
+Elezione del leader tra i worker uvicorn
+Un solo processo alla volta detiene il lock (advisory lock Postgres, chiave Redis
+con lease o lock in-process per sviluppo e test) ed esegue i job programmati;
+gli altri ritentano a ogni intervallo e subentrano quando il lock si libera
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import redis.asyncio as redis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Callback = Callable[[], Awaitable[None]]
+
+
+def advisory_lock_id(key: str) -> int:
+    """Chiave bigint stabile per pg_advisory_lock derivata dal nome del lock"""
+    return int.from_bytes(hashlib.sha1(key.encode('utf-8')).digest()[:8], 'big', signed=True)
+
+
+class PostgresAdvisoryLock:
+    """Advisory lock di sessione: resta valido finché la connessione dedicata è aperta"""
+
+    def __init__(self, engine: AsyncEngine, key: str):
+        self.engine = engine
+        self.key = key
+        self.lock_id = advisory_lock_id(key)
+        self._conn: Optional[AsyncConnection] = None
+
+    async def acquire(self) -> bool:
+        conn = await self.engine.connect()
+        try:
+            acquired = (await conn.execute(
+                text("SELECT pg_try_advisory_lock(:lock_id)"), {'lock_id': self.lock_id}
+            )).scalar()
+            # Commit subito: una transazione lasciata aperta verrebbe chiusa da idle_in_transaction_session_timeout
+            await conn.commit()
+        except Exception:
+            await conn.close()
+            raise
+        if not acquired:
+            await conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    async def renew(self) -> bool:
+        # Se la connessione è caduta Postgres ha già rilasciato il lock
+        if self._conn is None:
+            return False
+        try:
+            await self._conn.execute(text("SELECT 1"))
+            await self._conn.commit()
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Connessione del lock leader persa: {e}")
+            await self._close()
+            return False
+
+    async def release(self):
+        if self._conn is None:
+            return
+        try:
+            await self._conn.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {'lock_id': self.lock_id})
+            await self._conn.commit()
+        finally:
+            await self._close()
+
+    async def _close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                await conn.close()
+            except Exception:
+                pass
+
+
+class RedisLeaseLock:
+    """Chiave Redis con TTL rinnovata dal leader; scade da sola se il processo muore"""
+
+    RENEW_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    )
+    RELEASE_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(self, client, key: str, lease_seconds: float):
+        self.client = client
+        self.key = key
+        self.lease_ms = int(lease_seconds * 1000)
+        self.token = uuid.uuid4().hex
+
+    async def acquire(self) -> bool:
+        return bool(await self.client.set(self.key, self.token, nx=True, px=self.lease_ms))
+
+    async def renew(self) -> bool:
+        return bool(await self.client.eval(self.RENEW_SCRIPT, 1, self.key, self.token, self.lease_ms))
+
+    async def release(self):
+        await self.client.eval(self.RELEASE_SCRIPT, 1, self.key, self.token)
+
+
+class LocalLeaseLock:
+    """Lock con lease in memoria, condiviso dalle istanze dello stesso processo"""
+
+    _holders: Dict[str, Tuple[str, float]] = {}
+
+    def __init__(self, key: str, lease_seconds: float):
+        self.key = key
+        self.lease_seconds = lease_seconds
+        self.token = uuid.uuid4().hex
+
+    def _holder(self) -> Optional[str]:
+        holder = self._holders.get(self.key)
+        if holder and holder[1] > time.monotonic():
+            return holder[0]
+        return None
+
+    async def acquire(self) -> bool:
+        if self._holder() not in (None, self.token):
+            return False
+        self._holders[self.key] = (self.token, time.monotonic() + self.lease_seconds)
+        return True
+
+    async def renew(self) -> bool:
+        if self._holder() != self.token:
+            return False
+        self._holders[self.key] = (self.token, time.monotonic() + self.lease_seconds)
+        return True
+
+    async def release(self):
+        if self._holders.get(self.key, (None,))[0] == self.token:
+            del self._holders[self.key]
+
+
+class LeaderElector:
+    """Mantiene il ruolo di leader e notifica elezione e destituzione tramite callback"""
+
+    def __init__(self, lock=None, renew_interval: Optional[float] = None):
+        self.lock = lock
+        self.renew_interval = renew_interval or settings.leader_renew_interval_seconds
+        self.is_leader = False
+        self.elected_at: Optional[float] = None
+        self._on_elected: Optional[Callback] = None
+        self._on_demoted: Optional[Callback] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _build_lock(self):
+        """Sceglie il backend configurato; ripiega sul lock locale se non utilizzabile"""
+        backend = settings.leader_election_backend.lower()
+        key = settings.leader_lock_key
+        lease = settings.leader_lease_seconds
+
+        if backend == "postgres":
+            from app.database.database import engine
+            if engine.dialect.name == "postgresql":
+                return PostgresAdvisoryLock(engine, key)
+            logger.warning(f"⚠️ Advisory lock non disponibile su {engine.dialect.name}, lock leader locale")
+        elif backend == "redis":
+            try:
+                client = redis.from_url(settings.redis_url, encoding="utf-8", decode_responses=True)
+                await client.ping()
+                return RedisLeaseLock(client, key, lease)
+            except Exception as e:
+                logger.warning(f"⚠️ Redis non disponibile per l'elezione del leader, lock locale: {e}")
+        return LocalLeaseLock(key, lease)
+
+    async def start(self, on_elected: Optional[Callback] = None, on_demoted: Optional[Callback] = None):
+        """Avvia il ciclo di elezione in background"""
+        if self._task:
+            return
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        if self.lock is None:
+            self.lock = await self._build_lock()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🗳️ Elezione leader avviata ({type(self.lock).__name__})")
+
+    async def stop(self):
+        """Cede il ruolo di leader e ferma il ciclo"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            await self._demote("arresto del processo")
+        if self.lock is not None:
+            try:
+                await self.lock.release()
+            except Exception as e:
+                logger.warning(f"⚠️ Rilascio lock leader fallito: {e}")
+
+    async def _run(self):
+        while True:
+            await self.tick()
+            await asyncio.sleep(self.renew_interval)
+
+    async def tick(self):
+        """Un passo del ciclo: rinnova il lease da leader, altrimenti prova ad acquisirlo"""
+        try:
+            if self.is_leader:
+                if not await self.lock.renew():
+                    await self._demote("lease non rinnovato")
+            elif await self.lock.acquire():
+                await self._elect()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Errore elezione leader: {e}")
+            if self.is_leader:
+                await self._demote(str(e))
+
+    async def _elect(self):
+        self.is_leader = True
+        self.elected_at = time.time()
+        logger.info("👑 Processo eletto leader: avvio dei job programmati")
+        if self._on_elected:
+            try:
+                await self._on_elected()
+            except Exception as e:
+                logger.error(f"❌ Avvio come leader fallito, lock rilasciato: {e}")
+                self.is_leader = False
+                await self.lock.release()
+
+    async def _demote(self, reason: str):
+        self.is_leader = False
+        self.elected_at = None
+        logger.warning(f"⚠️ Ruolo di leader perso ({reason}): arresto dei job programmati")
+        if self._on_demoted:
+            try:
+                await self._on_demoted()
+            except Exception as e:
+                logger.error(f"❌ Errore arresto job dopo la perdita del ruolo di leader: {e}")
+
+
+# Istanza singleton del servizio
+leader_elector = LeaderElector()
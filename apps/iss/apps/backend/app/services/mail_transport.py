@@ -0,0 +1,224 @@
+"""
+Trasporto email asincrono con pool di connessioni SMTP persistenti
+Le connessioni autenticate vengono riutilizzate tra un messaggio e l'altro,
+ricreate in caso di errore e rinnovate dopo un numero massimo di invii
+"""
+
+import asyncio
+import logging
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.message import Message
+from typing import List, Optional, Sequence
+
+import aiosmtplib
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Errori dopo i quali la connessione non è più utilizzabile
+CONNECTION_ERRORS = (
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPTimeoutError,
+    ConnectionError,
+    asyncio.TimeoutError,
+    OSError,
+)
+
+
+class SendRateLimiter:
+    """Token bucket per rispettare il limite di invio del provider SMTP"""
+
+    def __init__(self, rate_per_second: float, burst: int = 1):
+        self.rate = rate_per_second
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self):
+        """Attende finché è disponibile un invio"""
+        if self.rate <= 0:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _PooledConnection:
+    __slots__ = ('client', 'sent', 'last_used')
+
+    def __init__(self, client: aiosmtplib.SMTP):
+        self.client = client
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class MailTransport:
+    """Pool di connessioni SMTP condiviso dai servizi email"""
+
+    def __init__(
+        self,
+        hostname: Optional[str] = None,
+        port: Optional[int] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: Optional[bool] = None,
+        start_tls: Optional[bool] = None,
+        pool_size: Optional[int] = None,
+        max_messages_per_connection: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        timeout: Optional[float] = None,
+        retries: int = 1,
+        rate_limiter: Optional[SendRateLimiter] = None,
+    ):
+        self.hostname = hostname or settings.mail_server
+        self.port = port or settings.mail_port
+        self.username = username if username is not None else settings.mail_username
+        self.password = password if password is not None else settings.mail_password
+        self.use_tls = settings.mail_ssl_tls if use_tls is None else use_tls
+        self.start_tls = settings.mail_starttls if start_tls is None else start_tls
+        self.pool_size = pool_size or settings.mail_pool_size
+        self.max_messages_per_connection = max_messages_per_connection or settings.mail_max_messages_per_connection
+        self.idle_timeout = idle_timeout or settings.mail_idle_timeout_seconds
+        self.timeout = timeout or settings.mail_timeout_seconds
+        self.retries = retries
+        self.rate_limiter = rate_limiter or SendRateLimiter(
+            settings.mail_rate_limit_per_second, settings.mail_rate_limit_burst
+        )
+
+        self._idle: List[_PooledConnection] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.stats = {'sent': 0, 'failed': 0, 'connections_opened': 0, 'reconnects': 0}
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Creato in modo lazy per legarlo all'event loop in esecuzione
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.pool_size)
+        return self._semaphore
+
+    async def _connect(self) -> _PooledConnection:
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username or None,
+            password=self.password or None,
+            use_tls=self.use_tls,
+            start_tls=False if self.use_tls else self.start_tls,
+            timeout=self.timeout,
+        )
+        await client.connect()
+        self.stats['connections_opened'] += 1
+        return _PooledConnection(client)
+
+    async def _discard(self, connection: _PooledConnection):
+        try:
+            if connection.client.is_connected:
+                await connection.client.quit()
+        except Exception:
+            connection.client.close()
+
+    async def _acquire(self) -> _PooledConnection:
+        await self.semaphore.acquire()
+        try:
+            now = time.monotonic()
+            while self._idle:
+                connection = self._idle.pop()
+                if connection.client.is_connected and now - connection.last_used < self.idle_timeout:
+                    return connection
+                await self._discard(connection)
+            return await self._connect()
+        except BaseException:
+            self.semaphore.release()
+            raise
+
+    async def _release(self, connection: _PooledConnection, reusable: bool):
+        try:
+            if reusable and connection.sent < self.max_messages_per_connection:
+                connection.last_used = time.monotonic()
+                self._idle.append(connection)
+            else:
+                await self._discard(connection)
+        finally:
+            self.semaphore.release()
+
+    async def send_message(self, message: Message, sender: Optional[str] = None,
+                           recipients: Optional[Sequence[str]] = None):
+        """Invia un messaggio già costruito; solleva eccezione se l'invio fallisce"""
+        await self.rate_limiter.acquire()
+
+        for attempt in range(self.retries + 1):
+            try:
+                connection = await self._acquire()
+            except Exception:
+                self.stats['failed'] += 1
+                raise
+
+            try:
+                await connection.client.send_message(message, sender=sender, recipients=recipients)
+            except CONNECTION_ERRORS as e:
+                await self._release(connection, reusable=False)
+                if attempt < self.retries:
+                    self.stats['reconnects'] += 1
+                    logger.warning(f"📧 Connessione SMTP persa, nuovo tentativo: {e}")
+                    continue
+                self.stats['failed'] += 1
+                raise
+            except Exception:
+                # Errore sul singolo messaggio (es. destinatario rifiutato): la connessione resta valida
+                await self._release(connection, reusable=True)
+                self.stats['failed'] += 1
+                raise
+
+            connection.sent += 1
+            await self._release(connection, reusable=True)
+            self.stats['sent'] += 1
+            return
+
+    async def send(
+        self,
+        to: str,
+        subject: str,
+        html_content: str,
+        text_content: Optional[str] = None,
+        from_email: Optional[str] = None,
+        cc: Optional[List[str]] = None,
+        bcc: Optional[List[str]] = None,
+    ):
+        """Costruisce e invia un messaggio HTML (con alternativa testuale)"""
+        message = MIMEMultipart("alternative")
+        message["Subject"] = subject
+        message["From"] = from_email or settings.mail_from
+        message["To"] = to
+        if cc:
+            message["Cc"] = ", ".join(cc)
+
+        if text_content:
+            message.attach(MIMEText(text_content, "plain", "utf-8"))
+        message.attach(MIMEText(html_content, "html", "utf-8"))
+
+        recipients = [to] + list(cc or []) + list(bcc or [])
+        await self.send_message(message, recipients=recipients)
+
+    async def close(self):
+        """Chiude tutte le connessioni inattive"""
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            await self._discard(connection)
+
+
+# Istanza singleton del servizio
+mail_transport = MailTransport()
@@ -0,0 +1,170 @@
+"""
+Rilevamento near-duplicate dei bandi in fase di ingestion
+Lo stesso bando viene spesso pubblicato da più fonti (Regione, CSV, granter.it)
+con titoli e link leggermente diversi: SimHash fa da primo filtro economico,
+la similarità degli embedding conferma il match
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.bando import Bando, BandoDuplicate, BandoStatus
+from app.utils.simhash import (
+    SIMHASH_BITS, simhash, hamming_distance, from_signed64, normalize_text
+)
+
+logger = logging.getLogger(__name__)
+
+# Bande LSH da 8 bit: due fingerprint entro distanza 7 condividono almeno una banda
+BAND_BITS = 8
+BAND_COUNT = SIMHASH_BITS // BAND_BITS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+
+class NearDuplicateDetector:
+    """Indice in memoria dei fingerprint SimHash per la ricerca dei bandi canonici"""
+
+    def __init__(self, refresh_interval: timedelta = timedelta(hours=1)):
+        self.fingerprints: Dict[int, int] = {}
+        self.titles: Dict[int, str] = {}
+        self.buckets: Dict[Tuple[int, int], Set[int]] = {}
+        self.refresh_interval = refresh_interval
+        self.last_load: Optional[datetime] = None
+
+    @staticmethod
+    def _bands(fingerprint: int) -> List[Tuple[int, int]]:
+        return [
+            (band, (fingerprint >> (band * BAND_BITS)) & BAND_MASK)
+            for band in range(BAND_COUNT)
+        ]
+
+    def add(self, bando_id: int, fingerprint: int, title: str):
+        """Registra un bando canonico nell'indice"""
+        self.fingerprints[bando_id] = fingerprint
+        self.titles[bando_id] = title
+        for key in self._bands(fingerprint):
+            self.buckets.setdefault(key, set()).add(bando_id)
+
+    def remove(self, bando_id: int):
+        """Rimuove un bando dall'indice (es. scaduto o archiviato)"""
+        fingerprint = self.fingerprints.pop(bando_id, None)
+        self.titles.pop(bando_id, None)
+        if fingerprint is None:
+            return
+        for key in self._bands(fingerprint):
+            bucket = self.buckets.get(key)
+            if bucket:
+                bucket.discard(bando_id)
+
+    async def ensure_loaded(self, db: AsyncSession):
+        """Carica (o ricarica periodicamente) i fingerprint dal database"""
+        if self.last_load and datetime.now() - self.last_load < self.refresh_interval:
+            return
+
+        # Solo bandi attivi: la riedizione annuale di un bando scaduto è un bando nuovo
+        result = await db.execute(
+            select(Bando.id, Bando.simhash, Bando.title).where(
+                Bando.simhash.isnot(None),
+                Bando.status == BandoStatus.ATTIVO
+            )
+        )
+
+        self.fingerprints, self.titles, self.buckets = {}, {}, {}
+        for bando_id, stored, title in result.all():
+            self.add(bando_id, from_signed64(stored), title)
+
+        self.last_load = datetime.now()
+        logger.info(f"🔎 Indice near-duplicate caricato: {len(self.fingerprints)} bandi")
+
+    def candidates(self, fingerprint: int, max_distance: int) -> List[Tuple[int, int]]:
+        """Bandi entro la distanza di Hamming indicata, ordinati per distanza"""
+        seen: Set[int] = set()
+        matches = []
+        for key in self._bands(fingerprint):
+            for bando_id in self.buckets.get(key, ()):
+                if bando_id in seen:
+                    continue
+                seen.add(bando_id)
+                distance = hamming_distance(fingerprint, self.fingerprints[bando_id])
+                if distance <= max_distance:
+                    matches.append((bando_id, distance))
+        matches.sort(key=lambda x: x[1])
+        return matches
+
+    async def _embedding_similarities(self, title: str, candidate_titles: List[str]) -> Optional[List[float]]:
+        """Similarità coseno tra i titoli, se il modello semantico è disponibile"""
+        # Importa qui per evitare di caricare il modello AI nei percorsi che non lo usano
+        from app.services.semantic_search import semantic_search_service
+
+        model = semantic_search_service.model
+        if model is None:
+            return None
+
+        texts = [normalize_text(title)] + [normalize_text(candidate) for candidate in candidate_titles]
+        # L'encoding è CPU-bound: fuori dall'event loop per non fermare l'ingest
+        embeddings = np.asarray(await asyncio.to_thread(model.encode, texts), dtype=np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12
+        return (embeddings[1:] @ embeddings[0]).tolist()
+
+    async def find_canonical(
+        self, db: AsyncSession, title: str, staged: Optional['NearDuplicateDetector'] = None
+    ) -> Optional[Dict]:
+        """Cerca il bando canonico di cui il titolo è un near-duplicate
+
+        staged: bandi inseriti dall'esecuzione corrente e non ancora committati, che
+        entrano nell'indice condiviso solo dopo il commit
+        """
+        await self.ensure_loaded(db)
+
+        fingerprint = simhash(title)
+        matches = self.candidates(fingerprint, settings.near_duplicate_max_distance)
+        titles = self.titles
+        if staged is not None:
+            matches = sorted(
+                matches + staged.candidates(fingerprint, settings.near_duplicate_max_distance),
+                key=lambda x: x[1]
+            )
+            titles = {**{bando_id: self.titles.get(bando_id) for bando_id, _ in matches}, **staged.titles}
+        if not matches:
+            return None
+
+        try:
+            similarities = await self._embedding_similarities(title, [titles[bando_id] for bando_id, _ in matches])
+        except Exception as e:
+            logger.warning(f"⚠️ Conferma embedding near-duplicate non disponibile: {e}")
+            similarities = None
+
+        if similarities is None:
+            # Senza modello AI accetta solo fingerprint molto vicini
+            bando_id, distance = matches[0]
+            if distance <= settings.near_duplicate_strict_distance:
+                return {'canonical_id': bando_id, 'hamming_distance': distance, 'similarity': None}
+            return None
+
+        best = max(range(len(matches)), key=lambda i: similarities[i])
+        if similarities[best] >= settings.near_duplicate_min_similarity:
+            bando_id, distance = matches[best]
+            return {
+                'canonical_id': bando_id,
+                'hamming_distance': distance,
+                'similarity': float(similarities[best])
+            }
+        return None
+
+    async def is_known_duplicate(self, db: AsyncSession, hash_identifier: str) -> bool:
+        """Verifica se la pubblicazione è già stata collegata a un bando canonico"""
+        result = await db.execute(
+            select(BandoDuplicate.id).where(BandoDuplicate.hash_identifier == hash_identifier)
+        )
+        return result.first() is not None
+
+
+# Istanza singleton del servizio
+near_duplicate_detector = NearDuplicateDetector()
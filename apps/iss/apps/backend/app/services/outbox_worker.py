@@ -0,0 +1,123 @@
+"""
+Worker di consegna della coda email (outbox)
+Prende in carico i messaggi pronti con SELECT ... SKIP LOCKED, li invia con
+concorrenza limitata tramite il pool SMTP e riprogramma i falliti con backoff.
+Gira solo nel processo leader (vedi leader_election), così il limite di invio
+del pool vale per l'intero deployment
+"""
+
+import asyncio
+import logging
+from typing import Any, Optional, Tuple
+
+from app.core.config import settings
+from app.crud.email_outbox import email_outbox_crud
+from app.database.database import async_session_maker
+from app.services.mail_transport import MailTransport, mail_transport
+
+logger = logging.getLogger(__name__)
+
+
+class EmailOutboxWorker:
+    """Consegna in background i messaggi accodati nell'outbox"""
+
+    def __init__(self, transport: Optional[MailTransport] = None, session_maker=None):
+        self.transport = transport or mail_transport
+        self.session_maker = session_maker or async_session_maker
+        self.running = False
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.stats = {'sent': 0, 'retried': 0, 'failed': 0}
+
+    async def start(self):
+        """Avvia il ciclo di consegna"""
+        if self.running:
+            return
+        self.running = True
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("📬 Worker outbox email avviato")
+
+    async def stop(self):
+        """Ferma il ciclo dopo il batch in corso"""
+        if not self.running:
+            return
+        self.running = False
+        self.wake()
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=settings.mail_timeout_seconds)
+            except asyncio.TimeoutError:
+                self._task.cancel()
+        logger.info("📬 Worker outbox email fermato")
+
+    def wake(self):
+        """Segnala nuovi messaggi in coda, senza attendere il polling"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _run(self):
+        while self.running:
+            try:
+                processed = await self.process_batch()
+            except Exception as e:
+                logger.error(f"❌ Errore worker outbox: {e}")
+                processed = 0
+
+            # Batch pieno: probabilmente c'è altro in coda
+            if processed >= settings.outbox_batch_size:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.outbox_poll_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _deliver(self, message: Any, semaphore: asyncio.Semaphore) -> Tuple[Any, Optional[str]]:
+        async with semaphore:
+            try:
+                await self.transport.send(
+                    to=message.to_email,
+                    subject=message.subject,
+                    html_content=message.html_content,
+                    text_content=message.text_content,
+                    from_email=settings.mail_from
+                )
+                return message, None
+            except Exception as e:
+                return message, str(e) or e.__class__.__name__
+
+    async def process_batch(self) -> int:
+        """Invia un batch di messaggi pronti; restituisce quanti ne ha presi in carico"""
+        async with self.session_maker() as db:
+            messages = await email_outbox_crud.claim_batch(db, settings.outbox_batch_size)
+        if not messages:
+            return 0
+
+        semaphore = asyncio.Semaphore(settings.outbox_concurrency)
+        outcomes = await asyncio.gather(*[self._deliver(message, semaphore) for message in messages])
+
+        async with self.session_maker() as db:
+            for message, error in outcomes:
+                if error is None:
+                    await email_outbox_crud.mark_sent(db, message.id)
+                    self.stats['sent'] += 1
+                else:
+                    await email_outbox_crud.mark_failed(
+                        db, message.id, message.attempts, message.max_attempts, error
+                    )
+                    if message.attempts >= message.max_attempts:
+                        self.stats['failed'] += 1
+                        logger.error(f"❌ Email {message.id} a {message.to_email} fallita definitivamente: {error}")
+                    else:
+                        self.stats['retried'] += 1
+                        logger.warning(f"⚠️ Email {message.id} a {message.to_email} riprogrammata: {error}")
+            await db.commit()
+
+        logger.info(f"📬 Outbox: {len(messages)} messaggi processati")
+        return len(messages)
+
+
+# Istanza singleton del servizio
+outbox_worker = EmailOutboxWorker()
@@ -3,31 +3,44 @@ Servizio di scheduling per il monitoraggio automatico dei bandi
 Utilizza APScheduler per gestire i job programmati
 """
 
+import asyncio
 import logging
-from datetime import datetime
-from typing import Optional
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
 from contextlib import asynccontextmanager
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
-from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.database import async_session_maker
 from app.crud.bando_config import bando_config_crud
-from app.services.bando_monitor import bando_monitor_service
+from app.crud.rollup import rollup_crud
+from app.services.bando_monitor import BandoMonitorService
 from app.services.alert_system import alert_system
+from app.services.bando_lifecycle import bando_lifecycle_service
+from app.services.job_telemetry import job_telemetry
+from app.services.telegram_notifier import telegram_notifier
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+def _seconds_since(moment: datetime) -> float:
+    """Secondi trascorsi da un istante, con o senza timezone"""
+    now = datetime.now(timezone.utc) if moment.tzinfo else datetime.now()
+    return max(0.0, (now - moment).total_seconds())
+
+
 class BandoSchedulerService:
     """Servizio per la programmazione automatica del monitoraggio bandi"""
     
     def __init__(self):
         self.scheduler: Optional[AsyncIOScheduler] = None
         self.is_running = False
+        self._config_runs: Dict[int, asyncio.Task] = {}
+        self._config_slots: Optional[asyncio.Semaphore] = None
     
     async def start(self):
         """Avvia lo scheduler"""
@@ -37,6 +50,7 @@ class BandoSchedulerService:
         
         try:
             self.scheduler = AsyncIOScheduler()
+            job_telemetry.attach(self.scheduler)
             
             # Job principale per controllare le configurazioni da eseguire
             self.scheduler.add_job(
@@ -48,7 +62,7 @@ class BandoSchedulerService:
                 max_instances=1
             )
             
-            # Job di pulizia giornaliera (alle 02:00)
+            # Job di pulizia giornaliera: scadenza e archiviazione (alle 02:00)
             self.scheduler.add_job(
                 func=self._daily_cleanup,
                 trigger=CronTrigger(hour=2, minute=0),
@@ -58,6 +72,16 @@ class BandoSchedulerService:
                 max_instances=1
             )
             
+            # Ricostruzione notturna dei rollup giornalieri (alle 03:00, dopo la pulizia)
+            self.scheduler.add_job(
+                func=self._rebuild_rollups,
+                trigger=CronTrigger(hour=3, minute=0),
+                id='rollups_rebuild',
+                name='Ricostruzione rollup analytics',
+                replace_existing=True,
+                max_instances=1
+            )
+            
             # Job per alert nuovi bandi (ogni ora)
             self.scheduler.add_job(
                 func=self._check_new_bandi_alerts,
@@ -104,87 +128,127 @@ class BandoSchedulerService:
         try:
             self.scheduler.shutdown(wait=True)
             self.is_running = False
+            
+            # Annulla le configurazioni in corso: il log resta marcato come 'cancelled'
+            runs = list(self._config_runs.values())
+            for task in runs:
+                task.cancel()
+            await asyncio.gather(*runs, return_exceptions=True)
             logger.info("Scheduler bandi fermato")
         except Exception as e:
             logger.error(f"Errore stop scheduler: {e}")
     
     async def _check_and_run_configs(self):
-        """Controlla le configurazioni da eseguire"""
+        """Avvia le configurazioni scadute sul pool limitato, senza attenderne la fine"""
         
         async with async_session_maker() as db:
             try:
-                # Ottieni configurazioni da eseguire
                 configs_to_run = await bando_config_crud.get_configs_to_run(db)
-                
-                if not configs_to_run:
-                    return
-                
-                logger.info(f"Trovate {len(configs_to_run)} configurazioni da eseguire")
-                
-                # Esegui ogni configurazione
-                for config in configs_to_run:
-                    try:
-                        await self._run_single_config(config, db)
-                    except Exception as e:
-                        logger.error(f"Errore esecuzione config {config.id}: {e}")
-                        
-                        # Crea log di errore
-                        await bando_config_crud.create_log(db, {
-                            'config_id': config.id,
-                            'status': 'failed',
-                            'error_message': str(e),
-                            'completed_at': datetime.now()
-                        })
-                        
             except Exception as e:
                 logger.error(f"Errore controllo configurazioni: {e}")
-    
-    async def _run_single_config(self, config, db: AsyncSession):
-        """Esegue il monitoraggio per una singola configurazione"""
+                return
         
-        logger.info(f"Esecuzione monitoraggio per config: {config.name} (ID: {config.id})")
+        # Una configurazione ancora in corso non viene rilanciata
+        due = [config for config in configs_to_run if config.id not in self._config_runs]
+        if not due:
+            return
         
-        # Crea log di inizio
-        log_data = {
-            'config_id': config.id,
-            'status': 'running'
-        }
-        log_entry = await bando_config_crud.create_log(db, log_data)
+        logger.info(f"Trovate {len(due)} configurazioni da eseguire ({len(self._config_runs)} già in corso)")
         
-        try:
-            # Esegui monitoraggio
-            async with bando_monitor_service as monitor:
-                result = await monitor.run_monitoring(db, config)
+        if self._config_slots is None:
+            self._config_slots = asyncio.Semaphore(max(1, settings.monitor_config_concurrency))
+        
+        for config in due:
+            task = asyncio.create_task(self._dispatch_config(config.id, config.next_run))
+            self._config_runs[config.id] = task
+            task.add_done_callback(lambda _, config_id=config.id: self._config_runs.pop(config_id, None))
+    
+    async def _dispatch_config(self, config_id: int, scheduled_for: Optional[datetime]):
+        """Attende uno slot libero del pool ed esegue la configurazione"""
+        async with self._config_slots:
+            try:
+                await self._run_single_config(config_id, scheduled_for)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Errore esecuzione config {config_id}: {e}")
+    
+    async def _run_single_config(self, config_id: int, scheduled_for: Optional[datetime] = None):
+        """Esegue il monitoraggio di una configurazione in una sessione dedicata, con timeout"""
+        
+        async with async_session_maker() as db:
+            config = await bando_config_crud.get_config(db, config_id)
+            if not config or not config.is_active:
+                return
+            
+            # Letti prima dell'esecuzione: dopo un rollback gli attributi sono scaduti
+            config_name = config.name
+            interval_hours = config.schedule_interval_hours
+            timeout = settings.monitor_config_timeout_seconds
             
-            # Aggiorna log con risultati
-            await bando_config_crud.create_log(db, {
-                'config_id': config.id,
+            started = time.monotonic()
+            dispatch_lag = _seconds_since(scheduled_for) if scheduled_for else None
+            log_entry = await bando_config_crud.create_log(db, {
+                'config_id': config_id,
+                'status': 'running',
+                'scheduled_for': scheduled_for,
+                'dispatch_lag_seconds': dispatch_lag
+            })
+            logger.info(
+                f"Esecuzione monitoraggio per config: {config_name} (ID: {config_id}), "
+                f"ritardo di avvio {dispatch_lag or 0:.1f}s"
+            )
+            
+            try:
+                # Istanza dedicata: il client HTTP del servizio non è condivisibile tra esecuzioni parallele
+                async with BandoMonitorService() as monitor:
+                    result = await asyncio.wait_for(monitor.run_monitoring(db, config), timeout=timeout)
+            except asyncio.TimeoutError:
+                await db.rollback()
+                result = {'status': 'timeout', 'error_message': f"Timeout dopo {timeout:.0f}s"}
+                # Riprogramma al prossimo intervallo: altrimenti verrebbe rilanciata a ogni controllo
+                config.next_run = datetime.now() + timedelta(hours=interval_hours)
+            except asyncio.CancelledError:
+                await db.rollback()
+                await bando_config_crud.update_log(db, log_entry, {
+                    'status': 'cancelled',
+                    'duration_seconds': time.monotonic() - started,
+                    'completed_at': datetime.now()
+                })
+                raise
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"Errore monitoraggio config {config_id}: {e}")
+                result = {'status': 'failed', 'error_message': str(e)}
+            
+            # Aggiorna il log di inizio con risultati e tempi
+            await bando_config_crud.update_log(db, log_entry, {
                 'bandi_found': result.get('bandi_found', 0),
                 'bandi_new': result.get('bandi_new', 0),
                 'errors_count': result.get('errors_count', 0),
                 'status': result.get('status', 'completed'),
                 'error_message': result.get('error_message'),
                 'sources_processed': result.get('sources_processed'),
+                'duration_seconds': time.monotonic() - started,
                 'completed_at': datetime.now()
             })
             
+            if result.get('status') != 'completed':
+                logger.error(f"Monitoraggio {result.get('status')} per {config_name}: {result.get('error_message')}")
+                return
+            
             logger.info(
-                f"Monitoraggio completato per {config.name}: "
+                f"Monitoraggio completato per {config_name}: "
                 f"{result.get('bandi_new', 0)} nuovi bandi trovati"
             )
             
-        except Exception as e:
-            logger.error(f"Errore monitoraggio config {config.id}: {e}")
-            
-            # Aggiorna log con errore
-            await bando_config_crud.create_log(db, {
-                'config_id': config.id,
-                'status': 'failed',
-                'error_message': str(e),
-                'completed_at': datetime.now()
-            })
-            
-            raise
+            # Notifica su Telegram i bandi non ancora inviati (no-op se il canale è disattivato)
+            try:
+                telegram_result = await telegram_notifier.deliver_pending(db, config)
+                if telegram_result.get('error_message'):
+                    logger.warning(f"⚠️ Notifica Telegram incompleta per {config_name}: {telegram_result['error_message']}")
+            except Exception as e:
+                logger.error(f"❌ Errore notifica Telegram per {config_name}: {e}")
     
     async def _daily_cleanup(self):
         """Pulizia automatica giornaliera"""
@@ -193,17 +257,31 @@ class BandoSchedulerService:
             try:
                 logger.info("Avvio pulizia automatica giornaliera")
                 
-                # Importa qui per evitare circular imports
-                from app.crud.bando import bando_crud
+                # Scadenza dei bandi con termine passato e archiviazione di quelli vecchi
+                result = await bando_lifecycle_service.run(db)
                 
-                # Archivia bandi vecchi di 1 anno
-                archived_count = await bando_crud.cleanup_old_bandi(db, days_old=365)
-                
-                logger.info(f"Pulizia completata: {archived_count} bandi archiviati")
+                logger.info(
+                    f"Pulizia completata: {len(result['expired'])} bandi scaduti, "
+                    f"{len(result['archived'])} archiviati"
+                )
                 
             except Exception as e:
                 logger.error(f"Errore pulizia automatica: {e}")
     
+    async def _rebuild_rollups(self):
+        """Riallinea i rollup giornalieri alle tabelle grezze"""
+        async with async_session_maker() as db:
+            try:
+                result = await rollup_crud.rebuild(db)
+                keyword_rows = await rollup_crud.rebuild_keywords(db)
+                await db.commit()
+                logger.info(
+                    f"📊 Rollup ricostruiti: {result['bandi_rows']} righe bandi, {result['user_rows']} righe utenti, "
+                    f"{keyword_rows} righe parole chiave"
+                )
+            except Exception as e:
+                logger.error(f"❌ Errore ricostruzione rollup: {e}")
+    
     def add_custom_job(
         self, 
         func, 
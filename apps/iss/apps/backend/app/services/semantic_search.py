@@ -3,6 +3,7 @@ Servizio di ricerca semantica con embedding per bandi ISS
 Implementa matching intelligente basato su similarità semantica
 """
 
+import asyncio
 import logging
 from typing import List, Dict, Optional, Tuple, Any
 import numpy as np
@@ -16,6 +17,7 @@ from datetime import datetime
 
 from app.models.bando import Bando
 from app.crud.bando import bando_crud
+from app.services.suggestion_index import suggestion_index
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +36,8 @@ class SemanticSearchService:
         os.makedirs(cache_dir, exist_ok=True)
         self.embeddings_cache_file = os.path.join(cache_dir, "bando_embeddings.pkl")
         self.last_update = None
+        # Un salvataggio alla volta: le scritture avvengono in un thread
+        self._save_lock = asyncio.Lock()
         
     async def initialize(self):
         """Inizializza il modello di embedding"""
@@ -95,20 +99,60 @@ class SemanticSearchService:
             bando_ids.append(bando.id)
         
         if texts:
-            # Genera embedding in batch per efficienza
-            embeddings = self.model.encode(texts, show_progress_bar=True)
+            # Genera embedding in batch per efficienza (in un thread: l'encoding è CPU-bound)
+            embeddings = await asyncio.to_thread(self.model.encode, texts, show_progress_bar=True)
             
             # Salva gli embedding
             for bando_id, embedding in zip(bando_ids, embeddings):
                 self.bando_embeddings[bando_id] = embedding
         
         # Salva cache
-        await self._save_embeddings_cache()
         self.last_update = datetime.now()
+        await self._save_embeddings_cache()
         
         logger.info(f"✅ Generati {len(self.bando_embeddings)} embedding")
         return self.bando_embeddings
     
+    async def index_bandi(self, bandi: List[Bando]) -> int:
+        """Aggiunge all'indice solo i bandi indicati che non hanno ancora un embedding"""
+        # Indice mai generato: la prossima generazione completa includerà anche questi bandi
+        if not self.last_update:
+            return 0
+        missing = [bando for bando in bandi if bando.id not in self.bando_embeddings]
+        if not missing:
+            return 0
+        if not self.model:
+            await self.initialize()
+        
+        texts = [self._prepare_bando_text(bando) for bando in missing]
+        embeddings = await asyncio.to_thread(self.model.encode, texts)
+        for bando, embedding in zip(missing, embeddings):
+            self.bando_embeddings[bando.id] = embedding
+        
+        await self._save_embeddings_cache()
+        logger.info(f"🧩 Indicizzati {len(missing)} nuovi bandi")
+        return len(missing)
+    
+    async def _embed_bandi(self, bandi: List[Bando]) -> Dict[int, np.ndarray]:
+        """Embedding dei soli bandi indicati: dall'indice se presenti, altrimenti calcolati al volo"""
+        embeddings = {
+            bando.id: self.bando_embeddings[bando.id] for bando in bandi if bando.id in self.bando_embeddings
+        }
+        missing = [bando for bando in bandi if bando.id not in embeddings]
+        if missing:
+            texts = [self._prepare_bando_text(bando) for bando in missing]
+            encoded = await asyncio.to_thread(self.model.encode, texts)
+            embeddings.update(zip((bando.id for bando in missing), encoded))
+        return embeddings
+    
+    async def remove_bandi(self, bando_ids) -> int:
+        """Toglie dall'indice i bandi non più proponibili (scaduti o archiviati)"""
+        removed = sum(1 for bando_id in bando_ids if self.bando_embeddings.pop(bando_id, None) is not None)
+        if removed:
+            await self._save_embeddings_cache()
+            logger.info(f"🧹 Rimossi {removed} bandi dall'indice semantico")
+        return removed
+    
     async def semantic_search(self, query: str, db: AsyncSession, limit: int = 10, threshold: float = 0.3) -> List[Tuple[Bando, float]]:
         """Ricerca semantica sui bandi"""
         if not self.model:
@@ -121,7 +165,7 @@ class SemanticSearchService:
             return []
         
         # Genera embedding della query
-        query_embedding = self.model.encode([query])[0]
+        query_embedding = (await asyncio.to_thread(self.model.encode, [query]))[0]
         
         # Calcola similarità con tutti i bandi
         similarities = []
@@ -205,24 +249,7 @@ class SemanticSearchService:
             await self.initialize()
         
         # Costruisci profilo semantico utente
-        profile_parts = []
-        
-        if user_profile.get('organization_type'):
-            profile_parts.append(f"organizzazione {user_profile['organization_type']}")
-        
-        if user_profile.get('sectors'):
-            profile_parts.append(f"settori: {', '.join(user_profile['sectors'])}")
-        
-        if user_profile.get('target_groups'):
-            profile_parts.append(f"target: {', '.join(user_profile['target_groups'])}")
-        
-        if user_profile.get('keywords'):
-            profile_parts.append(f"attività: {', '.join(user_profile['keywords'])}")
-        
-        if user_profile.get('description'):
-            profile_parts.append(f"descrizione: {user_profile['description']}")
-        
-        profile_query = " ".join(profile_parts)
+        profile_query = self._profile_query(user_profile)
         
         # Esegui match semantico
         matches = await self.semantic_search(profile_query, db, limit=limit * 2, threshold=0.15)
@@ -247,6 +274,103 @@ class SemanticSearchService:
         recommendations.sort(key=lambda x: x['recommendation_score'], reverse=True)
         return recommendations[:limit]
     
+    async def generate_batch_recommendations(
+        self,
+        user_profiles: Dict[int, Dict],
+        db: AsyncSession,
+        limit: int = 10,
+        threshold: float = 0.15,
+        bandi: Optional[List[Bando]] = None
+    ) -> Dict[int, List[Dict]]:
+        """
+        Raccomandazioni per molti utenti: un encode in batch, un prodotto matriciale, una query.
+        Con bandi indicati confronta i profili solo con quei bandi (es. appena inseriti),
+        senza passare dal corpus completo
+        """
+        if not user_profiles:
+            return {}
+        if not self.model:
+            await self.initialize()
+        
+        if bandi is None:
+            embeddings = await self.generate_embeddings(db)
+        else:
+            embeddings = await self._embed_bandi(bandi)
+        if not embeddings:
+            return {user_id: [] for user_id in user_profiles}
+        
+        # Matrice normalizzata degli embedding: prodotto scalare = similarità coseno
+        bando_ids = np.fromiter(embeddings.keys(), dtype=np.int64)
+        matrix = np.vstack(list(embeddings.values())).astype(np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+        
+        user_ids = list(user_profiles)
+        # Un solo encoding per tutti i profili, fuori dall'event loop
+        queries = await asyncio.to_thread(
+            self.model.encode, [self._profile_query(user_profiles[uid]) for uid in user_ids]
+        )
+        queries = np.asarray(queries, dtype=np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12
+        similarities = queries @ matrix.T
+        
+        # Come generate_user_recommendations: candidati limit*2 sopra soglia
+        top_n = max(1, min(limit * 2, len(bando_ids)))
+        candidates: Dict[int, List[Tuple[int, float]]] = {}
+        for row, user_id in enumerate(user_ids):
+            scores = similarities[row]
+            top = np.argpartition(-scores, top_n - 1)[:top_n]
+            candidates[user_id] = [
+                (int(bando_ids[i]), float(scores[i])) for i in top if scores[i] >= threshold
+            ]
+        
+        if bandi is None:
+            wanted = {bando_id for matches in candidates.values() for bando_id, _ in matches}
+            bandi = await bando_crud.get_bandi_by_ids(db, wanted)
+        else:
+            bandi = {bando.id: bando for bando in bandi}
+        
+        recommendations: Dict[int, List[Dict]] = {}
+        for user_id, matches in candidates.items():
+            profile = user_profiles[user_id]
+            user_recommendations = []
+            for bando_id, similarity in matches:
+                bando = bandi.get(bando_id)
+                if not bando:
+                    continue
+                match_factors = self._analyze_match_factors(profile, bando)
+                user_recommendations.append({
+                    'bando': bando,
+                    'recommendation_score': similarity,
+                    'reasoning': self._generate_ai_reasoning(profile, bando, similarity, match_factors),
+                    'match_factors': match_factors
+                })
+            user_recommendations.sort(key=lambda x: x['recommendation_score'], reverse=True)
+            recommendations[user_id] = user_recommendations[:limit]
+        
+        logger.info(f"🤖 Raccomandazioni batch per {len(user_ids)} utenti")
+        return recommendations
+    
+    def _profile_query(self, user_profile: Dict) -> str:
+        """Testo semantico del profilo utente"""
+        profile_parts = []
+        
+        if user_profile.get('organization_type'):
+            profile_parts.append(f"organizzazione {user_profile['organization_type']}")
+        
+        if user_profile.get('sectors'):
+            profile_parts.append(f"settori: {', '.join(user_profile['sectors'])}")
+        
+        if user_profile.get('target_groups'):
+            profile_parts.append(f"target: {', '.join(user_profile['target_groups'])}")
+        
+        if user_profile.get('keywords'):
+            profile_parts.append(f"attività: {', '.join(user_profile['keywords'])}")
+        
+        if user_profile.get('description'):
+            profile_parts.append(f"descrizione: {user_profile['description']}")
+        
+        return " ".join(profile_parts)
+    
     def _analyze_match_factors(self, user_profile: Dict, bando) -> Dict[str, Any]:
         """Analizza fattori specifici di compatibilità"""
         factors = {
@@ -281,17 +405,11 @@ class SemanticSearchService:
                 factors['geographical_match'] = True
         
         # Budget compatibility
-        if user_profile.get('max_budget_interest') and bando.importo:
-            try:
-                # Estrai numero da stringa importo
-                import re
-                numbers = re.findall(r'\d+(?:\.\d+)?', str(bando.importo))
-                if numbers:
-                    bando_amount = float(numbers[0])
-                    if bando_amount <= user_profile['max_budget_interest']:
-                        factors['budget_compatibility'] = True
-            except:
-                pass
+        if user_profile.get('max_budget_interest'):
+            # Estremo inferiore dell'importo, calcolato in fase di ingest
+            bando_amount = bando.importo_min if bando.importo_min is not None else bando.importo_max
+            if bando_amount is not None and bando_amount <= user_profile['max_budget_interest']:
+                factors['budget_compatibility'] = True
         
         return factors
     
@@ -328,42 +446,39 @@ class SemanticSearchService:
         else:
             return f"{strength} compatibilità semantica generale"
 
-    def get_intelligent_suggestions(self, search_history: List[str], limit: int = 5) -> List[str]:
-        """Genera suggerimenti intelligenti basati sullo storico"""
-        if not search_history or not self.model:
-            return self._get_default_suggestions()
-        
-        # Analizza le query passate per pattern
-        recent_queries = search_history[-10:]  # Ultime 10 ricerche
-        
-        suggestions = []
-        
-        # Suggerimenti basati su parole chiave frequenti
-        keywords_freq = {}
-        for query in recent_queries:
-            words = query.lower().split()
-            for word in words:
-                if len(word) > 3:  # Solo parole significative
-                    keywords_freq[word] = keywords_freq.get(word, 0) + 1
-        
-        # Genera suggerimenti intelligenti
-        top_keywords = sorted(keywords_freq.items(), key=lambda x: x[1], reverse=True)[:3]
-        
-        for keyword, _ in top_keywords:
-            suggestions.extend([
-                f"{keyword} giovani",
-                f"{keyword} formazione",
-                f"{keyword} digitale",
-                f"{keyword} sociale"
-            ])
-        
-        # Rimuovi duplicati e limita
-        suggestions = list(set(suggestions))[:limit]
-        
+    def get_intelligent_suggestions(
+        self,
+        search_history: List[str],
+        limit: int = 5,
+        prefix: Optional[str] = None
+    ) -> List[str]:
+        """Genera suggerimenti dal corpus dei bandi e dallo storico"""
+        suggestions: List[str] = []
+
+        # Completamento di quanto l'utente sta digitando
+        if prefix:
+            suggestions.extend(suggestion_index.complete(prefix, limit))
+
+        # Completion delle parole chiave più frequenti nello storico
+        if search_history and len(suggestions) < limit:
+            recent_queries = search_history[-10:]  # Ultime 10 ricerche
+            keywords_freq = {}
+            for query in recent_queries:
+                for word in query.lower().split():
+                    if len(word) > 3:  # Solo parole significative
+                        keywords_freq[word] = keywords_freq.get(word, 0) + 1
+
+            top_keywords = sorted(keywords_freq.items(), key=lambda x: x[1], reverse=True)[:3]
+            for keyword, _ in top_keywords:
+                suggestions.extend(suggestion_index.complete(keyword, limit))
+
+        # Rimuovi duplicati mantenendo l'ordine di ranking
+        suggestions = list(dict.fromkeys(suggestions))
+
         # Se pochi suggerimenti, aggiungi quelli di default
-        if len(suggestions) < limit:
-            suggestions.extend(self._get_default_suggestions())
-        
+        if len(suggestions) < limit and not prefix:
+            suggestions.extend(s for s in self._get_default_suggestions() if s not in suggestions)
+
         return suggestions[:limit]
     
     def _get_default_suggestions(self) -> List[str]:
@@ -393,16 +508,24 @@ class SemanticSearchService:
             self.bando_embeddings = {}
     
     async def _save_embeddings_cache(self):
-        """Salva embedding nella cache"""
-        try:
-            cache_data = {
-                'embeddings': self.bando_embeddings,
-                'last_update': datetime.now()
-            }
-            with open(self.embeddings_cache_file, 'wb') as f:
-                pickle.dump(cache_data, f)
-        except Exception as e:
-            logger.warning(f"⚠️ Errore salvataggio cache embedding: {e}")
+        """Salva embedding nella cache (copia dell'indice scritta in un thread)"""
+        async with self._save_lock:
+            try:
+                # Data dell'ultima generazione completa: gli aggiornamenti incrementali non la rinnovano
+                cache_data = {
+                    'embeddings': dict(self.bando_embeddings),
+                    'last_update': self.last_update or datetime.now()
+                }
+                await asyncio.to_thread(self._write_cache_file, cache_data)
+            except Exception as e:
+                logger.warning(f"⚠️ Errore salvataggio cache embedding: {e}")
+    
+    def _write_cache_file(self, cache_data: Dict[str, Any]):
+        """Serializza la cache su un file temporaneo e lo sostituisce a quello esistente"""
+        tmp_file = f"{self.embeddings_cache_file}.tmp"
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(cache_data, f)
+        os.replace(tmp_file, self.embeddings_cache_file)
     
     def _is_cache_valid(self) -> bool:
         """Controlla se la cache è ancora valida (24 ore)"""
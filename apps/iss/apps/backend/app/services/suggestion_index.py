@@ -0,0 +1,262 @@
+"""
+Indice di autocompletamento per la barra di ricerca bandi
+Trie in memoria costruito da titoli, enti, categorie e query più cercate:
+ogni nodo mantiene le migliori completion già ordinate, così un prefisso
+si risolve in tempo proporzionale alla sua lunghezza senza toccare il database.
+Una query entra nei suggerimenti solo dopo essere stata cercata (con risultati)
+da più client distinti; le query tracciate sono limitate e scadono.
+Ogni worker tiene il proprio indice: i nuovi bandi arrivano dagli eventi del
+broker, le archiviazioni e la ricostruzione periodica lo ricostruiscono
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.database.database import async_session_maker
+from app.models.bando import Bando, BandoStatus
+from app.services.event_broker import BANDO_CREATED, BANDO_STATUS
+from app.utils.simhash import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Peso di ogni occorrenza per tipo di sorgente
+SOURCE_WEIGHTS = {
+    'query': 3.0,
+    'categoria': 2.0,
+    'ente': 1.5,
+    'title': 1.0,
+}
+
+# Client distinti necessari per promuovere una query nei suggerimenti
+QUERY_MIN_CLIENTS = 3
+# Oltre questo numero di client il peso di una query non cresce più
+QUERY_MAX_CLIENTS = 50
+# Query tracciate al massimo (le meno recenti vengono scartate)
+MAX_TRACKED_QUERIES = 5000
+# Query non più cercate da questo tempo escono dall'indice alla ricostruzione
+QUERY_MAX_AGE = timedelta(days=30)
+
+
+@dataclass
+class _TrackedQuery:
+    display: str
+    clients: Set[str] = field(default_factory=set)
+    last_seen: datetime = field(default_factory=datetime.now)
+
+    @property
+    def promoted(self) -> bool:
+        return len(self.clients) >= QUERY_MIN_CLIENTS
+
+    @property
+    def weight(self) -> float:
+        """Peso nel ranking: un'occorrenza per ogni client oltre la soglia di promozione"""
+        return SOURCE_WEIGHTS['query'] * (len(self.clients) - QUERY_MIN_CLIENTS + 1)
+
+
+class _TrieNode:
+    __slots__ = ('children', 'top')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.top: List[str] = []  # Chiavi delle frasi migliori per questo prefisso
+
+
+class SuggestionIndex:
+    """Trie con top-k per nodo aggiornato incrementalmente"""
+
+    def __init__(self, top_k: int = 10, max_prefix_length: int = 24, session_maker=None):
+        self.top_k = top_k
+        self.max_prefix_length = max_prefix_length
+        self.session_maker = session_maker or async_session_maker
+        self._reset()
+        self.queries: 'OrderedDict[str, _TrackedQuery]' = OrderedDict()
+        self.last_build: Optional[datetime] = None
+        # Frasi aggiunte mentre una ricostruzione legge il database: riapplicate dopo lo scambio
+        self._building: Optional[List[Tuple[str, str, Optional[float]]]] = None
+        self._build_lock: Optional[asyncio.Lock] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+
+    def _reset(self):
+        self.root = _TrieNode()
+        self.scores: Dict[str, float] = {}
+        self.display: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def _update_node(self, node: _TrieNode, key: str):
+        if key not in node.top:
+            node.top.append(key)
+        node.top.sort(key=lambda k: self.scores[k], reverse=True)
+        del node.top[self.top_k:]
+
+    def add(self, phrase: Optional[str], source: str = 'title', weight: Optional[float] = None):
+        """Aggiunge (o rafforza) una frase suggeribile"""
+        key = normalize_text(phrase or '')
+        if len(key) < 3:
+            return
+
+        # Le query promosse sono riportate dalla ricostruzione con il loro peso
+        if self._building is not None and source != 'query':
+            self._building.append((phrase, source, weight))
+
+        self.scores[key] = self.scores.get(key, 0.0) + (weight or SOURCE_WEIGHTS.get(source, 1.0))
+        self.display.setdefault(key, ' '.join(phrase.split()))
+
+        # Indicizza la frase a partire da ogni parola, con profondità limitata
+        starts = [0] + [i + 1 for i, c in enumerate(key) if c == ' ']
+        for start in starts:
+            node = self.root
+            for char in key[start:start + self.max_prefix_length]:
+                node = node.children.setdefault(char, _TrieNode())
+                self._update_node(node, key)
+
+    def add_bando(self, bando: Bando):
+        """Indicizza titolo, ente e categoria di un nuovo bando"""
+        self.add(bando.title, 'title')
+        self.add(bando.ente, 'ente')
+        self.add(bando.categoria, 'categoria')
+
+    def record_query(self, query: str, client: str):
+        """Registra una ricerca con risultati; la promuove dopo QUERY_MIN_CLIENTS client distinti"""
+        if not query or len(query) > 80 or not client:
+            return
+        key = normalize_text(query)
+        if len(key) < 3:
+            return
+
+        tracked = self.queries.pop(key, None) or _TrackedQuery(' '.join(query.split()))
+        tracked.last_seen = datetime.now()
+        self.queries[key] = tracked
+        while len(self.queries) > MAX_TRACKED_QUERIES:
+            self.queries.popitem(last=False)
+
+        if client in tracked.clients or len(tracked.clients) >= QUERY_MAX_CLIENTS:
+            return
+        tracked.clients.add(client)
+        if tracked.promoted:
+            self.add(tracked.display, 'query')
+
+    def complete(self, prefix: str, limit: int = 5) -> List[str]:
+        """Completion ordinate per popolarità per il prefisso digitato"""
+        key = normalize_text(prefix or '')
+        if not key:
+            return []
+
+        node = self.root
+        for char in key[:self.max_prefix_length]:
+            node = node.children.get(char)
+            if node is None:
+                return []
+
+        candidates = node.top
+        if len(key) > self.max_prefix_length:
+            candidates = [
+                k for k in candidates
+                if k.startswith(key) or f" {key}" in f" {k}"
+            ]
+
+        return [self.display[k] for k in candidates[:limit]]
+
+    def apply_event(self, event: Dict[str, Any]):
+        """Aggiorna l'indice da un evento del broker: nuovi bandi aggiunti, archiviazioni con ricostruzione"""
+        bando = event.get('bando') or {}
+        if event.get('type') == BANDO_CREATED:
+            self.add(bando.get('title'), 'title')
+            self.add(bando.get('ente'), 'ente')
+            self.add(bando.get('categoria'), 'categoria')
+        elif event.get('type') == BANDO_STATUS and bando.get('status') == BandoStatus.ARCHIVIATO.value:
+            # Il trie non supporta rimozioni; un giro di archiviazione produce molti eventi, una ricostruzione
+            self.schedule_rebuild(settings.suggestion_rebuild_delay_seconds)
+
+    def schedule_rebuild(self, delay: float = 0.0):
+        """Ricostruzione in background dopo il ritardo indicato (una sola in attesa alla volta)"""
+        if self._rebuild_task and not self._rebuild_task.done():
+            return
+
+        async def rebuild_later():
+            await asyncio.sleep(delay)
+            await self.rebuild()
+
+        self._rebuild_task = asyncio.create_task(rebuild_later())
+
+    async def rebuild(self):
+        """Ricostruisce l'indice con una sessione propria; un errore lascia l'indice corrente"""
+        try:
+            async with self.session_maker() as db:
+                await self.build(db)
+        except Exception as e:
+            logger.warning(f"⚠️ Ricostruzione indice suggerimenti fallita: {e}")
+
+    async def start(self, interval: Optional[float] = None):
+        """Costruisce l'indice e lo ricostruisce periodicamente (in ogni worker)"""
+        if self._refresh_task:
+            return
+        interval = interval or settings.suggestion_rebuild_interval_seconds
+
+        async def refresh():
+            while True:
+                await self.rebuild()
+                await asyncio.sleep(interval)
+
+        self._refresh_task = asyncio.create_task(refresh())
+
+    async def stop(self):
+        """Ferma la ricostruzione periodica e quella in attesa"""
+        for task in (self._refresh_task, self._rebuild_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._refresh_task = self._rebuild_task = None
+
+    async def build(self, db: AsyncSession):
+        """Ricostruisce l'indice dai bandi non archiviati"""
+        if self._build_lock is None:
+            self._build_lock = asyncio.Lock()
+        async with self._build_lock:
+            self._building = []
+            try:
+                result = await db.execute(
+                    select(Bando.title, Bando.ente, Bando.categoria).where(
+                        Bando.status != BandoStatus.ARCHIVIATO
+                    )
+                )
+                fresh = SuggestionIndex(self.top_k, self.max_prefix_length)
+                for title, ente, categoria in result.all():
+                    fresh.add(title, 'title')
+                    fresh.add(ente, 'ente')
+                    fresh.add(categoria, 'categoria')
+
+                # Frasi arrivate durante la lettura: la lettura potrebbe non includerle
+                for phrase, source, weight in self._building:
+                    fresh.add(phrase, source, weight)
+            finally:
+                self._building = None
+
+            # Le query promosse sopravvivono alla ricostruzione finché vengono cercate
+            cutoff = datetime.now() - QUERY_MAX_AGE
+            for key, tracked in list(self.queries.items()):
+                if tracked.last_seen < cutoff:
+                    del self.queries[key]
+                elif tracked.promoted:
+                    fresh.add(tracked.display, 'query', weight=tracked.weight)
+
+            self.root, self.scores, self.display = fresh.root, fresh.scores, fresh.display
+            self.last_build = datetime.now()
+        logger.info(f"💡 Indice suggerimenti costruito: {len(self.scores)} frasi")
+
+
+# Singleton service instance
+suggestion_index = SuggestionIndex()
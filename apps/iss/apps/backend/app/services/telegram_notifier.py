@@ -0,0 +1,194 @@
+"""
+Canale di notifica Telegram per i nuovi bandi
+Raccoglie i bandi della configurazione non ancora inviati alla sua chat in pochi
+messaggi (max 4096 caratteri), li reclama nel ledger (chat, bando), li invia
+rispettando il limite di invio per chat e il retry_after del Bot API, poi
+conferma quelli inviati e libera gli altri
+"""
+
+import asyncio
+import html
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud.alert_ledger import telegram_ledger_crud
+from app.crud.bando import bando_crud
+from app.models.bando import Bando
+from app.models.bando_config import BandoConfig
+from app.services.mail_transport import SendRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Lunghezza massima di un messaggio del Bot API
+TELEGRAM_MAX_MESSAGE_CHARS = 4096
+
+
+class TelegramError(Exception):
+    """Risposta di errore del Bot API"""
+
+
+@dataclass
+class TelegramDelivery:
+    """Esito dell'invio di un lotto di bandi a una chat"""
+    sent_ids: List[int] = field(default_factory=list)
+    messages_sent: int = 0
+    pending: int = 0
+    error: Optional[str] = None
+
+
+def format_bando_entry(bando: Bando) -> str:
+    """Voce HTML di un bando nel messaggio"""
+    title = html.escape(bando.title or "")
+    link = html.escape(bando.link or "", quote=True)
+    details = [f"🏛 {html.escape(bando.ente or '')}"]
+    if bando.scadenza:
+        details.append(f"⏰ {bando.scadenza.strftime('%d/%m/%Y')}")
+    if bando.importo:
+        details.append(f"💰 {html.escape(bando.importo)}")
+    return f'• <a href="{link}">{title}</a>\n{" · ".join(details)}\n'
+
+
+def build_messages(
+    bandi: Sequence[Bando],
+    max_chars: int = TELEGRAM_MAX_MESSAGE_CHARS
+) -> List[Tuple[str, List[int]]]:
+    """Impacchetta i bandi nel minor numero di messaggi; ogni messaggio riporta i bandi che contiene"""
+    messages: List[Tuple[str, List[int]]] = []
+    entries: List[str] = []
+    ids: List[int] = []
+    length = 0
+
+    def flush():
+        header = f"🎯 <b>{len(ids)} nuovi bandi</b>\n\n"
+        messages.append((header + "\n".join(entries), list(ids)))
+
+    # Spazio riservato all'intestazione ("🎯 <b>NNN nuovi bandi</b>")
+    budget = max_chars - 40
+    for bando in bandi:
+        entry = format_bando_entry(bando)[:budget]
+        if entries and length + len(entry) + 1 > budget:
+            flush()
+            entries, ids, length = [], [], 0
+        entries.append(entry)
+        ids.append(bando.id)
+        length += len(entry) + 1
+
+    if entries:
+        flush()
+    return messages
+
+
+class TelegramNotifier:
+    """Invio dei bandi alle chat Telegram configurate"""
+
+    def __init__(
+        self,
+        api_base: Optional[str] = None,
+        chat_rate_per_second: Optional[float] = None,
+        max_messages_per_run: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.api_base = (api_base or settings.telegram_api_base).rstrip('/')
+        self.chat_rate = settings.telegram_chat_rate_per_second if chat_rate_per_second is None else chat_rate_per_second
+        self.max_messages_per_run = max_messages_per_run or settings.telegram_max_messages_per_run
+        self.max_retries = settings.telegram_max_retries if max_retries is None else max_retries
+        self.transport = transport
+        self._chat_limiters: Dict[str, SendRateLimiter] = {}
+
+    def _limiter(self, chat_id: str) -> SendRateLimiter:
+        # Telegram limita gli invii per chat: un token bucket per destinazione
+        if chat_id not in self._chat_limiters:
+            self._chat_limiters[chat_id] = SendRateLimiter(self.chat_rate, burst=1)
+        return self._chat_limiters[chat_id]
+
+    async def _send_message(self, client: httpx.AsyncClient, token: str, chat_id: str, text: str):
+        """Invia un messaggio; su 429 attende il retry_after indicato dal Bot API"""
+        url = f"{self.api_base}/bot{token}/sendMessage"
+        payload = {
+            'chat_id': chat_id,
+            'text': text,
+            'parse_mode': 'HTML',
+            'disable_web_page_preview': True
+        }
+
+        for attempt in range(self.max_retries + 1):
+            await self._limiter(chat_id).acquire()
+            response = await client.post(url, json=payload)
+            body = response.json()
+            if response.status_code == 429 and attempt < self.max_retries:
+                retry_after = (body.get('parameters') or {}).get('retry_after', 1)
+                logger.warning(f"⏳ Telegram rate limit sulla chat {chat_id}: nuovo tentativo tra {retry_after}s")
+                await asyncio.sleep(retry_after)
+                continue
+            if not body.get('ok'):
+                raise TelegramError(body.get('description') or f"HTTP {response.status_code}")
+            return body['result']
+
+    async def send_bandi(self, token: str, chat_id: str, bandi: Sequence[Bando]) -> TelegramDelivery:
+        """Invia i bandi in lotti; al primo errore si ferma e lascia il resto al prossimo giro"""
+        messages = build_messages(bandi)
+        delivery = TelegramDelivery()
+        async with httpx.AsyncClient(timeout=settings.telegram_timeout_seconds, transport=self.transport) as client:
+            for text, ids in messages[:self.max_messages_per_run]:
+                try:
+                    await self._send_message(client, token, chat_id, text)
+                except Exception as e:
+                    delivery.error = str(e)
+                    logger.error(f"❌ Invio Telegram alla chat {chat_id} fallito: {e}")
+                    break
+                delivery.sent_ids.extend(ids)
+                delivery.messages_sent += 1
+
+        delivery.pending = len(bandi) - len(delivery.sent_ids)
+        return delivery
+
+    async def deliver_pending(self, db: AsyncSession, config: BandoConfig, dry_run: bool = False) -> Dict:
+        """Notifica sulla chat della configurazione i suoi bandi non ancora inviati a quella chat"""
+        if not (config.telegram_enabled and config.telegram_bot_token and config.telegram_chat_id):
+            return {'status': 'disabled', 'bandi_notified': 0, 'messages_sent': 0}
+
+        chat_id = config.telegram_chat_id
+        if dry_run:
+            # Anteprima: nessun reclamo nel registro
+            bandi = await telegram_ledger_crud.find_pending(
+                db, chat_id, keywords=config.keywords, limit=settings.telegram_max_bandi_per_run
+            )
+            return {'status': 'dry_run', 'bandi_notified': 0, 'messages_sent': len(build_messages(bandi))}
+
+        # Reclamo salvato con commit: l'invio avviene fuori dalla transazione
+        bandi = await telegram_ledger_crud.claim_pending(
+            db, chat_id, keywords=config.keywords, limit=settings.telegram_max_bandi_per_run, config_id=config.id
+        )
+        if not bandi:
+            return {'status': 'completed', 'bandi_notified': 0, 'messages_sent': 0}
+
+        delivery = await self.send_bandi(config.telegram_bot_token, chat_id, bandi)
+        sent = set(delivery.sent_ids)
+        await telegram_ledger_crud.mark_sent(db, chat_id, delivery.sent_ids)
+        await telegram_ledger_crud.release(db, chat_id, [bando.id for bando in bandi if bando.id not in sent])
+        # notificato_telegram ora indica "inviato ad almeno una chat"
+        await bando_crud.mark_many_as_notified(db, delivery.sent_ids, telegram=True)
+        await db.commit()
+
+        if delivery.sent_ids:
+            logger.info(
+                f"📨 Telegram: {len(delivery.sent_ids)} bandi in {delivery.messages_sent} messaggi "
+                f"alla chat {config.telegram_chat_id}"
+            )
+        return {
+            'status': 'failed' if delivery.error else 'completed',
+            'bandi_notified': len(delivery.sent_ids),
+            'messages_sent': delivery.messages_sent,
+            'bandi_pending': delivery.pending,
+            'error_message': delivery.error
+        }
+
+
+# Istanza singleton del servizio
+telegram_notifier = TelegramNotifier()
@@ -0,0 +1,111 @@
+"""
+💶 Parsing degli importi in formato italiano
+
+Converte il testo libero dell'importo di un bando ("€ 1.500.000,00", "50k",
+"fino a 200 mila euro", "da 10.000 a 50.000 €") in un intervallo numerico
+(minimo, massimo). Un estremo è None quando il testo lo lascia aperto.
+Anni ("annualità 2024/2025") e durate ("per 12 mesi") non sono importi,
+a meno che non siano accompagnati da € o da un moltiplicatore.
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+# Moltiplicatori scritti dopo il numero
+MULTIPLIERS = {
+    'k': 1e3, 'mila': 1e3, 'mille': 1e3,
+    'm': 1e6, 'mln': 1e6, 'mio': 1e6, 'milione': 1e6, 'milioni': 1e6,
+    'mld': 1e9, 'miliardo': 1e9, 'miliardi': 1e9,
+}
+
+# Espressioni che aprono l'intervallo verso l'alto o verso il basso
+_UPPER_BOUND = re.compile(r'\b(?:fino\s+a(?:d)?|massimo|max|non\s+superiore\s+a|entro|sino\s+a)\s*\W*$')
+_LOWER_BOUND = re.compile(r'\b(?:minimo|min|almeno|a\s+partire\s+da|non\s+inferiore\s+a|oltre|da)\s*\W*$')
+
+_AMOUNT = re.compile(
+    r'(?<![\w.,])(\d{1,3}(?:[.\s]\d{3})+(?:,\d+)?|\d+(?:[.,]\d+)?)(?!\d)'
+    r'(?:\s*(' + '|'.join(sorted(MULTIPLIERS, key=len, reverse=True)) + r')\b)?'
+    r'(?!\s*%)',
+    re.IGNORECASE,
+)
+
+# Valuta subito prima o subito dopo il numero
+_CURRENCY_BEFORE = re.compile(r'€\s*$')
+_CURRENCY_AFTER = re.compile(r'^\s*(?:€|euro\b)')
+# Durate e percentuali scritte dopo il numero
+_NOT_AMOUNT_AFTER = re.compile(r'^\s*(?:%|mes[ei]\b|ann[oi]\b|giorn[oi]\b)')
+# Numeri di quattro cifre in questo intervallo sono anni
+YEAR_RANGE = (1900, 2100)
+
+
+def _to_number(digits: str) -> Optional[float]:
+    """Numero in formato italiano: punto (o spazio) per le migliaia, virgola per i decimali"""
+    digits = digits.replace(' ', '')
+    if ',' in digits:
+        digits = digits.replace('.', '').replace(',', '.')
+    elif digits.count('.') == 1 and len(digits.split('.')[1]) != 3:
+        # "1.5" è un decimale, "1.500" sono migliaia
+        pass
+    else:
+        digits = digits.replace('.', '')
+    try:
+        return float(digits)
+    except ValueError:
+        return None
+
+
+def _is_amount(text: str, match: re.Match, value: float) -> bool:
+    """Esclude anni e durate senza valuta né moltiplicatore"""
+    before, after = text[:match.start()], text[match.end():]
+    if match.group(2) or _CURRENCY_BEFORE.search(before) or _CURRENCY_AFTER.match(after):
+        return True
+    if _NOT_AMOUNT_AFTER.match(after):
+        return False
+    digits = match.group(1)
+    return not (len(digits) == 4 and digits.isdigit() and YEAR_RANGE[0] <= value <= YEAR_RANGE[1])
+
+
+def parse_amounts(text: str) -> List[Tuple[float, str]]:
+    """Importi presenti nel testo, ciascuno con il testo che lo precede"""
+    amounts = []
+    pending = []  # Numeri senza moltiplicatore: "tra 1 e 2 milioni"
+    for match in _AMOUNT.finditer(text):
+        value = _to_number(match.group(1))
+        if value is None or not _is_amount(text, match, value):
+            continue
+        multiplier = match.group(2)
+        if multiplier:
+            factor = MULTIPLIERS[multiplier.lower()]
+            for index in pending:
+                if amounts[index][0] < 1000:
+                    amounts[index] = (amounts[index][0] * factor, amounts[index][1])
+            pending = []
+            value *= factor
+        else:
+            pending.append(len(amounts))
+        amounts.append((value, text[:match.start()]))
+    return amounts
+
+
+def parse_importo(text: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
+    """Intervallo (minimo, massimo) in euro descritto dal testo dell'importo"""
+    if not text:
+        return None, None
+
+    text = text.lower()
+    amounts = parse_amounts(text)
+    if not amounts:
+        return None, None
+
+    # Ogni importo vale come estremo superiore, inferiore o entrambi secondo l'espressione che lo precede
+    lower, upper = [], []
+    for value, prefix in amounts:
+        if _UPPER_BOUND.search(prefix):
+            upper.append(value)
+        elif _LOWER_BOUND.search(prefix):
+            lower.append(value)
+        else:
+            lower.append(value)
+            upper.append(value)
+
+    return (min(lower) if lower else None), (max(upper) if upper else None)
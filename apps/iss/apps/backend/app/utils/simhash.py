@@ -0,0 +1,86 @@
+"""
+🔎 SimHash per il rilevamento near-duplicate dei bandi
+
+Fingerprint a 64 bit calcolato su trigrammi di caratteri del testo
+normalizzato: testi quasi identici producono fingerprint a bassa
+distanza di Hamming.
+"""
+
+import hashlib
+import re
+import unicodedata
+from typing import Iterable, List
+
+SIMHASH_BITS = 64
+
+# Stop words italiane escluse dalla normalizzazione
+ITALIAN_STOPWORDS = {
+    'il', 'lo', 'la', 'i', 'gli', 'le', 'un', 'uno', 'una', 'di', 'a', 'da', 'in',
+    'con', 'su', 'per', 'tra', 'fra', 'e', 'ed', 'o', 'ma', 'se', 'che', 'del',
+    'dello', 'della', 'dei', 'degli', 'delle', 'al', 'allo', 'alla', 'ai', 'agli',
+    'alle', 'dal', 'dallo', 'dalla', 'dai', 'dagli', 'dalle', 'nel', 'nello',
+    'nella', 'nei', 'negli', 'nelle', 'sul', 'sullo', 'sulla', 'sui', 'sugli',
+    'sulle', 'non', 'come', 'anche', 'piu', 'sono', 'essere', 'questo', 'questa',
+    'quello', 'quella', 'ogni', 'tutti', 'tutte', 'loro', 'suo', 'sua', 'suoi',
+}
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokenizza il testo: minuscolo, senza accenti, senza punteggiatura e stop words"""
+    if not text:
+        return []
+
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+
+    return [
+        token for token in _NON_ALNUM.split(text)
+        if token and token not in ITALIAN_STOPWORDS
+    ]
+
+
+def normalize_text(text: str) -> str:
+    """Forma canonica del testo usata per fingerprint e confronti"""
+    return ' '.join(tokenize(text))
+
+
+def _features(normalized: str) -> Iterable[str]:
+    """Trigrammi di caratteri: robusti a piccole variazioni nei titoli brevi"""
+    if len(normalized) < 3:
+        return [normalized] if normalized else []
+    return (normalized[i:i + 3] for i in range(len(normalized) - 2))
+
+
+def simhash(text: str) -> int:
+    """Calcola il fingerprint SimHash a 64 bit (unsigned) del testo"""
+    normalized = normalize_text(text)
+    weights = [0] * SIMHASH_BITS
+
+    for feature in _features(normalized):
+        digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+        value = int.from_bytes(digest, 'big')
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Numero di bit diversi tra due fingerprint"""
+    return (a ^ b).bit_count()
+
+
+def to_signed64(value: int) -> int:
+    """Converte un fingerprint unsigned nel range di una colonna BIGINT"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def from_signed64(value: int) -> int:
+    """Converte il valore BIGINT salvato nel fingerprint unsigned"""
+    return value + (1 << 64) if value < 0 else value
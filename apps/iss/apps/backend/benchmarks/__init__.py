@@ -0,0 +1,6 @@
+"""
+Benchmark offline dei servizi del backend ISS
+Eseguibili in-process, senza server né database esterni:
+
+    python -m benchmarks.semantic_search_benchmark --size 10000 --encoder hashing
+"""
@@ -0,0 +1,216 @@
+"""
+Benchmark delle aggregazioni SQL degli endpoint di analytics
+Popola uno schema PostgreSQL dedicato con generate_series (bandi e utenti APS
+sintetici) a dimensioni crescenti e misura le query di AnalyticsCRUD usate da
+/analytics/sources, /categories, /geographic e /users e le letture dai rollup
+giornalieri di /analytics/trends e /analytics/kpi. La baseline
+carica l'intera tabella bandi e aggrega in Python, come gli endpoint originali.
+Richiede un database PostgreSQL (DATABASE_URL o --database-url); lo schema viene
+eliminato a fine esecuzione salvo --keep.
+
+Esempi:
+    python -m benchmarks.analytics_benchmark
+    python -m benchmarks.analytics_benchmark --sizes 10000,100000 --repeat 50
+    python -m benchmarks.analytics_benchmark --skip-baseline --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Aggiungi il percorso backend al PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.crud.analytics import analytics_crud
+from app.crud.rollup import rollup_crud
+from app.database.database import Base
+from app.models import *  # noqa: F401,F403 - registra tutti i modelli
+from app.models.aps_user import APSUser, OrganizationType
+from app.models.bando import Bando, BandoSource, BandoStatus
+from app.models.rollup import BandoDailyRollup, UserDailyRollup
+from benchmarks.common import (
+    compare_results, load_results, print_comparison, run_metadata, save_results, summarize_latencies, timed
+)
+from benchmarks.corpus import ENTI, TOPICS
+
+logger = logging.getLogger(__name__)
+
+REGIONS = ['Campania', 'Lazio', 'Lombardia', 'Puglia', 'Sicilia']
+
+# Bandi con id in (start, end]: fonte, stato, categoria ed età distribuiti in modo deterministico
+SEED_BANDI = text("""
+    INSERT INTO bandi (title, ente, link, fonte, status, hash_identifier, data_trovato, categoria)
+    SELECT
+        'Bando sintetico ' || g,
+        (CAST(:enti AS TEXT[]))[1 + g % cardinality(CAST(:enti AS TEXT[]))],
+        'https://example.org/bandi/' || g,
+        CAST((CAST(:fonti AS TEXT[]))[1 + g % cardinality(CAST(:fonti AS TEXT[]))] AS bandosource),
+        CAST(CASE WHEN g % 5 = 0 THEN 'scaduto' WHEN g % 11 = 0 THEN 'archiviato' ELSE 'attivo' END AS bandostatus),
+        md5('bando-' || g),
+        now() - make_interval(hours => (g * 7919) % (730 * 24)),
+        CASE WHEN g % 7 = 0 THEN NULL
+             ELSE (CAST(:categorie AS TEXT[]))[1 + g % cardinality(CAST(:categorie AS TEXT[]))] END
+    FROM generate_series(CAST(:start AS INTEGER) + 1, CAST(:end AS INTEGER)) AS g
+""")
+
+SEED_USERS = text("""
+    INSERT INTO aps_users (organization_name, organization_type, fiscal_code, contact_email,
+                           region, sectors, created_at, is_active)
+    SELECT
+        'APS Benchmark ' || g,
+        CAST((CAST(:tipi AS TEXT[]))[1 + g % cardinality(CAST(:tipi AS TEXT[]))] AS organizationtype),
+        lpad(g::text, 16, '0'),
+        'aps' || g || '@example.it',
+        (CAST(:regioni AS TEXT[]))[1 + g % cardinality(CAST(:regioni AS TEXT[]))],
+        json_build_array(
+            (CAST(:settori AS TEXT[]))[1 + g % cardinality(CAST(:settori AS TEXT[]))],
+            (CAST(:settori AS TEXT[]))[1 + (g * 3) % cardinality(CAST(:settori AS TEXT[]))]
+        ),
+        now() - make_interval(days => g % 365),
+        g % 4 <> 0
+    FROM generate_series(CAST(:start AS INTEGER) + 1, CAST(:end AS INTEGER)) AS g
+""")
+
+
+async def _seed(session_maker, start: int, end: int):
+    """Porta il corpus da start a end bandi (e da start/10 a end/10 utenti)"""
+    async with session_maker() as db:
+        await db.execute(SEED_BANDI, {
+            'enti': ENTI,
+            'fonti': [source.value for source in BandoSource],
+            'categorie': list(TOPICS),
+            'start': start,
+            'end': end,
+        })
+        await db.execute(SEED_USERS, {
+            'tipi': [org_type.name for org_type in OrganizationType],
+            'regioni': REGIONS,
+            'settori': list(TOPICS),
+            'start': start // 10,
+            'end': end // 10,
+        })
+        # Rollup ricostruiti come dopo un import massivo
+        await rollup_crud.rebuild(db)
+        await db.commit()
+        await db.execute(text("ANALYZE bandi"))
+        await db.execute(text("ANALYZE aps_users"))
+
+
+async def _legacy_sources(db) -> Dict[str, Dict[str, int]]:
+    """Aggregazione originale: tutta la tabella caricata come oggetti ORM"""
+    source_stats: Dict[str, Dict[str, int]] = {}
+    for bando in (await db.execute(select(Bando))).scalars():
+        stats = source_stats.setdefault(bando.fonte.value, {'total': 0, 'active': 0, 'expired': 0})
+        stats['total'] += 1
+        stats['active' if bando.status == BandoStatus.ATTIVO else 'expired'] += 1
+    return source_stats
+
+
+async def _measure_size(session_maker, args) -> Dict[str, Any]:
+    trends_since = date.today() - timedelta(days=365)
+    operations = {
+        'sources': lambda db: analytics_crud.source_distribution(db),
+        'categories': lambda db: analytics_crud.category_distribution(db),
+        'geographic': lambda db: analytics_crud.geographic_distribution(db),
+        'trends_365d': lambda db: rollup_crud.daily_new_bandi(db, trends_since),
+        'kpi': lambda db: rollup_crud.bandi_kpis(db),
+        'users': lambda db: analytics_crud.user_analytics(db),
+    }
+    if not args.skip_baseline:
+        operations['legacy_sources'] = _legacy_sources
+
+    summaries = {}
+    async with session_maker() as db:
+        for name, operation in operations.items():
+            repeat = args.baseline_repeat if name.startswith('legacy') else args.repeat
+            # Warmup escluso dalle misure
+            await operation(db)
+            latencies: List[float] = []
+            for _ in range(repeat):
+                _, elapsed = await timed(lambda: operation(db))
+                latencies.append(elapsed)
+                # Gli oggetti caricati dalla baseline non devono restare nell'identity map
+                db.expunge_all()
+            summaries[name] = summarize_latencies(latencies)
+    return summaries
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+    results = {
+        'metadata': run_metadata(sizes=sizes, repeat=args.repeat, skip_baseline=args.skip_baseline),
+        'sizes': {}
+    }
+
+    admin_engine = create_async_engine(args.database_url)
+    async with admin_engine.begin() as conn:
+        await conn.execute(text(f'DROP SCHEMA IF EXISTS "{args.schema}" CASCADE'))
+        await conn.execute(text(f'CREATE SCHEMA "{args.schema}"'))
+
+    # Tabelle e tipi enum nello schema dedicato
+    engine = create_async_engine(
+        args.database_url, connect_args={'server_settings': {'search_path': args.schema}}
+    )
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[
+                Bando.__table__, APSUser.__table__, BandoDailyRollup.__table__, UserDailyRollup.__table__
+            ])
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+        seeded = 0
+        for size in sizes:
+            print(f"🌱 Popolamento fino a {size} bandi ({size // 10} utenti)")
+            await _seed(session_maker, seeded, size)
+            seeded = size
+
+            summaries = await _measure_size(session_maker, args)
+            results['sizes'][str(size)] = summaries
+            for name, summary in summaries.items():
+                print(f"   {name:<15} p50 {summary['p50_ms']:>10} ms   p95 {summary['p95_ms']:>10} ms")
+    finally:
+        await engine.dispose()
+        if not args.keep:
+            async with admin_engine.begin() as conn:
+                await conn.execute(text(f'DROP SCHEMA IF EXISTS "{args.schema}" CASCADE'))
+        await admin_engine.dispose()
+
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark delle aggregazioni SQL di analytics")
+    parser.add_argument('--sizes', default='10000,100000,1000000', help="Bandi sintetici, separati da virgola")
+    parser.add_argument('--repeat', type=int, default=20, help="Chiamate misurate per query")
+    parser.add_argument('--baseline-repeat', type=int, default=3, help="Chiamate misurate per la baseline")
+    parser.add_argument('--skip-baseline', action='store_true', help="Non misura il caricamento dell'intera tabella")
+    parser.add_argument('--database-url', default=settings.database_url, help="URL PostgreSQL (asyncpg)")
+    parser.add_argument('--schema', default='analytics_benchmark', help="Schema temporaneo per il corpus")
+    parser.add_argument('--keep', action='store_true', help="Non elimina lo schema a fine esecuzione")
+    parser.add_argument('--output', help="File JSON dei risultati (default: benchmarks/results/)")
+    parser.add_argument('--compare', help="Risultati di riferimento da confrontare con questa esecuzione")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    results = asyncio.run(run_benchmark(args))
+    path = save_results("analytics", results, args.output)
+    print(f"💾 Risultati salvati in {path}")
+
+    if args.compare:
+        print_comparison(compare_results(load_results(args.compare), results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Utility condivise dai benchmark: misure di latenza, encoder offline,
+salvataggio e confronto dei risultati JSON
+"""
+
+import hashlib
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.utils.simhash import tokenize
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile con interpolazione lineare"""
+    if not values:
+        return 0.0
+    return float(np.percentile(np.asarray(values), pct))
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    """Statistiche di latenza (ms) e throughput (operazioni/s)"""
+    total = sum(latencies)
+    return {
+        'count': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'mean_ms': round(total / len(latencies) * 1000, 3) if latencies else 0.0,
+        'throughput_ops': round(len(latencies) / total, 2) if total else 0.0,
+    }
+
+
+async def timed(func: Callable[[], Awaitable[Any]]) -> tuple:
+    """Esegue una coroutine restituendo (risultato, secondi)"""
+    start = time.perf_counter()
+    result = await func()
+    return result, time.perf_counter() - start
+
+
+class HashingEncoder:
+    """
+    Encoder deterministico basato su feature hashing di parole e trigrammi.
+    Sostituisce SentenceTransformer quando il modello non è disponibile
+    (CI, macchine offline): misura il costo del servizio, non quello del modello
+    """
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> List[str]:
+        tokens = tokenize(text)
+        features = list(tokens)
+        for token in tokens:
+            padded = f" {token} "
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def encode(self, texts, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+                sign = 1.0 if digest & 1 else -1.0
+                vectors[row, (digest >> 1) % self.dimensions] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=Path(__file__).parent, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def run_metadata(**params) -> Dict[str, Any]:
+    """Metadati dell'esecuzione per rendere confrontabili i risultati"""
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'params': params,
+    }
+
+
+def save_results(name: str, results: Dict[str, Any], output: Optional[str] = None) -> Path:
+    """Salva i risultati in JSON (default: benchmarks/results/)"""
+    if output:
+        path = Path(output)
+    else:
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = RESULTS_DIR / f"{name}_{stamp}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2, ensure_ascii=False, default=str))
+    return path
+
+
+def _flatten(data: Dict[str, Any], prefix: str = '') -> Dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Differenze percentuali tra le metriche numeriche di due esecuzioni"""
+    before = _flatten({k: v for k, v in baseline.items() if k != 'meta'})
+    after = _flatten({k: v for k, v in current.items() if k != 'meta'})
+    rows = []
+    for metric in sorted(before.keys() & after.keys()):
+        old, new = before[metric], after[metric]
+        change = ((new - old) / old * 100) if old else None
+        rows.append({'metric': metric, 'baseline': old, 'current': new, 'change_pct': change})
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]]):
+    """Stampa il confronto in forma tabellare"""
+    print(f"{'metrica':<45} {'baseline':>12} {'attuale':>12} {'Δ%':>9}")
+    for row in rows:
+        change = f"{row['change_pct']:+.1f}" if row['change_pct'] is not None else 'n/a'
+        print(f"{row['metric']:<45} {row['baseline']:>12.3f} {row['current']:>12.3f} {change:>9}")
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    """Carica un file di risultati salvato in precedenza"""
+    return json.loads(Path(path).read_text())
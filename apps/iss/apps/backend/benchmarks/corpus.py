@@ -0,0 +1,133 @@
+"""
+Generatore di un corpus sintetico di bandi italiani per i benchmark
+Ogni bando appartiene a un tema noto: le query e i profili generati per tema
+forniscono la ground truth per recall@k
+"""
+
+import hashlib
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from app.models.bando import BandoSource, BandoStatus
+
+TOPICS: Dict[str, Dict[str, List[str]]] = {
+    'sociale': {
+        'keywords': ['inclusione sociale', 'povertà educativa', 'contrasto al disagio', 'welfare di comunità', 'famiglie fragili'],
+        'targets': ['minori', 'famiglie', 'persone senza dimora', 'migranti'],
+    },
+    'cultura': {
+        'keywords': ['patrimonio culturale', 'spettacolo dal vivo', 'biblioteche', 'festival musicali', 'teatro di comunità'],
+        'targets': ['artisti', 'giovani creativi', 'comunità locali'],
+    },
+    'ambiente': {
+        'keywords': ['transizione ecologica', 'economia circolare', 'tutela del territorio', 'riforestazione urbana', 'raccolta differenziata'],
+        'targets': ['scuole', 'cittadini', 'comuni costieri'],
+    },
+    'sport': {
+        'keywords': ['impianti sportivi', 'sport di base', 'attività motoria', 'squadre dilettantistiche', 'sport paralimpico'],
+        'targets': ['giovani', 'anziani', 'persone con disabilità'],
+    },
+    'digitale': {
+        'keywords': ['competenze digitali', 'digitalizzazione dei servizi', 'alfabetizzazione informatica', 'piattaforme online', 'cybersicurezza'],
+        'targets': ['anziani', 'piccole associazioni', 'studenti'],
+    },
+    'formazione': {
+        'keywords': ['formazione professionale', 'tirocini', 'orientamento al lavoro', 'apprendistato', 'riqualificazione'],
+        'targets': ['disoccupati', 'NEET', 'donne'],
+    },
+    'salute': {
+        'keywords': ['prevenzione sanitaria', 'assistenza domiciliare', 'salute mentale', 'dipendenze', 'cure palliative'],
+        'targets': ['anziani non autosufficienti', 'caregiver', 'pazienti cronici'],
+    },
+    'turismo': {
+        'keywords': ['turismo sostenibile', 'borghi storici', 'cammini e itinerari', 'accoglienza turistica', 'valorizzazione enogastronomica'],
+        'targets': ['pro loco', 'imprese turistiche', 'aree interne'],
+    },
+}
+
+ENTI = [
+    'Regione Campania', 'Comune di Salerno', 'Provincia di Salerno', 'Fondazione Comunità Salernitana',
+    'CSV Salerno', 'Comune di Napoli', 'Ministero del Lavoro e delle Politiche Sociali', 'Fondazione CON IL SUD',
+]
+
+TITLE_PREFIXES = ['Bando', 'Avviso pubblico', 'Call', 'Contributi per', 'Manifestazione di interesse', 'Fondo']
+FILLER = [
+    'le domande vanno presentate tramite piattaforma', 'possono partecipare enti del terzo settore',
+    'è previsto un cofinanziamento minimo', 'il progetto deve avere durata di dodici mesi',
+    'sono ammesse partnership con enti pubblici', 'le spese devono essere rendicontate',
+]
+
+
+def generate_corpus(size: int, seed: int = 42) -> Tuple[List[Dict], Dict[int, str]]:
+    """Righe della tabella bandi e mappa id -> tema"""
+    rng = random.Random(seed)
+    topic_names = list(TOPICS)
+    now = datetime.now()
+    rows, topics = [], {}
+
+    for bando_id in range(1, size + 1):
+        topic = rng.choice(topic_names)
+        spec = TOPICS[topic]
+        keyword, other = rng.sample(spec['keywords'], 2)
+        target = rng.choice(spec['targets'])
+        ente = rng.choice(ENTI)
+        title = f"{rng.choice(TITLE_PREFIXES)} {keyword} per {target} {rng.randint(2024, 2026)}"
+        descrizione = (
+            f"Sostegno a progetti di {keyword} e {other} rivolti a {target}. "
+            f"{rng.choice(FILLER).capitalize()}; {rng.choice(FILLER)}."
+        )
+        link = f"https://bandi.example.it/{topic}/{bando_id}"
+        rows.append({
+            'id': bando_id,
+            'title': title,
+            'ente': ente,
+            'scadenza': now + timedelta(days=rng.randint(-30, 120)),
+            'link': link,
+            'descrizione': descrizione,
+            'fonte': rng.choice(list(BandoSource)),
+            'hash_identifier': hashlib.md5(f"{title}_{ente}_{link}".encode('utf-8')).hexdigest(),
+            'status': BandoStatus.ATTIVO,
+            # La categoria è valorizzata solo su parte dei bandi, come nei dati reali
+            'categoria': topic if rng.random() < 0.5 else None,
+            'importo': f"€ {rng.randint(5, 500) * 1000:,}".replace(',', '.'),
+            'data_trovato': now - timedelta(minutes=bando_id),
+        })
+        topics[bando_id] = topic
+
+    return rows, topics
+
+
+def generate_queries(count: int, seed: int = 7) -> List[Tuple[str, str]]:
+    """Query in linguaggio naturale con il tema atteso"""
+    rng = random.Random(seed)
+    templates = [
+        'progetti di {kw} per {target}',
+        'finanziamenti {kw}',
+        'bando {kw} {target}',
+        'contributi a fondo perduto per {kw}',
+    ]
+    queries = []
+    for _ in range(count):
+        topic = rng.choice(list(TOPICS))
+        spec = TOPICS[topic]
+        query = rng.choice(templates).format(kw=rng.choice(spec['keywords']), target=rng.choice(spec['targets']))
+        queries.append((query, topic))
+    return queries
+
+
+def generate_profiles(count: int, seed: int = 11) -> List[Tuple[Dict, str]]:
+    """Profili organizzazione con il tema atteso"""
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(count):
+        topic = rng.choice(list(TOPICS))
+        spec = TOPICS[topic]
+        profiles.append(({
+            'organization_type': rng.choice(['APS', 'ODV', 'Cooperativa sociale']),
+            'sectors': [topic],
+            'target_groups': rng.sample(spec['targets'], 1),
+            'keywords': rng.sample(spec['keywords'], 2),
+            'geographical_area': 'Campania',
+        }, topic))
+    return profiles
@@ -0,0 +1,132 @@
+"""
+Benchmark del rendering dei template email
+Renderizza N newsletter settimanali personalizzate (default 10k) con il registro
+compilato e la cache dei frammenti, e le confronta con il rendering originale che
+ricompilava il template a ogni invio e rigenerava ogni card.
+
+Esempi:
+    python -m benchmarks.email_templates_benchmark
+    python -m benchmarks.email_templates_benchmark --users 10000 --bandi 500
+    python -m benchmarks.email_templates_benchmark --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+# Aggiungi il percorso backend al PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from jinja2 import Environment
+
+from app.services.email_templates import TEMPLATES, EmailTemplateRegistry
+from benchmarks.common import (
+    compare_results, load_results, print_comparison, run_metadata, save_results, summarize_latencies
+)
+from benchmarks.corpus import generate_corpus
+
+logger = logging.getLogger(__name__)
+
+
+def _build_workload(users: int, bandi: int, seed: int) -> List[Dict[str, Any]]:
+    """Statistiche personalizzate per utente su un pool comune di bandi"""
+    rows, _ = generate_corpus(bandi, seed)
+    pool = [SimpleNamespace(data_aggiornamento=None, **row) for row in rows]
+    rng = random.Random(seed)
+    shared = {'nuovi_bandi': len(pool), 'totali_attivi': len(pool) * 4, 'importo_totale': '€ 12.500.000'}
+
+    workload = []
+    for user_id in range(1, users + 1):
+        stats = dict(shared)
+        stats['bandi_raccomandati'] = rng.sample(pool, 3)
+        stats['raccomandazioni_ai'] = len(stats['bandi_raccomandati'])
+        stats['scadenze_imminenti'] = [
+            {'bando': bando, 'days_left': rng.randint(1, 7)} for bando in rng.sample(pool, rng.randint(0, 3))
+        ]
+        workload.append({'organization_name': f"APS Benchmark {user_id}", 'stats': stats})
+    return workload
+
+
+def _render_uncompiled(env: Environment, organization_name: str, stats: Dict[str, Any]) -> str:
+    """Rendering originale: compila a ogni invio e rigenera tutte le sezioni"""
+    item = env.from_string(TEMPLATES['newsletter_bando_item.html'])
+    return env.from_string(TEMPLATES['weekly_newsletter.html']).render(
+        organization_name=organization_name,
+        stats=stats,
+        shared_stats=env.from_string(TEMPLATES['newsletter_shared_stats.html']).render(stats=stats),
+        recommended=[item.render(bando=bando) for bando in stats.get('bandi_raccomandati') or []]
+    )
+
+
+def _measure(render: Callable[[str, Dict[str, Any]], str], workload: List[Dict[str, Any]]) -> Dict[str, Any]:
+    latencies = []
+    total_bytes = 0
+    for message in workload:
+        start = time.perf_counter()
+        html = render(message['organization_name'], message['stats'])
+        latencies.append(time.perf_counter() - start)
+        total_bytes += len(html)
+    summary = summarize_latencies(latencies)
+    summary['total_s'] = round(sum(latencies), 3)
+    summary['avg_bytes'] = round(total_bytes / len(workload)) if workload else 0
+    return summary
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    workload = _build_workload(args.users, args.bandi, args.seed)
+    results = {'metadata': run_metadata(users=args.users, bandi=args.bandi, seed=args.seed)}
+    print(f"📧 {args.users} newsletter su un pool di {args.bandi} bandi")
+
+    start = time.perf_counter()
+    registry = EmailTemplateRegistry(fragment_cache_size=args.bandi * 2)
+    compile_s = time.perf_counter() - start
+
+    cached = _measure(registry.render_weekly_newsletter, workload)
+    cached['compile_ms'] = round(compile_s * 1000, 3)
+    lookups = registry.fragments.hits + registry.fragments.misses
+    cached['fragment_hit_ratio'] = round(registry.fragments.hits / lookups, 4) if lookups else 0.0
+    results['compiled'] = cached
+    print(f"   compilati + cache: p50 {cached['p50_ms']} ms, {cached['throughput_ops']} email/s, "
+          f"hit ratio {cached['fragment_hit_ratio']}")
+
+    if not args.skip_baseline:
+        env = Environment(autoescape=False)
+        baseline = _measure(lambda name, stats: _render_uncompiled(env, name, stats), workload)
+        results['uncompiled'] = baseline
+        if cached['total_s']:
+            results['speedup'] = round(baseline['total_s'] / cached['total_s'], 2)
+        print(f"   ricompilati a ogni invio: p50 {baseline['p50_ms']} ms, {baseline['throughput_ops']} email/s")
+
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del rendering delle newsletter")
+    parser.add_argument('--users', type=int, default=10000, help="Newsletter da renderizzare")
+    parser.add_argument('--bandi', type=int, default=200, help="Bandi nel pool delle raccomandazioni")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-baseline', action='store_true', help="Non misura il rendering originale")
+    parser.add_argument('--output', help="File JSON dei risultati (default: benchmarks/results/)")
+    parser.add_argument('--compare', help="Risultati di riferimento da confrontare con questa esecuzione")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run_benchmark(args)
+    path = save_results(f"email_templates_{args.users}", results, args.output)
+    print(f"💾 Risultati salvati in {path}")
+
+    if args.compare:
+        print_comparison(compare_results(load_results(args.compare), results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark del fan-out delle notifiche per utente
+Compone un alert per ogni utente sintetico e lo invia tramite il pool SMTP a un
+sink locale con latenza simulata, a diversi livelli di concorrenza del
+FanOutExecutor. Con --dry-run misura solo composizione e fan-out, senza SMTP.
+
+Esempi:
+    python -m benchmarks.notification_fanout_benchmark
+    python -m benchmarks.notification_fanout_benchmark --users 5000 --concurrency 1,8,32 --latency 0.05
+    python -m benchmarks.notification_fanout_benchmark --rate 50 --burst 10
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+# Aggiungi il percorso backend al PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.email_templates import EmailTemplateRegistry
+from app.services.fan_out import FanOutExecutor
+from app.services.mail_transport import MailTransport, SendRateLimiter
+from benchmarks.common import (
+    compare_results, load_results, print_comparison, run_metadata, save_results, summarize_latencies
+)
+from benchmarks.corpus import generate_corpus
+from benchmarks.smtp_sink import SMTPSink
+
+logger = logging.getLogger(__name__)
+
+
+def _build_users(users: int, bandi: int, seed: int) -> List[SimpleNamespace]:
+    """Utenti sintetici, ciascuno con 1-5 bandi rilevanti da un pool comune"""
+    rows, _ = generate_corpus(bandi, seed)
+    pool = [SimpleNamespace(data_aggiornamento=None, **row) for row in rows]
+    rng = random.Random(seed)
+    return [
+        SimpleNamespace(
+            id=user_id,
+            organization_name=f"APS Benchmark {user_id}",
+            contact_email=f"aps{user_id}@example.it",
+            bandi=rng.sample(pool, rng.randint(1, 5))
+        )
+        for user_id in range(1, users + 1)
+    ]
+
+
+async def _run_level(users: List[SimpleNamespace], concurrency: int, args) -> Dict[str, Any]:
+    templates = EmailTemplateRegistry()
+    executor = FanOutExecutor(concurrency)
+    latencies: List[float] = []
+
+    async with SMTPSink(latency=args.latency) as sink:
+        transport = MailTransport(
+            hostname=sink.host, port=sink.port, username="", password="",
+            use_tls=False, start_tls=False, pool_size=concurrency,
+            rate_limiter=SendRateLimiter(args.rate, args.burst)
+        )
+
+        async def notify(user):
+            start = time.perf_counter()
+            html = templates.render_new_bandi_alert(user.organization_name, user.bandi)
+            if not args.dry_run:
+                await transport.send(
+                    user.contact_email, f"🎯 {len(user.bandi)} nuovi bandi per {user.organization_name}",
+                    html, from_email="noreply@example.it"
+                )
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        outcomes = await executor.run(users, notify, label="benchmark")
+        elapsed = time.perf_counter() - start
+        await transport.close()
+
+    summary = summarize_latencies(latencies)
+    summary.update({
+        'wall_s': round(elapsed, 3),
+        'users_per_s': round(len(users) / elapsed, 2) if elapsed else 0.0,
+        'errors': sum(1 for outcome in outcomes if outcome.error),
+        'delivered': len(sink.messages),
+        'smtp_connections': sink.connections,
+    })
+    return summary
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    users = _build_users(args.users, args.bandi, args.seed)
+    levels = [int(level) for level in args.concurrency.split(',')]
+    results = {
+        'metadata': run_metadata(
+            users=args.users, bandi=args.bandi, concurrency=levels, latency=args.latency,
+            rate=args.rate, burst=args.burst, dry_run=args.dry_run, seed=args.seed
+        ),
+        'levels': {}
+    }
+
+    mode = "dry-run" if args.dry_run else f"sink SMTP, latenza {args.latency * 1000:.0f} ms"
+    print(f"📧 {args.users} utenti ({mode})")
+    for concurrency in levels:
+        summary = await _run_level(users, concurrency, args)
+        results['levels'][str(concurrency)] = summary
+        print(f"   concorrenza {concurrency:>3}: {summary['users_per_s']} utenti/s, "
+              f"p95 {summary['p95_ms']} ms, errori {summary['errors']}")
+
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del fan-out delle notifiche per utente")
+    parser.add_argument('--users', type=int, default=1000, help="Utenti da notificare")
+    parser.add_argument('--bandi', type=int, default=200, help="Bandi nel pool sintetico")
+    parser.add_argument('--concurrency', default='1,4,8,16', help="Livelli di concorrenza, separati da virgola")
+    parser.add_argument('--latency', type=float, default=0.02, help="Latenza simulata del sink per messaggio (s)")
+    parser.add_argument('--rate', type=float, default=0, help="Limite invii al secondo (0 = nessun limite)")
+    parser.add_argument('--burst', type=int, default=20, help="Burst del limite di invio")
+    parser.add_argument('--dry-run', action='store_true', help="Compone i messaggi senza inviarli")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="File JSON dei risultati (default: benchmarks/results/)")
+    parser.add_argument('--compare', help="Risultati di riferimento da confrontare con questa esecuzione")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    results = asyncio.run(run_benchmark(args))
+    path = save_results(f"notification_fanout_{args.users}", results, args.output)
+    print(f"💾 Risultati salvati in {path}")
+
+    if args.compare:
+        print_comparison(compare_results(load_results(args.compare), results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Benchmark offline di SemanticSearchService
+Genera un corpus sintetico di bandi in un database SQLite in memoria ed esegue
+in-process ricerca, bandi simili, match profilo e raccomandazioni, misurando
+latenza p50/p95, throughput, memoria degli embedding e recall@k.
+
+recall@k = risultati del tema atteso tra i primi k / min(k, bandi del tema)
+
+Esempi:
+    python -m benchmarks.semantic_search_benchmark --size 1000
+    python -m benchmarks.semantic_search_benchmark --size 100000 --encoder hashing
+    python -m benchmarks.semantic_search_benchmark --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import resource
+import sys
+import tempfile
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Aggiungi il percorso backend al PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.database.database import Base
+from app.models import *  # noqa: F401,F403 - registra tutti i modelli
+from app.models import aps_user  # noqa: F401 - relazioni di Bando
+from app.models.bando import Bando
+from app.models.rollup import BandoDailyRollup, KeywordDailyRollup
+from app.services.semantic_search import SemanticSearchService
+from benchmarks.common import (
+    HashingEncoder, compare_results, load_results, print_comparison,
+    run_metadata, save_results, summarize_latencies, timed
+)
+from benchmarks.corpus import generate_corpus, generate_profiles, generate_queries
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH_SIZE = 1000
+
+
+def recall_at_k(result_ids: List[int], expected_topic: str, topics: Dict[int, str],
+                topic_sizes: Counter, k: int) -> float:
+    """Quota dei primi k risultati appartenenti al tema atteso"""
+    relevant = min(k, topic_sizes[expected_topic])
+    if not relevant:
+        return 0.0
+    hits = sum(1 for bando_id in result_ids[:k] if topics.get(bando_id) == expected_topic)
+    return hits / relevant
+
+
+async def _setup_database(size: int, seed: int):
+    """Crea il database in memoria e inserisce il corpus sintetico"""
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        # Il rollup giornaliero è aggiornato da ingest e ciclo di vita dei bandi
+        await conn.run_sync(Base.metadata.create_all, tables=[
+            Bando.__table__, BandoDailyRollup.__table__, KeywordDailyRollup.__table__
+        ])
+
+    rows, topics = generate_corpus(size, seed=seed)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_maker() as db:
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            await db.execute(insert(Bando), rows[start:start + INSERT_BATCH_SIZE])
+        await db.commit()
+
+    return engine, session_maker, topics
+
+
+async def _measure(name: str, calls: List[Tuple], k: int, topics: Dict[int, str],
+                   topic_sizes: Counter) -> Dict:
+    """Esegue le chiamate (factory, tema atteso) raccogliendo latenze e recall"""
+    latencies, recalls = [], []
+
+    # Warmup escluso dalle misure
+    await calls[0][0]()
+
+    for factory, expected_topic in calls:
+        ids, elapsed = await timed(factory)
+        latencies.append(elapsed)
+        recalls.append(recall_at_k(ids, expected_topic, topics, topic_sizes, k))
+
+    stats = summarize_latencies(latencies)
+    stats[f'recall_at_{k}'] = round(sum(recalls) / len(recalls), 4)
+    print(f"  {name:<16} p50={stats['p50_ms']:.2f}ms p95={stats['p95_ms']:.2f}ms "
+          f"throughput={stats['throughput_ops']:.1f}/s recall@{k}={stats[f'recall_at_{k}']:.3f}")
+    return stats
+
+
+async def run_benchmark(args) -> Dict:
+    """Esegue il benchmark completo e restituisce i risultati"""
+    print(f"📦 Corpus sintetico: {args.size} bandi")
+    engine, session_maker, topics = await _setup_database(args.size, args.seed)
+    topic_sizes = Counter(topics.values())
+
+    service = SemanticSearchService()
+    service.embeddings_cache_file = str(Path(tempfile.mkdtemp()) / "bando_embeddings.pkl")
+    if args.encoder == 'hashing':
+        service.model = HashingEncoder()
+    else:
+        await service.initialize()
+
+    results = {
+        'meta': run_metadata(
+            size=args.size, queries=args.queries, k=args.k,
+            encoder=args.encoder, model_name=service.model_name if args.encoder == 'model' else None,
+            seed=args.seed
+        )
+    }
+
+    async with session_maker() as db:
+        # Costruzione indice embedding
+        tracemalloc.start()
+        _, build_seconds = await timed(lambda: service.generate_embeddings(db, force_refresh=True))
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        embeddings_bytes = sum(getattr(e, 'nbytes', 0) for e in service.bando_embeddings.values())
+        results['index'] = {
+            'indexed_bandi': len(service.bando_embeddings),
+            'coverage': round(len(service.bando_embeddings) / args.size, 4),
+            'build_seconds': round(build_seconds, 3),
+            'embeddings_mb': round(embeddings_bytes / 2**20, 3),
+            'build_peak_traced_mb': round(peak_bytes / 2**20, 3),
+        }
+        print(f"🧠 Indicizzati {results['index']['indexed_bandi']} bandi in {build_seconds:.2f}s")
+
+        rng = random.Random(args.seed)
+        k = args.k
+        queries = generate_queries(args.queries, seed=args.seed)
+        profiles = generate_profiles(args.queries, seed=args.seed)
+        indexed_ids = list(service.bando_embeddings)
+        similar_ids = [rng.choice(indexed_ids) for _ in range(args.queries)] if indexed_ids else []
+
+        def search_call(query):
+            async def call():
+                found = await service.semantic_search(query, db, limit=k, threshold=0.0)
+                return [bando.id for bando, _ in found]
+            return call
+
+        def similar_call(bando_id):
+            async def call():
+                found = await service.suggest_similar_bandi(bando_id, db, limit=k)
+                return [bando.id for bando, _ in found]
+            return call
+
+        def profile_call(profile):
+            async def call():
+                found = await service.match_profile_to_bandi(profile, db, limit=k)
+                return [bando.id for bando, _ in found]
+            return call
+
+        def recommendation_call(profile):
+            async def call():
+                found = await service.generate_user_recommendations(profile, db, limit=k)
+                return [rec['bando'].id for rec in found]
+            return call
+
+        print(f"⏱️  {args.queries} chiamate per operazione (k={k})")
+        operations = {}
+        operations['search'] = await _measure(
+            'search', [(search_call(q), t) for q, t in queries], k, topics, topic_sizes)
+        if similar_ids:
+            operations['similar'] = await _measure(
+                'similar', [(similar_call(i), topics[i]) for i in similar_ids], k, topics, topic_sizes)
+        operations['match_profile'] = await _measure(
+            'match_profile', [(profile_call(p), t) for p, t in profiles], k, topics, topic_sizes)
+        operations['recommendations'] = await _measure(
+            'recommendations', [(recommendation_call(p), t) for p, t in profiles], k, topics, topic_sizes)
+        results['operations'] = operations
+
+    # ru_maxrss è in KiB su Linux
+    results['process'] = {'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    await engine.dispose()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline della ricerca semantica bandi")
+    parser.add_argument('--size', type=int, default=1000, help="Numero di bandi sintetici (1k-100k)")
+    parser.add_argument('--queries', type=int, default=50, help="Chiamate misurate per operazione")
+    parser.add_argument('--k', type=int, default=10, help="Risultati per chiamata e cut-off di recall@k")
+    parser.add_argument('--encoder', choices=['model', 'hashing'], default='model',
+                        help="'model' usa SentenceTransformer, 'hashing' un encoder offline deterministico")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="File JSON dei risultati (default: benchmarks/results/)")
+    parser.add_argument('--compare', help="Risultati di riferimento da confrontare con questa esecuzione")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    results = asyncio.run(run_benchmark(args))
+    path = save_results(f"semantic_search_{args.size}", results, args.output)
+    print(f"💾 Risultati salvati in {path}")
+
+    if args.compare:
+        print_comparison(compare_results(load_results(args.compare), results))
+
+
+if __name__ == "__main__":
+    main()
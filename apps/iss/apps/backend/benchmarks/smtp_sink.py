@@ -0,0 +1,108 @@
+"""
+Server SMTP locale che accetta e conserva i messaggi in memoria
+Usato dai test e dai benchmark del trasporto email al posto di un relay reale.
+Simula anche i problemi del relay: disconnessione dopo N messaggi, latenza e
+destinatari rifiutati temporaneamente
+"""
+
+import asyncio
+from email import message_from_bytes
+from email.message import Message
+from typing import Iterable, List, Optional
+
+
+class SMTPSink:
+    """Sink SMTP minimale (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT)"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 drop_after: Optional[int] = None, latency: float = 0.0,
+                 reject_recipients: Iterable[str] = ()):
+        self.host = host
+        self.port = port
+        self.drop_after = drop_after  # Chiude la connessione dopo N messaggi
+        self.latency = latency  # Ritardo simulato per ogni messaggio
+        self.reject_recipients = set(reject_recipients)  # Rifiutati con errore temporaneo (450)
+        self.messages: List[Message] = []
+        self.envelopes: List[dict] = []
+        self.connections = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> 'SMTPSink':
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        delivered = 0
+        sender, recipients = None, []
+
+        async def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        try:
+            await reply("220 sink ESMTP ready")
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                command = raw.decode(errors='replace').strip()
+                verb = command[:4].upper()
+
+                if verb == 'EHLO':
+                    await reply("250-sink")
+                    await reply("250 8BITMIME")
+                elif verb == 'HELO':
+                    await reply("250 sink")
+                elif verb == 'MAIL':
+                    sender, recipients = command.split(':', 1)[1].strip().strip('<>'), []
+                    await reply("250 OK")
+                elif verb == 'RCPT':
+                    recipient = command.split(':', 1)[1].strip().strip('<>')
+                    if recipient in self.reject_recipients:
+                        await reply("450 Mailbox temporarily unavailable")
+                    else:
+                        recipients.append(recipient)
+                        await reply("250 OK")
+                elif verb == 'DATA':
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    while True:
+                        line = await reader.readline()
+                        if not line or line == b".\r\n":
+                            break
+                        lines.append(line[1:] if line.startswith(b"..") else line)
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    self.messages.append(message_from_bytes(b"".join(lines)))
+                    self.envelopes.append({'sender': sender, 'recipients': recipients})
+                    delivered += 1
+                    await reply("250 OK queued")
+                    if self.drop_after and delivered >= self.drop_after:
+                        break
+                elif verb == 'RSET':
+                    sender, recipients = None, []
+                    await reply("250 OK")
+                elif verb == 'NOOP':
+                    await reply("250 OK")
+                elif verb == 'QUIT':
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
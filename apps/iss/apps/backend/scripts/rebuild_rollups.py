@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Ricostruisce da zero le tabelle di rollup giornaliere (bandi, registrazioni e parole chiave)
+Da usare dopo import massivi o correzioni manuali dei dati; lo scheduler esegue
+la stessa ricostruzione ogni notte
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Aggiungi il percorso backend al PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database.database import async_session_maker
+from app.models import *  # noqa: F401,F403 - registra tutti i modelli
+from app.models import aps_user  # noqa: F401 - non esportato da app.models
+from app.crud.rollup import rollup_crud
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def rebuild_rollups():
+    """Ricostruisce i rollup in un'unica transazione"""
+    async with async_session_maker() as db:
+        result = await rollup_crud.rebuild(db)
+        keyword_rows = await rollup_crud.rebuild_keywords(db)
+        await db.commit()
+    logger.info(
+        f"✅ Rollup ricostruiti: {result['bandi_rows']} righe bandi, {result['user_rows']} righe utenti, "
+        f"{keyword_rows} righe parole chiave"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_rollups())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Script di aggiornamento incrementale dello schema database
+- Crea le tabelle nuove (Base.metadata.create_all)
+- Applica le modifiche alle tabelle esistenti (idempotenti)
+- Esegue i backfill dei dati derivati
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Aggiungi il percorso backend al PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import func, select, update
+from app.database.database import engine, Base, async_session_maker
+from app.models import *  # noqa: F401,F403 - registra tutti i modelli
+from app.models import aps_user  # noqa: F401 - non esportato da app.models
+from app.models.aps_user import APSUser, NOTIFICATION_PREFERENCE_COLUMNS
+from app.models.bando import Bando
+from app.crud.rollup import rollup_crud
+from app.utils.importo import parse_importo
+from app.utils.simhash import simhash, to_signed64
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+async def backfill_bandi_simhash():
+    """Calcola il fingerprint SimHash dei bandi esistenti"""
+    async with async_session_maker() as db:
+        total = 0
+        while True:
+            result = await db.execute(
+                select(Bando.id, Bando.title)
+                .where(Bando.simhash.is_(None))
+                .limit(BACKFILL_BATCH_SIZE)
+            )
+            rows = result.all()
+            if not rows:
+                break
+
+            for bando_id, title in rows:
+                await db.execute(
+                    update(Bando)
+                    .where(Bando.id == bando_id)
+                    .values(simhash=to_signed64(simhash(title)))
+                )
+            await db.commit()
+            total += len(rows)
+
+        logger.info(f"   Fingerprint calcolati: {total}")
+
+
+async def backfill_bandi_importo():
+    """Ricava gli estremi numerici dal testo dell'importo dei bandi esistenti"""
+    async with async_session_maker() as db:
+        total = 0
+        last_id = 0
+        # Paginazione per id: i testi non interpretabili restano NULL e non vanno riletti
+        while True:
+            result = await db.execute(
+                select(Bando.id, Bando.importo)
+                .where(Bando.id > last_id, Bando.importo.is_not(None))
+                .order_by(Bando.id)
+                .limit(BACKFILL_BATCH_SIZE)
+            )
+            rows = result.all()
+            if not rows:
+                break
+
+            # Riscrive anche gli estremi non più interpretabili (es. anni letti come importi)
+            values = []
+            for bando_id, importo in rows:
+                importo_min, importo_max = parse_importo(importo)
+                values.append({'id': bando_id, 'importo_min': importo_min, 'importo_max': importo_max})
+            await db.execute(update(Bando), values)
+            await db.commit()
+            total += sum(1 for value in values if value['importo_min'] is not None or value['importo_max'] is not None)
+            last_id = rows[-1][0]
+
+        logger.info(f"   Importi interpretati: {total}")
+
+
+async def backfill_notification_preferences():
+    """Copia le preferenze JSON nelle colonne tipizzate"""
+    async with async_session_maker() as db:
+        result = await db.execute(
+            update(APSUser)
+            .where(APSUser.notification_preferences.is_not(None))
+            .values({
+                **{
+                    column: func.coalesce(APSUser.notification_preferences[preference].as_boolean(), True)
+                    for preference, column in NOTIFICATION_PREFERENCE_COLUMNS.items()
+                },
+                # Non è una modifica del profilo
+                'updated_at': APSUser.updated_at,
+            })
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        logger.info(f"   Utenti aggiornati: {result.rowcount}")
+
+
+async def backfill_daily_rollups():
+    """Popola i rollup giornalieri dalle tabelle grezze"""
+    async with async_session_maker() as db:
+        result = await rollup_crud.rebuild(db)
+        await db.commit()
+        logger.info(f"   Righe di rollup: {result['bandi_rows']} bandi, {result['user_rows']} utenti")
+
+
+async def backfill_keyword_rollup():
+    """Popola i conteggi delle parole chiave dai testi dei bandi"""
+    async with async_session_maker() as db:
+        rows = await rollup_crud.rebuild_keywords(db)
+        await db.commit()
+        logger.info(f"   Righe parole chiave: {rows}")
+
+
+# (nome, statement DDL idempotenti, backfill opzionale)
+SCHEMA_UPGRADES = [
+    (
+        "bandi_simhash",
+        ["ALTER TABLE bandi ADD COLUMN IF NOT EXISTS simhash BIGINT"],
+        backfill_bandi_simhash,
+    ),
+    (
+        "aps_users_notification_columns",
+        [
+            f"ALTER TABLE aps_users ADD COLUMN IF NOT EXISTS {column} BOOLEAN NOT NULL DEFAULT TRUE"
+            for column in NOTIFICATION_PREFERENCE_COLUMNS.values()
+        ] + [
+            "CREATE INDEX IF NOT EXISTS ix_aps_users_active ON aps_users (id) WHERE is_active IS TRUE"
+        ] + [
+            f"CREATE INDEX IF NOT EXISTS ix_aps_users_active_{column} ON aps_users (id) "
+            f"WHERE is_active IS TRUE AND {column} IS TRUE"
+            for column in NOTIFICATION_PREFERENCE_COLUMNS.values()
+        ],
+        backfill_notification_preferences,
+    ),
+    (
+        "bando_logs_timing",
+        [
+            "ALTER TABLE bando_logs ADD COLUMN IF NOT EXISTS scheduled_for TIMESTAMP WITH TIME ZONE",
+            "ALTER TABLE bando_logs ADD COLUMN IF NOT EXISTS dispatch_lag_seconds DOUBLE PRECISION",
+            "ALTER TABLE bando_logs ADD COLUMN IF NOT EXISTS duration_seconds DOUBLE PRECISION",
+        ],
+        None,
+    ),
+    (
+        "bandi_data_trovato_index",
+        ["CREATE INDEX IF NOT EXISTS ix_bandi_data_trovato ON bandi (data_trovato)"],
+        None,
+    ),
+    (
+        "daily_rollups",
+        [],
+        backfill_daily_rollups,
+    ),
+    (
+        "bandi_importo_range",
+        [
+            "ALTER TABLE bandi ADD COLUMN IF NOT EXISTS importo_min DOUBLE PRECISION",
+            "ALTER TABLE bandi ADD COLUMN IF NOT EXISTS importo_max DOUBLE PRECISION",
+            "CREATE INDEX IF NOT EXISTS ix_bandi_importo_min ON bandi (importo_min)",
+            "CREATE INDEX IF NOT EXISTS ix_bandi_importo_max ON bandi (importo_max)",
+        ],
+        backfill_bandi_importo,
+    ),
+    (
+        "keyword_rollup",
+        [],
+        backfill_keyword_rollup,
+    ),
+]
+
+
+async def upgrade_schema():
+    """Applica tutti gli aggiornamenti di schema"""
+    async with engine.begin() as conn:
+        logger.info("🔨 Creazione tabelle mancanti...")
+        await conn.run_sync(Base.metadata.create_all)
+
+    for name, statements, backfill in SCHEMA_UPGRADES:
+        logger.info(f"🔄 Aggiornamento '{name}'")
+        async with engine.begin() as conn:
+            for statement in statements:
+                await conn.exec_driver_sql(statement)
+        if backfill:
+            await backfill()
+
+    logger.info("✅ Schema aggiornato")
+
+
+if __name__ == "__main__":
+    asyncio.run(upgrade_schema())
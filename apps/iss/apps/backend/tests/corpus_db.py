@@ -0,0 +1,40 @@
+"""
+Database SQLite in memoria con il corpus sintetico di bandi, condiviso dai test
+"""
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.database.database import Base
+from app.models import *  # noqa: F401,F403 - registra tutti i modelli
+from app.models import aps_user  # noqa: F401 - relazioni di Bando
+from app.models.bando import Bando
+from app.models.rollup import BandoDailyRollup, KeywordDailyRollup
+from benchmarks.corpus import generate_corpus
+
+INSERT_BATCH_SIZE = 1000
+
+
+async def setup_corpus_database(size: int, seed: int):
+    """Crea il database in memoria e inserisce il corpus: il bando i è stato trovato i minuti fa
+
+    Restituisce (engine, session_maker, temi per bando); l'engine va chiuso dal test
+    """
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[
+            Bando.__table__, BandoDailyRollup.__table__, KeywordDailyRollup.__table__
+        ])
+
+    rows, topics = generate_corpus(size, seed=seed)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_maker() as db:
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            await db.execute(insert(Bando), rows[start:start + INSERT_BATCH_SIZE])
+        await db.commit()
+
+    return engine, session_maker, topics
@@ -0,0 +1,215 @@
+"""
+Test per l'avanzamento del checkpoint degli alert sui nuovi bandi
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import update
+
+from app.crud.bando import bando_crud
+from app.models.bando import Bando
+from app.services import alert_system as alert_module
+from app.services.alert_system import NEW_BANDI_OVERLAP, NEW_BANDI_RETRY_WINDOW, BandoAlertSystem
+from app.services.semantic_search import SemanticSearchService
+from benchmarks.common import HashingEncoder
+from benchmarks.corpus import generate_profiles
+from tests.corpus_db import setup_corpus_database
+
+
+class MemoryCheckpoints:
+    """Checkpoint in memoria al posto della tabella job_checkpoints"""
+
+    def __init__(self, mark):
+        self.mark = mark
+
+    async def get_mark(self, db, name):
+        return self.mark
+
+    async def set_mark(self, db, name, mark):
+        self.mark = max(self.mark, mark)
+
+
+@pytest_asyncio.fixture
+async def corpus():
+    # Il bando i è stato trovato i minuti fa
+    engine, session_maker, _ = await setup_corpus_database(12, seed=5)
+    yield session_maker
+    await engine.dispose()
+
+
+@pytest.fixture
+def checkpoints(monkeypatch):
+    # Bandi 1-8 trovati dopo il checkpoint
+    checkpoints = MemoryCheckpoints(mark=datetime.now() - timedelta(minutes=8, seconds=30))
+    monkeypatch.setattr(alert_module, "job_checkpoint_crud", checkpoints)
+    return checkpoints
+
+
+class RecordingSession:
+    """Sessione per utente che registra commit e rollback"""
+
+    def __init__(self):
+        self.commits, self.rollbacks = 0, 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def recording_alert_users(evaluated, errors=0):
+    async def alert_users(db, new_bandi, results, dry_run):
+        evaluated.extend(bando.id for bando in new_bandi)
+        results["errors"] += errors
+    return alert_users
+
+
+class TestAlertNewBandi:
+    """Test per lo stage di alert della pipeline di ingest."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("errors", [0, 1])
+    async def test_leaves_checkpoint_to_hourly_job(self, corpus, checkpoints, monkeypatch, errors):
+        """Test checkpoint mai avanzato dalla pipeline: un lotto fallito resta nella finestra del job orario."""
+        previous = checkpoints.mark
+        system = BandoAlertSystem(session_maker=corpus)
+        monkeypatch.setattr(system, "_alert_users", recording_alert_users([], errors=errors))
+
+        async with corpus() as db:
+            results = await system.alert_new_bandi(db, list(range(1, 9)))
+
+        assert results["errors"] == errors and checkpoints.mark == previous
+
+    @pytest.mark.asyncio
+    async def test_matches_only_new_bandi(self, corpus, monkeypatch):
+        """Test profili confrontati con i soli bandi nuovi, senza generare gli embedding del corpus."""
+        service = SemanticSearchService()
+        service.model = HashingEncoder()
+
+        async def no_corpus(db, force_refresh=False):
+            raise AssertionError("embedding del corpus non richiesti")
+        monkeypatch.setattr(service, "generate_embeddings", no_corpus)
+        monkeypatch.setattr(alert_module, "semantic_search_service", service)
+        monkeypatch.setattr(alert_module, "ALERT_MIN_SCORE", 0.0)
+
+        users = [
+            SimpleNamespace(id=user_id, organization_type=None, geographical_scope=None, max_budget_interest=None,
+                            description=None, sectors=profile['sectors'], target_groups=profile['target_groups'],
+                            keywords=profile['keywords'])
+            for user_id, (profile, _) in enumerate(generate_profiles(3))
+        ]
+        async with corpus() as db:
+            new_bandi = list((await bando_crud.get_bandi_by_ids(db, [2, 5, 9])).values())
+            matches = await BandoAlertSystem(session_maker=corpus)._match_new_bandi(db, users, new_bandi)
+
+        assert set(matches) == {user.id for user in users} and any(matches.values())
+        assert all(bando.id in {2, 5, 9} for bandi in matches.values() for bando in bandi)
+
+
+class TestAlertUsers:
+    """Test per il salvataggio del registro insieme all'email accodata."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("queued, in_outbox, committed", [
+        (True, False, True),
+        (False, True, True),
+        (False, False, False),
+    ])
+    async def test_ledger_saved_only_with_queued_email(self, corpus, monkeypatch, queued, in_outbox, committed):
+        """Test email non accodata (es. servizio disabilitato): coppie del registro annullate."""
+        user = SimpleNamespace(id=1, organization_name="APS")
+        session = RecordingSession()
+
+        async def stream_users(db, preference=None):
+            yield [user]
+
+        async def pending_pairs(db, user_ids, bando_ids):
+            return {user.id: set(bando_ids)}
+
+        async def record(db, user_id, bando_ids):
+            return list(bando_ids)
+
+        async def send_alert(*args, **kwargs):
+            return queued
+
+        async def outbox_exists(db, idempotency_key):
+            return in_outbox
+
+        monkeypatch.setattr(alert_module.aps_user_crud, "stream_active_users", stream_users)
+        monkeypatch.setattr(alert_module.alert_ledger_crud, "get_pending_pairs", pending_pairs)
+        monkeypatch.setattr(alert_module.alert_ledger_crud, "record", record)
+        monkeypatch.setattr(alert_module.email_notification_service, "send_new_bandi_alert", send_alert)
+        monkeypatch.setattr(alert_module.email_outbox_crud, "exists", outbox_exists)
+        monkeypatch.setattr(alert_module.outbox_worker, "wake", lambda: None)
+
+        system = BandoAlertSystem(session_maker=lambda: session)
+        results = {"users_notified": 0, "emails_queued": 0, "pairs_already_sent": 0, "errors": 0}
+        async with corpus() as db:
+            new_bandi = list((await bando_crud.get_bandi_by_ids(db, [2, 5])).values())
+
+            async def match(db, users, bandi):
+                return {user.id: new_bandi}
+            monkeypatch.setattr(system, "_match_new_bandi", match)
+
+            await system._alert_users(db, new_bandi, results, dry_run=False)
+
+        assert results["errors"] == 0
+        assert (session.commits, session.rollbacks) == ((1, 0) if committed else (0, 1))
+        assert results["emails_queued"] == int(queued)
+
+
+class TestCheckNewBandiAlerts:
+    """Test per il job orario degli alert sui nuovi bandi."""
+
+    @pytest.mark.asyncio
+    async def test_late_commit_inside_overlap_is_evaluated(self, corpus, checkpoints, monkeypatch):
+        """Test bando con data_trovato precedente al checkpoint ma visibile solo dopo: rivalutato."""
+        late = checkpoints.mark - NEW_BANDI_OVERLAP / 2
+        async with corpus() as db:
+            await db.execute(update(Bando).where(Bando.id == 12).values(data_trovato=late))
+            await db.commit()
+
+        evaluated = []
+        system = BandoAlertSystem(session_maker=corpus)
+        monkeypatch.setattr(system, "_alert_users", recording_alert_users(evaluated))
+
+        previous = checkpoints.mark
+        async with corpus() as db:
+            await system.check_new_bandi_alerts(db)
+
+        assert 12 in evaluated and checkpoints.mark != previous
+
+    @pytest.mark.asyncio
+    async def test_errors_keep_recent_checkpoint(self, corpus, checkpoints, monkeypatch):
+        """Test giro con errori di fan-out: un checkpoint recente resta fermo per ritentare."""
+        system = BandoAlertSystem(session_maker=corpus)
+        monkeypatch.setattr(system, "_alert_users", recording_alert_users([], errors=1))
+
+        previous = checkpoints.mark
+        async with corpus() as db:
+            results = await system.check_new_bandi_alerts(db)
+
+        assert results["errors"] == 1 and checkpoints.mark == previous
+
+    @pytest.mark.asyncio
+    async def test_errors_cap_checkpoint_lag(self, corpus, checkpoints, monkeypatch):
+        """Test errori ripetuti: il checkpoint non resta indietro oltre la finestra di retry."""
+        checkpoints.mark = datetime.now() - NEW_BANDI_RETRY_WINDOW * 3
+        evaluated = []
+        system = BandoAlertSystem(session_maker=corpus)
+        monkeypatch.setattr(system, "_alert_users", recording_alert_users(evaluated, errors=1))
+
+        async with corpus() as db:
+            results = await system.check_new_bandi_alerts(db)
+
+        assert results["errors"] == 1 and evaluated
+        assert checkpoints.mark >= datetime.now() - NEW_BANDI_RETRY_WINDOW - timedelta(minutes=1)
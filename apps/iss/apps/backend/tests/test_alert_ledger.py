@@ -0,0 +1,74 @@
+"""
+Test per il registro degli alert e i checkpoint dei job
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.alert_ledger import alert_ledger_crud, job_checkpoint_crud
+from app.models.aps_user import APSUser
+from app.models.bando import Bando, BandoSource
+
+
+async def create_user(db: AsyncSession) -> APSUser:
+    suffix = uuid.uuid4().hex[:8]
+    user = APSUser(
+        organization_name=f"APS Ledger {suffix}",
+        fiscal_code=suffix.upper(),
+        contact_email=f"ledger-{suffix}@example.it"
+    )
+    db.add(user)
+    await db.flush()
+    return user
+
+
+async def create_bando(db: AsyncSession, title: str) -> Bando:
+    bando = Bando(
+        title=title, ente="Regione Campania", link=f"https://bandi.example.it/{uuid.uuid4().hex}",
+        fonte=BandoSource.REGIONE_CAMPANIA, hash_identifier=uuid.uuid4().hex
+    )
+    db.add(bando)
+    await db.flush()
+    return bando
+
+
+class TestAlertLedger:
+    """Test per coppie (utente, bando) già notificate."""
+
+    @pytest.mark.asyncio
+    async def test_recorded_pairs_are_excluded(self, db_session: AsyncSession):
+        """Test anti-join: le coppie registrate non tornano tra quelle da notificare."""
+        user = await create_user(db_session)
+        first = await create_bando(db_session, "Bando Inclusione")
+        second = await create_bando(db_session, "Bando Cultura")
+
+        assert await alert_ledger_crud.record(db_session, user.id, [first.id]) == [first.id]
+
+        pending = await alert_ledger_crud.get_pending_pairs(db_session, [user.id], [first.id, second.id])
+        assert pending == {user.id: {second.id}}
+
+    @pytest.mark.asyncio
+    async def test_record_is_idempotent(self, db_session: AsyncSession):
+        """Test seconda registrazione della stessa coppia: nessun nuovo alert."""
+        user = await create_user(db_session)
+        bando = await create_bando(db_session, "Bando Ambiente")
+
+        await alert_ledger_crud.record(db_session, user.id, [bando.id])
+        assert await alert_ledger_crud.record(db_session, user.id, [bando.id]) == []
+
+
+class TestJobCheckpoint:
+    """Test per l'high-water mark dei job."""
+
+    @pytest.mark.asyncio
+    async def test_mark_never_moves_back(self, db_session: AsyncSession):
+        """Test checkpoint temporale assente al primo avvio e monotono."""
+        name = f"test_{uuid.uuid4().hex[:8]}"
+        assert await job_checkpoint_crud.get_mark(db_session, name) is None
+
+        later = datetime.now(timezone.utc)
+        await job_checkpoint_crud.set_mark(db_session, name, later)
+        await job_checkpoint_crud.set_mark(db_session, name, later - timedelta(hours=1))
+        assert await job_checkpoint_crud.get_mark(db_session, name) == later
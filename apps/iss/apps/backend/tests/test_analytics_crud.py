@@ -0,0 +1,90 @@
+"""
+Test per le aggregazioni SQL degli endpoint di analytics
+"""
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql
+
+from app.crud.analytics import analytics_crud
+from app.models.bando import Bando, BandoStatus
+from tests.corpus_db import setup_corpus_database
+
+
+@pytest_asyncio.fixture
+async def corpus():
+    engine, session_maker, _ = await setup_corpus_database(300, seed=5)
+    async with session_maker() as db:
+        await db.execute(update(Bando).where(Bando.id % 4 == 0).values(status=BandoStatus.SCADUTO))
+        await db.execute(update(Bando).where(Bando.id % 9 == 0).values(ente='Comune di Napoli - Campania'))
+        await db.commit()
+        bandi = list((await db.execute(select(Bando))).scalars())
+    yield session_maker, bandi
+    await engine.dispose()
+
+
+class TestAnalyticsCRUD:
+    """Test per risultati uguali all'aggregazione in Python, senza caricare la tabella."""
+
+    @pytest.mark.asyncio
+    async def test_source_distribution(self, corpus):
+        """Test conteggi per fonte con attivi e non attivi, ordinati per totale."""
+        session_maker, bandi = corpus
+        async with session_maker() as db:
+            sources = await analytics_crud.source_distribution(db)
+
+        totals = Counter(bando.fonte.value for bando in bandi)
+        active = Counter(bando.fonte.value for bando in bandi if bando.status == BandoStatus.ATTIVO)
+        assert {row['source']: row['count'] for row in sources} == totals
+        assert all(row['active'] == active[row['source']] for row in sources)
+        assert all(row['expired'] == row['count'] - row['active'] for row in sources)
+        assert [row['count'] for row in sources] == sorted(totals.values(), reverse=True)
+
+    @pytest.mark.asyncio
+    async def test_category_distribution_reports_table_total(self, corpus):
+        """Test top categorie con categoria mancante raggruppata e totale dell'intera tabella."""
+        session_maker, bandi = corpus
+        async with session_maker() as db:
+            categories = await analytics_crud.category_distribution(db, limit=3)
+
+        expected = Counter(bando.categoria or 'Non specificata' for bando in bandi)
+        assert len(categories) == 3
+        assert categories[0][:2] == expected.most_common(1)[0]
+        assert all(total == len(bandi) for _, _, total in categories)
+
+    @pytest.mark.asyncio
+    async def test_geographic_distribution_first_match_wins(self, corpus):
+        """Test regione dall'ente: 'campania' ha la precedenza sulla città."""
+        session_maker, bandi = corpus
+        async with session_maker() as db:
+            regions = dict(await analytics_crud.geographic_distribution(db))
+
+        assert regions['Campania'] == sum(1 for bando in bandi if 'campania' in bando.ente.lower())
+        assert sum(regions.values()) == len(bandi)
+
+    @pytest.mark.asyncio
+    async def test_users_aggregate_in_postgres(self):
+        """Test SQL PostgreSQL: FILTER e settori espansi nel database."""
+        db = RecordingSession()
+        await analytics_crud.user_analytics(db)
+
+        totals, by_type, by_region, sectors = db.statements
+        assert totals.count("FILTER (WHERE") == 3 and "FROM aps_users" in totals
+        assert "GROUP BY aps_users.organization_type" in by_type
+        assert "JOIN LATERAL json_array_elements_text" in sectors and "LIMIT" in sectors
+        # Nessuna query carica le righe complete degli utenti
+        assert not any("aps_users.contact_email" in statement for statement in db.statements)
+
+
+class RecordingSession:
+    """Sessione che registra l'SQL PostgreSQL generato e restituisce risultati vuoti"""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return SimpleNamespace(all=lambda: [], one=lambda: (0, 0, 0, 0))
@@ -0,0 +1,70 @@
+"""
+Test per il job di ciclo di vita dei bandi (scadenza e archiviazione set-based)
+"""
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select, update
+
+from app.models.bando import Bando, BandoStatus
+from app.services import bando_lifecycle
+from app.services.bando_lifecycle import BandoLifecycleService
+from app.services.event_broker import EventBroker
+from tests.corpus_db import setup_corpus_database
+
+
+@pytest_asyncio.fixture
+async def corpus():
+    engine, session_maker, _ = await setup_corpus_database(40, seed=3)
+    async with session_maker() as db:
+        ids = list((await db.execute(select(Bando.id).order_by(Bando.id))).scalars())
+        now = datetime.now()
+        await db.execute(update(Bando).values(scadenza=now + timedelta(days=30), data_trovato=now))
+        # 1-3 con scadenza passata, 4 in scadenza oggi, 5-6 trovati più di un anno fa
+        await db.execute(update(Bando).where(Bando.id.in_(ids[:3])).values(scadenza=now - timedelta(days=2)))
+        await db.execute(update(Bando).where(Bando.id == ids[3]).values(scadenza=now.replace(hour=0, minute=0)))
+        await db.execute(update(Bando).where(Bando.id.in_(ids[4:6])).values(data_trovato=now - timedelta(days=400)))
+        await db.commit()
+    yield session_maker, ids
+    await engine.dispose()
+
+
+class TestBandoLifecycle:
+    """Test per scadenza automatica, archiviazione e invalidazione."""
+
+    @pytest.mark.asyncio
+    async def test_expires_and_archives_with_returned_ids(self, corpus, monkeypatch):
+        """Test UPDATE set-based: id restituiti e stati aggiornati, scadenza odierna ancora attiva."""
+        session_maker, ids = corpus
+        broker = EventBroker(redis_url="redis://localhost:6379")
+        subscription = broker.subscribe()
+        monkeypatch.setattr(bando_lifecycle, "event_broker", broker)
+
+        async with session_maker() as db:
+            result = await BandoLifecycleService().run(db, archive_after_days=365)
+            statuses = dict((await db.execute(select(Bando.id, Bando.status))).all())
+
+        assert sorted(result['expired']) == ids[:3]
+        assert sorted(result['archived']) == ids[4:6]
+        assert all(statuses[bando_id] == BandoStatus.SCADUTO for bando_id in ids[:3])
+        assert statuses[ids[3]] == BandoStatus.ATTIVO
+        assert all(statuses[bando_id] == BandoStatus.ARCHIVIATO for bando_id in ids[4:6])
+
+        events = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+        assert sorted(event['bando']['id'] for event in events) == ids[:3] + ids[4:6]
+        assert {event['bando']['status'] for event in events} == {'scaduto', 'archiviato'}
+
+    @pytest.mark.asyncio
+    async def test_second_run_is_a_no_op(self, corpus):
+        """Test idempotenza: un secondo giro non trova altri bandi da aggiornare."""
+        session_maker, _ = corpus
+        service = BandoLifecycleService()
+
+        async with session_maker() as db:
+            await service.run(db, archive_after_days=365)
+            result = await service.run(db, archive_after_days=365)
+            active = await db.scalar(select(func.count(Bando.id)).where(Bando.status == BandoStatus.ATTIVO))
+
+        assert result == {'expired': [], 'archived': []}
+        assert active == 40 - 5
@@ -0,0 +1,69 @@
+"""
+Test per le statistiche dei bandi calcolate con aggregati condizionali
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.crud.bando import bando_crud
+from app.crud.rollup import rollup_crud
+from app.schemas.bando import BandoStats
+
+
+class StatsSession:
+    """Sessione che registra l'SQL PostgreSQL generato e restituisce risultati predefiniti"""
+
+    def __init__(self, row, months):
+        self.statements = []
+        self.params = []
+        self.row = row
+        self.months = months
+
+    async def execute(self, statement):
+        compiled = statement.compile(dialect=postgresql.dialect())
+        self.statements.append(str(compiled))
+        self.params.append(compiled.params)
+        return SimpleNamespace(mappings=lambda: SimpleNamespace(one=lambda: self.row), all=lambda: self.months)
+
+
+class TestGetStats:
+    """Test per get_stats: due query, nessun caricamento di righe ORM."""
+
+    @pytest.mark.asyncio
+    async def test_two_statements_and_payload(self):
+        """Test aggregati condizionali e serie mensile mappati nei campi attesi."""
+        row = defaultdict(int, {
+            'totali': 10, 'attivi': 7, 'scaduti': 3, 'nuovi_settimana': 14, 'nuovi_mese': 20,
+            'fonte_csv_salerno': 6, 'fonte_regione_campania': 4, 'categorie': {'sociale': 5},
+            'macro_sociale': 5, 'ultimo_trovato': datetime(2025, 3, 1, 9, 0),
+        })
+        months = [(datetime(2025, 2, 1), 0), (datetime(2025, 3, 1), 4)]
+        db = StatsSession(row, months)
+
+        stats = await bando_crud.get_stats(db)
+
+        aggregates, series = db.statements
+        assert aggregates.count("FILTER (WHERE") >= 5 and "json_object_agg" in aggregates
+        assert "generate_series" in series and "bandi_daily_rollup" in series
+        # Nessuna query seleziona le colonne complete dei bandi
+        assert not any("bandi.title" in statement for statement in db.statements)
+
+        assert stats["total_bandi"] == 10 and stats["bandi_attivi"] == 7 and stats["bandi_scaduti"] == 3
+        assert stats["bandi_per_fonte"] == {'csv_salerno': 6, 'regione_campania': 4}
+        assert stats["media_giornaliera"] == 2.0
+        assert stats["macro_categorie"]["sociale"] == 5 and stats["macro_categorie"]["ambiente"] == 0
+        assert [(entry["mese"], entry["count"]) for entry in stats["trend_mensile"]] == [("2025-02", 0), ("2025-03", 4)]
+        assert BandoStats(**stats).totali == 10
+
+    @pytest.mark.asyncio
+    async def test_monthly_series_covers_calendar_months(self):
+        """Test serie di sei mesi di calendario che termina al mese corrente."""
+        db = StatsSession(None, [])
+        await rollup_crud.monthly_new_bandi(db, months=6, today=date(2025, 3, 15))
+
+        series, = db.statements
+        assert "LEFT OUTER JOIN bandi_daily_rollup" in series
+        assert {value for value in db.params[0].values() if isinstance(value, date)} == {date(2024, 10, 1), date(2025, 3, 1)}
@@ -0,0 +1,86 @@
+"""
+Test per le raccomandazioni AI calcolate in batch per la newsletter
+"""
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.crud.bando import bando_crud
+from app.services.semantic_search import SemanticSearchService
+from benchmarks.common import HashingEncoder
+from benchmarks.corpus import generate_profiles
+from tests.corpus_db import setup_corpus_database
+
+
+class TestBatchRecommendations:
+    """Test di equivalenza tra raccomandazioni per utente e in batch."""
+
+    @pytest.mark.asyncio
+    async def test_batch_matches_single_user_recommendations(self):
+        """Test stessi bandi, stesso ordine, per ogni profilo."""
+        engine, session_maker, _ = await setup_corpus_database(200, seed=42)
+        service = SemanticSearchService()
+        service.embeddings_cache_file = str(Path(tempfile.mkdtemp()) / "bando_embeddings.pkl")
+        service.model = HashingEncoder()
+        profiles = {index: profile for index, (profile, _) in enumerate(generate_profiles(5))}
+
+        async with session_maker() as db:
+            batch = await service.generate_batch_recommendations(profiles, db, limit=3)
+            for user_id, profile in profiles.items():
+                single = await service.generate_user_recommendations(profile, db, limit=3)
+                assert [rec['bando'].id for rec in batch[user_id]] == [rec['bando'].id for rec in single]
+                assert [rec['recommendation_score'] for rec in batch[user_id]] == pytest.approx(
+                    [rec['recommendation_score'] for rec in single], abs=1e-4
+                )
+
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_restricted_to_given_bandi(self):
+        """Test bandi indicati: stesso punteggio del corpus completo, senza dipendere dal loro rango nel corpus."""
+        engine, session_maker, _ = await setup_corpus_database(200, seed=42)
+        service = SemanticSearchService()
+        service.embeddings_cache_file = str(Path(tempfile.mkdtemp()) / "bando_embeddings.pkl")
+        service.model = HashingEncoder()
+        profiles = {index: profile for index, (profile, _) in enumerate(generate_profiles(5))}
+
+        async with session_maker() as db:
+            subset = list((await bando_crud.get_bandi_by_ids(db, range(150, 171))).values())
+            full = await service.generate_batch_recommendations(profiles, db, limit=200, threshold=0.0)
+            fresh = SemanticSearchService()
+            fresh.model = HashingEncoder()
+            restricted = await fresh.generate_batch_recommendations(
+                profiles, db, limit=len(subset), threshold=0.0, bandi=subset
+            )
+
+        subset_ids = {bando.id for bando in subset}
+        for user_id in profiles:
+            expected = [rec['bando'].id for rec in full[user_id] if rec['bando'].id in subset_ids]
+            assert [rec['bando'].id for rec in restricted[user_id]] == expected
+        # Il servizio senza indice non ha generato gli embedding del corpus
+        assert not fresh.bando_embeddings
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_profiles_encoded_off_event_loop(self):
+        """Test encoding di bandi e profili in un thread, senza bloccare l'event loop."""
+        threads = []
+
+        class RecordingEncoder(HashingEncoder):
+            def encode(self, texts, **kwargs):
+                threads.append(threading.get_ident())
+                return super().encode(texts, **kwargs)
+
+        engine, session_maker, _ = await setup_corpus_database(20, seed=42)
+        service = SemanticSearchService()
+        service.embeddings_cache_file = str(Path(tempfile.mkdtemp()) / "bando_embeddings.pkl")
+        service.model = RecordingEncoder()
+        profiles = {index: profile for index, (profile, _) in enumerate(generate_profiles(3))}
+
+        async with session_maker() as db:
+            await service.generate_batch_recommendations(profiles, db, limit=3)
+        await engine.dispose()
+
+        assert len(threads) == 2 and threading.get_ident() not in threads
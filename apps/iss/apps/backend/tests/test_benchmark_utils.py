@@ -0,0 +1,49 @@
+"""
+Test per le utility dei benchmark offline
+"""
+import numpy as np
+import pytest
+
+from benchmarks.common import HashingEncoder, compare_results, summarize_latencies
+from benchmarks.corpus import generate_corpus, generate_queries
+
+
+class TestBenchmarkUtils:
+    """Test per corpus sintetico, statistiche e confronto risultati."""
+
+    def test_corpus_is_deterministic(self):
+        """Test stesso seed, stesso corpus con ground truth per tema."""
+        rows_a, topics_a = generate_corpus(50, seed=1)
+        rows_b, topics_b = generate_corpus(50, seed=1)
+
+        assert [r['title'] for r in rows_a] == [r['title'] for r in rows_b]
+        assert topics_a == topics_b
+        assert len({r['hash_identifier'] for r in rows_a}) == 50
+        assert all(topic for _, topic in generate_queries(10))
+
+    def test_summarize_latencies(self):
+        """Test percentili e throughput."""
+        stats = summarize_latencies([0.01] * 9 + [0.1])
+
+        assert stats['count'] == 10
+        assert stats['p50_ms'] == pytest.approx(10.0)
+        assert stats['p95_ms'] > stats['p50_ms']
+        assert stats['throughput_ops'] == pytest.approx(10 / 0.19, rel=1e-2)
+
+    def test_hashing_encoder_normalized(self):
+        """Test encoder offline: vettori unitari, testi simili più vicini."""
+        vectors = HashingEncoder().encode([
+            "inclusione sociale minori", "progetti di inclusione sociale", "impianti sportivi"
+        ])
+
+        assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+        assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+    def test_compare_results(self):
+        """Test differenze percentuali tra due esecuzioni."""
+        rows = compare_results(
+            {'meta': {'size': 1}, 'operations': {'search': {'p50_ms': 10.0}}},
+            {'meta': {'size': 2}, 'operations': {'search': {'p50_ms': 5.0}}},
+        )
+
+        assert rows == [{'metric': 'operations.search.p50_ms', 'baseline': 10.0, 'current': 5.0, 'change_pct': -50.0}]
@@ -0,0 +1,144 @@
+"""
+Test per la frequenza di crawling adattiva per fonte
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.database.database import Base
+from app.models.bando import Bando, BandoDuplicate
+from app.models.bando_config import BandoConfig, BandoSourceState
+from app.models.rollup import BandoDailyRollup, KeywordDailyRollup
+from app.services import bando_monitor
+from app.services.bando_monitor import BandoMonitorService
+from app.services.crawl_frequency import CrawlFrequencyPolicy
+from app.services.near_duplicates import NearDuplicateDetector
+
+SCRAPERS = [
+    'scrape_fondazione_comunita_salernitana', 'scrape_regione_campania_bandi', 'scrape_sviluppo_campania',
+    'scrape_fse_regione_campania', 'scrape_comune_salerno_real', 'scrape_arci_servizio_civile',
+    'scrape_csr_campania', 'scrape_csv_napoli', 'scrape_granter_campania',
+    'scrape_contributi_regione_campania',
+]
+
+
+def make_policy():
+    return CrawlFrequencyPolicy(min_hours=1, max_hours=48, increase_hours=6, decrease_factor=0.5)
+
+
+def make_state(interval=24.0):
+    return BandoSourceState(config_id=1, source='csv_napoli', poll_interval_hours=interval,
+                            change_rate=0.0, fetches=0, changes=0)
+
+
+def item(title):
+    return {'title': title, 'ente': 'Regione Campania', 'link': f'https://example.org/{title}', 'fonte': 'altro'}
+
+
+class TestCrawlFrequencyPolicy:
+    """Test per la regola di aggiornamento dell'intervallo."""
+
+    def test_changes_shorten_and_quiet_fetches_lengthen_within_bounds(self):
+        """Test riduzione moltiplicativa con novità, aumento additivo senza, entro i limiti."""
+        policy = make_policy()
+        now = datetime(2025, 3, 1, 9, 0, tzinfo=timezone.utc)
+        state = make_state()
+
+        policy.record_fetch(state, ['a', 'b'], new_items=0, now=now)
+        assert state.poll_interval_hours == 30  # primo fetch: solo riferimento
+        assert policy.record_fetch(state, ['a', 'b', 'c'], new_items=0, now=now)
+        assert state.poll_interval_hours == 15
+        assert state.next_fetch_at == now + timedelta(hours=15)
+        for _ in range(10):
+            policy.record_fetch(state, ['a', 'b', 'c'], new_items=0, now=now)
+        assert state.poll_interval_hours == 48
+        for _ in range(10):
+            policy.record_fetch(state, ['x'], new_items=1, now=now)
+        assert state.poll_interval_hours == 1
+        assert state.fetches == 22 and state.changes == 11
+        assert state.change_rate > 0.9
+
+    def test_empty_listing_is_not_a_change(self):
+        """Test elenco vuoto (portale in errore): hash conservato, nessuna novità."""
+        policy = make_policy()
+        state = make_state()
+        now = datetime(2025, 3, 1, 9, 0, tzinfo=timezone.utc)
+        policy.record_fetch(state, ['a'], new_items=0, now=now)
+        content_hash = state.content_hash
+
+        assert not policy.record_fetch(state, [], new_items=0, now=now)
+        assert state.content_hash == content_hash
+
+    def test_next_run_is_earliest_due_source(self):
+        """Test prossima esecuzione della configurazione alla prima fonte dovuta, mai prima del minimo."""
+        policy = make_policy()
+        now = datetime(2025, 3, 1, 9, 0, tzinfo=timezone.utc)
+        states = [make_state(), make_state(), make_state()]
+        states[0].next_fetch_at = now + timedelta(hours=20)
+        states[1].next_fetch_at = now + timedelta(hours=5)
+
+        assert policy.next_run(states, now) == now + timedelta(hours=5)
+        states[1].next_fetch_at = now
+        assert policy.next_run(states, now) == now + timedelta(hours=1)
+
+        # Istante riletto senza timezone (SQLite): confrontato come UTC
+        states[1].next_fetch_at = (now + timedelta(hours=3)).replace(tzinfo=None)
+        assert policy.next_run(states, now) == now + timedelta(hours=3)
+        assert not policy.is_due(states[1], now)
+
+
+class TestAdaptiveMonitoring:
+    """Test per il salto delle fonti non dovute in run_monitoring."""
+
+    @pytest.mark.asyncio
+    async def test_quiet_sources_are_skipped_until_due(self, monkeypatch):
+        """Test fonte con novità riprogrammata prima, fonti ferme saltate e forzabili."""
+        engine = create_async_engine(
+            "sqlite+aiosqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[
+                Bando.__table__, BandoDuplicate.__table__, BandoConfig.__table__, BandoSourceState.__table__,
+                BandoDailyRollup.__table__, KeywordDailyRollup.__table__
+            ])
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        monkeypatch.setattr(bando_monitor, "near_duplicate_detector", NearDuplicateDetector())
+        monkeypatch.setattr(bando_monitor, "crawl_frequency_policy", make_policy())
+
+        monitor = BandoMonitorService()
+        calls = []
+        listings = {name: [] for name in SCRAPERS}
+        listings['scrape_csv_napoli'] = [item('Bando inclusione sociale 2025')]
+        for name in SCRAPERS:
+            async def scrape(keywords, config, name=name):
+                calls.append(name)
+                return listings[name]
+            monkeypatch.setattr(monitor, name, scrape)
+
+        async with session_maker() as db:
+            config = BandoConfig(name='test', keywords=['bando'], fonte_enabled=[], scraping_delay=0,
+                                 schedule_interval_hours=24)
+            db.add(config)
+            await db.commit()
+
+            first = await monitor.run_monitoring(db, config)
+            assert len(calls) == 10 and first['bandi_new'] == 1
+            sources = first['sources_processed']
+            assert sources['csv_napoli']['poll_interval_hours'] == 12
+            assert sources['csr_campania']['poll_interval_hours'] == 30
+            assert timedelta(hours=11) < config.next_run - datetime.now(timezone.utc) <= timedelta(hours=12)
+
+            calls.clear()
+            second = await monitor.run_monitoring(db, config)
+            assert calls == []
+            assert {entry['status'] for entry in second['sources_processed'].values()} == {'skipped'}
+
+            await monitor.run_monitoring(db, config, force=True)
+            assert len(calls) == 10
+            states = (await db.execute(select(BandoSourceState))).scalars().all()
+            assert len(states) == 10 and all(state.fetches == 2 for state in states)
+
+        await engine.dispose()
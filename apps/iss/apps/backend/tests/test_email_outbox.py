@@ -0,0 +1,286 @@
+"""
+Test per la coda email in uscita (outbox)
+"""
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.crud.email_outbox import email_outbox_crud, retry_delay
+from app.database.database import Base, async_session_maker
+from app.models.aps_user import APSUser
+from app.models.email_outbox import EmailOutbox, OutboxStatus
+from app.services import email_notifications as email_module
+from app.services.email_notifications import EmailNotificationService, notification_key, bandi_digest, iso_week
+from app.services.mail_transport import MailTransport, SendRateLimiter
+from app.services.outbox_worker import EmailOutboxWorker
+from benchmarks.smtp_sink import SMTPSink
+
+
+MESSAGE = dict(subject="Nuovi bandi", html_content="<p>3 bandi</p>", category="new_bandi")
+
+
+@pytest_asyncio.fixture
+async def outbox_sessions():
+    """Outbox su SQLite in memoria (senza SKIP LOCKED né aritmetica sulle date)"""
+    engine = create_async_engine(
+        "sqlite+aiosqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[EmailOutbox.__table__])
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def enqueue_messages(db, *recipients):
+    """Accoda un messaggio per destinatario; restituisce gli id per destinatario"""
+    prefix = uuid.uuid4().hex[:8]
+    for recipient in recipients:
+        await email_outbox_crud.enqueue(db, idempotency_key=f"{prefix}:{recipient}", to_email=recipient, **MESSAGE)
+    await db.commit()
+    result = await db.execute(
+        select(EmailOutbox.to_email, EmailOutbox.id).where(EmailOutbox.idempotency_key.startswith(f"{prefix}:"))
+    )
+    return dict(result.all())
+
+
+class TestOutboxHelpers:
+    """Test per backoff, chiavi di idempotenza e limite di invio."""
+
+    def test_retry_delay_grows_and_is_capped(self):
+        """Test backoff esponenziale limitato al massimo configurato."""
+        first = retry_delay(1).total_seconds()
+        third = retry_delay(3).total_seconds()
+
+        assert settings.outbox_retry_base_seconds * 0.8 <= first <= settings.outbox_retry_base_seconds * 1.2
+        assert third > first
+        assert retry_delay(50) <= timedelta(seconds=settings.outbox_retry_max_seconds * 1.2)
+
+    def test_idempotency_keys(self):
+        """Test stesse notifiche, stessa chiave; ordine dei bandi irrilevante."""
+        bandi = [SimpleNamespace(id=7), SimpleNamespace(id=3)]
+
+        assert bandi_digest(bandi) == bandi_digest(list(reversed(bandi)))
+        assert notification_key("new_bandi", 12, bandi_digest(bandi)).startswith("new_bandi:12:")
+        assert notification_key("deadline", 12, 5, 3) == "deadline:12:5:3"
+        assert iso_week(datetime(2025, 1, 1)) == "2025-W01"
+        assert iso_week(datetime(2025, 12, 29)) == "2026-W01"
+
+    @pytest.mark.asyncio
+    async def test_rate_limiter_throttles_after_burst(self):
+        """Test token bucket: burst immediato, poi un invio ogni 1/rate secondi."""
+        limiter = SendRateLimiter(rate_per_second=50, burst=5)
+
+        start = time.monotonic()
+        for _ in range(10):
+            await limiter.acquire()
+        elapsed = time.monotonic() - start
+
+        assert 0.08 <= elapsed < 0.5
+
+
+class TestEnqueue:
+    """Test per l'accodamento nella transazione del chiamante."""
+
+    @pytest.mark.asyncio
+    async def test_enqueue_leaves_commit_to_caller(self):
+        """Test messaggio salvato solo con il commit del chiamante, chiave duplicata scartata."""
+        engine = create_async_engine(
+            "sqlite+aiosqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[EmailOutbox.__table__])
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        message = dict(to_email="aps@example.org", subject="Nuovi bandi", html_content="<p>3 bandi</p>",
+                       category="new_bandi")
+
+        async with session_maker() as db:
+            assert await email_outbox_crud.enqueue(db, idempotency_key="new_bandi:1:a", **message)
+            await db.rollback()
+            assert await db.scalar(select(func.count()).select_from(EmailOutbox)) == 0
+
+            assert await email_outbox_crud.enqueue(db, idempotency_key="new_bandi:1:a", **message)
+            await db.commit()
+            assert not await email_outbox_crud.enqueue(db, idempotency_key="new_bandi:1:a", **message)
+            assert await email_outbox_crud.exists(db, "new_bandi:1:a")
+            assert not await email_outbox_crud.exists(db, "new_bandi:1:b")
+
+            queued = (await db.execute(select(EmailOutbox))).scalar_one()
+            assert queued.status is OutboxStatus.PENDING and queued.next_attempt_at is not None
+
+        await engine.dispose()
+
+
+class TestBulkNotifications:
+    """Test per l'accodamento bulk su una sessione separata."""
+
+    @pytest.mark.asyncio
+    async def test_failing_user_does_not_break_page(self, monkeypatch):
+        """Test rollback per un utente: gli altri della stessa pagina vengono accodati."""
+        engine = create_async_engine(
+            "sqlite+aiosqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[APSUser.__table__, EmailOutbox.__table__])
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        monkeypatch.setattr(email_module, "async_session_maker", session_maker)
+        monkeypatch.setattr(email_module.outbox_worker, "wake", lambda: None)
+
+        service = EmailNotificationService()
+        service.enabled = True
+        send_alert = service.send_new_bandi_alert
+
+        async def failing_alert(user, bandi, **kwargs):
+            queued = await send_alert(user, bandi, **kwargs)
+            if user.fiscal_code == "BULK2":
+                raise RuntimeError("template non valido")
+            return queued
+        monkeypatch.setattr(service, "send_new_bandi_alert", failing_alert)
+
+        bando = SimpleNamespace(
+            id=1, title="Bando", ente="Ente", importo=None, scadenza=None, descrizione=None,
+            link="https://bandi.example.it/1", data_trovato=None, data_aggiornamento=None
+        )
+        async with session_maker() as db:
+            db.add_all([
+                APSUser(organization_name=f"APS {i}", fiscal_code=f"BULK{i}", contact_email=f"aps{i}@example.it")
+                for i in range(1, 4)
+            ])
+            await db.commit()
+
+            results = await service.send_bulk_notifications(db, "new_bandi", bandi=[bando])
+            queued = await db.scalar(select(func.count()).select_from(EmailOutbox))
+
+        assert results == {"queued": 2, "failed": 1, "skipped": 0}
+        assert queued == 2
+
+        await engine.dispose()
+
+
+class TestClaimBatch:
+    """Test per la presa in carico dei messaggi pronti."""
+
+    @pytest.mark.asyncio
+    async def test_claimed_messages_are_not_claimed_again(self, outbox_sessions):
+        """Test messaggi presi in carico una sola volta finché il lease è valido."""
+        async with outbox_sessions() as db:
+            ids = await enqueue_messages(db, "a@example.it", "b@example.it")
+
+            first = await email_outbox_crud.claim_batch(db, limit=1)
+            second = await email_outbox_crud.claim_batch(db, limit=5)
+
+            assert len(first) == 1 and len(second) == 1
+            assert {first[0].id, second[0].id} == set(ids.values())
+            assert first[0].attempts == 1
+            assert await email_outbox_crud.claim_batch(db, limit=5) == []
+
+            statuses = (await db.execute(select(EmailOutbox.status))).scalars().all()
+            assert statuses == [OutboxStatus.SENDING] * 2
+
+
+class TestOutboxWorker:
+    """Test per la consegna di un batch tramite il pool SMTP."""
+
+    @pytest.mark.asyncio
+    async def test_process_batch_sends_retries_and_fails(self, outbox_sessions):
+        """Test un invio riuscito, un errore temporaneo riprogrammato e un messaggio all'ultimo tentativo."""
+        ok, flaky, dead = "ok@example.it", "flaky@example.it", "dead@example.it"
+        async with outbox_sessions() as db:
+            ids = await enqueue_messages(db, ok, flaky, dead)
+            await db.execute(
+                update(EmailOutbox).where(EmailOutbox.id == ids[dead])
+                .values(attempts=EmailOutbox.max_attempts - 1)
+            )
+            await db.commit()
+
+        async with SMTPSink(reject_recipients=[flaky, dead]) as sink:
+            transport = MailTransport(
+                hostname=sink.host, port=sink.port, username="", password="", use_tls=False, start_tls=False
+            )
+            worker = EmailOutboxWorker(transport=transport, session_maker=outbox_sessions)
+            processed = await worker.process_batch()
+            await transport.close()
+
+        assert processed == 3
+        assert [envelope['recipients'] for envelope in sink.envelopes] == [[ok]]
+        assert worker.stats == {'sent': 1, 'retried': 1, 'failed': 1}
+
+        # next_attempt_at escluso: SQLite non calcola now() + intervallo (vedi i test su PostgreSQL)
+        async with outbox_sessions() as db:
+            result = await db.execute(select(
+                EmailOutbox.id, EmailOutbox.status, EmailOutbox.attempts, EmailOutbox.max_attempts,
+                EmailOutbox.sent_at, EmailOutbox.locked_at, EmailOutbox.last_error
+            ))
+            rows = {row.id: row for row in result}
+
+        assert rows[ids[ok]].status is OutboxStatus.SENT and rows[ids[ok]].sent_at is not None
+        assert rows[ids[flaky]].status is OutboxStatus.PENDING and rows[ids[flaky]].attempts == 1
+        assert rows[ids[dead]].status is OutboxStatus.FAILED
+        assert rows[ids[dead]].attempts == rows[ids[dead]].max_attempts
+        assert all(rows[ids[r]].last_error and rows[ids[r]].locked_at is None for r in (flaky, dead))
+
+
+class TestOutboxOnPostgres:
+    """Test su PostgreSQL: SKIP LOCKED, backoff e lease scaduti."""
+
+    @pytest.mark.database
+    @pytest.mark.asyncio
+    async def test_claim_skips_locked_rows(self):
+        """Test un messaggio bloccato da un'altra transazione viene saltato, non atteso."""
+        async with async_session_maker() as db:
+            ids = await enqueue_messages(db, "locked@example.it", "free@example.it")
+
+        try:
+            async with async_session_maker() as db_a, async_session_maker() as db_b:
+                await db_a.execute(
+                    select(EmailOutbox.id).where(EmailOutbox.id == ids["locked@example.it"]).with_for_update()
+                )
+                claimed = {message.id for message in await email_outbox_crud.claim_batch(db_b, limit=100)}
+                await db_a.rollback()
+
+            assert ids["free@example.it"] in claimed
+            assert ids["locked@example.it"] not in claimed
+        finally:
+            async with async_session_maker() as db:
+                await db.execute(delete(EmailOutbox).where(EmailOutbox.id.in_(ids.values())))
+                await db.commit()
+
+    @pytest.mark.database
+    @pytest.mark.asyncio
+    async def test_backoff_and_stale_lease(self):
+        """Test errore riprogrammato nel futuro, FAILED all'ultimo tentativo, lease scaduto ripreso."""
+        async with async_session_maker() as db:
+            ids = await enqueue_messages(db, "retry@example.it", "last@example.it", "stale@example.it")
+
+        try:
+            async with async_session_maker() as db:
+                await email_outbox_crud.mark_failed(db, ids["retry@example.it"], 1, 5, "450 temporaneo")
+                await email_outbox_crud.mark_failed(db, ids["last@example.it"], 5, 5, "450 temporaneo")
+                await db.execute(
+                    update(EmailOutbox).where(EmailOutbox.id == ids["stale@example.it"])
+                    .values(
+                        status=OutboxStatus.SENDING, attempts=1,
+                        locked_at=func.now() - timedelta(seconds=settings.outbox_lease_seconds + 60)
+                    )
+                )
+                await db.commit()
+
+                retry = await db.get(EmailOutbox, ids["retry@example.it"])
+                assert retry.status is OutboxStatus.PENDING
+                assert retry.next_attempt_at > await db.scalar(select(func.now()))
+                assert (await db.get(EmailOutbox, ids["last@example.it"])).status is OutboxStatus.FAILED
+
+                claimed = {message.id: message for message in await email_outbox_crud.claim_batch(db, limit=100)}
+                assert ids["retry@example.it"] not in claimed and ids["last@example.it"] not in claimed
+                assert claimed[ids["stale@example.it"]].attempts == 2
+        finally:
+            async with async_session_maker() as db:
+                await db.execute(delete(EmailOutbox).where(EmailOutbox.id.in_(ids.values())))
+                await db.commit()
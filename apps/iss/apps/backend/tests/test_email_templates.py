@@ -0,0 +1,111 @@
+"""
+Test per il registro dei template email e la cache dei frammenti
+"""
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.services.email_service import EmailService
+from app.services.email_templates import EmailTemplateRegistry
+
+
+def make_bando(bando_id, title="Bando Inclusione Sociale", aggiornato=None):
+    return SimpleNamespace(
+        id=bando_id, title=title, ente="Regione Campania", importo="€ 50.000",
+        scadenza=datetime(2026, 3, 31), descrizione="Sostegno a progetti di inclusione",
+        link=f"https://bandi.example.it/{bando_id}", categoria="sociale", fonte="regione",
+        data_trovato=datetime(2026, 1, 1), data_aggiornamento=aggiornato
+    )
+
+
+class TestEmailTemplateRegistry:
+    """Test per rendering e riuso dei frammenti."""
+
+    def test_new_bandi_alert_renders_cards(self):
+        """Test alert con una card per bando e intestazione personalizzata."""
+        registry = EmailTemplateRegistry()
+        html = registry.render_new_bandi_alert("APS Salerno", [make_bando(1), make_bando(2, "Bando Cultura")])
+
+        assert "APS Salerno" in html
+        assert "Bando Inclusione Sociale" in html and "Bando Cultura" in html
+        assert "31/03/2026" in html
+
+    def test_fragments_reused_across_users(self):
+        """Test card renderizzata una volta e riusata per altri destinatari."""
+        registry = EmailTemplateRegistry()
+        bando = make_bando(1)
+        first = registry.render_new_bandi_alert("APS Uno", [bando])
+        second = registry.render_new_bandi_alert("APS Due", [bando])
+
+        assert registry.fragments.misses == 1
+        assert registry.fragments.hits == 1
+        assert first.replace("APS Uno", "APS Due") == second
+
+    def test_updated_bando_is_rendered_again(self):
+        """Test nuova versione del bando: la card in cache non viene riusata."""
+        registry = EmailTemplateRegistry()
+        registry.render_deadline_reminder("APS", make_bando(1), 3)
+        html = registry.render_deadline_reminder(
+            "APS", make_bando(1, "Bando Rettificato", aggiornato=datetime(2026, 2, 1)), 3
+        )
+
+        assert "Bando Rettificato" in html
+        assert registry.fragments.hits == 0
+
+    def test_deadline_digest_orders_by_urgency(self):
+        """Test riepilogo scadenze: un blocco per bando, il più urgente per primo."""
+        registry = EmailTemplateRegistry()
+        html = registry.render_deadline_digest(
+            "APS Salerno", [(make_bando(1, "Bando Sette Giorni"), 7), (make_bando(2, "Bando Domani"), 1)]
+        )
+
+        assert "2 bandi in scadenza" in html
+        assert html.index("Bando Domani") < html.index("Bando Sette Giorni")
+        assert "1 giorno rimasto" in html and "7 giorni rimasti" in html
+
+    def test_newsletter_shared_and_personal_sections(self):
+        """Test newsletter: statistiche comuni in cache, scadenze per utente."""
+        registry = EmailTemplateRegistry()
+        stats = {
+            'nuovi_bandi': 4, 'totali_attivi': 20, 'importo_totale': '€ 1.000.000',
+            'raccomandazioni_ai': 1, 'bandi_raccomandati': [make_bando(1)],
+            'scadenze_imminenti': [{'bando': make_bando(2, "Bando In Scadenza"), 'days_left': 2}]
+        }
+        registry.render_weekly_newsletter("APS Uno", stats)
+        html = registry.render_weekly_newsletter("APS Due", dict(stats, scadenze_imminenti=[]))
+
+        assert "APS Due" in html
+        assert "Bando Inclusione Sociale" in html
+        assert "Bando In Scadenza" not in html
+        assert registry.fragments.hits == 2
+
+
+class TestEmailServiceLinks:
+    """Test per link e mittente delle email transazionali presi dalla configurazione."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("method, args, path", [
+        ("send_welcome_email", (), "/auth/login"),
+        ("send_password_reset_email", ("TOKEN",), "/auth/reset-password?token=TOKEN"),
+        ("send_email_verification", ("TOKEN",), "/auth/verify-email?token=TOKEN"),
+    ])
+    async def test_links_use_frontend_url(self, monkeypatch, method, args, path):
+        """Test link costruiti su FRONTEND_URL e supporto su MAIL_FROM."""
+        sent = []
+
+        async def capture(to, template_name, context, subject=None, attachments=None):
+            sent.append((subject, context))
+            return True
+
+        service = EmailService()
+        monkeypatch.setattr(service, "send_template_email", capture)
+        monkeypatch.setattr(settings, "frontend_url", "https://iss.example.it")
+
+        user = SimpleNamespace(nome="Maria", email="maria@example.it")
+        assert await getattr(service, method)(user, *args)
+
+        subject, context = sent[0]
+        assert f"https://iss.example.it{path}" in context.values()
+        assert context["support_email"] == settings.mail_from
@@ -0,0 +1,87 @@
+"""
+Test per il broker degli eventi in tempo reale sui bandi
+"""
+import asyncio
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.bando import BandoSource, BandoStatus
+from app.services.event_broker import (
+    BANDO_CREATED, EventBroker, bando_event, filter_terms, format_sse, matches_profile
+)
+
+
+def make_bando(bando_id, title="Bando Inclusione Sociale", categoria="sociale"):
+    return SimpleNamespace(
+        id=bando_id, title=title, ente="Regione Campania", fonte=BandoSource.REGIONE_CAMPANIA,
+        status=BandoStatus.ATTIVO, categoria=categoria, importo="€ 50.000",
+        scadenza=datetime(2026, 3, 31), link=f"https://bandi.example.it/{bando_id}",
+        keyword_match=None, descrizione=None
+    )
+
+
+class TestEventBroker:
+    """Test per pubblicazione, filtro per profilo e formato SSE."""
+
+    def test_event_is_json_serializable(self):
+        """Test enum e date convertiti in valori JSON."""
+        event = bando_event(BANDO_CREATED, make_bando(1))
+
+        payload = json.loads(json.dumps(event))
+        assert payload['bando']['status'] == BandoStatus.ATTIVO.value
+        assert payload['bando']['scadenza'] == "2026-03-31T00:00:00"
+
+    def test_terms_filter(self):
+        """Test filtro sui termini del client; nessun termine riceve tutto."""
+        terms = filter_terms(["Giovani", "Sociale", "giovani ", " ", ""])
+
+        assert terms == ["giovani", "sociale"]
+        assert matches_profile(bando_event(BANDO_CREATED, make_bando(1)), terms)
+        assert not matches_profile(bando_event(BANDO_CREATED, make_bando(2, "Bando Sport", "sport")), terms)
+        assert matches_profile(bando_event(BANDO_CREATED, make_bando(2, "Bando Sport", "sport")), [])
+
+    @pytest.mark.asyncio
+    async def test_in_process_publish_reaches_matching_subscribers(self):
+        """Test fan-out in-process: ogni client riceve solo gli eventi pertinenti."""
+        broker = EventBroker(redis_url="redis://localhost:6379", queue_size=10)
+        everyone = broker.subscribe()
+        sport = broker.subscribe(["sport"])
+
+        await broker.publish([
+            bando_event(BANDO_CREATED, make_bando(1)),
+            bando_event(BANDO_CREATED, make_bando(2, "Bando Sport", "sport"))
+        ])
+
+        assert everyone.queue.qsize() == 2
+        assert sport.queue.qsize() == 1
+        assert (await sport.queue.get())['bando']['id'] == 2
+
+    def test_slow_subscriber_drops_oldest(self):
+        """Test coda piena: viene scartato l'evento più vecchio."""
+        broker = EventBroker(redis_url="redis://localhost:6379", queue_size=2)
+        subscription = broker.subscribe()
+
+        for bando_id in range(1, 4):
+            broker.dispatch(bando_event(BANDO_CREATED, make_bando(bando_id)))
+
+        assert subscription.dropped == 1
+        assert subscription.queue.get_nowait()['bando']['id'] == 2
+
+    @pytest.mark.asyncio
+    async def test_stream_yields_events_and_unsubscribes(self):
+        """Test flusso SSE: retry iniziale, evento, keep-alive e rilascio della sottoscrizione."""
+        broker = EventBroker(redis_url="redis://localhost:6379")
+        stream = broker.stream(heartbeat=0.05)
+
+        assert (await stream.__anext__()).startswith("retry: 50")
+        await broker.publish([bando_event(BANDO_CREATED, make_bando(7))])
+        chunk = await stream.__anext__()
+        assert chunk == format_sse(json.loads(chunk.split("data: ", 1)[1]))
+        assert "event: bando.created\nid: 7\n" in chunk
+        assert await asyncio.wait_for(stream.__anext__(), timeout=1) == ": keep-alive\n\n"
+
+        await stream.aclose()
+        assert broker.subscriber_count == 0
@@ -0,0 +1,61 @@
+"""
+Test per il fan-out concorrente dei job di notifica
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.email_notifications import EmailNotificationService
+from app.services.fan_out import FanOutExecutor
+
+
+class TestFanOutExecutor:
+    """Test per concorrenza limitata e isolamento degli errori."""
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        """Test mai più di N handler in esecuzione contemporaneamente."""
+        running, peak = 0, 0
+
+        async def handler(item):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return item * 2
+
+        outcomes = await FanOutExecutor(concurrency=3).run(range(10), handler)
+
+        assert peak == 3
+        assert [outcome.result for outcome in outcomes] == [i * 2 for i in range(10)]
+
+    @pytest.mark.asyncio
+    async def test_errors_are_isolated(self):
+        """Test un elemento che fallisce non interrompe gli altri."""
+        async def handler(item):
+            if item == 2:
+                raise ValueError("utente non valido")
+            return item
+
+        outcomes = await FanOutExecutor(concurrency=2).run([1, 2, 3], handler)
+
+        assert [outcome.result for outcome in outcomes] == [1, None, 3]
+        assert isinstance(outcomes[1].error, ValueError)
+
+    @pytest.mark.asyncio
+    async def test_dry_run_neither_queues_nor_sends(self):
+        """Test dry-run: messaggio composto, nessun invio."""
+        class FailingTransport:
+            async def send(self, *args, **kwargs):
+                raise AssertionError("invio non atteso")
+
+        service = EmailNotificationService(transport=FailingTransport())
+        user = SimpleNamespace(id=1, organization_name="APS", contact_email="aps@example.it")
+        bando = SimpleNamespace(
+            id=1, title="Bando", ente="Ente", importo=None, scadenza=None, descrizione=None,
+            link="https://bandi.example.it/1", data_trovato=None, data_aggiornamento=None
+        )
+
+        assert await service.send_new_bandi_alert(user, [bando], dry_run=True) is True
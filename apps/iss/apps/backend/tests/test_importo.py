@@ -0,0 +1,75 @@
+"""
+Test per il parsing degli importi e i filtri per intervallo di importo
+"""
+import pytest
+import pytest_asyncio
+from sqlalchemy import update
+
+from app.crud.bando import bando_crud
+from app.models.bando import Bando
+from app.schemas.bando import BandoSearch
+from app.utils.importo import parse_importo
+from tests.corpus_db import setup_corpus_database
+
+
+class TestParseImporto:
+    """Test per i formati italiani degli importi."""
+
+    @pytest.mark.parametrize("text, expected", [
+        ("€ 1.500.000,00", (1500000.0, 1500000.0)),
+        ("50k", (50000.0, 50000.0)),
+        ("fino a 200 mila euro", (None, 200000.0)),
+        ("da 10.000 a 50.000 €", (10000.0, 50000.0)),
+        ("a partire da 5.000 euro", (5000.0, None)),
+        ("tra 1 e 2 milioni", (1000000.0, 2000000.0)),
+        ("1,5 milioni di euro", (1500000.0, 1500000.0)),
+        ("contributo dell'80% fino a 30.000 euro", (None, 30000.0)),
+        ("fino a € 50.000 per 12 mesi", (None, 50000.0)),
+        ("€ 100.000,00 - annualità 2024/2025", (100000.0, 100000.0)),
+        ("max 5.000 euro per progetti 2025", (None, 5000.0)),
+        ("fino a 30.000 euro, minimo 5.000 euro", (5000.0, 30000.0)),
+        ("2.000 euro per 24 mesi", (2000.0, 2000.0)),
+    ])
+    def test_formats(self, text, expected):
+        """Test migliaia col punto, decimali con la virgola, moltiplicatori e intervalli aperti."""
+        assert parse_importo(text) == expected
+
+    @pytest.mark.parametrize("text", [None, "", "Vedi bando", "Importo non specificato", "Annualità 2024/2025"])
+    def test_without_amount(self, text):
+        """Test testi senza importo: nessun estremo."""
+        assert parse_importo(text) == (None, None)
+
+
+@pytest_asyncio.fixture
+async def corpus():
+    engine, session_maker, _ = await setup_corpus_database(40, seed=11)
+    importi = {1: "€ 10.000", 2: "fino a 50 mila euro", 3: "da 100.000 a 300.000 €", 4: "a partire da 1 milione"}
+    async with session_maker() as db:
+        for bando_id, importo in importi.items():
+            importo_min, importo_max = parse_importo(importo)
+            await db.execute(
+                update(Bando).where(Bando.id == bando_id)
+                .values(importo=importo, importo_min=importo_min, importo_max=importo_max)
+            )
+        await db.commit()
+    yield session_maker
+    await engine.dispose()
+
+
+class TestImportoFilters:
+    """Test per i filtri importo_min/importo_max di get_bandi."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("importo_min, importo_max, expected", [
+        (40000, None, {2, 3, 4}),
+        (None, 20000, {1, 2}),
+        (200000, 500000, {3}),
+    ])
+    async def test_overlapping_ranges(self, corpus, importo_min, importo_max, expected):
+        """Test bandi il cui intervallo di importo si sovrappone a quello richiesto."""
+        async with corpus() as db:
+            bandi, total = await bando_crud.get_bandi(
+                db, limit=100, search=BandoSearch(importo_min=importo_min, importo_max=importo_max)
+            )
+
+        assert {bando.id for bando in bandi} == expected and total == len(expected)
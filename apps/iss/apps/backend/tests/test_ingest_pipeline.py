@@ -0,0 +1,125 @@
+"""
+Test per la pipeline a eventi ingest → embedding → alert
+"""
+import pickle
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from app.services import semantic_search
+from app.services.ingest_pipeline import IngestPipeline
+from benchmarks.common import HashingEncoder
+from tests.corpus_db import setup_corpus_database
+
+
+class Recorder:
+    """Handler di stage che registra i lotti ricevuti e può fallire"""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, bando_ids):
+        self.batches.append(bando_ids)
+        if self.fail:
+            raise RuntimeError("stage non disponibile")
+
+
+def make_pipeline(embed=None, alert=None):
+    pipeline = IngestPipeline(batch_size=10)
+    pipeline.embed.handler = embed or Recorder()
+    pipeline.alert.handler = alert or Recorder()
+    return pipeline
+
+
+class TestIngestPipeline:
+    """Test per inoltro tra stage, lotti, errori e metriche."""
+
+    @pytest.mark.asyncio
+    async def test_inserted_ids_flow_through_stages(self):
+        """Test id inseriti elaborati dall'embedding e poi dagli alert, a lotti e senza duplicati."""
+        pipeline = make_pipeline()
+        await pipeline.start()
+        assert pipeline.publish_inserted([1, 2, 2, 3])
+        await pipeline.drain()
+
+        assert pipeline.embed.handler.batches == [[1, 2, 3]]
+        assert pipeline.alert.handler.batches == [[1, 2, 3]]
+        metrics = pipeline.metrics()
+        assert metrics['alert']['processed'] == 3 and metrics['alert']['queue_depth'] == 0
+        assert metrics['alert']['last_lag_ms'] >= metrics['embed']['last_lag_ms']
+        await pipeline.stop()
+
+    @pytest.mark.asyncio
+    async def test_embed_failure_still_alerts(self):
+        """Test embedding fallito: gli alert proseguono con il matching di ripiego."""
+        pipeline = make_pipeline(embed=Recorder(fail=True))
+        await pipeline.start()
+        pipeline.publish_inserted([5])
+        await pipeline.drain()
+
+        assert pipeline.metrics()['embed']['failed'] == 1
+        assert pipeline.alert.handler.batches == [[5]]
+        await pipeline.stop()
+
+    @pytest.mark.asyncio
+    async def test_not_running_pipeline_rejects_ids(self):
+        """Test pipeline ferma: gli id restano al job orario degli alert."""
+        pipeline = make_pipeline()
+
+        assert not pipeline.publish_inserted([1])
+        assert pipeline.embed.queue.qsize() == 0
+
+    @pytest.mark.asyncio
+    async def test_embed_stage_indexes_only_new_bandi(self, monkeypatch):
+        """Test stage embedding: indicizza solo i bandi mancanti, senza rigenerare l'indice."""
+        engine, session_maker, _ = await setup_corpus_database(50, seed=7)
+        service = semantic_search.SemanticSearchService()
+        service.embeddings_cache_file = str(Path(tempfile.mkdtemp()) / "bando_embeddings.pkl")
+        service.model = HashingEncoder()
+        monkeypatch.setattr(semantic_search, "semantic_search_service", service)
+
+        async with session_maker() as db:
+            await service.generate_embeddings(db)
+        last_update = service.last_update
+        new_ids = sorted(service.bando_embeddings)[-3:]
+        for bando_id in new_ids:
+            del service.bando_embeddings[bando_id]
+
+        pipeline = IngestPipeline(session_maker=session_maker)
+        pipeline.alert.handler = Recorder()
+        await pipeline.start()
+        pipeline.publish_inserted(new_ids)
+        await pipeline.drain()
+        await pipeline.stop()
+
+        assert set(new_ids) <= set(service.bando_embeddings)
+        assert len(service.bando_embeddings) == 50
+        assert service.last_update == last_update
+        assert pipeline.alert.handler.batches == [new_ids]
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_cache_saved_off_event_loop(self, monkeypatch):
+        """Test salvataggio della cache in un thread, su una copia dell'indice."""
+        service = semantic_search.SemanticSearchService()
+        service.embeddings_cache_file = str(Path(tempfile.mkdtemp()) / "bando_embeddings.pkl")
+        service.model = HashingEncoder()
+        service.last_update = datetime.now()
+        service.bando_embeddings = {1: service.model.encode(["Bando Cultura"])[0]}
+        loop_thread = threading.get_ident()
+        dumps, dump = [], pickle.dump
+
+        def recording_dump(data, f):
+            dumps.append((threading.get_ident(), data['embeddings'] is service.bando_embeddings))
+            dump(data, f)
+        monkeypatch.setattr(semantic_search.pickle, "dump", recording_dump)
+
+        await service.remove_bandi([1])
+
+        assert dumps and all(thread != loop_thread and not shared for thread, shared in dumps)
+        with open(service.embeddings_cache_file, 'rb') as f:
+            assert pickle.load(f)['embeddings'] == {}
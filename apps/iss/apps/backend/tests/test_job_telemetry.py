@@ -0,0 +1,82 @@
+"""
+Test per la telemetria dei job dello scheduler
+"""
+from datetime import datetime, timedelta, timezone
+
+from apscheduler.events import (
+    EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED,
+    JobExecutionEvent, JobSubmissionEvent
+)
+from prometheus_client import CollectorRegistry
+
+from app.services.job_telemetry import JobTelemetry
+
+
+def make_telemetry(history_size=10):
+    registry = CollectorRegistry()
+    return JobTelemetry(history_size=history_size, registry=registry), registry
+
+
+def submitted(job_id, run_time):
+    return JobSubmissionEvent(EVENT_JOB_SUBMITTED, job_id, 'default', [run_time])
+
+
+def executed(job_id, run_time, exception=None):
+    code = EVENT_JOB_ERROR if exception else EVENT_JOB_EXECUTED
+    return JobExecutionEvent(code, job_id, 'default', run_time, exception=exception)
+
+
+class TestJobTelemetry:
+    """Test per ritardo di avvio, durata, esiti e storico dei job."""
+
+    def test_successful_run_records_lag_and_duration(self):
+        """Test esecuzione riuscita: ritardo e durata osservati negli istogrammi."""
+        telemetry, registry = make_telemetry()
+        run_time = datetime.now(timezone.utc) - timedelta(seconds=2)
+
+        telemetry.handle_event(submitted('bandi_cleanup', run_time))
+        assert telemetry.running[0]['job_id'] == 'bandi_cleanup'
+        telemetry.handle_event(executed('bandi_cleanup', run_time))
+
+        labels = {'job_id': 'bandi_cleanup', 'outcome': 'success'}
+        assert registry.get_sample_value('iss_scheduler_job_runs_total', labels) == 1
+        assert registry.get_sample_value('iss_scheduler_job_duration_seconds_count', labels) == 1
+        lag = registry.get_sample_value('iss_scheduler_job_start_lag_seconds_sum', {'job_id': 'bandi_cleanup'})
+        assert lag >= 2
+        entry = telemetry.recent()[0]
+        assert entry['outcome'] == 'success' and entry['start_lag_seconds'] >= 2
+        assert entry['duration_seconds'] is not None
+        assert telemetry.running == []
+
+    def test_error_missed_and_skipped_outcomes(self):
+        """Test errori, esecuzioni perse e saltate per sovrapposizione contate per esito."""
+        telemetry, registry = make_telemetry()
+        run_time = datetime.now(timezone.utc)
+
+        telemetry.handle_event(submitted('new_bandi_alerts', run_time))
+        telemetry.handle_event(executed('new_bandi_alerts', run_time, exception=RuntimeError("smtp giù")))
+        telemetry.handle_event(JobExecutionEvent(EVENT_JOB_MISSED, 'new_bandi_alerts', 'default', run_time))
+        telemetry.handle_event(JobSubmissionEvent(EVENT_JOB_MAX_INSTANCES, 'new_bandi_alerts', 'default', [run_time]))
+
+        summary = telemetry.summary()['new_bandi_alerts']
+        assert summary['runs'] == {'error': 1, 'missed': 1, 'skipped': 1}
+        assert summary['last_outcome'] == 'skipped'
+        assert 'smtp giù' in telemetry.recent(job_id='new_bandi_alerts')[-1]['error']
+        labels = {'job_id': 'new_bandi_alerts', 'outcome': 'missed'}
+        assert registry.get_sample_value('iss_scheduler_job_runs_total', labels) == 1
+        # Solo l'esecuzione avviata ha una durata
+        assert registry.get_sample_value('iss_scheduler_job_duration_seconds_count', labels) is None
+
+    def test_history_is_bounded_and_newest_first(self):
+        """Test storico limitato alle ultime esecuzioni, dalla più recente."""
+        telemetry, _ = make_telemetry(history_size=3)
+        base = datetime.now(timezone.utc)
+        for minutes in range(5):
+            run_time = base + timedelta(minutes=minutes)
+            telemetry.handle_event(submitted('bandi_monitor_check', run_time))
+            telemetry.handle_event(executed('bandi_monitor_check', run_time))
+
+        history = telemetry.recent()
+        assert len(history) == 3
+        assert history[0]['scheduled_at'] == (base + timedelta(minutes=4)).isoformat()
+        assert telemetry.summary()['bandi_monitor_check']['runs'] == {'success': 5}
@@ -0,0 +1,100 @@
+"""
+Test per l'elezione del leader dello scheduler
+"""
+import asyncio
+
+import pytest
+
+from app.services.leader_election import LeaderElector, LocalLeaseLock, advisory_lock_id
+
+
+class Recorder:
+    """Callback che registrano elezioni e destituzioni"""
+
+    def __init__(self):
+        self.events = []
+
+    async def elected(self):
+        self.events.append("elected")
+
+    async def demoted(self):
+        self.events.append("demoted")
+
+
+async def make_elector(key, lease=10.0):
+    recorder = Recorder()
+    elector = LeaderElector(lock=LocalLeaseLock(key, lease), renew_interval=0.01)
+    elector._on_elected, elector._on_demoted = recorder.elected, recorder.demoted
+    return elector, recorder
+
+
+class TestLeaderElection:
+    """Test per esclusività, failover e perdita del lease."""
+
+    def test_advisory_lock_id_is_stable_bigint(self):
+        """Test chiave advisory deterministica nel range bigint."""
+        lock_id = advisory_lock_id("iss:scheduler:leader")
+
+        assert lock_id == advisory_lock_id("iss:scheduler:leader")
+        assert -2 ** 63 <= lock_id < 2 ** 63
+
+    @pytest.mark.asyncio
+    async def test_single_leader_among_workers(self):
+        """Test un solo leader tra più worker in competizione."""
+        electors = [await make_elector("test:single") for _ in range(3)]
+        for elector, _ in electors:
+            await elector.tick()
+
+        assert [elector.is_leader for elector, _ in electors] == [True, False, False]
+        assert electors[0][1].events == ["elected"]
+
+        await electors[0][0].stop()
+
+    @pytest.mark.asyncio
+    async def test_follower_takes_over_after_leader_stops(self):
+        """Test failover: il follower subentra quando il leader cede il lock."""
+        (leader, leader_events), (follower, follower_events) = [
+            await make_elector("test:failover") for _ in range(2)
+        ]
+        await leader.tick()
+        await follower.tick()
+        assert not follower.is_leader
+
+        await leader.stop()
+        await follower.tick()
+
+        assert leader_events.events == ["elected", "demoted"]
+        assert follower.is_leader and follower_events.events == ["elected"]
+        await follower.stop()
+
+    @pytest.mark.asyncio
+    async def test_expired_lease_demotes_leader(self):
+        """Test lease scaduto: il vecchio leader si ferma, un altro processo subentra."""
+        (leader, leader_events), (follower, _) = [
+            await make_elector("test:expiry", lease=0.05) for _ in range(2)
+        ]
+        await leader.tick()
+        await asyncio.sleep(0.06)
+        await follower.tick()
+        await leader.tick()
+
+        assert follower.is_leader
+        assert not leader.is_leader and leader_events.events == ["elected", "demoted"]
+        await follower.stop()
+
+    @pytest.mark.asyncio
+    async def test_failed_start_releases_lock(self):
+        """Test avvio dei job fallito: il lock torna disponibile per gli altri worker."""
+        elector, _ = await make_elector("test:failed-start")
+
+        async def broken():
+            raise RuntimeError("scheduler non avviabile")
+
+        elector._on_elected = broken
+        await elector.tick()
+        other, _ = await make_elector("test:failed-start")
+        await other.tick()
+
+        assert not elector.is_leader
+        assert other.is_leader
+        await other.stop()
@@ -0,0 +1,72 @@
+"""
+Test per il trasporto email con pool di connessioni SMTP
+"""
+import asyncio
+import pytest
+
+from app.services.mail_transport import MailTransport
+from app.services.email_notifications import EmailNotificationService
+from benchmarks.smtp_sink import SMTPSink
+
+
+def _transport(sink: SMTPSink, **kwargs) -> MailTransport:
+    return MailTransport(
+        hostname=sink.host, port=sink.port, username="", password="",
+        use_tls=False, start_tls=False, **kwargs
+    )
+
+
+class TestMailTransport:
+    """Test per riuso, rinnovo e riconnessione delle connessioni SMTP."""
+
+    @pytest.mark.asyncio
+    async def test_connections_are_reused(self):
+        """Test più messaggi concorrenti sulle stesse connessioni del pool."""
+        async with SMTPSink() as sink:
+            transport = _transport(sink, pool_size=2)
+            await asyncio.gather(*[
+                transport.send(f"aps{i}@example.it", f"Bando {i}", "<p>Nuovo bando</p>", from_email="noreply@example.it")
+                for i in range(10)
+            ])
+            await transport.close()
+
+        assert len(sink.messages) == 10
+        assert sink.connections <= 2
+        assert transport.stats['sent'] == 10
+
+    @pytest.mark.asyncio
+    async def test_max_messages_per_connection(self):
+        """Test rinnovo della connessione dopo il numero massimo di invii."""
+        async with SMTPSink() as sink:
+            transport = _transport(sink, pool_size=1, max_messages_per_connection=3)
+            for i in range(7):
+                await transport.send("aps@example.it", f"Bando {i}", "<p>ok</p>", from_email="noreply@example.it")
+            await transport.close()
+
+        assert len(sink.messages) == 7
+        assert sink.connections == 3
+
+    @pytest.mark.asyncio
+    async def test_reconnect_after_server_disconnect(self):
+        """Test nuovo tentativo su connessione chiusa dal server."""
+        async with SMTPSink(drop_after=2) as sink:
+            transport = _transport(sink, pool_size=1)
+            for i in range(5):
+                await transport.send("aps@example.it", f"Bando {i}", "<p>ok</p>", from_email="noreply@example.it")
+            await transport.close()
+
+        assert len(sink.messages) == 5
+        assert sink.connections == 3
+        assert transport.stats['failed'] == 0
+
+    @pytest.mark.asyncio
+    async def test_notification_service_sends_through_pool(self):
+        """Test EmailNotificationService inviato tramite il trasporto."""
+        async with SMTPSink() as sink:
+            service = EmailNotificationService(transport=_transport(sink))
+            service.enabled = True
+            assert await service.send_email("aps@example.it", "Scadenza bando", "<p>Mancano 3 giorni</p>")
+            await service.transport.close()
+
+        assert sink.messages[0]["Subject"] == "Scadenza bando"
+        assert sink.envelopes[0]['recipients'] == ["aps@example.it"]
@@ -0,0 +1,62 @@
+"""
+Test per il salvataggio dei bandi in run_monitoring con esecuzioni concorrenti
+"""
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.database.database import Base
+from app.models.bando import Bando, BandoDuplicate, BandoSource
+from app.models.bando_config import BandoConfig, BandoSourceState
+from app.models.rollup import BandoDailyRollup, KeywordDailyRollup
+from app.services import bando_monitor
+from app.services.bando_monitor import BandoMonitorService
+from app.services.near_duplicates import NearDuplicateDetector
+from tests.test_crawl_frequency import SCRAPERS, item
+
+
+class TestConcurrentIngest:
+    """Test per bandi inseriti nel frattempo da un'altra configurazione."""
+
+    @pytest.mark.asyncio
+    async def test_unique_violation_does_not_poison_the_run(self, monkeypatch):
+        """Test violazione dell'hash univoco: bando saltato, i successivi salvati, esecuzione completata."""
+        engine = create_async_engine(
+            "sqlite+aiosqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[
+                Bando.__table__, BandoDuplicate.__table__, BandoConfig.__table__, BandoSourceState.__table__,
+                BandoDailyRollup.__table__, KeywordDailyRollup.__table__
+            ])
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        monkeypatch.setattr(bando_monitor, "near_duplicate_detector", NearDuplicateDetector())
+
+        monitor = BandoMonitorService()
+        raced, fresh = item('Contributi per la cultura 2025'), item('Servizio civile universale giovani')
+        for name in SCRAPERS:
+            async def scrape(keywords, config, name=name):
+                return [raced, fresh] if name == 'scrape_csv_napoli' else []
+            monkeypatch.setattr(monitor, name, scrape)
+
+        # L'altra esecuzione ha già salvato il bando dopo il controllo sull'hash di questa
+        async def not_found_yet(db, hash_identifier):
+            return None
+        monkeypatch.setattr(bando_monitor.bando_crud, "get_bando_by_hash", not_found_yet)
+
+        async with session_maker() as db:
+            db.add(Bando(title=raced['title'], ente=raced['ente'], link=raced['link'], fonte=BandoSource.ALTRO,
+                         hash_identifier=monitor.generate_hash(raced['title'], raced['ente'], raced['link'])))
+            config = BandoConfig(name='test', keywords=['bando'], fonte_enabled=[], scraping_delay=0,
+                                 schedule_interval_hours=24)
+            db.add(config)
+            await db.commit()
+
+            result = await monitor.run_monitoring(db, config, force=True)
+            titles = set((await db.execute(select(Bando.title))).scalars())
+
+        assert result['status'] == 'completed'
+        assert result['bandi_new'] == 1 and result['errors_count'] == 0
+        assert titles == {raced['title'], fresh['title']}
+        await engine.dispose()
@@ -0,0 +1,106 @@
+"""
+Test per il rilevamento near-duplicate dei bandi
+"""
+import threading
+
+import pytest
+
+from app.utils.simhash import (
+    simhash, hamming_distance, normalize_text, to_signed64, from_signed64
+)
+from app.models.bando import Bando, BandoSource, BandoStatus
+from app.services.near_duplicates import NearDuplicateDetector
+from app.services.semantic_search import semantic_search_service
+from benchmarks.common import HashingEncoder
+from tests.corpus_db import setup_corpus_database
+
+
+class TestSimHash:
+    """Test per fingerprint SimHash e normalizzazione."""
+
+    def test_normalize_text(self):
+        """Test normalizzazione: minuscolo, senza accenti, punteggiatura e stop words."""
+        assert normalize_text("Bando per l'Inclusione Sociale - Città di Salerno") == \
+            "bando l inclusione sociale citta salerno"
+        assert normalize_text("") == ""
+
+    def test_similar_titles_are_close(self):
+        """Test titoli quasi identici da fonti diverse."""
+        a = simhash("Bando Regionale Sostegno Progetti Locali ODV e APS 2025")
+        b = simhash("BANDO REGIONALE: sostegno ai progetti locali di ODV e APS (2025)")
+        c = simhash("Avviso pubblico per la manutenzione delle strade comunali")
+
+        assert hamming_distance(a, b) <= 7
+        assert hamming_distance(a, c) > 7
+
+    def test_signed_roundtrip(self):
+        """Test conversione per la colonna BIGINT."""
+        value = simhash("Fondo unico per il terzo settore")
+        stored = to_signed64(value)
+        assert -(1 << 63) <= stored < (1 << 63)
+        assert from_signed64(stored) == value
+
+
+class TestNearDuplicateDetector:
+    """Test per l'indice LSH dei fingerprint."""
+
+    def test_candidates_and_remove(self):
+        """Test ricerca candidati e rimozione dall'indice."""
+        detector = NearDuplicateDetector()
+        detector.add(1, simhash("Bando Cultura Digitale 2025 per le APS"), "Bando Cultura Digitale 2025 per le APS")
+        detector.add(2, simhash("Contributi per eventi sportivi giovanili"), "Contributi per eventi sportivi giovanili")
+
+        matches = detector.candidates(simhash("Bando cultura digitale 2025 per APS"), max_distance=7)
+        assert [bando_id for bando_id, _ in matches] == [1]
+
+        detector.remove(1)
+        assert detector.candidates(simhash("Bando cultura digitale 2025 per APS"), max_distance=7) == []
+
+    @pytest.mark.asyncio
+    async def test_only_active_bandi_are_canonical(self):
+        """Test riedizione annuale di un bando scaduto: nessun canonico, il bando è nuovo."""
+        engine, session_maker, _ = await setup_corpus_database(0, seed=1)
+        title = "Contributi per le associazioni culturali annualità 2025"
+        async with session_maker() as db:
+            db.add(Bando(title=title, ente='Regione Campania', link='https://example.org/2025', fonte=BandoSource.ALTRO,
+                         status=BandoStatus.SCADUTO, hash_identifier='riedizione',
+                         simhash=to_signed64(simhash(title))))
+            await db.commit()
+
+            detector = NearDuplicateDetector()
+            assert await detector.find_canonical(db, title.replace("2025", "2026")) is None
+
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_staged_bandi_match_within_the_run(self):
+        """Test bandi non ancora committati: trovati tramite l'indice locale, assenti da quello condiviso."""
+        engine, session_maker, _ = await setup_corpus_database(0, seed=1)
+        title = "Bando Regionale Sostegno Progetti Locali ODV e APS 2025"
+        staged = NearDuplicateDetector()
+        staged.add(99, simhash(title), title)
+        detector = NearDuplicateDetector()
+        async with session_maker() as db:
+            match = await detector.find_canonical(db, "BANDO REGIONALE: sostegno progetti locali ODV e APS 2025",
+                                                  staged=staged)
+
+        assert match is not None and match['canonical_id'] == 99
+        assert 99 not in detector.fingerprints
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_embeddings_encoded_off_event_loop(self, monkeypatch):
+        """Test encoding dei titoli in un thread, senza bloccare l'event loop dell'ingest."""
+        threads = []
+
+        class RecordingEncoder(HashingEncoder):
+            def encode(self, texts, **kwargs):
+                threads.append(threading.get_ident())
+                return super().encode(texts, **kwargs)
+
+        monkeypatch.setattr(semantic_search_service, "model", RecordingEncoder())
+        title = "Bando Cultura Digitale 2025 per le APS"
+        similarities = await NearDuplicateDetector()._embedding_similarities(title, [title])
+
+        assert similarities == pytest.approx([1.0], abs=1e-4)
+        assert threads and threading.get_ident() not in threads
@@ -0,0 +1,69 @@
+"""
+Test per l'iterazione a pagine degli utenti destinatari delle notifiche
+"""
+import uuid
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.aps_user import aps_user_crud
+from app.models.aps_user import APSUser, NOTIFICATION_PREFERENCE_COLUMNS
+
+
+async def create_user(db: AsyncSession, preferences=None, is_active=True) -> APSUser:
+    suffix = uuid.uuid4().hex[:8]
+    user = APSUser(
+        organization_name=f"APS Stream {suffix}",
+        fiscal_code=suffix.upper(),
+        contact_email=f"stream-{suffix}@example.it",
+        notification_preferences=preferences,
+        is_active=is_active
+    )
+    db.add(user)
+    await db.flush()
+    return user
+
+
+class TestNotificationColumns:
+    """Test per l'allineamento tra preferenze JSON e colonne indicizzate."""
+
+    def test_columns_follow_json_preferences(self):
+        """Test preferenze mancanti abilitate, quelle disattivate riportate sulle colonne."""
+        user = APSUser(organization_name="APS", notification_preferences={'weekly_newsletter': False})
+        assert user.notify_weekly_newsletter is False
+        assert user.notify_new_bandi_alerts is True
+
+        user.notification_preferences = None
+        assert all(getattr(user, column) is True for column in NOTIFICATION_PREFERENCE_COLUMNS.values())
+
+
+class TestStreamActiveUsers:
+    """Test per keyset pagination e filtro preferenze lato database."""
+
+    @pytest.mark.asyncio
+    async def test_pages_cover_every_user_once(self, db_session: AsyncSession):
+        """Test pagine piccole: nessun utente perso o ripetuto."""
+        created = {(await create_user(db_session)).id for _ in range(5)}
+
+        seen = []
+        async for users in aps_user_crud.stream_active_users(db_session, page_size=2):
+            assert len(users) <= 2
+            seen.extend(user.id for user in users)
+
+        assert len(seen) == len(set(seen))
+        assert created <= set(seen)
+
+    @pytest.mark.asyncio
+    async def test_preference_and_active_filters(self, db_session: AsyncSession):
+        """Test esclusione di utenti disattivati o con preferenza disabilitata."""
+        default = await create_user(db_session)
+        opted_in = await create_user(db_session, {'weekly_newsletter': True})
+        opted_out = await create_user(db_session, {'weekly_newsletter': False})
+        inactive = await create_user(db_session, is_active=False)
+
+        seen = set()
+        async for users in aps_user_crud.stream_active_users(db_session, preference='weekly_newsletter'):
+            seen.update(user.id for user in users)
+
+        assert {default.id, opted_in.id} <= seen
+        assert opted_out.id not in seen and inactive.id not in seen
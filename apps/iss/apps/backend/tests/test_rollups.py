@@ -0,0 +1,207 @@
+"""
+Test per le tabelle di rollup giornaliere
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+import asyncio
+import uuid
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, func, select, update
+
+from app.crud.bando import bando_crud
+from app.crud.rollup import keyword_terms, rollup_crud
+from app.database.database import Base, async_session_maker
+from app.models.aps_user import AIRecommendation, APSUser, BandoApplication, BandoWatchlist
+from app.models.bando import Bando, BandoDuplicate, BandoSource, BandoStatus
+from app.models.rollup import BandoDailyRollup, KeywordDailyRollup, UserDailyRollup
+from app.schemas.bando import BandoUpdate
+from app.services.bando_lifecycle import BandoLifecycleService
+from tests.corpus_db import setup_corpus_database
+
+
+@pytest_asyncio.fixture
+async def corpus():
+    engine, session_maker, _ = await setup_corpus_database(120, seed=9)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[
+            APSUser.__table__, UserDailyRollup.__table__, BandoDuplicate.__table__,
+            BandoApplication.__table__, BandoWatchlist.__table__, AIRecommendation.__table__
+        ])
+    async with session_maker() as db:
+        now = datetime.now()
+        # Bandi distribuiti sugli ultimi 12 giorni
+        for offset in range(12):
+            await db.execute(
+                update(Bando).where(Bando.id % 12 == offset).values(data_trovato=now - timedelta(days=offset))
+            )
+        await db.commit()
+        await rollup_crud.rebuild(db)
+        await rollup_crud.rebuild_keywords(db)
+        await db.commit()
+    yield session_maker
+    await engine.dispose()
+
+
+async def raw_counts(db):
+    rows = (await db.execute(select(Bando.data_trovato, Bando.fonte, Bando.categoria, Bando.status))).all()
+    return Counter((found.date(), fonte.value, categoria or '', status.value) for found, fonte, categoria, status in rows)
+
+
+async def rollup_counts(db):
+    rows = (await db.execute(select(BandoDailyRollup))).scalars()
+    return Counter({(row.day, row.fonte, row.categoria, row.status): row.count for row in rows})
+
+
+async def keyword_counts(db):
+    rows = (await db.execute(select(KeywordDailyRollup))).scalars()
+    return Counter({(row.day, row.term): row.count for row in rows if row.count})
+
+
+class TestRollups:
+    """Test per ricostruzione, aggiornamento incrementale e letture dai rollup."""
+
+    @pytest.mark.asyncio
+    async def test_rebuild_matches_raw_table(self, corpus):
+        """Test ricostruzione: stessi conteggi per giorno, fonte, categoria e stato."""
+        async with corpus() as db:
+            assert await rollup_counts(db) == await raw_counts(db)
+
+    @pytest.mark.asyncio
+    async def test_status_changes_refresh_touched_days(self, corpus):
+        """Test scadenza e modifica di un bando: rollup allineato senza ricostruzione."""
+        async with corpus() as db:
+            await db.execute(update(Bando).where(Bando.id <= 10).values(scadenza=datetime.now() - timedelta(days=3)))
+            await db.commit()
+            result = await BandoLifecycleService().run(db, archive_after_days=3650)
+            await bando_crud.update_bando(db, 50, BandoUpdate(categoria='cultura'))
+            await bando_crud.delete_bando(db, 51)
+
+            assert set(range(1, 11)) <= set(result['expired'])
+            assert await rollup_counts(db) == await raw_counts(db)
+
+    @pytest.mark.asyncio
+    async def test_trends_and_kpis_read_rollup(self, corpus):
+        """Test serie giornaliera e KPI dal rollup uguali ai conteggi sulla tabella."""
+        async with corpus() as db:
+            await db.execute(update(Bando).where(Bando.id % 5 == 0).values(status=BandoStatus.SCADUTO))
+            await rollup_crud.rebuild(db)
+            await db.commit()
+
+            today = datetime.now().date()
+            daily = await rollup_crud.daily_new_bandi(db, today - timedelta(days=6))
+            kpis = await rollup_crud.bandi_kpis(db, today=today)
+            raw = await raw_counts(db)
+
+        assert len(daily) == 7 and sum(count for _, count in daily) == 70
+        assert kpis['total'] == 120 and kpis['expired'] == 24 and kpis['active'] == 96
+        assert kpis['new_week'] == sum(count for key, count in raw.items() if key[0] >= today - timedelta(days=7))
+
+    @pytest.mark.asyncio
+    async def test_keywords_follow_updates_and_archive(self, corpus):
+        """Test conteggi incrementali dei termini uguali a una ricostruzione completa."""
+        async with corpus() as db:
+            await bando_crud.update_bando(db, 30, BandoUpdate(title='Contributi straordinari biblioteche comunali'))
+            await bando_crud.delete_bando(db, 31)
+            # Archiviazione e nuovo titolo insieme: i termini escono dai conteggi
+            await bando_crud.update_bando(db, 32, BandoUpdate(title='Bando archiviato teatri', status='archiviato'))
+            after_update = await keyword_counts(db)
+            await rollup_crud.rebuild_keywords(db)
+            assert after_update == await keyword_counts(db)
+            assert sum(count for (_, term), count in after_update.items() if term == 'biblioteche') >= 1
+            assert not any(term == 'teatri' for (_, term) in after_update)
+
+            # Bandi vecchi da archiviare: giorni spostati, conteggi ricostruiti prima del job
+            await db.execute(update(Bando).where(Bando.id <= 12).values(data_trovato=datetime.now() - timedelta(days=400)))
+            await rollup_crud.rebuild(db)
+            await rollup_crud.rebuild_keywords(db)
+            await db.commit()
+            result = await BandoLifecycleService().run(db, archive_after_days=365)
+            after_archive = await keyword_counts(db)
+            await rollup_crud.rebuild_keywords(db)
+
+            assert len(result['archived']) == 12
+            assert after_archive == await keyword_counts(db)
+
+    @pytest.mark.asyncio
+    async def test_top_keywords_by_bucket(self, corpus):
+        """Test top termini su tutto il periodo e sugli ultimi giorni."""
+        async with corpus() as db:
+            bandi = (await db.execute(select(Bando.data_trovato, Bando.title, Bando.descrizione))).all()
+            top = await rollup_crud.top_keywords(db, limit=5)
+            since = datetime.now().date() - timedelta(days=2)
+            recent = await rollup_crud.top_keywords(db, limit=5, since=since)
+
+        expected = Counter()
+        expected_recent = Counter()
+        for found, title, descrizione in bandi:
+            terms = keyword_terms(title, descrizione)
+            expected.update(terms)
+            if found.date() >= since:
+                expected_recent.update(terms)
+        assert [count for _, count in top] == [count for _, count in expected.most_common(5)]
+        assert all(expected[term] == count for term, count in top)
+        assert all(expected_recent[term] == count for term, count in recent)
+
+
+class TestConcurrentRefresh:
+    """Test su PostgreSQL: due transazioni che ricalcolano lo stesso giorno."""
+
+    @staticmethod
+    async def _interleave(first, second):
+        """La seconda transazione ricalcola mentre la prima tiene il giorno, poi entrambe fanno commit"""
+        async with async_session_maker() as db_a, async_session_maker() as db_b:
+            await first(db_a)
+            waiting = asyncio.create_task(second(db_b))
+            await asyncio.sleep(0.3)
+            assert not waiting.done()  # in attesa dell'advisory lock, non in errore
+            await db_a.commit()
+            await waiting
+            await db_b.commit()
+
+    @pytest.mark.database
+    @pytest.mark.asyncio
+    async def test_same_day_signups(self):
+        """Test due registrazioni concorrenti nello stesso giorno: nessuna violazione di chiave, conteggio esatto."""
+        async def signup(db):
+            code = uuid.uuid4().hex[:16]
+            user = APSUser(organization_name=f'APS {code}', fiscal_code=code, contact_email=f'{code}@example.it')
+            db.add(user)
+            await db.flush()
+            await rollup_crud.refresh_user_days(db, [user.created_at.date()])
+
+        await self._interleave(signup, signup)
+
+        today = datetime.now().date()
+        async with async_session_maker() as db:
+            raw = await db.scalar(select(func.count(APSUser.id)).where(func.date(APSUser.created_at) == today))
+            signups = await db.scalar(select(UserDailyRollup.signups).where(UserDailyRollup.day == today))
+        assert signups == raw
+
+    @pytest.mark.database
+    @pytest.mark.asyncio
+    async def test_same_day_ingests(self):
+        """Test due ingest concorrenti nello stesso giorno: entrambi committati e rollup allineato."""
+        created = []
+
+        async def ingest(db):
+            code = uuid.uuid4().hex
+            bando = Bando(title=f'Bando concorrente {code}', ente='Test', link=f'https://example.org/{code}',
+                          fonte=BandoSource.ALTRO, hash_identifier=code)
+            db.add(bando)
+            await db.flush()
+            created.append(bando.id)
+            await rollup_crud.refresh_bandi(db, [bando.id])
+
+        await self._interleave(ingest, ingest)
+
+        today = datetime.now().date()
+        async with async_session_maker() as db:
+            raw = await db.scalar(select(func.count(Bando.id)).where(func.date(Bando.data_trovato) == today))
+            total = await db.scalar(select(func.sum(BandoDailyRollup.count)).where(BandoDailyRollup.day == today))
+            assert total == raw
+            await db.execute(delete(Bando).where(Bando.id.in_(created)))
+            await rollup_crud.refresh_bandi_days(db, [today])
+            await db.commit()
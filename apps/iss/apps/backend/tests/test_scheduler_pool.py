@@ -0,0 +1,96 @@
+"""
+Test per l'esecuzione parallela delle configurazioni di monitoraggio
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.services import scheduler as scheduler_module
+from app.services.scheduler import BandoSchedulerService, _seconds_since
+
+
+def make_config(config_id):
+    return SimpleNamespace(id=config_id, next_run=datetime.now() - timedelta(seconds=30))
+
+
+class FakeRuns:
+    """Sostituisce l'esecuzione reale tracciando la concorrenza"""
+
+    def __init__(self, duration=0.02):
+        self.duration = duration
+        self.running = 0
+        self.max_running = 0
+        self.started = []
+
+    async def __call__(self, config_id, scheduled_for=None):
+        self.started.append(config_id)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.duration)
+        finally:
+            self.running -= 1
+
+
+@pytest.fixture
+def service(monkeypatch):
+    configs = [make_config(config_id) for config_id in range(1, 6)]
+
+    async def get_configs_to_run(db):
+        return configs
+
+    monkeypatch.setattr(scheduler_module.bando_config_crud, "get_configs_to_run", get_configs_to_run)
+    monkeypatch.setattr(settings, "monitor_config_concurrency", 2)
+    service = BandoSchedulerService()
+    service._run_single_config = FakeRuns()
+    return service
+
+
+class TestConfigPool:
+    """Test per pool limitato, deduplica e annullamento."""
+
+    def test_seconds_since_naive_and_aware(self):
+        """Test ritardo calcolato sia con datetime naive che con timezone."""
+        assert 9 <= _seconds_since(datetime.now() - timedelta(seconds=10)) < 11
+        assert 9 <= _seconds_since(datetime.now(timezone.utc) - timedelta(seconds=10)) < 11
+        assert _seconds_since(datetime.now() + timedelta(hours=1)) == 0.0
+
+    @pytest.mark.asyncio
+    async def test_due_configs_run_with_bounded_concurrency(self, service):
+        """Test tutte le configurazioni eseguite, al massimo due alla volta."""
+        await service._check_and_run_configs()
+        await asyncio.gather(*list(service._config_runs.values()))
+
+        runs = service._run_single_config
+        assert sorted(runs.started) == [1, 2, 3, 4, 5]
+        assert runs.max_running == 2
+        assert service._config_runs == {}
+
+    @pytest.mark.asyncio
+    async def test_running_config_not_dispatched_twice(self, service):
+        """Test controllo successivo: le configurazioni in corso non vengono rilanciate."""
+        service._run_single_config.duration = 0.2
+        await service._check_and_run_configs()
+        first = dict(service._config_runs)
+        await service._check_and_run_configs()
+
+        assert service._config_runs == first
+        await asyncio.gather(*first.values())
+        assert len(service._run_single_config.started) == 5
+
+    @pytest.mark.asyncio
+    async def test_stop_cancels_running_configs(self, service):
+        """Test arresto dello scheduler: le esecuzioni in corso vengono annullate."""
+        service._run_single_config.duration = 10
+        await service._check_and_run_configs()
+        await asyncio.sleep(0.01)
+        service.is_running = True
+        service.scheduler = SimpleNamespace(shutdown=lambda wait: None)
+
+        await service.stop()
+
+        assert service._config_runs == {}
+        assert service._run_single_config.running == 0
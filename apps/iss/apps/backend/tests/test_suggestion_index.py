@@ -0,0 +1,103 @@
+"""
+Test per l'indice di autocompletamento della ricerca bandi
+"""
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.bando import BandoStatus
+from app.services import suggestion_index as suggestion_module
+from app.services.event_broker import BANDO_CREATED, bando_event
+from app.services.suggestion_index import QUERY_MAX_AGE, QUERY_MIN_CLIENTS, SuggestionIndex
+from tests.corpus_db import setup_corpus_database
+
+
+class TestSuggestionIndex:
+    """Test per il trie dei suggerimenti."""
+
+    def test_prefix_completion_ranked_by_popularity(self):
+        """Test completion ordinate per frequenza nel corpus."""
+        index = SuggestionIndex()
+        index.add("Inclusione sociale", 'categoria')
+        index.add("Inclusione sociale", 'categoria')
+        index.add("Inclusione digitale anziani", 'title')
+
+        assert index.complete("incl") == ["Inclusione sociale", "Inclusione digitale anziani"]
+        assert index.complete("INCLUSIONE dig") == ["Inclusione digitale anziani"]
+        assert index.complete("xyz") == []
+
+    def test_word_start_and_accents(self):
+        """Test match a inizio parola, ignorando accenti e stop words."""
+        index = SuggestionIndex()
+        index.add("Bando per le Città Sostenibili", 'title')
+
+        assert index.complete("citta") == ["Bando per le Città Sostenibili"]
+        assert index.complete("sosten") == ["Bando per le Città Sostenibili"]
+        assert index.complete("ittà") == []
+
+    def test_recorded_queries_promoted_after_distinct_clients(self):
+        """Test query promossa solo dopo QUERY_MIN_CLIENTS client distinti, poi sopra i titoli."""
+        index = SuggestionIndex(top_k=2)
+        index.add("Giovani e sport", 'title')
+        index.add("Giovani in rete", 'title')
+        for _ in range(10):
+            index.record_query("giovani volontari", "10.0.0.1")
+
+        # Ripetuta da un solo client: non entra nei suggerimenti
+        assert "giovani volontari" not in index.complete("giov", limit=10)
+
+        for client in range(2, QUERY_MIN_CLIENTS + 1):
+            index.record_query("giovani volontari", f"10.0.0.{client}")
+
+        assert index.complete("giov", limit=1) == ["giovani volontari"]
+        assert len(index.complete("giov", limit=10)) == 2
+
+    @pytest.mark.asyncio
+    async def test_tracked_queries_capped_and_aged(self, monkeypatch):
+        """Test query tracciate limitate e scartate alla ricostruzione quando non più cercate."""
+        monkeypatch.setattr(suggestion_module, "MAX_TRACKED_QUERIES", 2)
+        index = SuggestionIndex()
+        for query in ("alpha uno", "beta due", "gamma tre"):
+            for client in range(QUERY_MIN_CLIENTS):
+                index.record_query(query, str(client))
+
+        assert list(index.queries) == ["beta due", "gamma tre"]
+
+        index.queries["beta due"].last_seen = datetime.now() - QUERY_MAX_AGE * 2
+        engine, session_maker, _ = await setup_corpus_database(5, seed=3)
+        async with session_maker() as db:
+            await index.build(db)
+        await engine.dispose()
+
+        assert list(index.queries) == ["gamma tre"]
+        assert index.complete("beta") == [] and index.complete("gamma") == ["gamma tre"]
+
+    def test_events_add_created_bandi(self):
+        """Test bandi creati da un altro worker indicizzati dall'evento del broker."""
+        index = SuggestionIndex()
+        bando = SimpleNamespace(id=1, title="Sostegno alle famiglie fragili", ente="Comune di Salerno",
+                                categoria="Welfare", status=BandoStatus.ATTIVO)
+        index.apply_event(bando_event(BANDO_CREATED, bando))
+
+        assert index.complete("sostegno") == ["Sostegno alle famiglie fragili"]
+        assert index.complete("salerno") == ["Comune di Salerno"]
+
+    @pytest.mark.asyncio
+    async def test_adds_during_build_survive_swap(self):
+        """Test frase aggiunta mentre la ricostruzione legge il database: presente dopo lo scambio."""
+        engine, session_maker, _ = await setup_corpus_database(5, seed=3)
+        index = SuggestionIndex()
+
+        async with session_maker() as db:
+            execute = db.execute
+
+            async def execute_with_add(*args, **kwargs):
+                index.add("Bando appena arrivato", 'title')
+                return await execute(*args, **kwargs)
+            db.execute = execute_with_add
+            await index.build(db)
+        await engine.dispose()
+
+        assert index.complete("appena") == ["Bando appena arrivato"]
+        assert index._building is None
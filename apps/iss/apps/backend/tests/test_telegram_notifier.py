@@ -0,0 +1,197 @@
+"""
+Test per il canale di notifica Telegram contro un Bot API simulato
+"""
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.database.database import Base
+from app.crud.alert_ledger import telegram_ledger_crud
+from app.models.alert_ledger import TelegramLedger, TelegramLedgerStatus
+from app.models.bando import Bando, BandoSource, BandoStatus
+from app.models.bando_config import BandoConfig
+from app.services.telegram_notifier import TELEGRAM_MAX_MESSAGE_CHARS, TelegramNotifier, build_messages
+
+
+def make_bando(bando_id, title="Bando Inclusione Sociale"):
+    return SimpleNamespace(
+        id=bando_id, title=title, ente="Regione Campania", importo="€ 50.000",
+        scadenza=datetime(2026, 3, 31), link=f"https://bandi.example.it/{bando_id}?a=1&b=2"
+    )
+
+
+class MockBotAPI:
+    """Bot API minimale: registra i messaggi e può rispondere 429 o errore"""
+
+    def __init__(self, rate_limited=0, fail_after=None):
+        self.messages = []
+        self.rate_limited = rate_limited
+        self.fail_after = fail_after
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/botTOKEN/sendMessage"
+        if self.rate_limited:
+            self.rate_limited -= 1
+            return httpx.Response(429, json={
+                'ok': False, 'error_code': 429, 'parameters': {'retry_after': 0}
+            })
+        if self.fail_after is not None and len(self.messages) >= self.fail_after:
+            return httpx.Response(400, json={'ok': False, 'description': "Bad Request: chat not found"})
+        self.messages.append(json.loads(request.content))
+        return httpx.Response(200, json={'ok': True, 'result': {'message_id': len(self.messages)}})
+
+
+def make_notifier(api: MockBotAPI, **kwargs) -> TelegramNotifier:
+    return TelegramNotifier(
+        api_base="http://bot.test", chat_rate_per_second=0, transport=httpx.MockTransport(api), **kwargs
+    )
+
+
+class TestTelegramNotifier:
+    """Test per impacchettamento, limiti e gestione errori."""
+
+    def test_build_messages_respects_limit(self):
+        """Test lotti sotto i 4096 caratteri che coprono tutti i bandi."""
+        bandi = [make_bando(i, "Bando " + "x" * 300) for i in range(1, 41)]
+        messages = build_messages(bandi)
+
+        assert len(messages) > 1
+        assert all(len(text) <= TELEGRAM_MAX_MESSAGE_CHARS for text, _ in messages)
+        assert [bando_id for _, ids in messages for bando_id in ids] == list(range(1, 41))
+
+    def test_entries_are_html_escaped(self):
+        """Test titolo e link con caratteri HTML escapati."""
+        text, ids = build_messages([make_bando(1, "Bando <Giovani> & Sport")])[0]
+
+        assert ids == [1]
+        assert "Bando &lt;Giovani&gt; &amp; Sport" in text
+        assert 'href="https://bandi.example.it/1?a=1&amp;b=2"' in text
+
+    @pytest.mark.asyncio
+    async def test_send_batches_and_retries_on_rate_limit(self):
+        """Test invio in pochi messaggi con retry dopo 429."""
+        api = MockBotAPI(rate_limited=1)
+        delivery = await make_notifier(api).send_bandi("TOKEN", "-100123", [make_bando(i) for i in range(1, 6)])
+
+        assert delivery.error is None
+        assert delivery.sent_ids == [1, 2, 3, 4, 5]
+        assert len(api.messages) == 1
+        assert api.messages[0]['chat_id'] == "-100123"
+        assert api.messages[0]['parse_mode'] == "HTML"
+
+    @pytest.mark.asyncio
+    async def test_stops_on_error_and_reports_pending(self):
+        """Test errore del Bot API: solo i lotti consegnati risultano inviati."""
+        api = MockBotAPI(fail_after=1)
+        bandi = [make_bando(i, "Bando " + "x" * 300) for i in range(1, 41)]
+        delivery = await make_notifier(api).send_bandi("TOKEN", "-100123", bandi)
+
+        assert delivery.messages_sent == 1
+        assert "chat not found" in delivery.error
+        assert delivery.pending == len(bandi) - len(delivery.sent_ids) > 0
+
+    @pytest.mark.asyncio
+    async def test_messages_per_run_cap(self):
+        """Test limite di messaggi per giro: il resto resta in attesa."""
+        api = MockBotAPI()
+        bandi = [make_bando(i, "Bando " + "x" * 300) for i in range(1, 41)]
+        delivery = await make_notifier(api, max_messages_per_run=1).send_bandi("TOKEN", "-100123", bandi)
+
+        assert delivery.messages_sent == 1 and len(api.messages) == 1
+        assert delivery.pending > 0
+
+
+async def make_database():
+    engine = create_async_engine(
+        "sqlite+aiosqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[
+            Bando.__table__, BandoConfig.__table__, TelegramLedger.__table__
+        ])
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+class TestDeliverPending:
+    """Test per l'invio per chat registrato nel ledger (chat, bando)."""
+
+    @pytest.mark.asyncio
+    async def test_each_chat_gets_its_own_matches_once(self):
+        """Test configurazioni con chat e parole chiave diverse: ognuna riceve i propri bandi, una sola volta."""
+        engine, session_maker = await make_database()
+
+        titles = {
+            1: "Bando cultura e spettacolo", 2: "Bando sport giovanile",
+            3: "Cultura nelle scuole", 4: "Bando cultura scaduto",
+        }
+        async with session_maker() as db:
+            for bando_id, title in titles.items():
+                db.add(Bando(
+                    id=bando_id, title=title, ente="Comune di Salerno", link=f"https://bandi.example.it/{bando_id}",
+                    fonte=BandoSource.ALTRO, hash_identifier=f"hash-{bando_id}",
+                    status=BandoStatus.SCADUTO if bando_id == 4 else BandoStatus.ATTIVO
+                ))
+            cultura = BandoConfig(name='cultura', keywords=['cultura'], fonte_enabled=[], telegram_enabled=True,
+                                  telegram_bot_token="TOKEN", telegram_chat_id="-100111")
+            sport = BandoConfig(name='sport', keywords=['sport'], fonte_enabled=[], telegram_enabled=True,
+                                telegram_bot_token="TOKEN", telegram_chat_id="-100222")
+            db.add_all([cultura, sport])
+            await db.commit()
+
+            api = MockBotAPI()
+            notifier = make_notifier(api)
+            first = await notifier.deliver_pending(db, cultura)
+            second = await notifier.deliver_pending(db, sport)
+            again = await notifier.deliver_pending(db, cultura)
+            ledger = (await db.execute(select(TelegramLedger.chat_id, TelegramLedger.bando_id))).all()
+
+        assert first['bandi_notified'] == 2 and second['bandi_notified'] == 1
+        assert again['bandi_notified'] == 0 and len(api.messages) == 2
+        assert set(ledger) == {("-100111", 1), ("-100111", 3), ("-100222", 2)}
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_claims_committed_before_sending_and_released_on_failure(self):
+        """Test bandi reclamati con commit prima dell'invio; quelli non inviati tornano al giro successivo."""
+        engine, session_maker = await make_database()
+        async with session_maker() as db:
+            db.add_all([
+                Bando(id=bando_id, title=f"Bando cultura {bando_id}", ente="Comune di Salerno",
+                      link=f"https://bandi.example.it/{bando_id}", fonte=BandoSource.ALTRO,
+                      hash_identifier=f"hash-{bando_id}", status=BandoStatus.ATTIVO)
+                for bando_id in (1, 2)
+            ])
+            config = BandoConfig(name='cultura', keywords=['cultura'], fonte_enabled=[], telegram_enabled=True,
+                                 telegram_bot_token="TOKEN", telegram_chat_id="-100111")
+            db.add(config)
+            await db.commit()
+
+            notifier = make_notifier(MockBotAPI(fail_after=0))
+            send_bandi = notifier.send_bandi
+            concurrent = []
+
+            async def send_while_claimed(token, chat_id, bandi):
+                # Un giro concorrente durante l'invio non trova nulla da reclamare
+                async with session_maker() as other_db:
+                    concurrent.extend(await telegram_ledger_crud.claim_pending(other_db, chat_id))
+                    claims = (await other_db.execute(select(TelegramLedger.status))).scalars().all()
+                assert claims == [TelegramLedgerStatus.PENDING] * 2
+                return await send_bandi(token, chat_id, bandi)
+            notifier.send_bandi = send_while_claimed
+
+            failed = await notifier.deliver_pending(db, config)
+            released = (await db.execute(select(TelegramLedger))).scalars().all()
+
+            retried = await make_notifier(MockBotAPI()).deliver_pending(db, config)
+            ledger = (await db.execute(select(TelegramLedger.bando_id, TelegramLedger.status))).all()
+
+        assert concurrent == [] and failed['status'] == 'failed' and released == []
+        assert retried['bandi_notified'] == 2
+        assert set(ledger) == {(1, TelegramLedgerStatus.SENT), (2, TelegramLedgerStatus.SENT)}
+        await engine.dispose()